@@ -0,0 +1,143 @@
+"""
+Round-trips and latency of a read-heavy mix with and without the
+client-side cache.
+
+Simulates handlers reading cycles, the questionnaire and Telegram IDs
+while a second client (another process) rewrites some cycles, and checks
+that every read after such a write sees the new value. Round-trips are
+taken from the server's `total_commands_processed`. Requires a local
+Redis; the given database is flushed.
+
+Run from the project root:
+    python -m backend.benchmarks.bench_client_cache --reads 20000
+"""
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import time
+
+os.environ.setdefault("BOT_TOKEN", "12345:benchmark")
+os.environ.setdefault("GOOGLE_SHEET_ID", "benchmark")
+
+from redis.asyncio.client import Redis  # noqa: E402
+
+from backend.src.storage.client_cache import ClientSideCache  # noqa: E402
+from backend.src.storage.models import FeedbackCycle, Question, Questionnaire  # noqa: E402
+from backend.src.storage.redis_storage import RedisStorageService  # noqa: E402
+
+CYCLES = 300
+EMPLOYEES = 500
+PREFIXES = ["questionnaire", "cycle:", "employee_tg_id:"]
+
+
+def make_cycle(n: int, version: int = 0) -> FeedbackCycle:
+    return FeedbackCycle.model_validate(
+        {
+            "id": f"c{n}",
+            "target_employee_id": f"user{n}",
+            "respondents": {
+                f"user{r}": {
+                    "id": f"user{r}",
+                    "status": "completed" if r < version else "pending",
+                    "token": "t",
+                }
+                for r in range(8)
+            },
+            "deadline": "2030-01-01",
+        }
+    )
+
+
+QUESTIONNAIRE = Questionnaire(
+    questions=[
+        Question(question_id=f"q{i}", question_text="Question " * 10, question_type="scale")
+        for i in range(15)
+    ]
+)
+
+
+async def commands_processed(redis_client: Redis) -> int:
+    return (await redis_client.info("stats"))["total_commands_processed"]
+
+
+async def measure(dsn: str, reads: int, write_every: int, cached: bool):
+    redis_client = Redis.from_url(dsn)
+    writer = RedisStorageService(Redis.from_url(dsn))
+    await redis_client.flushdb()
+    for n in range(CYCLES):
+        await writer.set_model(f"cycle:{n}", make_cycle(n))
+    for n in range(EMPLOYEES):
+        await writer.set_value(f"employee_tg_id:user{n}", str(1000 + n))
+    await writer.set_model("questionnaire", QUESTIONNAIRE)
+
+    cache = None
+    if cached:
+        cache = ClientSideCache(redis_client, PREFIXES, max_entries=10_000, configure_keyspace_events=True)
+        cache.start()
+        while cache.mode is None:
+            await asyncio.sleep(0.01)
+    storage = RedisStorageService(redis_client, cache=cache)
+
+    rng = random.Random(1)
+    versions = [0] * CYCLES
+    latencies = []
+    stale = 0
+    before = await commands_processed(redis_client)
+    for i in range(reads):
+        if write_every and i % write_every == 0:
+            n = rng.randrange(CYCLES)
+            versions[n] += 1
+            await writer.set_model(f"cycle:{n}", make_cycle(n, versions[n]))
+            # Invalidations are asynchronous; give the push a moment to arrive.
+            await asyncio.sleep(0.002)
+        start = time.perf_counter()
+        kind = rng.random()
+        if kind < 0.5:
+            n = min(int(rng.paretovariate(1.2)) - 1, CYCLES - 1)
+            cycle = await storage.get_model(f"cycle:{n}", FeedbackCycle)
+            completed = sum(r.status == "completed" for r in cycle.respondents.values())
+            stale += completed != min(versions[n], 8)
+        elif kind < 0.8:
+            await storage.get(f"employee_tg_id:user{rng.randrange(EMPLOYEES)}")
+        else:
+            await storage.get_model("questionnaire", Questionnaire)
+        latencies.append(time.perf_counter() - start)
+    # Minus the writer's commands and the INFO call itself.
+    round_trips = await commands_processed(redis_client) - before - 1
+    if write_every:
+        round_trips -= (reads + write_every - 1) // write_every
+
+    mode = cache.mode if cache else None
+    if cache:
+        await cache.stop()
+    await redis_client.close()
+    await writer._redis.close()
+    return round_trips, latencies, stale, cache, mode
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--reads", type=int, default=20_000)
+    parser.add_argument("--write-every", type=int, default=50, help="one cycle write per N reads")
+    parser.add_argument("--redis", default="redis://localhost:6379/15")
+    args = parser.parse_args()
+
+    print(f"{args.reads} reads, one cycle rewritten every {args.write_every} reads:")
+    for cached in (False, True):
+        round_trips, latencies, stale, cache, mode = await measure(
+            args.redis, args.reads, args.write_every, cached
+        )
+        latencies.sort()
+        p50 = statistics.median(latencies) * 1e6
+        p99 = latencies[int(len(latencies) * 0.99)] * 1e6
+        label = f"cache ({mode}, hit rate {cache.hit_rate:.0%})" if cache else "no cache"
+        print(
+            f"  {label:32} {round_trips:7d} round-trips  "
+            f"p50 {p50:6.0f} us  p99 {p99:6.0f} us  stale reads {stale}"
+        )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
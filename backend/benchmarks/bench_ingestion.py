@@ -0,0 +1,185 @@
+"""
+Throughput of long polling vs. webhook ingestion against a local stand-in
+for the Telegram Bot API.
+
+The stand-in serves synthetic updates through getUpdates and answers every
+other method after a fixed simulated network latency. In webhook mode the
+same updates are POSTed to the WebhookServer with Telegram's default of
+40 parallel connections.
+
+Run from the project root:
+    python -m backend.benchmarks.bench_ingestion --updates 2000
+"""
+import argparse
+import asyncio
+import os
+import time
+
+os.environ.setdefault("BOT_TOKEN", "12345:benchmark")
+os.environ.setdefault("GOOGLE_SHEET_ID", "benchmark")
+
+from aiogram import Bot, Dispatcher, Router  # noqa: E402
+from aiogram.client.session.aiohttp import AiohttpSession  # noqa: E402
+from aiogram.client.telegram import TelegramAPIServer  # noqa: E402
+from aiogram.types import Message  # noqa: E402
+from aiohttp import ClientSession, TCPConnector, web  # noqa: E402
+
+from backend.src.webhook import SECRET_HEADER, WebhookServer  # noqa: E402
+
+TOKEN = "12345:benchmark"
+API_PORT = 18081
+WEBHOOK_PORT = 18082
+SECRET = "benchmark-secret"
+
+
+def make_update(update_id: int) -> dict:
+    user = {"id": 1000 + update_id % 500, "is_bot": False, "first_name": "User"}
+    return {
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id,
+            "date": int(time.time()),
+            "chat": {"id": user["id"], "type": "private"},
+            "from": user,
+            "text": "/ping",
+        },
+    }
+
+
+class FakeTelegramAPI:
+    """Serves queued updates via getUpdates and acknowledges other methods."""
+
+    def __init__(self, latency: float):
+        self.latency = latency
+        self.pending = []
+        self.calls = 0
+
+    async def handle(self, request: web.Request) -> web.Response:
+        method = request.match_info["method"]
+        data = await request.post()
+        self.calls += 1
+        await asyncio.sleep(self.latency)
+        if method == "getMe":
+            result = {"id": 1, "is_bot": True, "first_name": "Bench", "username": "bench_bot"}
+        elif method == "getUpdates":
+            offset = int(data.get("offset") or 0)
+            limit = int(data.get("limit") or 100)
+            self.pending = [u for u in self.pending if u["update_id"] >= offset]
+            result = self.pending[:limit]
+            if not result:
+                await asyncio.sleep(0.05)
+        elif method == "sendMessage":
+            chat_id = int(data["chat_id"])
+            result = {
+                "message_id": 1,
+                "date": int(time.time()),
+                "chat": {"id": chat_id, "type": "private"},
+                "text": data.get("text", ""),
+            }
+        else:
+            result = True
+        return web.json_response({"ok": True, "result": result})
+
+    def create_app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_post("/bot{token}/{method}", self.handle)
+        return app
+
+
+def make_dispatcher(total: int, done: asyncio.Event, handler_work: float) -> Dispatcher:
+    router = Router()
+    processed = 0
+
+    @router.message()
+    async def on_message(message: Message):
+        nonlocal processed
+        await asyncio.sleep(handler_work)
+        await message.answer("pong")
+        processed += 1
+        if processed == total:
+            done.set()
+
+    dp = Dispatcher()
+    dp.include_router(router)
+    return dp
+
+
+def make_bot() -> Bot:
+    session = AiohttpSession(api=TelegramAPIServer.from_base(f"http://127.0.0.1:{API_PORT}"))
+    return Bot(token=TOKEN, session=session)
+
+
+async def run_polling(api: FakeTelegramAPI, total: int, handler_work: float) -> float:
+    done = asyncio.Event()
+    dp = make_dispatcher(total, done, handler_work)
+    bot = make_bot()
+    api.pending = [make_update(i + 1) for i in range(total)]
+
+    start = time.perf_counter()
+    polling = asyncio.create_task(dp.start_polling(bot, polling_timeout=1, handle_signals=False))
+    await done.wait()
+    elapsed = time.perf_counter() - start
+    await dp.stop_polling()
+    await polling
+    await bot.session.close()
+    return elapsed
+
+
+async def run_webhook(total: int, handler_work: float, connections: int) -> float:
+    done = asyncio.Event()
+    dp = make_dispatcher(total, done, handler_work)
+    bot = make_bot()
+    server = WebhookServer(dp, bot, secret_token=SECRET, queue_size=1000, workers=64)
+    runner = web.AppRunner(server.create_app())
+    await runner.setup()
+    await web.TCPSite(runner, "127.0.0.1", WEBHOOK_PORT).start()
+    await server.start()
+
+    url = f"http://127.0.0.1:{WEBHOOK_PORT}/webhook"
+    updates = iter(make_update(i + 1) for i in range(total))
+
+    async def deliver(session: ClientSession):
+        for update in updates:
+            while True:
+                async with session.post(url, json=update, headers={SECRET_HEADER: SECRET}) as resp:
+                    if resp.status == 200:
+                        break
+                await asyncio.sleep(0.01)
+
+    start = time.perf_counter()
+    async with ClientSession(connector=TCPConnector(limit=connections)) as session:
+        await asyncio.gather(*(deliver(session) for _ in range(connections)))
+    await done.wait()
+    elapsed = time.perf_counter() - start
+
+    await runner.cleanup()
+    await server.stop()
+    await bot.session.close()
+    return elapsed
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--updates", type=int, default=2000)
+    parser.add_argument("--latency", type=float, default=0.02, help="simulated API latency, s")
+    parser.add_argument("--handler-work", type=float, default=0.005, help="simulated I/O per update, s")
+    parser.add_argument("--connections", type=int, default=40, help="parallel webhook deliveries")
+    args = parser.parse_args()
+
+    api = FakeTelegramAPI(latency=args.latency)
+    runner = web.AppRunner(api.create_app())
+    await runner.setup()
+    await web.TCPSite(runner, "127.0.0.1", API_PORT).start()
+
+    polling = await run_polling(api, args.updates, args.handler_work)
+    polling_calls, api.calls = api.calls, 0
+    webhook = await run_webhook(args.updates, args.handler_work, args.connections)
+    await runner.cleanup()
+
+    print(f"{args.updates} updates, API latency {args.latency * 1000:.0f} ms:")
+    print(f"  polling  {polling:6.2f} s  {args.updates / polling:8.0f} updates/s  {polling_calls} API calls")
+    print(f"  webhook  {webhook:6.2f} s  {args.updates / webhook:8.0f} updates/s  {api.calls} API calls")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,421 @@
+"""
+End-to-end load test of the real Dispatcher with synthetic users.
+
+Builds the dispatcher with `create_dispatcher` from `backend.src.__main__`,
+replaces the Bot API with an in-process session and Google Sheets with an
+in-memory stand-in (both with simulated latency), and feeds updates through
+`feed_update` in five phases:
+
+    register  every user sends /start and gets their Telegram ID registered
+    cycles    admins walk through /new_cycle: target, respondents, deadline,
+              confirmation (cycle creation and invitations)
+    survey    every invited respondent opens the survey via the deep link
+              and presses the invitation button
+    answers   respondents answer every question: a button press for
+              questions with choices, a message for free-text ones
+    submit    respondents confirm the filled-in questionnaire
+
+Each user sends their updates one after another, as a real client would;
+`--concurrency` users are active at once. Requires a local Redis; the given
+database is flushed.
+
+Run from the project root:
+    python -m backend.benchmarks.bench_load --users 500 --concurrency 50 \\
+        --output load.json [--baseline previous.json]
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import platform
+import resource
+import time
+from datetime import date, timedelta
+from typing import Any, Dict, List, Tuple
+
+ADMIN_BASE_ID = 900_000
+USER_BASE_ID = 100_000
+MAX_ADMINS = 100
+
+os.environ.setdefault("BOT_TOKEN", "12345:benchmark")
+os.environ.setdefault("GOOGLE_SHEET_ID", "benchmark")
+os.environ.setdefault("METRICS_ENABLED", "false")
+os.environ.setdefault("RESULTS_DB_PATH", ":memory:")
+os.environ["ADMIN_TELEGRAM_IDS"] = json.dumps(
+    [ADMIN_BASE_ID + i for i in range(MAX_ADMINS)]
+)
+
+from aiogram import Bot  # noqa: E402
+from aiogram.client.default import DefaultBotProperties  # noqa: E402
+from aiogram.client.session.base import BaseSession  # noqa: E402
+from aiogram.methods import SendMessage, TelegramMethod  # noqa: E402
+from aiogram.types import Message, Update  # noqa: E402
+from redis.asyncio.client import Redis  # noqa: E402
+
+from backend.src.__main__ import create_dispatcher  # noqa: E402
+from backend.src.bot.keyboards.survey_keyboards import (  # noqa: E402
+    ANSWER_CALLBACK_PREFIX,
+    SUBMIT_SURVEY_CALLBACK,
+)
+from backend.src.storage.models import Question  # noqa: E402
+
+
+class FakeBotSession(BaseSession):
+    """Answers every Bot API method in-process after a simulated latency."""
+
+    def __init__(self, latency: float):
+        super().__init__()
+        self.latency = latency
+        self.calls: Dict[str, int] = {}
+        self._message_ids = itertools.count(1)
+
+    async def make_request(self, bot: Bot, method: TelegramMethod, timeout=None) -> Any:
+        name = type(method).__name__
+        self.calls[name] = self.calls.get(name, 0) + 1
+        await asyncio.sleep(self.latency)
+        if isinstance(method, SendMessage):
+            return Message.model_validate(
+                {
+                    "message_id": next(self._message_ids),
+                    "date": int(time.time()),
+                    "chat": {"id": method.chat_id, "type": "private"},
+                    "text": method.text,
+                },
+                context={"bot": bot},
+            )
+        return True
+
+    async def stream_content(self, url, headers=None, timeout=30, chunk_size=65536, raise_for_status=True):
+        yield b""
+
+    async def close(self) -> None:
+        pass
+
+
+class FakeSheets:
+    """The GoogleSheetsService interface backed by in-memory worksheets."""
+
+    main_spreadsheet_id = "main"
+
+    def __init__(self, employees: List[Dict[str, str]], questions: List[Dict[str, str]], latency: float):
+        self.latency = latency
+        self.calls: Dict[str, int] = {}
+        self.sheets: Dict[str, List[List[Any]]] = {}
+        self.spreadsheets = 1
+        self._records = {"Employees": employees, "Questions": questions}
+
+    async def _call(self, name: str) -> None:
+        self.calls[name] = self.calls.get(name, 0) + 1
+        await asyncio.sleep(self.latency)
+
+    async def get_all_records(self, sheet_name: str) -> List[Dict[str, Any]]:
+        await self._call("get_all_records")
+        return list(self._records.get(sheet_name, []))
+
+    async def get_all_values(self, sheet_name: str, spreadsheet_id=None) -> List[List[str]]:
+        await self._call("get_all_values")
+        return [list(map(str, row)) for row in self.sheets.get(sheet_name, [])]
+
+    async def create_worksheet(self, title: str, headers: List[str], spreadsheet_id=None) -> None:
+        await self._call("create_worksheet")
+        self.sheets.setdefault(title, [headers])
+
+    async def create_worksheets(self, worksheets: Dict[str, List[str]], spreadsheet_id=None) -> int:
+        await self._call("create_worksheets")
+        new = [title for title in worksheets if title not in self.sheets]
+        for title in new:
+            self.sheets[title] = [worksheets[title]]
+        return len(new)
+
+    async def append_row(self, worksheet_title: str, row_data: List[Any], spreadsheet_id=None) -> None:
+        await self._call("append_row")
+        self.sheets.setdefault(worksheet_title, []).append(row_data)
+
+    async def append_rows(self, worksheet_title: str, rows: List[List[Any]], spreadsheet_id=None) -> None:
+        await self._call("append_rows")
+        self.sheets.setdefault(worksheet_title, []).extend(rows)
+
+    async def create_spreadsheet(self, title: str, folder_id=None) -> str:
+        await self._call("create_spreadsheet")
+        self.spreadsheets += 1
+        return f"shard{self.spreadsheets}"
+
+    async def get_usage(self, spreadsheet_id=None) -> Tuple[int, int]:
+        await self._call("get_usage")
+        return 1, 26_000
+
+
+def make_employees(users: int) -> List[Dict[str, str]]:
+    return [
+        {"Telegram_Nickname": f"@user{i}", "Last_Name": f"Last{i}", "First_Name": f"First{i}"}
+        for i in range(users)
+    ]
+
+
+def make_questions() -> List[Dict[str, str]]:
+    questions = [
+        {"question_id": f"Q{i}", "question_text": f"Question {i}", "question_type": "scale 0-3"}
+        for i in range(1, 11)
+    ]
+    questions += [
+        {"question_id": topic, "question_text": topic, "question_type": "textarea"}
+        for topic in ("O1_blockers", "O2_strengths", "O3_suggestions")
+    ]
+    return questions
+
+
+class LoadDriver:
+    """Builds synthetic updates and records the latency of feeding each one."""
+
+    def __init__(self, dp, bot: Bot):
+        self.dp = dp
+        self.bot = bot
+        self.latencies: Dict[str, List[float]] = {}
+        self.errors: Dict[str, int] = {}
+        self._update_ids = itertools.count(1)
+        self._message_ids = itertools.count(1_000_000)
+
+    @staticmethod
+    def _user(user_id: int, username: str) -> Dict[str, Any]:
+        return {"id": user_id, "is_bot": False, "first_name": username, "username": username}
+
+    async def _feed(self, step: str, payload: Dict[str, Any]) -> None:
+        update = Update.model_validate(
+            {"update_id": next(self._update_ids), **payload}, context={"bot": self.bot}
+        )
+        start = time.perf_counter()
+        try:
+            await self.dp.feed_update(self.bot, update)
+        except Exception:
+            self.errors[step] = self.errors.get(step, 0) + 1
+        self.latencies.setdefault(step, []).append(time.perf_counter() - start)
+
+    async def message(self, step: str, user_id: int, username: str, text: str) -> None:
+        user = self._user(user_id, username)
+        await self._feed(step, {
+            "message": {
+                "message_id": next(self._message_ids),
+                "date": int(time.time()),
+                "chat": {"id": user_id, "type": "private"},
+                "from": user,
+                "text": text,
+            },
+        })
+
+    async def callback(self, step: str, user_id: int, username: str, message_id: int, data: str) -> None:
+        await self._feed(step, {
+            "callback_query": {
+                "id": str(next(self._message_ids)),
+                "chat_instance": str(user_id),
+                "from": self._user(user_id, username),
+                "data": data,
+                "message": {
+                    "message_id": message_id,
+                    "date": int(time.time()),
+                    "chat": {"id": user_id, "type": "private"},
+                    "text": "screen",
+                },
+            },
+        })
+
+
+async def register_user(driver: LoadDriver, index: int) -> None:
+    await driver.message("start", USER_BASE_ID + index, f"user{index}", "/start")
+
+
+async def create_cycle(driver: LoadDriver, admin_index: int, target: int, respondents: List[int]) -> None:
+    admin_id, name = ADMIN_BASE_ID + admin_index, f"admin{admin_index}"
+    screen = next(driver._message_ids)
+    await driver.message("new_cycle", admin_id, name, "/new_cycle")
+    await driver.callback("select_target", admin_id, name, screen, f"select_target:user{target}")
+    for respondent in respondents:
+        await driver.callback("toggle_resp", admin_id, name, screen, f"toggle_resp:user{respondent}:0")
+    await driver.callback("finish_respondents", admin_id, name, screen, "finish_respondents")
+    deadline = (date.today() + timedelta(days=14)).isoformat()
+    await driver.message("deadline", admin_id, name, deadline)
+    await driver.callback("confirm_creation", admin_id, name, next(driver._message_ids), "confirm_creation")
+
+
+async def open_survey(driver: LoadDriver, index: int, token: str) -> None:
+    user_id, name = USER_BASE_ID + index, f"user{index}"
+    await driver.message("survey_deep_link", user_id, name, f"/start {token}")
+    await driver.callback("survey_button", user_id, name, next(driver._message_ids), f"survey:{token}")
+
+
+async def answer_survey(driver: LoadDriver, index: int, questions: List[Question]) -> None:
+    user_id, name = USER_BASE_ID + index, f"user{index}"
+    screen = next(driver._message_ids)
+    for number, question in enumerate(questions):
+        if question.type == "checkbox":
+            await driver.callback("answer_button", user_id, name, screen, f"{ANSWER_CALLBACK_PREFIX}t:{number}:0")
+            await driver.callback("answer_button", user_id, name, screen, f"{ANSWER_CALLBACK_PREFIX}n:{number}")
+        elif question.choices:
+            choice = (index + number) % len(question.choices)
+            await driver.callback("answer_button", user_id, name, screen, f"{ANSWER_CALLBACK_PREFIX}a:{number}:{choice}")
+        else:
+            await driver.message("answer_text", user_id, name, f"Answer {number} of user{index}")
+
+
+async def submit_survey(driver: LoadDriver, index: int) -> None:
+    user_id, name = USER_BASE_ID + index, f"user{index}"
+    await driver.callback("submit", user_id, name, next(driver._message_ids), SUBMIT_SURVEY_CALLBACK)
+
+
+async def run_phase(concurrency: int, jobs) -> float:
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def run(job):
+        async with semaphore:
+            await job
+
+    start = time.perf_counter()
+    await asyncio.gather(*(run(job) for job in jobs))
+    return time.perf_counter() - start
+
+
+def percentile(sorted_values: List[float], p: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, round(p / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def latency_summary(values: List[float]) -> Dict[str, float]:
+    ordered = sorted(values)
+    return {
+        "count": len(ordered),
+        "p50_ms": round(percentile(ordered, 50) * 1000, 2),
+        "p95_ms": round(percentile(ordered, 95) * 1000, 2),
+        "p99_ms": round(percentile(ordered, 99) * 1000, 2),
+        "max_ms": round(ordered[-1] * 1000, 2) if ordered else 0.0,
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=300)
+    parser.add_argument("--admins", type=int, default=5)
+    parser.add_argument("--respondents", type=int, default=20, help="respondents per cycle")
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--api-latency", type=float, default=0.03, help="simulated Bot API latency, s")
+    parser.add_argument("--sheets-latency", type=float, default=0.3, help="simulated Sheets latency, s")
+    parser.add_argument("--redis", default="redis://localhost:6379/15")
+    parser.add_argument("--output", help="write results as JSON")
+    parser.add_argument("--baseline", help="compare with a previous JSON result")
+    args = parser.parse_args()
+    if args.admins > MAX_ADMINS or args.admins * (args.respondents + 1) > args.users:
+        parser.error("need admins <= 100 and users >= admins * (respondents + 1)")
+
+    redis_client = Redis.from_url(args.redis)
+    await redis_client.flushdb()
+    sheets = FakeSheets(make_employees(args.users), make_questions(), args.sheets_latency)
+    dp = create_dispatcher(redis_client, sheets)
+    await dp["employee_service"].load_employees()
+
+    session = FakeBotSession(args.api_latency)
+    bot = Bot(token="12345:benchmark", session=session, default=DefaultBotProperties(parse_mode="HTML"))
+    driver = LoadDriver(dp, bot)
+    info_before = await redis_client.info()
+    usage_before = resource.getrusage(resource.RUSAGE_SELF)
+    phases: Dict[str, Dict[str, Any]] = {}
+
+    def record(phase: str, steps: List[str], seconds: float) -> None:
+        updates = sum(len(driver.latencies.get(step, [])) for step in steps)
+        phases[phase] = {
+            "updates": updates,
+            "seconds": round(seconds, 3),
+            "updates_per_second": round(updates / seconds, 1) if seconds else 0.0,
+            "latency": latency_summary(
+                [v for step in steps for v in driver.latencies.get(step, [])]
+            ),
+        }
+
+    seconds = await run_phase(args.concurrency, (register_user(driver, i) for i in range(args.users)))
+    record("register", ["start"], seconds)
+
+    # Admin i targets user i * (respondents + 1) and invites the next `respondents` users.
+    plans = [
+        (a, a * (args.respondents + 1), list(range(a * (args.respondents + 1) + 1, (a + 1) * (args.respondents + 1))))
+        for a in range(args.admins)
+    ]
+    seconds = await run_phase(args.concurrency, (create_cycle(driver, *plan) for plan in plans))
+    await dp["edit_coalescer"].drain()
+    record(
+        "cycles",
+        ["new_cycle", "select_target", "toggle_resp", "finish_respondents", "deadline", "confirm_creation"],
+        seconds,
+    )
+
+    cycle_service = dp["cycle_service"]
+    invitations = []
+    cycles_created = 0
+    for _, target, _ in plans:
+        cycle = await cycle_service.get_cycle_by_id(f"{date.today():%Y%m%d}_user{target}")
+        if cycle:
+            cycles_created += 1
+            invitations.extend(
+                (int(respondent_id.removeprefix("user")), info.token)
+                for respondent_id, info in cycle.respondents.items()
+            )
+    seconds = await run_phase(args.concurrency, (open_survey(driver, i, token) for i, token in invitations))
+    record("survey", ["survey_deep_link", "survey_button"], seconds)
+
+    questions = await dp["questionnaire_service"].get_questionnaire()
+    seconds = await run_phase(args.concurrency, (answer_survey(driver, i, questions) for i, _ in invitations))
+    record("answers", ["answer_button", "answer_text"], seconds)
+    seconds = await run_phase(args.concurrency, (submit_survey(driver, i) for i, _ in invitations))
+    record("submit", ["submit"], seconds)
+    snapshot = await dp["progress_service"].get_snapshot()
+    surveys_submitted = sum(cycle.completed for cycle in snapshot.cycles.values())
+
+    usage_after = resource.getrusage(resource.RUSAGE_SELF)
+    info_after = await redis_client.info()
+    results = {
+        "config": vars(args) | {"python": platform.python_version(), "cpus": os.cpu_count()},
+        "phases": phases,
+        "steps": {step: latency_summary(values) for step, values in driver.latencies.items()},
+        "errors": driver.errors,
+        "cycles_created": cycles_created,
+        "surveys_submitted": surveys_submitted,
+        "resources": {
+            "cpu_user_s": round(usage_after.ru_utime - usage_before.ru_utime, 2),
+            "cpu_system_s": round(usage_after.ru_stime - usage_before.ru_stime, 2),
+            "max_rss_mb": round(usage_after.ru_maxrss / 1024, 1),
+            "redis_commands": info_after["total_commands_processed"] - info_before["total_commands_processed"],
+            "redis_used_memory_mb": round(info_after["used_memory"] / 2**20, 2),
+            "bot_api_calls": session.calls,
+            "sheets_calls": sheets.calls,
+        },
+    }
+    await bot.session.close()
+    await redis_client.aclose()
+
+    print(f"{args.users} users, {args.admins} admins, concurrency {args.concurrency}:")
+    for name, phase in phases.items():
+        latency = phase["latency"]
+        print(
+            f"  {name:<9} {phase['updates']:6d} updates {phase['updates_per_second']:8.1f}/s  "
+            f"p50 {latency['p50_ms']:7.1f}  p95 {latency['p95_ms']:7.1f}  p99 {latency['p99_ms']:7.1f} ms"
+        )
+    print(f"  {cycles_created} cycles created, {surveys_submitted}/{len(invitations)} surveys submitted")
+    print(f"  errors: {driver.errors or 'none'}; resources: {json.dumps(results['resources'])}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)["phases"]
+        print("Against baseline:")
+        for name, phase in phases.items():
+            if name in baseline:
+                before = baseline[name]
+                print(
+                    f"  {name:<9} throughput {phase['updates_per_second'] / (before['updates_per_second'] or 1):6.2f}x  "
+                    f"p95 {phase['latency']['p95_ms'] - before['latency']['p95_ms']:+8.1f} ms"
+                )
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,103 @@
+"""
+Per-update overhead of the metrics instrumentation.
+
+Feeds the same message update through a dispatcher with a trivial handler:
+without middlewares, with a pass-through middleware (the cost of aiogram's
+middleware chain itself) and with the handler timing middleware. Also times
+the metric primitives.
+
+Run from the project root:
+    python -m backend.benchmarks.bench_metrics --updates 20000
+"""
+import argparse
+import asyncio
+import os
+import time
+import timeit
+
+os.environ.setdefault("BOT_TOKEN", "12345:benchmark")
+os.environ.setdefault("GOOGLE_SHEET_ID", "benchmark")
+
+from aiogram import Bot, Dispatcher, Router  # noqa: E402
+from aiogram.types import Message, Update  # noqa: E402
+
+from backend.src.metrics import (  # noqa: E402
+    HandlerMetricsMiddleware,
+    Registry,
+    REGISTRY,
+)
+
+UPDATE = {
+    "update_id": 1,
+    "message": {
+        "message_id": 1,
+        "date": 0,
+        "chat": {"id": 1, "type": "private"},
+        "from": {"id": 1, "is_bot": False, "first_name": "User"},
+        "text": "ping",
+    },
+}
+
+
+async def pass_through(handler, event, data):
+    return await handler(event, data)
+
+
+def make_dispatcher(middleware=None) -> Dispatcher:
+    router = Router()
+
+    @router.message()
+    async def on_message(message: Message):
+        pass
+
+    dp = Dispatcher()
+    if middleware:
+        dp.message.middleware(middleware)
+    dp.include_router(router)
+    return dp
+
+
+async def feed(dp: Dispatcher, bot: Bot, updates: int) -> float:
+    update = Update.model_validate(UPDATE, context={"bot": bot})
+    start = time.perf_counter()
+    for _ in range(updates):
+        await dp.feed_update(bot, update)
+    return (time.perf_counter() - start) / updates
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--updates", type=int, default=20000)
+    args = parser.parse_args()
+
+    bot = Bot(token="12345:benchmark")
+    dispatchers = {
+        "plain": make_dispatcher(),
+        "pass-through": make_dispatcher(pass_through),
+        "instrumented": make_dispatcher(HandlerMetricsMiddleware()),
+    }
+    # Interleaved runs, best of each, to keep machine noise out of the deltas.
+    best = dict.fromkeys(dispatchers, float("inf"))
+    for _ in range(5):
+        for name, dp in dispatchers.items():
+            best[name] = min(best[name], await feed(dp, bot, args.updates))
+    await bot.session.close()
+
+    registry = Registry()
+    histogram = registry.histogram("bench_seconds", "Benchmark.", ("handler",))
+    counter = registry.counter("bench_total", "Benchmark.", ("handler",))
+    observe = min(timeit.repeat(lambda: histogram.observe(0.003, "h"), number=100000, repeat=5))
+    inc = min(timeit.repeat(lambda: counter.inc("h"), number=100000, repeat=5))
+    render = min(timeit.repeat(REGISTRY.render, number=100, repeat=3)) / 100
+
+    print(f"feed_update, {args.updates} updates:")
+    for name, seconds in best.items():
+        delta = seconds - best["plain"]
+        print(f"  {name:<13} {seconds * 1e6:8.1f} us/update  {delta * 1e6:+6.1f} us")
+    print(f"Histogram.observe {observe / 100000 * 1e9:6.0f} ns")
+    print(f"Counter.inc       {inc / 100000 * 1e9:6.0f} ns")
+    print(f"REGISTRY.render   {render * 1e6:6.1f} us")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,107 @@
+"""
+Benchmark of the report aggregation engine on synthetic results sheets.
+
+Run from the project root:
+    python -m backend.benchmarks.bench_report_aggregation
+"""
+import argparse
+import os
+import random
+import time
+
+os.environ.setdefault("BOT_TOKEN", "12345:benchmark")
+os.environ.setdefault("GOOGLE_SHEET_ID", "benchmark")
+
+from backend.src.services.report_aggregation import build_columns, compute_report  # noqa: E402
+from backend.src.storage.models import Question  # noqa: E402
+
+COMFORT_OPTIONS = ["communication", "flexibility", "responsibility", "openness", "teamwork"]
+ROLE_FIT_OPTIONS = ["yes", "no", "unknown"]
+
+
+def make_questions():
+    questions = [
+        {"question_id": "G-1", "question_type": "checkbox", "sheet_column": "G1_comfort"},
+        {"question_id": "G-2", "question_type": "radio", "sheet_column": "G2_role_fit"},
+    ]
+    for i in range(1, 9):
+        questions.append(
+            {"question_id": f"C-{i}", "question_type": "scale 0-3", "sheet_column": f"C{i}_score"}
+        )
+        questions.append(
+            {"question_id": f"C-{i}-c", "question_type": "textarea", "sheet_column": f"C{i}_comment"}
+        )
+    return [Question.model_validate({"question_text": q["question_id"], **q}) for q in questions]
+
+
+def make_sheet(rng, questions, rows, target="target"):
+    header = ["cycle_id", "respondent_id", "submitted_at"] + [q.result_column for q in questions]
+    sheet = [header]
+    for i in range(rows):
+        row = ["cycle", target if i == 0 else f"resp{i}", "2025-07-01"]
+        for q in questions:
+            if q.type == "scale":
+                row.append(str(rng.randint(0, 3)) if rng.random() > 0.05 else "")
+            elif q.type == "checkbox":
+                row.append(",".join(rng.sample(COMFORT_OPTIONS, rng.randint(1, 3))))
+            elif q.type == "radio":
+                row.append(rng.choice(ROLE_FIT_OPTIONS))
+            else:
+                row.append("comment")
+        sheet.append(row)
+    return sheet
+
+
+def naive_means(sheet, questions):
+    """Row-by-row baseline over dict records, as get_all_records would return."""
+    header = sheet[0]
+    records = [dict(zip(header, r)) for r in sheet[1:]]
+    means = {}
+    for q in questions:
+        if q.type != "scale":
+            continue
+        values = [int(r[q.result_column]) for r in records if r[q.result_column] != ""]
+        means[q.result_column] = sum(values) / len(values) if values else None
+    return means
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=5000, help="rows in the large sheet")
+    parser.add_argument("--cycles", type=int, default=300, help="number of small cycles")
+    parser.add_argument("--cycle-rows", type=int, default=15, help="rows per small cycle")
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    questions = make_questions()
+
+    large = make_sheet(rng, questions, args.rows)
+    columns, t_build = timed(build_columns, large, questions, "target")
+    report, t_compute = timed(compute_report, "large", columns)
+    _, t_naive = timed(naive_means, large, questions)
+    print(f"Single cycle, {args.rows} rows:")
+    print(f"  build columns  {t_build * 1000:8.2f} ms")
+    print(f"  compute stats  {t_compute * 1000:8.2f} ms (means, distributions, percentiles, gaps)")
+    print(f"  naive means    {t_naive * 1000:8.2f} ms (means only, row dicts)")
+
+    sheets = [make_sheet(rng, questions, args.cycle_rows) for _ in range(args.cycles)]
+    start = time.perf_counter()
+    combined = None
+    for i, sheet in enumerate(sheets):
+        cycle_report = compute_report(f"c{i}", build_columns(sheet, questions, "target"))
+        combined = cycle_report if combined is None else combined.merge(cycle_report)
+    elapsed = time.perf_counter() - start
+    print(f"{args.cycles} cycles x {args.cycle_rows} rows, per-cycle reports + merge:")
+    print(f"  total          {elapsed * 1000:8.2f} ms ({elapsed / args.cycles * 1e6:.0f} us/cycle)")
+    print(f"  combined C1 mean {combined.scales['C1_score'].mean:.3f} over {combined.responses} responses")
+    assert abs(report.scales["C1_score"].mean - naive_means(large, questions)["C1_score"]) < 1e-9
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""
+Scaling of update processing with the number of shard worker processes.
+
+Publishes synthetic callback updates to the shard streams and runs 1, 2, 4...
+worker processes whose handler renders respondent keyboards (CPU-bound, no
+Bot API calls). Requires a local Redis; the given database is flushed.
+
+Run from the project root:
+    python -m backend.benchmarks.bench_sharding --updates 5000 --workers 1 2 4
+"""
+import argparse
+import asyncio
+import multiprocessing
+import os
+import time
+
+os.environ.setdefault("BOT_TOKEN", "12345:benchmark")
+os.environ.setdefault("GOOGLE_SHEET_ID", "benchmark")
+
+from aiogram import Bot, Dispatcher, Router  # noqa: E402
+from aiogram.types import CallbackQuery, Update  # noqa: E402
+from redis.asyncio.client import Redis  # noqa: E402
+
+from backend.src.bot.keyboards.respondent_select_keyboard import (  # noqa: E402
+    get_respondent_select_keyboard,
+)
+from backend.src.config import ShardingSettings  # noqa: E402
+from backend.src.sharding import ShardWorker, UpdatePublisher  # noqa: E402
+from backend.src.storage.models import Employee  # noqa: E402
+from backend.src.storage.redis_storage import RedisStorageService  # noqa: E402
+
+DONE_KEY = "bench:processed"
+SHARDS = 32
+EMPLOYEES = [
+    Employee.model_validate(
+        {"Telegram_Nickname": f"@user{i}", "Last_Name": f"Last{i}", "First_Name": f"First{i}"}
+    )
+    for i in range(200)
+]
+
+
+def make_update(update_id: int) -> Update:
+    user = {"id": 1000 + update_id % 997, "is_bot": False, "first_name": "User"}
+    return Update.model_validate(
+        {
+            "update_id": update_id,
+            "callback_query": {
+                "id": str(update_id),
+                "chat_instance": "1",
+                "from": user,
+                "data": f"toggle_resp:user{update_id % 200}:0",
+            },
+        }
+    )
+
+
+async def run_worker(index: int, workers: int, dsn: str):
+    redis_client = Redis.from_url(dsn)
+    router = Router()
+
+    @router.callback_query()
+    async def on_callback(callback: CallbackQuery):
+        selected = {callback.data.split(":")[1]}
+        for page in range(20):
+            get_respondent_select_keyboard(EMPLOYEES, selected, page=page % 20)
+        await redis_client.incr(DONE_KEY)
+
+    dp = Dispatcher()
+    dp.include_router(router)
+    config = ShardingSettings(SHARDS=SHARDS, WORKERS=workers, BLOCK_MS=100)
+    worker = ShardWorker(dp, Bot(token="12345:benchmark"), RedisStorageService(redis_client), index, config)
+    await worker.run()
+
+
+def worker_process(index: int, workers: int, dsn: str):
+    asyncio.run(run_worker(index, workers, dsn))
+
+
+async def measure(dsn: str, workers: int, total: int) -> float:
+    redis_client = Redis.from_url(dsn)
+    await redis_client.flushdb()
+    publisher = UpdatePublisher(RedisStorageService(redis_client), SHARDS, maxlen=total * 2)
+    for i in range(total):
+        await publisher.publish(make_update(i + 1))
+
+    processes = [
+        multiprocessing.Process(target=worker_process, args=(i, workers, dsn), daemon=True)
+        for i in range(workers)
+    ]
+    start = time.perf_counter()
+    for p in processes:
+        p.start()
+    while int(await redis_client.get(DONE_KEY) or 0) < total:
+        await asyncio.sleep(0.05)
+    elapsed = time.perf_counter() - start
+    for p in processes:
+        p.terminate()
+        p.join()
+    await redis_client.close()
+    return elapsed
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--updates", type=int, default=5000)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--redis", default="redis://localhost:6379/15")
+    args = parser.parse_args()
+
+    print(f"{args.updates} updates over {SHARDS} shards, {os.cpu_count()} CPUs:")
+    baseline = None
+    for workers in args.workers:
+        elapsed = await measure(args.redis, workers, args.updates)
+        rate = args.updates / elapsed
+        baseline = baseline or rate
+        print(f"  {workers} workers  {elapsed:6.2f} s  {rate:8.0f} updates/s  x{rate / baseline:.2f}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
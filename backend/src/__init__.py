@@ -0,0 +1,4 @@
+import time
+
+# When the application imports began, for the startup profile.
+IMPORT_STARTED = time.perf_counter()
@@ -1,5 +1,7 @@
 import asyncio
 import logging
+from contextlib import suppress
+from datetime import datetime, timedelta, timezone
 
 from aiogram import Bot, Dispatcher
 from aiogram.client.default import DefaultBotProperties
@@ -8,35 +10,57 @@ from aiogram.fsm.storage.redis import RedisStorage
 from redis.asyncio.client import Redis
 
 from .bot.handlers import admin, respondent
+from .bot.middlewares.deduplication import DeduplicationMiddleware
+from .bot.middlewares.in_flight import InFlightMiddleware
 from .config import settings
+from .lifecycle import LifecycleManager
+from .metrics import HandlerMetricsMiddleware, start_metrics_server, watch_stats
+from . import IMPORT_STARTED
+from .scheduler import JobScheduler, LeaderElection
+from .startup import StartupProfiler, warm_up
+from .tracing import Tracer, TracingMiddleware
+from .sharding import create_ingest_dispatcher
+from .webhook import run_webhook
+from .services.archive_service import CycleArchiveService
+from .services.bulk_launch import BulkLaunchService
 from .services.cycle_service import CycleService
+from .services.edit_coalescer import EditCoalescer
 from .services.employee_service import EmployeeService
 from .services.google_sheets import GoogleSheetsService
+from .services.notification_sender import RateLimitedSender
+from .services.progress_service import ProgressService
 from .services.question_service import QuestionnaireService
+from .services.reminder_service import ReminderService
+from .services.result_storage import ResultStorageRouter
+from .services.results_export import ResultsExportService
+from .services.report_aggregation import ReportAggregationService
+from .services.sheets_mirror import SheetsMirror
+from .services.token_service import SurveyTokenService
+from .storage.client_cache import ClientSideCache
 from .storage.redis_storage import RedisStorageService
+from .storage.results_store import ResultsStore
 
 
-async def main():
+def create_dispatcher(
+    redis_client: Redis, google_sheets_service: GoogleSheetsService
+) -> Dispatcher:
     """
-    Application entry point.
+    Builds the services and the Dispatcher with all routers registered.
+    Services are available to handlers and callers as workflow data,
+    e.g. `dp["cycle_service"]`.
     """
-    logging.basicConfig(
-        level=logging.INFO,
-        format="%(asctime)s - %(levelname)s - %(name)s - %(message)s",
-    )
-
-    # Initialize Bot and Dispatcher
-    bot = Bot(
-        token=settings.BOT_TOKEN, default=DefaultBotProperties(parse_mode="HTML")
-    )
-
-    # Initialize Redis storage
-    redis_client = Redis.from_url(settings.redis.dsn)
     fsm_storage = RedisStorage(redis=redis_client)
-    app_storage = RedisStorageService(redis_client=redis_client)
+    client_cache = None
+    if settings.redis.client_cache:
+        client_cache = ClientSideCache(
+            redis_client,
+            prefixes=settings.redis.client_cache_prefixes,
+            max_entries=settings.redis.client_cache_size,
+            configure_keyspace_events=settings.redis.client_cache_keyspace_events,
+        )
+    app_storage = RedisStorageService(redis_client=redis_client, cache=client_cache)
 
     # Initialize services
-    google_sheets_service = GoogleSheetsService(config=settings.google)
     questionnaire_service = QuestionnaireService(
         redis_service=app_storage,
         google_sheets_service=google_sheets_service,
@@ -45,10 +69,95 @@ async def main():
         redis_service=app_storage,
         google_sheets_service=google_sheets_service
     )
+    token_service = SurveyTokenService(
+        redis_service=app_storage,
+        secret=settings.survey_token.SECRET or settings.BOT_TOKEN,
+        grace_days=settings.survey_token.GRACE_DAYS,
+    )
+    progress_service = ProgressService(redis_service=app_storage)
+    result_storage = ResultStorageRouter(
+        redis_service=app_storage,
+        google_sheets_service=google_sheets_service,
+        config=settings.results,
+    )
+    results_store = ResultsStore(settings.results.DB_PATH)
     cycle_service = CycleService(
         redis_service=app_storage,
         google_sheets_service=google_sheets_service,
         questionnaire_service=questionnaire_service,
+        token_service=token_service,
+        progress_service=progress_service,
+        result_storage=result_storage,
+        results_store=results_store,
+    )
+    report_service = ReportAggregationService(
+        redis_service=app_storage,
+        google_sheets_service=google_sheets_service,
+        questionnaire_service=questionnaire_service,
+        results_store=results_store,
+    )
+    sheets_mirror = SheetsMirror(
+        store=results_store,
+        google_sheets_service=google_sheets_service,
+        batch_size=settings.results.MIRROR_BATCH_SIZE,
+        report_service=report_service,
+    )
+
+    tracing_config = settings.tracing
+    tracer = Tracer(
+        redis_service=app_storage,
+        sample_rate=tracing_config.SAMPLE_RATE,
+        slow_threshold_ms=tracing_config.SLOW_THRESHOLD_MS,
+        keep_slow=tracing_config.KEEP_SLOW,
+    )
+
+    scheduler_config = settings.scheduler
+    sender = RateLimitedSender(rate=scheduler_config.SEND_RATE, redis_service=app_storage)
+    reminder_service = ReminderService(
+        redis_service=app_storage,
+        cycle_service=cycle_service,
+        employee_service=employee_service,
+        sender=sender,
+        tz=scheduler_timezone(),
+        interval_days=scheduler_config.REMINDER_INTERVAL_DAYS,
+        final_ping_days=scheduler_config.FINAL_PING_DAYS,
+        reminder_hour=scheduler_config.REMINDER_HOUR,
+        batch_size=scheduler_config.BATCH_SIZE,
+    )
+
+    archive_config = settings.archive
+    archive_service = CycleArchiveService(
+        redis_service=app_storage,
+        cycle_service=cycle_service,
+        progress_service=progress_service,
+        reminder_service=reminder_service,
+        result_storage=result_storage,
+        report_service=report_service,
+        after_days=archive_config.AFTER_DAYS,
+        batch_size=archive_config.BATCH_SIZE,
+    )
+    results_export_service = ResultsExportService(
+        redis_service=app_storage,
+        google_sheets_service=google_sheets_service,
+        results_store=results_store,
+        employee_service=employee_service,
+        archive_service=archive_service,
+    )
+
+    bulk_launch_service = BulkLaunchService(
+        cycle_service=cycle_service,
+        employee_service=employee_service,
+        reminder_service=reminder_service,
+        sender=sender,
+    )
+
+    in_flight = InFlightMiddleware()
+    lifecycle = LifecycleManager(
+        in_flight=in_flight,
+        sender=sender,
+        sheets_mirror=sheets_mirror,
+        drain_timeout=settings.SHUTDOWN_DRAIN_SECONDS,
+        cycle_service=cycle_service,
     )
 
     dp = Dispatcher(
@@ -56,19 +165,173 @@ async def main():
         # Pass services to handlers
         g_sheets=google_sheets_service,
         app_storage=app_storage,
+        client_cache=client_cache,
         questionnaire_service=questionnaire_service,
         employee_service=employee_service,
         cycle_service=cycle_service,
+        result_storage=result_storage,
+        results_store=results_store,
+        sheets_mirror=sheets_mirror,
+        token_service=token_service,
+        reminder_service=reminder_service,
+        bulk_launch_service=bulk_launch_service,
+        progress_service=progress_service,
+        report_service=report_service,
+        results_export_service=results_export_service,
+        archive_service=archive_service,
+        sender=sender,
+        edit_coalescer=EditCoalescer(),
+        tracer=tracer,
+        lifecycle=lifecycle,
     )
 
+    # Count updates being handled, so shutdown can wait for them
+    dp.update.outer_middleware(in_flight)
+
+    # Record the span tree of every update; the root span covers all below
+    if tracing_config.ENABLED:
+        dp.update.outer_middleware(TracingMiddleware(tracer))
+
+    # Drop redelivered updates before any handler work runs
+    deduplication = DeduplicationMiddleware(app_storage)
+    dp.update.outer_middleware(deduplication)
+    # Time every handler; dispatcher middlewares apply to nested routers too
+    dp.message.middleware(HandlerMetricsMiddleware())
+    dp.callback_query.middleware(HandlerMetricsMiddleware())
+    watch_stats("deduplication", deduplication, "checked", "duplicate_updates", "duplicate_callbacks")
+    watch_stats("edit_coalescer", dp["edit_coalescer"], "requested", "sent", "skipped")
+    watch_stats("tracer", tracer, "traced", "slow")
+    watch_stats("in_flight", in_flight, "in_flight", "handled")
+    watch_stats("sender", sender, "handed_over", "resumed")
+    watch_stats("sheets_mirror", sheets_mirror, "mirrored", "failures", "lag")
+    watch_stats("archive", archive_service, "archived", "saved_bytes")
+    if client_cache:
+        watch_stats("client_cache", client_cache, "hits", "misses", "invalidations", "size")
+
     # Register routers
     dp.include_router(admin.router)
     dp.include_router(respondent.router)
+    return dp
+
+
+def scheduler_timezone() -> timezone:
+    return timezone(timedelta(hours=settings.scheduler.UTC_OFFSET_HOURS))
+
+
+def create_scheduler(dp: Dispatcher, bot: Bot) -> JobScheduler:
+    """Registers the background jobs; they run on the leader replica only."""
+    scheduler_config = settings.scheduler
+    tz = scheduler_timezone()
+    scheduler = JobScheduler(
+        LeaderElection(dp["app_storage"], ttl_seconds=scheduler_config.LEADER_TTL_SECONDS),
+        tz=tz,
+    )
+    scheduler.add_job(
+        "reminders",
+        lambda: dp["reminder_service"].tick(bot),
+        "interval",
+        seconds=scheduler_config.TICK_SECONDS,
+    )
+    scheduler.add_job(
+        "daily_summary",
+        lambda: dp["progress_service"].send_daily_summary(
+            bot,
+            dp["sender"],
+            dp["employee_service"],
+            settings.ADMIN_TELEGRAM_IDS,
+            datetime.now(tz).date(),
+        ),
+        "cron",
+        hour=scheduler_config.SUMMARY_HOUR,
+    )
+    scheduler.add_job(
+        "archive",
+        lambda: dp["archive_service"].run(datetime.now(tz).date()),
+        "cron",
+        hour=settings.archive.HOUR,
+    )
+    return scheduler
+
+
+async def main():
+    """
+    Application entry point.
+    """
+    profiler = StartupProfiler(IMPORT_STARTED)
+    profiler.mark("imports")
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s - %(levelname)s - %(name)s - %(message)s",
+    )
+
+    # Initialize Bot and Dispatcher
+    bot = Bot(
+        token=settings.BOT_TOKEN, default=DefaultBotProperties(parse_mode="HTML")
+    )
+    redis_client = Redis.from_url(settings.redis.dsn)
+    dp = create_dispatcher(redis_client, GoogleSheetsService(config=settings.google))
+    profiler.mark("services")
+    if dp["client_cache"]:
+        dp["client_cache"].start()
+    profiler.mark("client_cache")
+    dp["token_service"].start()
+    await warm_up(dp, profiler, settings.WARM_UP_TIMEOUT_SECONDS)
+    profiler.mark("warm_up")
+
+    # Start background jobs
+    scheduler = create_scheduler(dp, bot)
+    scheduler.start()
+    # The results store is local to this host, so its mirror runs here (and
+    # in every shard worker) rather than as a leader-only job.
+    lifecycle = dp["lifecycle"]
+    lifecycle.start(bot, mirror_interval=settings.results.MIRROR_INTERVAL_SECONDS)
+
+    # With sharding enabled updates are only published here and handled
+    # by the worker processes.
+    ingest_dp = dp
+    if settings.sharding.ENABLED:
+        ingest_dp = create_ingest_dispatcher(dp["app_storage"], settings.sharding)
+    allowed_updates = dp.resolve_used_update_types()
+
+    metrics_runner = None
+    if settings.metrics.ENABLED:
+        metrics_runner = await start_metrics_server(settings.metrics.HOST, settings.metrics.PORT)
+    profiler.mark("background_jobs")
+    profiler.log()
 
-    # Start polling
+    # Start receiving updates
     try:
-        await dp.start_polling(bot)
+        if settings.UPDATES_MODE == "webhook":
+            webhook_task = asyncio.create_task(
+                run_webhook(ingest_dp, bot, settings.webhook, allowed_updates, lifecycle)
+            )
+            lifecycle.cancel_on_signals(webhook_task)
+            with suppress(asyncio.CancelledError):
+                await webhook_task
+        else:
+            # Telegram refuses getUpdates while a webhook is registered.
+            await bot.delete_webhook()
+            # Polling stops on SIGINT/SIGTERM; handlers still running need
+            # the session until the drain below. When sharding, publishing
+            # is awaited in order so each chat's updates reach its stream in
+            # the order Telegram sent them.
+            await ingest_dp.start_polling(
+                bot,
+                allowed_updates=allowed_updates,
+                close_bot_session=False,
+                handle_as_tasks=not settings.sharding.ENABLED,
+            )
     finally:
+        # Nothing new arrives from here on: let in-flight work finish or
+        # hand it over before the connections go.
+        await lifecycle.shutdown()
+        if metrics_runner:
+            await metrics_runner.cleanup()
+        await scheduler.shutdown()
+        if dp["client_cache"]:
+            await dp["client_cache"].stop()
+        await dp["token_service"].stop()
+        dp["results_store"].close()
         await bot.session.close()
         await redis_client.close()
 
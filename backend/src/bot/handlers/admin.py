@@ -1,26 +1,175 @@
+import html
 import logging
-from datetime import datetime
-from aiogram.types import CallbackQuery
+import os
+import time
+from datetime import date, datetime
+from aiogram.types import CallbackQuery, FSInputFile
 
 from aiogram import F, Router, types, Bot
-from aiogram.filters import Command, StateFilter
+from aiogram.exceptions import TelegramAPIError
+from aiogram.filters import Command, CommandObject, StateFilter
 from aiogram.fsm.context import FSMContext
 
 from ...config import settings
+from ...services.archive_service import CycleArchiveService, format_archive_report
+from ...services.bulk_launch import BulkLaunchService, LaunchPlan, read_csv
 from ...services.cycle_service import CycleService
+from ...services.edit_coalescer import EditCoalescer
 from ...services.employee_service import EmployeeService
-
-from ..keyboards.admin_keyboards import get_confirmation_keyboard
+from ...services.google_sheets import GoogleSheetsService
+from ...services.notification_sender import RateLimitedSender
+from ...services.progress_service import ProgressService, format_progress_summary
+from ...services.reminder_service import ReminderService
+from ...services.results_export import EXPORT_FORMATS, ResultsExportService, parse_period
+from ...tracing import Tracer, format_trace
+
+from ..keyboards.admin_keyboards import get_bulk_confirmation_keyboard, get_confirmation_keyboard
+from ..keyboards.employee_select_keyboard import EmployeeShort, get_employee_select_keyboard
+from ..keyboards.respondent_select_keyboard import get_respondent_select_keyboard
 from ..middlewares.auth import AdminAuthMiddleware
-from ..states.cycle_creation import CycleCreationFSM
+from ..states.cycle_creation import BulkLaunchFSM, CycleCreationFSM
 
 logger = logging.getLogger(__name__)
 
+# Largest launch table accepted as a file upload.
+MAX_TABLE_FILE_BYTES = 1_000_000
+# Rejected rows listed in a launch report; the rest are summarised.
+MAX_LISTED_ERRORS = 20
+# Minimum interval between edits of a bulk launch progress message.
+PROGRESS_EDIT_INTERVAL_SECONDS = 2.0
+# Bots may upload documents of up to 50 MB.
+MAX_DOCUMENT_BYTES = 50 * 1024 * 1024
+
 router = Router()
 # Protect all handlers in this router with the admin auth middleware
 router.message.middleware(AdminAuthMiddleware(settings.ADMIN_TELEGRAM_IDS))
 
-MAX_ACTIVE_CYCLES = 5
+@router.message(Command("status"), StateFilter(None))
+async def cmd_status(
+    message: types.Message,
+    progress_service: ProgressService,
+    employee_service: EmployeeService,
+):
+    """
+    Handler for the /status command. Shows the progress of all active cycles.
+    """
+    snapshot = await progress_service.get_snapshot()
+    await message.answer(format_progress_summary(snapshot, employee_service, date.today()))
+
+
+@router.message(Command("slow"), StateFilter(None))
+async def cmd_slow(message: types.Message, tracer: Tracer):
+    """
+    Handler for the /slow command. Shows the span trees of the slowest recent updates.
+    """
+    traces = await tracer.get_slow_traces(limit=3)
+    if not traces:
+        await message.answer("Медленных обновлений не зафиксировано.")
+        return
+
+    text = ""
+    for trace in traces:
+        started = datetime.fromtimestamp(trace["at"]).strftime("%d.%m %H:%M:%S")
+        tree = "\n".join(format_trace(trace))
+        block = f"<b>{started}</b>\n<pre>{html.escape(tree[:3000])}</pre>\n\n"
+        if text and len(text) + len(block) > 4096:
+            break
+        text += block
+    await message.answer(text)
+
+
+@router.message(Command("export"), StateFilter(None))
+async def cmd_export(
+    message: types.Message,
+    command: CommandObject,
+    results_export_service: ResultsExportService,
+):
+    """
+    Handler for the /export [period] [csv|xlsx] command. Sends the results
+    of the cycles created in a quarter ("2025Q3") or between two dates.
+    """
+    args = (command.args or "").split()
+    fmt = "xlsx"
+    if args and args[-1].lower() in EXPORT_FORMATS:
+        fmt = args.pop().lower()
+    try:
+        start, end = parse_period(" ".join(args), date.today())
+    except ValueError:
+        await message.answer(
+            "Укажите период: /export 2025Q3 или /export 2025-07-01 2025-09-30, "
+            "и при необходимости формат csv или xlsx."
+        )
+        return
+
+    status = await message.answer("Готовим выгрузку…")
+    try:
+        export = await results_export_service.export(start, end, fmt)
+    except Exception as e:
+        logger.error(f"Failed to export results for {start}..{end}: {e}", exc_info=True)
+        await status.edit_text("Не удалось подготовить выгрузку. Попробуйте позже.")
+        return
+    try:
+        if not export.cycles:
+            await status.edit_text("За этот период циклов нет.")
+        elif os.path.getsize(export.path) > MAX_DOCUMENT_BYTES:
+            await status.edit_text("Выгрузка больше 50 МБ. Выберите период короче.")
+        else:
+            await message.answer_document(
+                FSInputFile(export.path, filename=export.filename),
+                caption=f"Циклов: {export.cycles}, ответов: {export.rows}.",
+            )
+            await status.delete()
+    finally:
+        os.remove(export.path)
+
+
+@router.message(Command("cancel"), StateFilter(None))
+async def cmd_cancel_cycle(
+    message: types.Message, command: CommandObject, cycle_service: CycleService
+):
+    """
+    Handler for the /cancel <Cycle_ID> command. Closes a cycle without a report.
+    """
+    if not command.args:
+        await message.answer("Укажите ID цикла: /cancel <Cycle_ID>")
+        return
+
+    cycle = await cycle_service.cancel_cycle(command.args.strip())
+    if not cycle:
+        await message.answer("Цикл не найден.")
+        return
+    await message.answer(f"Цикл <code>{cycle.id}</code> отменён.")
+
+
+@router.message(Command("archive"), StateFilter(None))
+async def cmd_archive(message: types.Message, archive_service: CycleArchiveService):
+    """
+    Handler for the /archive command. Archives finished cycles now instead
+    of waiting for the nightly run.
+    """
+    report = await archive_service.run(date.today())
+    if report is None:
+        await message.answer("Архивация уже идёт, попробуйте позже.")
+        return
+    await message.answer(format_archive_report(report))
+
+
+@router.message(Command("restore"), StateFilter(None))
+async def cmd_restore_cycle(
+    message: types.Message, command: CommandObject, archive_service: CycleArchiveService
+):
+    """
+    Handler for the /restore <Cycle_ID> command. Brings an archived cycle back.
+    """
+    if not command.args:
+        await message.answer("Укажите ID цикла: /restore <Cycle_ID>")
+        return
+
+    cycle = await archive_service.restore(command.args.strip())
+    if not cycle:
+        await message.answer("Цикла нет в архиве.")
+        return
+    await message.answer(f"Цикл <code>{cycle.id}</code> восстановлен из архива.")
 
 
 @router.message(Command("new_cycle"), StateFilter(None))
@@ -33,11 +182,13 @@ async def cmd_new_cycle(
     """
     Handler for the /new_cycle command. Starts the cycle creation FSM.
     """
-    active_cycles = await cycle_service.get_active_cycles_count()
-    if active_cycles >= MAX_ACTIVE_CYCLES:
-        await message.answer(
-            f"Достигнут лимит активных циклов ({active_cycles}/{MAX_ACTIVE_CYCLES})."
-        )
+    max_active = settings.results.MAX_ACTIVE_CYCLES
+    if not await cycle_service.can_create_cycle(max_active):
+        active_cycles = await cycle_service.get_active_cycles_count()
+        if active_cycles >= max_active:
+            await message.answer(f"Достигнут лимит активных циклов ({active_cycles}/{max_active}).")
+        else:
+            await message.answer("Хранилище результатов заполнено. Обратитесь к администратору.")
         return
 
     await employee_service.load_employees()
@@ -45,7 +196,6 @@ async def cmd_new_cycle(
     await state.set_state(CycleCreationFSM.waiting_for_target_employee)
 
     # Prepare list of employees for selection
-    from ..keyboards.employee_select_keyboard import get_employee_select_keyboard, EmployeeShort
     employees = [EmployeeShort(emp.id, emp.full_name) for emp in employee_service._employees]
     if not employees:
         await message.answer("В справочнике сотрудников нет записей.")
@@ -57,15 +207,30 @@ async def cmd_new_cycle(
 
 
 @router.callback_query(lambda c: c.data.startswith("emp_page:"), CycleCreationFSM.waiting_for_target_employee)
-async def paginate_employees(callback: CallbackQuery, state: FSMContext, employee_service: EmployeeService):
+async def paginate_employees(
+    callback: CallbackQuery,
+    state: FSMContext,
+    employee_service: EmployeeService,
+    edit_coalescer: EditCoalescer,
+    bot: Bot,
+):
+    await callback.answer()
     page = int(callback.data.split(":")[1])
-    from ..keyboards.employee_select_keyboard import get_employee_select_keyboard, EmployeeShort
     employees = [EmployeeShort(emp.id, emp.full_name) for emp in employee_service._employees]
-    await callback.message.edit_reply_markup(reply_markup=get_employee_select_keyboard(employees, page=page))
-    await callback.answer()
+    edit_coalescer.edit_markup(
+        bot,
+        callback.message.chat.id,
+        callback.message.message_id,
+        get_employee_select_keyboard(employees, page=page),
+    )
 
 @router.callback_query(lambda c: c.data.startswith("select_target:"), CycleCreationFSM.waiting_for_target_employee)
-async def select_target_employee(callback: CallbackQuery, state: FSMContext, employee_service: EmployeeService):
+async def select_target_employee(
+    callback: CallbackQuery,
+    state: FSMContext,
+    employee_service: EmployeeService,
+    edit_coalescer: EditCoalescer,
+):
     employee_id = callback.data.split(":")[1]
     employee = employee_service.find_by_id(employee_id)
     if not employee:
@@ -77,10 +242,10 @@ async def select_target_employee(callback: CallbackQuery, state: FSMContext, emp
     await state.set_state(CycleCreationFSM.waiting_for_respondents)
 
     # Prepare respondent selection keyboard
-    from ..keyboards.respondent_select_keyboard import get_respondent_select_keyboard
     all_other_employees = [emp for emp in employee_service._employees if emp.id != employee.id]
     selected_respondents = set()
 
+    edit_coalescer.discard(callback.message.chat.id, callback.message.message_id)
     await callback.message.edit_text(
         f"Отлично. Цель: <b>{employee.full_name}</b>.\n\n"
         "Теперь выберите респондентов (можно выбрать несколько).",
@@ -90,7 +255,14 @@ async def select_target_employee(callback: CallbackQuery, state: FSMContext, emp
 
 
 @router.callback_query(lambda c: c.data.startswith("resp_page:"), CycleCreationFSM.waiting_for_respondents)
-async def paginate_respondents(callback: CallbackQuery, state: FSMContext, employee_service: EmployeeService):
+async def paginate_respondents(
+    callback: CallbackQuery,
+    state: FSMContext,
+    employee_service: EmployeeService,
+    edit_coalescer: EditCoalescer,
+    bot: Bot,
+):
+    await callback.answer()
     page = int(callback.data.split(":")[1])
     data = await state.get_data()
     target_employee_id = data.get("target_employee_id")
@@ -98,15 +270,23 @@ async def paginate_respondents(callback: CallbackQuery, state: FSMContext, emplo
     all_other_employees = [emp for emp in employee_service._employees if emp.id != target_employee.id]
     selected_respondents = set(data.get("respondents", []))
 
-    from ..keyboards.respondent_select_keyboard import get_respondent_select_keyboard
-    await callback.message.edit_reply_markup(
-        reply_markup=get_respondent_select_keyboard(all_other_employees, selected_respondents, page=page)
+    edit_coalescer.edit_markup(
+        bot,
+        callback.message.chat.id,
+        callback.message.message_id,
+        get_respondent_select_keyboard(all_other_employees, selected_respondents, page=page),
     )
-    await callback.answer()
 
 
 @router.callback_query(lambda c: c.data.startswith("toggle_resp:"), CycleCreationFSM.waiting_for_respondents)
-async def toggle_respondent(callback: CallbackQuery, state: FSMContext, employee_service: EmployeeService):
+async def toggle_respondent(
+    callback: CallbackQuery,
+    state: FSMContext,
+    employee_service: EmployeeService,
+    edit_coalescer: EditCoalescer,
+    bot: Bot,
+):
+    await callback.answer()
     _, respondent_id, page_str = callback.data.split(":")
     page = int(page_str)
 
@@ -125,15 +305,23 @@ async def toggle_respondent(callback: CallbackQuery, state: FSMContext, employee
     target_employee = employee_service.find_by_id(target_employee_id)
     all_other_employees = [emp for emp in employee_service._employees if emp.id != target_employee.id]
     
-    from ..keyboards.respondent_select_keyboard import get_respondent_select_keyboard
-    await callback.message.edit_reply_markup(
-        reply_markup=get_respondent_select_keyboard(all_other_employees, current_respondents, page=page)
+    edit_coalescer.edit_markup(
+        bot,
+        callback.message.chat.id,
+        callback.message.message_id,
+        get_respondent_select_keyboard(all_other_employees, current_respondents, page=page),
     )
-    await callback.answer()
 
 
 @router.callback_query(lambda c: c.data.startswith("resp_select_all:"), CycleCreationFSM.waiting_for_respondents)
-async def select_all_respondents(callback: CallbackQuery, state: FSMContext, employee_service: EmployeeService):
+async def select_all_respondents(
+    callback: CallbackQuery,
+    state: FSMContext,
+    employee_service: EmployeeService,
+    edit_coalescer: EditCoalescer,
+    bot: Bot,
+):
+    await callback.answer("Выбраны все респонденты")
     page = int(callback.data.split(":")[1])
     data = await state.get_data()
     target_employee_id = data.get("target_employee_id")
@@ -143,15 +331,23 @@ async def select_all_respondents(callback: CallbackQuery, state: FSMContext, emp
     all_respondent_ids = {emp.id for emp in all_other_employees}
     await state.update_data(respondents=list(all_respondent_ids))
 
-    from ..keyboards.respondent_select_keyboard import get_respondent_select_keyboard
-    await callback.message.edit_reply_markup(
-        reply_markup=get_respondent_select_keyboard(all_other_employees, all_respondent_ids, page=page)
+    edit_coalescer.edit_markup(
+        bot,
+        callback.message.chat.id,
+        callback.message.message_id,
+        get_respondent_select_keyboard(all_other_employees, all_respondent_ids, page=page),
     )
-    await callback.answer("Выбраны все респонденты")
 
 
 @router.callback_query(lambda c: c.data.startswith("resp_deselect_all:"), CycleCreationFSM.waiting_for_respondents)
-async def deselect_all_respondents(callback: CallbackQuery, state: FSMContext, employee_service: EmployeeService):
+async def deselect_all_respondents(
+    callback: CallbackQuery,
+    state: FSMContext,
+    employee_service: EmployeeService,
+    edit_coalescer: EditCoalescer,
+    bot: Bot,
+):
+    await callback.answer("Выбор снят со всех респондентов")
     page = int(callback.data.split(":")[1])
     await state.update_data(respondents=[])
 
@@ -160,21 +356,25 @@ async def deselect_all_respondents(callback: CallbackQuery, state: FSMContext, e
     target_employee = employee_service.find_by_id(target_employee_id)
     all_other_employees = [emp for emp in employee_service._employees if emp.id != target_employee.id]
     
-    from ..keyboards.respondent_select_keyboard import get_respondent_select_keyboard
-    await callback.message.edit_reply_markup(
-        reply_markup=get_respondent_select_keyboard(all_other_employees, set(), page=page)
+    edit_coalescer.edit_markup(
+        bot,
+        callback.message.chat.id,
+        callback.message.message_id,
+        get_respondent_select_keyboard(all_other_employees, set(), page=page),
     )
-    await callback.answer("Выбор снят со всех респондентов")
 
 
 @router.callback_query(F.data == "finish_respondents", CycleCreationFSM.waiting_for_respondents)
-async def finish_respondents_selection(callback: CallbackQuery, state: FSMContext):
+async def finish_respondents_selection(
+    callback: CallbackQuery, state: FSMContext, edit_coalescer: EditCoalescer
+):
     data = await state.get_data()
     if not data.get("respondents"):
         await callback.answer("Нужно добавить хотя бы одного респондента.", show_alert=True)
         return
 
     await state.set_state(CycleCreationFSM.waiting_for_deadline)
+    edit_coalescer.discard(callback.message.chat.id, callback.message.message_id)
     await callback.message.edit_text(
         "Ввод респондентов завершен.\n\nВведите дедлайн в формате ГГГГ-ММ-ДД:"
     )
@@ -224,6 +424,8 @@ async def confirm_creation(
     state: FSMContext,
     cycle_service: CycleService,
     employee_service: EmployeeService,
+    reminder_service: ReminderService,
+    sender: RateLimitedSender,
     bot: Bot,
 ):
     await callback.message.edit_text("Создаем цикл... ")
@@ -233,18 +435,20 @@ async def confirm_creation(
         data = await state.get_data()
         target_employee_id = data.get("target_employee_id")
         respondent_ids = data.get("respondents")
-        deadline = data.get("deadline")
+        deadline = date.fromisoformat(data.get("deadline"))
         target_employee = employee_service.find_by_id(target_employee_id)
         cycle = await cycle_service.create_new_cycle(
             target_employee=target_employee,
             respondent_ids=respondent_ids,
             deadline=deadline,
         )
+        await reminder_service.schedule_cycle(cycle)
         # After successful creation, distribute the survey links
         await cycle_service.notify_respondents(
             cycle=cycle,
             employee_service=employee_service,
             bot=bot,
+            sender=sender,
         )
         await callback.message.edit_text(
             f" Цикл <code>{cycle.id}</code> успешно создан и разослан респондентам."
@@ -257,3 +461,136 @@ async def confirm_creation(
     finally:
         await state.clear()
         await callback.answer()
+
+
+def format_row_errors(errors) -> str:
+    lines = [f"строка {line}: {html.escape(error)}" for line, error in errors[:MAX_LISTED_ERRORS]]
+    if len(errors) > MAX_LISTED_ERRORS:
+        lines.append(f"…и ещё {len(errors) - MAX_LISTED_ERRORS}")
+    return "\n".join(lines)
+
+
+@router.message(Command("bulk_cycles"), StateFilter(None))
+async def cmd_bulk_cycles(message: types.Message, state: FSMContext):
+    """
+    Handler for the /bulk_cycles command. Starts launching cycles from a table.
+    """
+    await state.set_state(BulkLaunchFSM.waiting_for_table)
+    await message.answer(
+        "Массовый запуск циклов.\n\n"
+        "Отправьте CSV-файл или название листа в основной таблице. Колонки: "
+        "<code>target, respondents, deadline</code> — ID цели, ID респондентов через "
+        "пробел и дедлайн в формате ГГГГ-ММ-ДД.\n\n/cancel_bulk — отмена."
+    )
+
+
+@router.message(Command("cancel_bulk"), BulkLaunchFSM.waiting_for_table)
+async def cmd_cancel_bulk(message: types.Message, state: FSMContext):
+    await state.clear()
+    await message.answer("Массовый запуск отменён.")
+
+
+@router.message(BulkLaunchFSM.waiting_for_table)
+async def process_launch_table(
+    message: types.Message,
+    state: FSMContext,
+    bulk_launch_service: BulkLaunchService,
+    g_sheets: GoogleSheetsService,
+    bot: Bot,
+):
+    if message.document:
+        if (message.document.file_size or 0) > MAX_TABLE_FILE_BYTES:
+            await message.answer("Файл слишком большой.")
+            return
+        try:
+            values = read_csv((await bot.download(message.document)).getvalue())
+        except (UnicodeDecodeError, ValueError):
+            await message.answer("Не удалось прочитать файл: нужен CSV в кодировке UTF-8.")
+            return
+    elif message.text and message.text.startswith("/"):
+        # Other commands are filtered to the idle state; they are not sheet names.
+        await message.answer(
+            "Идёт массовый запуск. Отправьте CSV-файл или название листа, "
+            "либо /cancel_bulk для отмены."
+        )
+        return
+    elif message.text:
+        try:
+            values = await g_sheets.get_all_values(message.text.strip())
+        except Exception as e:
+            logger.warning(f"Failed to read launch sheet '{message.text}': {e}")
+            await message.answer("Лист не найден. Отправьте CSV-файл или название листа.")
+            return
+    else:
+        await message.answer("Отправьте CSV-файл или название листа.")
+        return
+
+    plan = await bulk_launch_service.plan(
+        values, date.today(), settings.results.MAX_ACTIVE_CYCLES
+    )
+    text = f"<b>Будет создано циклов:</b> {len(plan.rows)}"
+    if plan.errors:
+        text += f"\n<b>Отклонено строк:</b> {len(plan.errors)}\n\n{format_row_errors(plan.errors)}"
+    if not plan.rows:
+        await state.clear()
+        await message.answer(text + "\n\nИсправьте таблицу и запустите /bulk_cycles снова.")
+        return
+
+    # The table is validated again on confirmation, so it is kept as is.
+    await state.update_data(launch_table=values)
+    await state.set_state(BulkLaunchFSM.confirming_launch)
+    await message.answer(text, reply_markup=get_bulk_confirmation_keyboard())
+
+
+@router.callback_query(F.data == "cancel_bulk", BulkLaunchFSM.confirming_launch)
+async def cancel_bulk_launch(callback: types.CallbackQuery, state: FSMContext):
+    await state.clear()
+    await callback.message.edit_text("Массовый запуск отменён.")
+    await callback.answer()
+
+
+@router.callback_query(F.data == "confirm_bulk", BulkLaunchFSM.confirming_launch)
+async def confirm_bulk_launch(
+    callback: types.CallbackQuery,
+    state: FSMContext,
+    bulk_launch_service: BulkLaunchService,
+):
+    await callback.answer()
+    data = await state.get_data()
+    await state.clear()
+    await callback.message.edit_text("Проверяем таблицу…")
+
+    last_edit = 0.0
+
+    async def show_progress(text: str) -> None:
+        nonlocal last_edit
+        if time.monotonic() - last_edit < PROGRESS_EDIT_INTERVAL_SECONDS:
+            return
+        last_edit = time.monotonic()
+        try:
+            await callback.message.edit_text(text)
+        except TelegramAPIError as e:
+            logger.warning(f"Failed to update bulk launch progress: {e}")
+
+    try:
+        plan: LaunchPlan = await bulk_launch_service.plan(
+            data.get("launch_table", []), date.today(), settings.results.MAX_ACTIVE_CYCLES
+        )
+        result = await bulk_launch_service.launch(callback.bot, plan, show_progress)
+    except Exception as e:
+        logger.error(f"Bulk launch failed: {e}", exc_info=True)
+        await callback.message.edit_text(
+            "Произошла ошибка при массовом запуске. Проверьте /status и попробуйте позже."
+        )
+        return
+
+    text = (
+        f"<b>Создано циклов:</b> {len(result.cycles)}\n"
+        f"<b>Приглашений отправлено:</b> {result.sent}\n"
+        f"<b>Отложено до регистрации:</b> {result.queued}"
+    )
+    if result.handed_over:
+        text += f"\n<b>Будет отправлено после перезапуска бота:</b> {result.handed_over}"
+    if result.errors:
+        text += f"\n<b>Отклонено строк:</b> {len(result.errors)}\n\n{format_row_errors(result.errors)}"
+    await callback.message.edit_text(text)
@@ -1,16 +1,154 @@
+import html
 import logging
+from typing import List
 
 from aiogram import F, Router, types, Bot
-from aiogram.filters import CommandStart
+from aiogram.filters import CommandObject, CommandStart
 from aiogram.fsm.context import FSMContext
 
+from ..keyboards.survey_keyboards import (
+    ANSWER_CALLBACK_PREFIX,
+    SUBMIT_SURVEY_CALLBACK,
+    SURVEY_CALLBACK_PREFIX,
+    get_question_keyboard,
+    get_submit_keyboard,
+)
+from ..states.survey import SurveyFSM
 from ...services.cycle_service import CycleService
 from ...services.employee_service import EmployeeService
+from ...services.progress_service import ProgressService
+from ...services.question_service import QuestionnaireService
+from ...services.token_service import SurveyTokenService
+from ...storage.models import Question, TokenData
 
 logger = logging.getLogger(__name__)
 router = Router()
 
 
+async def _resolve_token(
+    token: str,
+    telegram_id: int,
+    token_service: SurveyTokenService,
+    employee_service: EmployeeService,
+) -> TokenData | None:
+    """Verifies a survey token and checks that it belongs to the calling user."""
+    employee = await employee_service.find_by_telegram_id(telegram_id)
+    if not employee:
+        logger.warning(f"Unknown user {telegram_id} tried to use a survey token.")
+        return None
+    return await token_service.verify(token, employee.id)
+
+
+async def _begin_survey(
+    message: types.Message,
+    state: FSMContext,
+    token_data: TokenData,
+    cycle_service: CycleService,
+    employee_service: EmployeeService,
+    questionnaire_service: QuestionnaireService,
+    progress_service: ProgressService,
+) -> None:
+    """Starts the questionnaire of a verified token, or resumes it if already started."""
+    data = await state.get_data()
+    if await state.get_state() in (SurveyFSM.answering.state, SurveyFSM.confirming.state):
+        if data.get("cycle_id") == token_data.cycle_id:
+            await _send_question(message, state, await questionnaire_service.get_questionnaire() or [])
+        else:
+            await message.answer("Сначала завершите начатую анкету.")
+        return
+
+    cycle = await cycle_service.get_cycle_by_id(token_data.cycle_id)
+    respondent = cycle.respondents.get(token_data.respondent_id) if cycle else None
+    if not cycle or cycle.status != "active" or not respondent:
+        await message.answer("Этот опрос уже закрыт.")
+        return
+    if respondent.status == "completed":
+        await message.answer("Вы уже заполнили эту анкету. Спасибо!")
+        return
+    questions = await questionnaire_service.get_questionnaire()
+    if not questions:
+        await message.answer("Анкета временно недоступна, попробуйте позже.")
+        return
+
+    await progress_service.mark_started(token_data.cycle_id, token_data.respondent_id)
+    target = employee_service.find_by_id(cycle.target_employee_id)
+    await state.set_state(SurveyFSM.answering)
+    await state.set_data({
+        "cycle_id": cycle.id,
+        "respondent_id": token_data.respondent_id,
+        "target_name": target.full_name if target else cycle.target_employee_id,
+        "index": 0,
+        "answers": {},
+        "selected": [],
+    })
+    await _send_question(message, state, questions)
+
+
+def _question_text(question: Question, index: int, total: int, target_name: str) -> str:
+    lines = [
+        f"Вопрос {index + 1}/{total}",
+        "",
+        f"<b>{html.escape(question.text.replace('{Имя}', target_name))}</b>",
+    ]
+    if question.type == "scale" and question.options:
+        lines.append(html.escape(question.options))
+    if not question.choices:
+        lines.append("Напишите ответ сообщением.")
+    return "\n".join(lines)
+
+
+async def _send_question(message: types.Message, state: FSMContext, questions: List[Question]) -> None:
+    """Sends the current question, or the confirmation once all are answered."""
+    data = await state.get_data()
+    index = data["index"]
+    if index >= len(questions):
+        await state.set_state(SurveyFSM.confirming)
+        await message.answer("Анкета заполнена. Отправить ответы?", reply_markup=get_submit_keyboard())
+        return
+    question = questions[index]
+    await message.answer(
+        _question_text(question, index, len(questions), data["target_name"]),
+        reply_markup=get_question_keyboard(question, index, data["selected"]),
+    )
+
+
+async def _record_answer(
+    message: types.Message, state: FSMContext, questions: List[Question], value: str
+) -> None:
+    data = await state.get_data()
+    answers = {**data["answers"], questions[data["index"]].id: value}
+    await state.update_data(answers=answers, index=data["index"] + 1, selected=[])
+    await _send_question(message, state, questions)
+
+
+@router.message(CommandStart(deep_link=True))
+async def cmd_start_with_token(
+    message: types.Message,
+    command: CommandObject,
+    state: FSMContext,
+    employee_service: EmployeeService,
+    token_service: SurveyTokenService,
+    cycle_service: CycleService,
+    questionnaire_service: QuestionnaireService,
+    progress_service: ProgressService,
+):
+    """Handles `/start <token>` deep links from survey invitations."""
+    username = message.from_user.username
+    if username:
+        await employee_service.register_telegram_id(username, message.from_user.id)
+
+    token_data = await _resolve_token(
+        command.args, message.from_user.id, token_service, employee_service
+    )
+    if not token_data:
+        await message.answer("Ссылка на опрос недействительна или устарела.")
+        return
+    await _begin_survey(
+        message, state, token_data, cycle_service, employee_service,
+        questionnaire_service, progress_service,
+    )
+
+
 @router.message(CommandStart())
 async def cmd_start(message: types.Message, employee_service: EmployeeService, cycle_service: CycleService, bot: Bot):
     telegram_id = message.from_user.id
@@ -22,7 +160,7 @@ async def cmd_start(message: types.Message, employee_service: EmployeeService, c
     if username:
         await employee_service.register_telegram_id(username, telegram_id)
 
-    employee = employee_service.find_by_telegram_id(telegram_id)
+    employee = await employee_service.find_by_telegram_id(telegram_id)
 
     if not employee:
         logger.warning(f"User with telegram_id {telegram_id} not found in employee list.")
@@ -58,22 +196,105 @@ async def cmd_start(message: types.Message, employee_service: EmployeeService, c
     logger.info(f"Cleared pending notifications for user {employee.id}.")
 
 
-@router.callback_query(F.data.startswith("start_survey:"))
-async def start_survey(callback: types.CallbackQuery, state: FSMContext):
+@router.callback_query(F.data.startswith(SURVEY_CALLBACK_PREFIX))
+async def start_survey(
+    callback: types.CallbackQuery,
+    state: FSMContext,
+    employee_service: EmployeeService,
+    token_service: SurveyTokenService,
+    cycle_service: CycleService,
+    questionnaire_service: QuestionnaireService,
+    progress_service: ProgressService,
+):
     """
     Handles the 'Start Survey' button click.
     Starts the questionnaire FSM.
     """
-    _, cycle_id, respondent_id = callback.data.split(":")
+    token = callback.data[len(SURVEY_CALLBACK_PREFIX):]
+    token_data = await _resolve_token(
+        token, callback.from_user.id, token_service, employee_service
+    )
+    if not token_data:
+        await callback.answer("Ссылка на опрос недействительна или устарела.", show_alert=True)
+        return
+    await callback.answer()
+    await _begin_survey(
+        callback.message, state, token_data, cycle_service, employee_service,
+        questionnaire_service, progress_service,
+    )
 
-    # TODO: Implement Questionnaire FSM
-    # 1. Check if survey is already completed
-    # 2. Get questions from the service
-    # 3. Set initial state and store cycle/respondent info
-    # 4. Send the first question
 
-    await callback.message.edit_text(
-        f"Начинаем опрос (цикл: {cycle_id}, респондент: {respondent_id}).\n"
-        "\n(Здесь будет логика анкеты...)"
-    )
+@router.callback_query(SurveyFSM.answering, F.data.startswith(ANSWER_CALLBACK_PREFIX))
+async def answer_with_button(
+    callback: types.CallbackQuery,
+    state: FSMContext,
+    questionnaire_service: QuestionnaireService,
+):
+    """Handles choices, checkbox toggles, 'Next' and 'Skip' of the current question."""
+    action, index, *choice = callback.data[len(ANSWER_CALLBACK_PREFIX):].split(":")
+    data = await state.get_data()
+    questions = await questionnaire_service.get_questionnaire() or []
+    if int(index) != data["index"] or data["index"] >= len(questions):
+        await callback.answer("Этот вопрос уже пройден.")
+        return
+    question = questions[data["index"]]
+
+    if action == "t":
+        selected = set(data["selected"]) ^ {int(choice[0])}
+        await state.update_data(selected=sorted(selected))
+        await callback.message.edit_reply_markup(
+            reply_markup=get_question_keyboard(question, data["index"], selected)
+        )
+        await callback.answer()
+        return
+    if action == "a":
+        value = question.choices[int(choice[0])]
+    elif action == "n":
+        if question.required and not data["selected"]:
+            await callback.answer("Выберите хотя бы один вариант.", show_alert=True)
+            return
+        value = ", ".join(question.choices[n] for n in data["selected"])
+    elif question.required:
+        await callback.answer("Это обязательный вопрос.", show_alert=True)
+        return
+    else:
+        value = ""
+
+    await callback.message.edit_reply_markup(reply_markup=None)
+    await callback.answer()
+    await _record_answer(callback.message, state, questions, value)
+
+
+@router.message(SurveyFSM.answering, F.text)
+async def answer_with_text(
+    message: types.Message, state: FSMContext, questionnaire_service: QuestionnaireService
+):
+    """Takes a free-text answer to the current question."""
+    data = await state.get_data()
+    questions = await questionnaire_service.get_questionnaire() or []
+    if data["index"] >= len(questions):
+        await _send_question(message, state, questions)
+        return
+    if questions[data["index"]].choices:
+        await message.answer("Выберите ответ кнопкой под вопросом.")
+        return
+    await _record_answer(message, state, questions, message.text.strip())
+
+
+@router.callback_query(SurveyFSM.confirming, F.data == SUBMIT_SURVEY_CALLBACK)
+async def submit_survey(
+    callback: types.CallbackQuery, state: FSMContext, cycle_service: CycleService
+):
+    """Commits the answers once the respondent confirms them."""
+    data = await state.get_data()
+    cycle = await cycle_service.get_cycle_by_id(data["cycle_id"])
+    if not cycle or cycle.status != "active":
+        text = "Опрос уже закрыт, ответы не приняты."
+    elif await cycle_service.submit_answers(cycle, data["respondent_id"], data["answers"]):
+        text = "Спасибо! Ответы сохранены."
+    else:
+        text = "Вы уже отправляли ответы по этой анкете."
+    # Cleared only now: if submitting fails, pressing the button again retries.
+    await state.clear()
+    await callback.message.edit_text(text)
     await callback.answer()
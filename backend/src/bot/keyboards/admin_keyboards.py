@@ -11,3 +11,15 @@ def get_confirmation_keyboard() -> InlineKeyboardMarkup:
             ]
         ]
     )
+
+
+def get_bulk_confirmation_keyboard() -> InlineKeyboardMarkup:
+    """Returns a keyboard for confirming or canceling a bulk launch."""
+    return InlineKeyboardMarkup(
+        inline_keyboard=[
+            [
+                InlineKeyboardButton(text="✅ Запустить", callback_data="confirm_bulk"),
+                InlineKeyboardButton(text="❌ Отмена", callback_data="cancel_bulk"),
+            ]
+        ]
+    )
@@ -0,0 +1,55 @@
+from typing import Collection, Optional
+
+from aiogram.types import InlineKeyboardButton, InlineKeyboardMarkup
+
+from ...storage.models import Question
+
+SURVEY_CALLBACK_PREFIX = "survey:"
+# "sq:<action>:<question index>[:<choice index>]": a(nswer), t(oggle), n(ext), s(kip).
+ANSWER_CALLBACK_PREFIX = "sq:"
+TOGGLE_CALLBACK_PREFIX = f"{ANSWER_CALLBACK_PREFIX}t:"
+SUBMIT_SURVEY_CALLBACK = "sq_submit"
+
+
+def get_survey_invitation_keyboard(token: str) -> InlineKeyboardMarkup:
+    """Returns a keyboard with a 'Start Survey' button carrying the survey token."""
+    return InlineKeyboardMarkup(
+        inline_keyboard=[
+            [InlineKeyboardButton(text="Начать опрос", callback_data=f"{SURVEY_CALLBACK_PREFIX}{token}")]
+        ]
+    )
+
+
+def get_question_keyboard(
+    question: Question, index: int, selected: Collection[int] = ()
+) -> Optional[InlineKeyboardMarkup]:
+    """
+    Returns the answer buttons of a question: its choices (toggles plus
+    'Next' for checkboxes) and 'Skip' for optional ones. Free-text questions
+    are answered with a message, so they only get 'Skip' if optional.
+    """
+    rows = []
+    if question.type == "checkbox":
+        rows += [
+            [InlineKeyboardButton(
+                text=f"{'✅ ' if n in selected else ''}{choice}",
+                callback_data=f"{TOGGLE_CALLBACK_PREFIX}{index}:{n}",
+            )]
+            for n, choice in enumerate(question.choices)
+        ]
+        rows.append([InlineKeyboardButton(text="Далее ➡️", callback_data=f"{ANSWER_CALLBACK_PREFIX}n:{index}")])
+    elif question.choices:
+        rows.append([
+            InlineKeyboardButton(text=choice, callback_data=f"{ANSWER_CALLBACK_PREFIX}a:{index}:{n}")
+            for n, choice in enumerate(question.choices)
+        ])
+    if not question.required:
+        rows.append([InlineKeyboardButton(text="Пропустить", callback_data=f"{ANSWER_CALLBACK_PREFIX}s:{index}")])
+    return InlineKeyboardMarkup(inline_keyboard=rows) if rows else None
+
+
+def get_submit_keyboard() -> InlineKeyboardMarkup:
+    """Returns the confirmation button at the end of a questionnaire."""
+    return InlineKeyboardMarkup(
+        inline_keyboard=[[InlineKeyboardButton(text="Отправить", callback_data=SUBMIT_SURVEY_CALLBACK)]]
+    )
@@ -0,0 +1,144 @@
+import asyncio
+import hashlib
+import logging
+import uuid
+from typing import Any, Awaitable, Callable, Dict, List, Tuple
+
+from aiogram import BaseMiddleware
+from aiogram.exceptions import TelegramAPIError
+from aiogram.types import TelegramObject, Update
+
+from ..keyboards.survey_keyboards import TOGGLE_CALLBACK_PREFIX
+from ...storage.redis_storage import RedisStorageService
+
+logger = logging.getLogger(__name__)
+
+UPDATE_KEY = "dedup:u:{update_id}"
+CALLBACK_KEY = "dedup:c:{digest}"
+# Telegram stops redelivering an update well within a day.
+UPDATE_TTL_SECONDS = 24 * 3600
+# How long the claim of a replica that died while handling an update holds;
+# renewed while the handler runs, so long handlers keep it.
+PROCESSING_TTL_SECONDS = 60
+DONE = "done"
+# Window in which the same button press on the same message counts as a repeat.
+CALLBACK_TTL_SECONDS = 5
+# Callbacks that users legitimately send several times in a row.
+REPEATABLE_CALLBACK_PREFIXES = ("toggle_resp:", TOGGLE_CALLBACK_PREFIX)
+
+
+class DeduplicationMiddleware(BaseMiddleware):
+    """
+    Outer update middleware that drops updates already seen by any replica.
+
+    Two kinds of repeats are recognized with one Redis round-trip:
+    a redelivered `update_id` (after a polling restart or a webhook retry)
+    and the same (user, message, callback data) pressed again within a
+    short window. Keys are short hashes with a TTL, so memory stays bounded.
+
+    Keys are claimed for `processing_ttl`, renewed while the handler runs
+    (sending to many users can take minutes) and marked done only once it
+    returns, so repeats arriving meanwhile are dropped too. A dropped button
+    press is still answered, so its spinner stops. If the handler raises, the claim is released and a redelivery of
+    the update (e.g. a shard worker's retry) is handled again.
+    """
+
+    def __init__(
+        self,
+        redis_service: RedisStorageService,
+        update_ttl: int = UPDATE_TTL_SECONDS,
+        callback_ttl: int = CALLBACK_TTL_SECONDS,
+        processing_ttl: int = PROCESSING_TTL_SECONDS,
+        repeatable_prefixes: Tuple[str, ...] = REPEATABLE_CALLBACK_PREFIXES,
+    ):
+        self._redis = redis_service
+        self._update_ttl = update_ttl
+        self._callback_ttl = callback_ttl
+        self._processing_ttl = processing_ttl
+        self._repeatable = repeatable_prefixes
+        self.checked = 0
+        self.duplicate_updates = 0
+        self.duplicate_callbacks = 0
+
+    @property
+    def hit_rate(self) -> float:
+        """The share of checked updates that were dropped as duplicates."""
+        dropped = self.duplicate_updates + self.duplicate_callbacks
+        return dropped / self.checked if self.checked else 0.0
+
+    def _callback_key(self, update: Update) -> str | None:
+        callback = update.callback_query
+        if not callback or not callback.data or not callback.message:
+            return None
+        if callback.data.startswith(self._repeatable):
+            return None
+        identity = (
+            f"{callback.from_user.id}:{callback.message.chat.id}:"
+            f"{callback.message.message_id}:{callback.data}"
+        )
+        digest = hashlib.blake2b(identity.encode("utf-8"), digest_size=8).hexdigest()
+        return CALLBACK_KEY.format(digest=digest)
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: Update,
+        data: Dict[str, Any],
+    ) -> Any:
+        update_key = UPDATE_KEY.format(update_id=event.update_id)
+        done = {update_key: self._update_ttl}
+        callback_key = self._callback_key(event)
+        if callback_key:
+            done[callback_key] = self._callback_ttl
+
+        claim = uuid.uuid4().hex
+        fresh = await self._redis.set_many_if_absent(
+            {key: self._processing_ttl for key in done}, claim
+        )
+        self.checked += 1
+        claimed = [key for key, is_fresh in zip(done, fresh) if is_fresh]
+        if not fresh[0]:
+            self.duplicate_updates += 1
+            logger.info(f"Dropping redelivered update {event.update_id}.")
+            await self._release(claimed, claim)
+            return None
+        if callback_key and not fresh[1]:
+            self.duplicate_callbacks += 1
+            logger.info(f"Dropping repeated callback '{event.callback_query.data}'.")
+            await self._redis.set_many_with_ttl({update_key: self._update_ttl}, DONE)
+            await self._answer(event, data)
+            return None
+
+        heartbeat = asyncio.create_task(self._renew(claimed, claim))
+        try:
+            result = await handler(event, data)
+        except BaseException:
+            await self._release(claimed, claim)
+            raise
+        finally:
+            heartbeat.cancel()
+        await self._redis.set_many_with_ttl(done, DONE)
+        return result
+
+    async def _renew(self, keys: List[str], claim: str) -> None:
+        """Keeps the claim alive while the handler runs, like a shard lease."""
+        while True:
+            await asyncio.sleep(self._processing_ttl / 3)
+            try:
+                await asyncio.gather(*(
+                    self._redis.acquire_lock(key, claim, self._processing_ttl * 1000) for key in keys
+                ))
+            except Exception as e:
+                logger.error(f"Failed to renew the claim of {keys[0]}: {e}")
+
+    @staticmethod
+    async def _answer(event: Update, data: Dict[str, Any]) -> None:
+        """Answers a dropped callback, so the button stops showing the spinner."""
+        try:
+            await data["bot"].answer_callback_query(event.callback_query.id)
+        except TelegramAPIError as e:
+            logger.warning(f"Failed to answer a repeated callback: {e}")
+
+    async def _release(self, keys: List[str], claim: str) -> None:
+        """Deletes the keys still holding this claim."""
+        await asyncio.gather(*(self._redis.release_lock(key, claim) for key in keys))
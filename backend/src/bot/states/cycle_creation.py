@@ -9,3 +9,11 @@ class CycleCreationFSM(StatesGroup):
     waiting_for_respondents = State()
     waiting_for_deadline = State()
     confirming_creation = State()
+
+
+class BulkLaunchFSM(StatesGroup):
+    """
+    FSM for launching cycles from a table.
+    """
+    waiting_for_table = State()
+    confirming_launch = State()
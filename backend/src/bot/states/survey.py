@@ -0,0 +1,9 @@
+from aiogram.fsm.state import State, StatesGroup
+
+
+class SurveyFSM(StatesGroup):
+    """
+    FSM for answering a questionnaire about a colleague.
+    """
+    answering = State()
+    confirming = State()
@@ -1,6 +1,6 @@
-from typing import List
+from typing import List, Literal
 
-from pydantic import Field, computed_field
+from pydantic import Field, computed_field, model_validator
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 class GoogleSettings(BaseSettings):
@@ -16,6 +16,14 @@ class RedisSettings(BaseSettings):
     host: str = "localhost"
     port: int = 6379
     db: int = 0
+    # Serve repeated reads of these key prefixes from process memory; the
+    # server reports changes (CLIENT TRACKING, or keyspace events on Redis 5).
+    client_cache: bool = False
+    client_cache_size: int = 10_000
+    client_cache_prefixes: List[str] = ["questionnaire", "cycle:", "employee_tg_id:", "employee_by_tg_id:"]
+    # Without CLIENT TRACKING the cache needs keyspace events; allow it to
+    # enable them on the server with CONFIG SET instead of failing.
+    client_cache_keyspace_events: bool = False
 
     @computed_field
     @property
@@ -23,15 +31,149 @@ class RedisSettings(BaseSettings):
         return f"redis://{self.host}:{self.port}/{self.db}"
 
 
+class SurveyTokenSettings(BaseSettings):
+    model_config = SettingsConfigDict(env_prefix="SURVEY_TOKEN_")
+
+    # HMAC key for survey tokens. Falls back to BOT_TOKEN when empty.
+    SECRET: str = ""
+    # How many days after the cycle deadline a token stays valid.
+    GRACE_DAYS: int = 3
+
+
+class SchedulerSettings(BaseSettings):
+    model_config = SettingsConfigDict(env_prefix="SCHEDULER_")
+
+    # Moscow time has no DST, so a fixed offset is enough.
+    UTC_OFFSET_HOURS: int = 3
+    TICK_SECONDS: int = 30
+    BATCH_SIZE: int = 100
+    LEADER_TTL_SECONDS: int = 90
+    REMINDER_INTERVAL_DAYS: int = 3
+    FINAL_PING_DAYS: int = 2
+    REMINDER_HOUR: int = 10
+    SUMMARY_HOUR: int = 9
+    # Outgoing messages per second for reminder broadcasts.
+    SEND_RATE: float = 25
+
+
+class WebhookSettings(BaseSettings):
+    model_config = SettingsConfigDict(env_prefix="WEBHOOK_")
+
+    # Public base URL Telegram delivers updates to, e.g. https://bot.example.com
+    URL: str = ""
+    PATH: str = "/webhook"
+    # Checked against the X-Telegram-Bot-Api-Secret-Token header.
+    SECRET: str = ""
+    HOST: str = "0.0.0.0"
+    PORT: int = 8080
+    # Updates accepted but not yet processed; beyond this Telegram is asked to retry.
+    QUEUE_SIZE: int = 1000
+    WORKERS: int = 16
+    ENQUEUE_TIMEOUT_SECONDS: float = 1.0
+
+
+class ShardingSettings(BaseSettings):
+    model_config = SettingsConfigDict(env_prefix="SHARDING_")
+
+    # When enabled, the main process only receives updates and publishes them
+    # to Redis streams; `python -m backend.src.worker` processes handle them.
+    ENABLED: bool = False
+    SHARDS: int = 32
+    WORKERS: int = 4
+    STREAM_MAXLEN: int = 100_000
+    BATCH_SIZE: int = 50
+    BLOCK_MS: int = 1000
+    # Workers hold a Redis lease per shard, renewed every third of this; the
+    # shards of a worker that stops renewing go to the live ones.
+    LEASE_TTL_MS: int = 15_000
+    # A failing update is retried in order, then moved to updates:dead.
+    MAX_ATTEMPTS: int = 5
+    RETRY_DELAY_MS: int = 1000
+
+
+class MetricsSettings(BaseSettings):
+    model_config = SettingsConfigDict(env_prefix="METRICS_")
+
+    # Serves Prometheus metrics on HOST:PORT/metrics; worker N uses
+    # PORT + 1 + N. Off by default and bound to localhost: set HOST to
+    # 0.0.0.0 only where the port is reachable by the scraper alone.
+    ENABLED: bool = False
+    HOST: str = "127.0.0.1"
+    PORT: int = 9100
+
+
+class ResultsSettings(BaseSettings):
+    model_config = SettingsConfigDict(env_prefix="RESULTS_")
+
+    MAX_ACTIVE_CYCLES: int = 300
+    # Results worksheets are spread over several spreadsheets (shards); a new
+    # one is created when the current one reaches either limit. Sheets allows
+    # 10M cells per spreadsheet.
+    SHARD_MAX_CYCLES: int = 150
+    SHARD_MAX_CELLS: int = 5_000_000
+    MAX_SHARDS: int = 20
+    # Drive folder for new shard spreadsheets; it should be shared with HR.
+    FOLDER_ID: str = ""
+    # Submissions are committed to a local SQLite database first and copied
+    # to the results worksheets in the background.
+    DB_PATH: str = "data/results.db"
+    MIRROR_BATCH_SIZE: int = 500
+    MIRROR_INTERVAL_SECONDS: int = 15
+
+
+class ArchiveSettings(BaseSettings):
+    model_config = SettingsConfigDict(env_prefix="ARCHIVE_")
+
+    # Closed cycles are compressed into the archive this many days after
+    # their deadline; only a summary stays readable.
+    AFTER_DAYS: int = 30
+    HOUR: int = 4
+    BATCH_SIZE: int = 200
+
+
+class TracingSettings(BaseSettings):
+    model_config = SettingsConfigDict(env_prefix="TRACING_")
+
+    ENABLED: bool = True
+    # Share of traces of normal updates written to the log.
+    SAMPLE_RATE: float = 0.01
+    # Updates slower than this keep their span tree for /slow.
+    SLOW_THRESHOLD_MS: int = 2000
+    KEEP_SLOW: int = 50
+
+
 class Settings(BaseSettings):
     model_config = SettingsConfigDict(
         env_file=".env", env_file_encoding="utf-8", extra="ignore"
     )
 
     BOT_TOKEN: str
+    UPDATES_MODE: Literal["polling", "webhook"] = "polling"
     ADMIN_TELEGRAM_IDS: List[int] = Field(default_factory=list)
+    # Startup waits this long for the employee directory and questionnaire
+    # to load before it starts receiving updates anyway.
+    WARM_UP_TIMEOUT_SECONDS: float = 20
+    # On shutdown, updates being handled, fan-outs and the Sheets mirror get
+    # this long in total to finish or hand their work over.
+    SHUTDOWN_DRAIN_SECONDS: float = 25
     redis: RedisSettings = RedisSettings()
     google: GoogleSettings = GoogleSettings()
+    survey_token: SurveyTokenSettings = SurveyTokenSettings()
+    scheduler: SchedulerSettings = SchedulerSettings()
+    webhook: WebhookSettings = WebhookSettings()
+    sharding: ShardingSettings = ShardingSettings()
+    metrics: MetricsSettings = MetricsSettings()
+    tracing: TracingSettings = TracingSettings()
+    results: ResultsSettings = ResultsSettings()
+    archive: ArchiveSettings = ArchiveSettings()
+
+    @model_validator(mode="after")
+    def check_webhook(self) -> "Settings":
+        # Telegram only delivers to public HTTPS URLs; fail at startup rather
+        # than register a webhook that never receives anything.
+        if self.UPDATES_MODE == "webhook" and not self.webhook.URL.startswith("https://"):
+            raise ValueError("UPDATES_MODE=webhook requires WEBHOOK_URL, an https:// URL.")
+        return self
 
 
 settings = Settings()
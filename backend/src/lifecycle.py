@@ -0,0 +1,133 @@
+import asyncio
+import logging
+import signal
+import time
+from typing import Optional
+
+from aiogram import Bot
+
+from .bot.middlewares.in_flight import InFlightMiddleware
+from .services.cycle_service import CycleService
+from .services.notification_sender import RateLimitedSender
+from .services.sheets_mirror import SheetsMirror
+
+logger = logging.getLogger(__name__)
+
+# How often a running process picks up messages handed over by a replica
+# that stopped after this one started, e.g. during a rolling restart.
+RESUME_INTERVAL_SECONDS = 30
+
+
+class LifecycleManager:
+    """
+    Owns the work a process keeps in flight besides handling updates and
+    hands it over on shutdown, so a restart loses nothing:
+
+    - updates being handled get until the drain deadline to finish;
+    - fan-outs stop sending and leave their unsent messages in Redis, where
+      the next process (or any running replica) sends them; invitations
+      it fails to deliver wait as pending notifications;
+    - the Sheets mirror flushes what is pending. Submissions are committed
+      to the results store before they are acknowledged, so rows it cannot
+      flush in time are mirrored on the next start.
+    """
+
+    def __init__(
+        self,
+        in_flight: InFlightMiddleware,
+        sender: RateLimitedSender,
+        sheets_mirror: Optional[SheetsMirror] = None,
+        drain_timeout: float = 25,
+        cycle_service: Optional[CycleService] = None,
+    ):
+        self._in_flight = in_flight
+        self._sender = sender
+        self._mirror = sheets_mirror
+        self._cycles = cycle_service
+        self._drain_timeout = drain_timeout
+        self._stopping = asyncio.Event()
+        self._deadline: Optional[float] = None
+        self._resume_task: Optional[asyncio.Task] = None
+        self._mirror_task: Optional[asyncio.Task] = None
+
+    def start(self, bot: Bot, mirror_interval: Optional[float] = None) -> None:
+        """
+        Starts sending handed-over messages and, given an interval, the
+        Sheets mirror.
+        """
+        self._resume_task = asyncio.create_task(self._resume(bot))
+        if self._mirror and mirror_interval:
+            self._mirror_task = asyncio.create_task(self._mirror.run(mirror_interval))
+
+    async def _resume(self, bot: Bot) -> None:
+        while not self._stopping.is_set():
+            try:
+                await self._sender.resume(
+                    bot, on_undelivered=self._cycles.queue_undelivered if self._cycles else None
+                )
+            except Exception as e:
+                logger.error(f"Failed to resume handed-over messages: {e}")
+            try:
+                await asyncio.wait_for(self._stopping.wait(), RESUME_INTERVAL_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+
+    @staticmethod
+    async def _wait(task: asyncio.Task, deadline: float) -> bool:
+        """Waits for a task until the deadline, then cancels it; False if it had to."""
+        try:
+            await asyncio.wait_for(task, max(deadline - time.monotonic(), 0))
+        except asyncio.TimeoutError:
+            return False
+        except Exception as e:
+            logger.error(f"Background task failed while stopping: {e}")
+        return True
+
+    @staticmethod
+    def cancel_on_signals(task: asyncio.Task) -> None:
+        """Turns SIGINT and SIGTERM into cancelling a task, e.g. the webhook server."""
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(sig, task.cancel)
+
+    def start_drain(self) -> float:
+        """
+        Starts draining: fan-outs stop sending and the drain deadline is set.
+        The webhook server calls it to drain its queue within the same
+        deadline; calling it again returns the deadline already set.
+        :return: The `time.monotonic()` value every drain step must finish by.
+        """
+        if self._deadline is None:
+            self._deadline = time.monotonic() + self._drain_timeout
+            self._stopping.set()
+            self._sender.stop()
+        return self._deadline
+
+    async def shutdown(self) -> None:
+        """
+        Drains the process once it no longer receives updates; every step
+        shares one deadline of `drain_timeout` seconds.
+        """
+        started = time.monotonic()
+        deadline = self.start_drain()
+
+        if not await self._in_flight.wait_idle(deadline - time.monotonic()):
+            logger.warning(
+                f"{self._in_flight.in_flight} updates still in flight after "
+                f"{self._drain_timeout:.0f} s; shutting down anyway."
+            )
+
+        # A resume round in progress hands its rest over like any fan-out.
+        if self._resume_task and not await self._wait(self._resume_task, deadline):
+            logger.warning("Resuming handed-over messages did not stop in time.")
+
+        if self._mirror_task:
+            self._mirror.stop()
+            if not await self._wait(self._mirror_task, deadline):
+                logger.warning(f"Sheets mirror did not flush in time; {self._mirror.lag} rows left.")
+
+        lag = f", {self._mirror.lag} rows left to mirror" if self._mirror else ""
+        logger.info(
+            f"Drained in {time.monotonic() - started:.2f} s: "
+            f"{self._sender.handed_over} messages handed over{lag}."
+        )
@@ -0,0 +1,72 @@
+import logging
+from typing import Any, Awaitable, Callable
+from uuid import uuid4
+
+from apscheduler.schedulers.asyncio import AsyncIOScheduler
+
+from .storage.redis_storage import RedisStorageService
+
+logger = logging.getLogger(__name__)
+
+LEADER_LOCK_KEY = "scheduler:leader"
+
+
+class LeaderElection:
+    """
+    A Redis lock that makes sure only one bot replica runs scheduled jobs.
+    The lock is renewed on every check, so it moves to another replica
+    only if the current leader stops checking for `ttl_seconds`.
+    """
+
+    def __init__(self, redis_service: RedisStorageService, ttl_seconds: int):
+        self._redis = redis_service
+        self._ttl_ms = ttl_seconds * 1000
+        self._owner = uuid4().hex
+        self._is_leader = False
+
+    async def check(self) -> bool:
+        is_leader = await self._redis.acquire_lock(LEADER_LOCK_KEY, self._owner, self._ttl_ms)
+        if is_leader != self._is_leader:
+            logger.info(f"Scheduler leadership {'acquired' if is_leader else 'lost'}.")
+            self._is_leader = is_leader
+        return is_leader
+
+    async def resign(self) -> None:
+        if self._is_leader:
+            await self._redis.release_lock(LEADER_LOCK_KEY, self._owner)
+            self._is_leader = False
+
+
+class JobScheduler:
+    """
+    Wraps APScheduler so that every job runs on the elected leader only.
+    """
+
+    def __init__(self, leader: LeaderElection, tz: Any):
+        self._leader = leader
+        self._scheduler = AsyncIOScheduler(timezone=tz)
+
+    def add_job(
+        self, name: str, func: Callable[[], Awaitable[Any]], trigger: str, **trigger_args
+    ) -> None:
+        """Registers a coroutine function that is run on the leader replica only."""
+
+        async def run_on_leader():
+            if not await self._leader.check():
+                return
+            try:
+                await func()
+            except Exception as e:
+                logger.error(f"Scheduled job '{name}' failed: {e}", exc_info=True)
+
+        self._scheduler.add_job(
+            run_on_leader, trigger, id=name, max_instances=1, coalesce=True, **trigger_args
+        )
+
+    def start(self) -> None:
+        self._scheduler.start()
+        logger.info("Scheduler started.")
+
+    async def shutdown(self) -> None:
+        self._scheduler.shutdown(wait=False)
+        await self._leader.resign()
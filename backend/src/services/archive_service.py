@@ -0,0 +1,219 @@
+import logging
+import uuid
+import zlib
+from collections import Counter
+from dataclasses import dataclass, field
+from datetime import date, datetime, timedelta
+from typing import AsyncIterator, Dict, List, Optional
+
+from ..storage.models import CycleSummary, FeedbackCycle
+from ..storage.redis_storage import RedisStorageService
+from ..tracing import traced
+from .cycle_service import CycleService
+from .progress_service import COUNTER_NAMES, CycleProgress, ProgressService
+from .reminder_service import ReminderService
+from .report_aggregation import ReportAggregationService
+from .result_storage import ResultStorageRouter
+
+logger = logging.getLogger(__name__)
+
+# Hash of cycle_id -> zlib-compressed cycle JSON, one per quarter of creation.
+ARCHIVE_KEY = "archive:{period}"
+# Hash of cycle_id -> CycleSummary JSON of every archived cycle.
+ARCHIVE_SUMMARIES_KEY = "archive:summaries"
+ARCHIVE_LOCK_KEY = "archive:lock"
+ARCHIVE_LOCK_TTL_MS = 600_000
+ARCHIVED_STATUSES = ("closed", "reported")
+COMPRESSION_LEVEL = 9
+
+
+def period_of(day: date) -> str:
+    """The archive period of a day: its quarter, as accepted by /export."""
+    return f"{day.year}Q{(day.month - 1) // 3 + 1}"
+
+
+def unpack_cycle(data: bytes) -> FeedbackCycle:
+    return FeedbackCycle.model_validate_json(zlib.decompress(data))
+
+
+def summarize(cycle: FeedbackCycle, progress: Optional[CycleProgress]) -> CycleSummary:
+    progress = progress or CycleProgress(invited=len(cycle.respondents))
+    return CycleSummary(
+        id=cycle.id,
+        target_employee_id=cycle.target_employee_id,
+        status=cycle.status,
+        deadline=cycle.deadline,
+        created_at=cycle.created_at,
+        results_sheet=cycle.results_sheet,
+        results_spreadsheet_id=cycle.results_spreadsheet_id,
+        counters={name: getattr(progress, name) for name in COUNTER_NAMES},
+    )
+
+
+@dataclass
+class ArchiveReport:
+    cycles: int = 0
+    periods: Counter = field(default_factory=Counter)
+    json_bytes: int = 0
+    compressed_bytes: int = 0
+    memory_before: int = 0
+    memory_after: int = 0
+
+    @property
+    def saved_bytes(self) -> int:
+        """Change of the server's allocated memory over the run."""
+        return self.memory_before - self.memory_after
+
+
+def format_archive_report(report: ArchiveReport) -> str:
+    if not report.cycles:
+        return "Нет циклов для архивации."
+    periods = ", ".join(f"{p}: {n}" for p, n in sorted(report.periods.items()))
+    return (
+        f"В архив перенесено циклов: {report.cycles} ({periods}).\n"
+        f"Сжато {report.json_bytes / 1024:.0f} КБ → {report.compressed_bytes / 1024:.0f} КБ, "
+        f"память Redis уменьшилась на {report.saved_bytes / 1024:.0f} КБ."
+    )
+
+
+class CycleArchiveService:
+    """
+    Moves finished cycles out of the working key space.
+
+    A cycle that is closed (or reported) and whose deadline passed more than
+    `after_days` ago is compressed into the archive of its quarter, and
+    everything else it left in Redis is deleted in the same transaction:
+    the cycle key, progress counters and states, reminders, queued
+    invitations, routing and the results version. A small summary stays
+    for history queries such as exports, and `restore` brings the cycle
+    back on demand; a restored cycle is archived again once it has been
+    back for `after_days`. Results themselves stay in their worksheet and
+    the results store.
+    """
+
+    def __init__(
+        self,
+        redis_service: RedisStorageService,
+        cycle_service: CycleService,
+        progress_service: ProgressService,
+        reminder_service: ReminderService,
+        result_storage: ResultStorageRouter,
+        report_service: ReportAggregationService,
+        after_days: int = 30,
+        batch_size: int = 200,
+    ):
+        self._redis = redis_service
+        self._cycles = cycle_service
+        self._progress = progress_service
+        self._reminders = reminder_service
+        self._results = result_storage
+        self._reports = report_service
+        self._after = timedelta(days=after_days)
+        self._batch_size = batch_size
+        self.archived = 0
+        self.saved_bytes = 0
+
+    async def _archive_batch(
+        self, keys: List[str], cutoff: date, progress: Dict[str, CycleProgress], report: ArchiveReport
+    ) -> None:
+        cycles = [
+            cycle
+            for cycle in await self._redis.get_models(keys, FeedbackCycle)
+            if cycle and cycle.status in ARCHIVED_STATUSES and cycle.deadline < cutoff
+            and not (cycle.restored_at and cycle.restored_at.date() >= cutoff)
+        ]
+        if not cycles:
+            return
+        pipe = self._redis.pipeline()
+        for cycle in cycles:
+            period = period_of(cycle.created_at.date())
+            raw = cycle.model_dump_json(by_alias=True).encode("utf-8")
+            data = zlib.compress(raw, COMPRESSION_LEVEL)
+            pipe.hset(ARCHIVE_KEY.format(period=period), cycle.id, data)
+            pipe.hset(
+                ARCHIVE_SUMMARIES_KEY,
+                cycle.id,
+                summarize(cycle, progress.get(cycle.id)).model_dump_json(),
+            )
+            self._cycles.queue_removal(pipe, cycle)
+            self._progress.queue_removal(pipe, cycle.id)
+            self._reminders.queue_unschedule(pipe, cycle)
+            self._results.queue_removal(pipe, cycle.id)
+            self._reports.queue_removal(pipe, cycle.id)
+            report.periods[period] += 1
+            report.json_bytes += len(raw)
+            report.compressed_bytes += len(data)
+        await pipe.execute()
+        report.cycles += len(cycles)
+
+    @traced()
+    async def run(self, today: date) -> Optional[ArchiveReport]:
+        """
+        Archives every eligible cycle.
+        :return: What was archived, or None if another run holds the lock.
+        """
+        owner = uuid.uuid4().hex
+        if not await self._redis.acquire_lock(ARCHIVE_LOCK_KEY, owner, ARCHIVE_LOCK_TTL_MS):
+            logger.info("Cycle archival is already running elsewhere.")
+            return None
+        try:
+            report = ArchiveReport(memory_before=await self._redis.used_memory())
+            cutoff = today - self._after
+            progress = (await self._progress.get_snapshot()).cycles
+            keys: List[str] = []
+            async for key in self._redis.scan_keys("cycle:*"):
+                keys.append(key)
+                if len(keys) == self._batch_size:
+                    await self._archive_batch(keys, cutoff, progress, report)
+                    keys = []
+            await self._archive_batch(keys, cutoff, progress, report)
+            report.memory_after = await self._redis.used_memory()
+        finally:
+            await self._redis.release_lock(ARCHIVE_LOCK_KEY, owner)
+
+        self.archived += report.cycles
+        self.saved_bytes += max(report.saved_bytes, 0)
+        logger.info(
+            f"Archived {report.cycles} cycles {dict(report.periods)}: "
+            f"{report.json_bytes} bytes of JSON compressed to {report.compressed_bytes}, "
+            f"Redis memory {report.memory_before} -> {report.memory_after} bytes "
+            f"({report.saved_bytes} saved)."
+        )
+        return report
+
+    async def get_summary(self, cycle_id: str) -> Optional[CycleSummary]:
+        data = await self._redis.get_hash_field(ARCHIVE_SUMMARIES_KEY, cycle_id)
+        return CycleSummary.model_validate_json(data) if data else None
+
+    async def iter_summaries(self) -> AsyncIterator[CycleSummary]:
+        """The summaries of all archived cycles, read in batches."""
+        async for _, data in self._redis.scan_hash(ARCHIVE_SUMMARIES_KEY):
+            yield CycleSummary.model_validate_json(data)
+
+    async def restore(self, cycle_id: str) -> Optional[FeedbackCycle]:
+        """
+        Moves an archived cycle back under `cycle:{id}` with its progress
+        counters. It stays closed: reminders and invitations are not
+        brought back. Runs skip it for `after_days` after the restore.
+        :return: The restored cycle, or None if it is not archived.
+        """
+        summary = await self.get_summary(cycle_id)
+        if not summary:
+            return None
+        archive_key = ARCHIVE_KEY.format(period=period_of(summary.created_at.date()))
+        data = await self._redis.get_hash_field_bytes(archive_key, cycle_id)
+        if not data:
+            logger.error(f"Archived cycle {cycle_id} has a summary but no data in {archive_key}.")
+            return None
+        cycle = unpack_cycle(data)
+        cycle.restored_at = datetime.utcnow()
+
+        pipe = self._redis.pipeline()
+        self._redis.invalidate(f"cycle:{cycle.id}")
+        pipe.set(f"cycle:{cycle.id}", cycle.model_dump_json(by_alias=True))
+        self._progress.queue_restore(pipe, cycle, summary.counters)
+        pipe.hdel(archive_key, cycle.id)
+        pipe.hdel(ARCHIVE_SUMMARIES_KEY, cycle.id)
+        await pipe.execute()
+        logger.info(f"Restored cycle {cycle.id} from {archive_key}.")
+        return cycle
@@ -0,0 +1,197 @@
+import csv
+import io
+import logging
+import re
+from collections import defaultdict
+from dataclasses import dataclass, field
+from datetime import date
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+from aiogram import Bot
+
+from ..storage.models import FeedbackCycle
+from .cycle_service import CycleService, CycleSpec, cycle_id_for
+from .employee_service import EmployeeService
+from .notification_sender import OutgoingMessage, RateLimitedSender
+from .reminder_service import ReminderService
+
+logger = logging.getLogger(__name__)
+
+HEADER = ("target", "respondents", "deadline")
+_RESPONDENT_SEPARATORS = re.compile(r"[\s,;]+")
+
+ProgressCallback = Callable[[str], Awaitable[None]]
+
+
+@dataclass
+class LaunchRow:
+    line: int
+    spec: CycleSpec
+
+
+@dataclass
+class LaunchPlan:
+    """Validated rows of a launch table and the errors of the rejected ones."""
+
+    rows: List[LaunchRow] = field(default_factory=list)
+    errors: List[Tuple[int, str]] = field(default_factory=list)
+
+
+@dataclass
+class LaunchResult:
+    cycles: List[FeedbackCycle]
+    errors: List[Tuple[int, str]]
+    sent: int
+    queued: int
+    # Invitations left to the next process because this one was stopping.
+    handed_over: int = 0
+
+
+def read_csv(data: bytes) -> List[List[str]]:
+    """Parses an uploaded CSV file; Excel exports with `;` are accepted too."""
+    text = data.decode("utf-8-sig")
+    try:
+        dialect = csv.Sniffer().sniff(text[:4096], delimiters=",;\t")
+    except csv.Error:
+        dialect = csv.excel
+    return [row for row in csv.reader(io.StringIO(text), dialect) if any(cell.strip() for cell in row)]
+
+
+def parse_launch_table(
+    values: List[List[str]], employee_service: EmployeeService, today: date
+) -> LaunchPlan:
+    """
+    Validates rows of (target, respondents, deadline) against the employee
+    directory. A header row is optional; respondents are employee IDs
+    separated by spaces, commas or semicolons.
+    """
+    plan = LaunchPlan()
+    seen_targets: Dict[str, int] = {}
+    for line, row in enumerate(values, start=1):
+        cells = [cell.strip() for cell in row] + [""] * (len(HEADER) - len(row))
+        if line == 1 and cells[0].lower() == HEADER[0]:
+            continue
+        target_id, respondents_cell, deadline_cell = cells[:3]
+
+        target = employee_service.find_by_id(target_id.lstrip("@"))
+        if not target:
+            plan.errors.append((line, f"сотрудник «{target_id}» не найден"))
+            continue
+        if target.id in seen_targets:
+            plan.errors.append((line, f"цель {target.id} уже указана в строке {seen_targets[target.id]}"))
+            continue
+
+        respondent_ids = list(dict.fromkeys(
+            r.lstrip("@") for r in _RESPONDENT_SEPARATORS.split(respondents_cell) if r
+        ))
+        unknown = [r for r in respondent_ids if not employee_service.find_by_id(r)]
+        if unknown:
+            plan.errors.append((line, f"неизвестные респонденты: {', '.join(unknown)}"))
+            continue
+        if target.id in respondent_ids:
+            plan.errors.append((line, "цель не может быть своим респондентом"))
+            continue
+        if not respondent_ids:
+            plan.errors.append((line, "не указаны респонденты"))
+            continue
+
+        try:
+            deadline = date.fromisoformat(deadline_cell)
+        except ValueError:
+            plan.errors.append((line, f"неверная дата «{deadline_cell}», нужен формат ГГГГ-ММ-ДД"))
+            continue
+        if deadline <= today:
+            plan.errors.append((line, "дедлайн должен быть в будущем"))
+            continue
+
+        seen_targets[target.id] = line
+        plan.rows.append(LaunchRow(line, CycleSpec(target, respondent_ids, deadline)))
+    return plan
+
+
+class BulkLaunchService:
+    """
+    Launches cycles for many targets from one table: the rows are validated
+    in one pass, the cycles are created together (see
+    `CycleService.create_cycles`) and the invitations are fanned out through
+    the rate-limited sender.
+    """
+
+    def __init__(
+        self,
+        cycle_service: CycleService,
+        employee_service: EmployeeService,
+        reminder_service: ReminderService,
+        sender: RateLimitedSender,
+    ):
+        self._cycles = cycle_service
+        self._employees = employee_service
+        self._reminders = reminder_service
+        self._sender = sender
+
+    async def plan(self, values: List[List[str]], today: date, max_active: int) -> LaunchPlan:
+        """Validates a launch table against the directory, existing cycles and the active-cycle limit."""
+        await self._employees.load_employees()
+        plan = parse_launch_table(values, self._employees, today)
+
+        existing = await self._cycles.find_existing(
+            [cycle_id_for(row.spec.target_employee.id, today) for row in plan.rows]
+        )
+        capacity = max_active - await self._cycles.get_active_cycles_count()
+        rows = []
+        for row in plan.rows:
+            if cycle_id_for(row.spec.target_employee.id, today) in existing:
+                plan.errors.append((row.line, "цикл для этой цели уже создан сегодня"))
+            elif len(rows) >= capacity:
+                plan.errors.append((row.line, f"превышен лимит активных циклов ({max_active})"))
+            else:
+                rows.append(row)
+        plan.rows = rows
+        plan.errors.sort()
+        return plan
+
+    async def launch(
+        self, bot: Bot, plan: LaunchPlan, on_progress: Optional[ProgressCallback] = None
+    ) -> LaunchResult:
+        """Creates the planned cycles and sends their invitations."""
+
+        async def report(text: str) -> None:
+            if on_progress:
+                await on_progress(text)
+
+        await report(f"Создаем {len(plan.rows)} циклов…")
+        cycles = await self._cycles.create_cycles([row.spec for row in plan.rows])
+        errors = list(plan.errors)
+        errors.extend(
+            (row.line, "хранилище результатов заполнено")
+            for row in plan.rows[len(cycles):]
+        )
+        await self._reminders.schedule_cycles(cycles)
+
+        messages: List[OutgoingMessage] = []
+        pending: Dict[str, List[str]] = defaultdict(list)
+        for cycle in cycles:
+            target = self._employees.find_by_id(cycle.target_employee_id)
+            for resp_id in cycle.respondents:
+                respondent = self._employees.find_by_id(resp_id)
+                if not respondent:
+                    continue
+                if respondent.telegram_id:
+                    messages.append(self._cycles.invitation_message(cycle, respondent, target))
+                else:
+                    pending[resp_id].append(cycle.id)
+        if pending:
+            await self._cycles.add_pending_notifications(pending)
+
+        async def sent(done: int, total: int) -> None:
+            await report(f"Создано циклов: {len(cycles)}. Разослано приглашений: {done}/{total}…")
+
+        result = await self._sender.send_many(bot, messages, on_progress=sent)
+        queued = sum(len(cycle_ids) for cycle_ids in pending.values())
+        queued += await self._cycles.queue_undelivered(result.failed)
+
+        logger.info(
+            f"Bulk launch created {len(cycles)} cycles; {result.sent} invitations sent, "
+            f"{queued} queued, {result.handed_over} handed over, {len(errors)} rows rejected."
+        )
+        return LaunchResult(cycles, sorted(errors), result.sent, queued, result.handed_over)
@@ -1,71 +1,223 @@
+import asyncio
 import logging
+import sqlite3
 
+from collections import defaultdict
+from dataclasses import dataclass
 from datetime import date, datetime
-from typing import Optional
+from typing import Any, Dict, List, Optional, Set
 from aiogram import Bot
-from aiogram.exceptions import TelegramAPIError
+from redis.asyncio.client import Pipeline
 
-from ..storage.models import Employee, FeedbackCycle, RespondentInfo
+from ..bot.keyboards.survey_keyboards import get_survey_invitation_keyboard
+from ..metrics import MESSAGES_SENT
+from ..storage.models import Employee, FeedbackCycle, Question, RespondentInfo
 from ..storage.redis_storage import RedisStorageService
+from ..storage.results_store import ResultsStore
+from ..tracing import traced
 from .google_sheets import GoogleSheetsService
 from .question_service import QuestionnaireService
 from .employee_service import EmployeeService
+from .progress_service import ProgressService
+from .notification_sender import FanOutResult, OutgoingMessage, RateLimitedSender
+from .result_storage import ACTIVE_CYCLES_KEY, ResultStorageFull, ResultStorageRouter
+from .token_service import SurveyTokenService
 
 logger = logging.getLogger(__name__)
 
+# Set once cycles:active holds the cycles created before it counted them.
+ACTIVE_CYCLES_BACKFILLED_KEY = "cycles:active:backfilled"
+
+
+def cycle_id_for(target_employee_id: str, created_on: date) -> str:
+    return f"{created_on.strftime('%Y%m%d')}_{target_employee_id}"
+
+
+def results_headers(questions: List[Question]) -> List[str]:
+    """The header row of a results worksheet."""
+    return ["cycle_id", "respondent_id", "submitted_at"] + [
+        q.result_column or q.id for q in questions
+    ]
+
+
+@dataclass
+class CycleSpec:
+    target_employee: Employee
+    respondent_ids: List[str]
+    deadline: date
+
+
 class CycleService:
     def __init__(
         self,
         redis_service: RedisStorageService,
         google_sheets_service: GoogleSheetsService,
         questionnaire_service: QuestionnaireService,
+        token_service: SurveyTokenService,
+        progress_service: ProgressService,
+        result_storage: ResultStorageRouter,
+        results_store: ResultsStore,
     ):
         self._redis = redis_service
         self._g_sheets = google_sheets_service
         self._questionnaire = questionnaire_service
+        self._tokens = token_service
+        self._progress = progress_service
+        self._results = result_storage
+        self._store = results_store
 
     async def get_active_cycles_count(self) -> int:
+        """Returns the number of active feedback cycles."""
+        return await self._redis.count_set(ACTIVE_CYCLES_KEY)
+
+    async def backfill_active_cycles(self) -> int:
         """
-        Returns the number of active feedback cycles.
-        Note: This is a simplified implementation. A more robust solution would
-        involve fetching each cycle and checking its status or using a dedicated
-        set in Redis for active cycle IDs.
+        Adds the active cycles stored before `cycles:active` tracked them to
+        the set, and registers their progress if it was not tracked either,
+        once per Redis database.
+        :return: The number of active cycles found, or 0 if already done.
         """
-        keys = await self._redis.get_keys_by_pattern("cycle:*")
-        return len(keys)
+        if await self._redis.get(ACTIVE_CYCLES_BACKFILLED_KEY):
+            return 0
+        active = []
+        async for key in self._redis.scan_keys("cycle:*"):
+            cycle = await self._redis.get_model(key, FeedbackCycle)
+            if cycle and cycle.status == "active":
+                active.append(cycle)
+        pipe = self._redis.pipeline()
+        if active:
+            pipe.sadd(ACTIVE_CYCLES_KEY, *(cycle.id for cycle in active))
+        for cycle in active:
+            self._progress.queue_backfill(pipe, cycle)
+        pipe.set(ACTIVE_CYCLES_BACKFILLED_KEY, "1")
+        await pipe.execute()
+        logger.info(f"Backfilled {len(active)} active cycles into {ACTIVE_CYCLES_KEY}.")
+        return len(active)
 
+    async def can_create_cycle(self, max_active: int) -> bool:
+        """Whether the active-cycle limit and the result storage allow a new cycle."""
+        if await self.get_active_cycles_count() >= max_active:
+            return False
+        return await self._results.has_capacity()
+
+    @traced()
     async def create_new_cycle(
         self, target_employee: Employee, respondent_ids: list[str], deadline: date
     ) -> FeedbackCycle:
         """Creates a new feedback cycle, stores it, and sets up the results sheet."""
-        cycle_id = f"{datetime.now().strftime('%Y%m%d')}_{target_employee.id}"
-
-        respondents = {}
-        for resp_id in respondent_ids:
-            respondent_info = RespondentInfo(id=resp_id)
-            respondents[resp_id] = respondent_info
-
-        cycle = FeedbackCycle(
-            id=cycle_id,
-            target_employee_id=target_employee.id,
-            respondents=respondents,
-            deadline=deadline,
-        )
+        cycles = await self.create_cycles([CycleSpec(target_employee, respondent_ids, deadline)])
+        return cycles[0]
 
-        await self._redis.set_model(f"cycle:{cycle.id}", cycle)
+    @traced()
+    async def create_cycles(self, specs: List[CycleSpec]) -> List[FeedbackCycle]:
+        """
+        Creates several cycles at once: the questionnaire is read once, all
+        cycles are written in one Redis pipeline and the results worksheets
+        are created with batched requests per spreadsheet.
 
-        sheet_title = f"{datetime.now().strftime('%Y-%m-%d')}_{target_employee.full_name}"
+        When the result storage fills up part way, the cycles placed so far
+        are created and returned; they are a prefix of `specs`. On any other
+        failure the room reserved for the cycles is given back.
+        :raises ResultStorageFull: If not even the first cycle fits.
+        """
+        if not specs:
+            return []
         questions = await self._questionnaire.get_questionnaire()
         if not questions:
             # This can happen if the Questions sheet is empty or validation fails.
             raise ValueError("Could not retrieve questionnaire to create cycle.")
-        headers = ["cycle_id", "respondent_id", "submitted_at"] + [
-            q.id for q in questions
-        ]
-        await self._g_sheets.create_worksheet(sheet_title, headers)
+        headers = results_headers(questions)
 
-        logger.info(f"Successfully created feedback cycle {cycle_id}")
-        return cycle
+        now = datetime.now()
+        cycles: List[FeedbackCycle] = []
+        created: Set[str] = set()
+        try:
+            await self._place_cycles(specs, now, headers, cycles)
+
+            by_spreadsheet: Dict[Optional[str], List[FeedbackCycle]] = defaultdict(list)
+            for cycle in cycles:
+                by_spreadsheet[cycle.results_spreadsheet_id].append(cycle)
+            for spreadsheet_id, placed in by_spreadsheet.items():
+                await self._g_sheets.create_worksheets(
+                    {cycle.results_sheet: headers for cycle in placed}, spreadsheet_id
+                )
+                created.update(cycle.id for cycle in placed)
+
+            for cycle in cycles:
+                await asyncio.to_thread(
+                    self._store.record_cycle, cycle.id, cycle.target_employee_id,
+                    cycle.results_sheet, cycle.results_spreadsheet_id, headers,
+                )
+            pipe = self._redis.pipeline()
+            for cycle in cycles:
+                self._redis.invalidate(f"cycle:{cycle.id}")
+                pipe.set(f"cycle:{cycle.id}", cycle.model_dump_json(by_alias=True))
+                self._progress.queue_registration(pipe, cycle)
+            await pipe.execute()
+        except Exception:
+            await self._release_placements(cycles, created, len(headers))
+            raise
+
+        logger.info(f"Successfully created feedback cycles {', '.join(c.id for c in cycles)}")
+        return cycles
+
+    async def _place_cycles(
+        self,
+        specs: List[CycleSpec],
+        now: datetime,
+        headers: List[str],
+        cycles: List[FeedbackCycle],
+    ) -> None:
+        """Builds the cycles and reserves their results worksheets, appending to `cycles`."""
+        for spec in specs:
+            target_employee = spec.target_employee
+            cycle_id = cycle_id_for(target_employee.id, now.date())
+            respondents = {
+                resp_id: RespondentInfo(
+                    id=resp_id,
+                    token=self._tokens.issue(cycle_id, resp_id, spec.deadline),
+                )
+                for resp_id in spec.respondent_ids
+            }
+            cycle = FeedbackCycle(
+                id=cycle_id,
+                target_employee_id=target_employee.id,
+                respondents=respondents,
+                deadline=spec.deadline,
+                results_sheet=f"{now.strftime('%Y-%m-%d')}_{target_employee.full_name}",
+            )
+            try:
+                cycle.results_spreadsheet_id = await self._results.assign(
+                    cycle_id, len(respondents), len(headers)
+                )
+            except ResultStorageFull:
+                if not cycles:
+                    raise
+                logger.error(f"Result storage is full; created {len(cycles)}/{len(specs)} cycles.")
+                break
+            cycles.append(cycle)
+
+    async def _release_placements(
+        self, cycles: List[FeedbackCycle], created: Set[str], columns: int
+    ) -> None:
+        """
+        Undoes the reservations of cycles that failed to be created. Cycles
+        whose worksheets exist keep the room they take and only lose their
+        route.
+        """
+        logger.error(f"Failed to create cycles {', '.join(c.id for c in cycles)}; releasing their results room.")
+        pipe = self._redis.pipeline()
+        for cycle in cycles:
+            if cycle.id in created:
+                self._results.queue_removal(pipe, cycle.id)
+            else:
+                await self._results.release(cycle.id, len(cycle.respondents), columns)
+        await pipe.execute()
+
+    async def find_existing(self, cycle_ids: List[str]) -> Set[str]:
+        """Returns which of the given cycle IDs are already taken, in one round-trip."""
+        models = await self._redis.get_models([f"cycle:{c}" for c in cycle_ids], FeedbackCycle)
+        return {cycle_id for cycle_id, model in zip(cycle_ids, models) if model}
 
     async def get_cycle_by_id(self, cycle_id: str) -> Optional[FeedbackCycle]:
         """Retrieves a feedback cycle by its ID."""
@@ -75,6 +227,81 @@ class CycleService:
             logger.warning(f"Cycle with id {cycle_id} not found in Redis.")
         return cycle
 
+    def queue_removal(self, pipe: Pipeline, cycle: FeedbackCycle) -> None:
+        """Adds commands deleting a cycle and its queued invitations to a pipeline."""
+        self._redis.invalidate(f"cycle:{cycle.id}")
+        pipe.delete(f"cycle:{cycle.id}")
+        pipe.srem(ACTIVE_CYCLES_KEY, cycle.id)
+        for resp_id in cycle.respondents:
+            pipe.srem(f"pending_notifications:{resp_id}", cycle.id)
+
+    async def close_cycle(self, cycle: FeedbackCycle) -> None:
+        """Marks a cycle as closed and stores it."""
+        cycle.status = "closed"
+        # Only the status changes; respondents may be submitting meanwhile.
+        await self._redis.update_model(
+            f"cycle:{cycle.id}", FeedbackCycle, lambda stored: setattr(stored, "status", "closed")
+        )
+        await self._redis.remove_from_set(ACTIVE_CYCLES_KEY, cycle.id)
+        await self._progress.mark_closed(cycle.id)
+
+    async def expire_cycle(self, cycle: FeedbackCycle) -> None:
+        """Closes a cycle whose deadline has passed, counting overdue respondents."""
+        overdue = await self._progress.mark_overdue(cycle.id)
+        await self.close_cycle(cycle)
+        logger.info(f"Cycle {cycle.id} expired with {overdue} overdue respondents.")
+
+    async def cancel_cycle(self, cycle_id: str) -> Optional[FeedbackCycle]:
+        """Closes a cycle without a report and revokes its survey tokens."""
+        cycle = await self.get_cycle_by_id(cycle_id)
+        if not cycle:
+            return None
+        await self.close_cycle(cycle)
+        await self._tokens.revoke_cycle(cycle.id)
+        logger.info(f"Cancelled feedback cycle {cycle.id}")
+        return cycle
+
+    @traced()
+    async def submit_answers(
+        self, cycle: FeedbackCycle, respondent_id: str, answers: Dict[str, Any]
+    ) -> bool:
+        """
+        Records a respondent's answers, keyed by question ID. They are
+        committed to the results store and reach the results sheet through
+        the mirror.
+
+        A cycle created on another host is registered in this host's store
+        first; the store then only mirrors its rows and leaves reports to the
+        worksheet, which has all of them.
+        :return: False if the respondent had already submitted.
+        """
+        questions = await self._questionnaire.get_questionnaire() or []
+        columns = {q.id: q.result_column or q.id for q in questions}
+        await asyncio.to_thread(
+            self._store.record_cycle, cycle.id, cycle.target_employee_id, cycle.results_sheet,
+            cycle.results_spreadsheet_id, results_headers(questions), complete=False,
+        )
+        try:
+            await asyncio.to_thread(
+                self._store.record_submission,
+                cycle.id,
+                respondent_id,
+                {columns.get(question_id, question_id): value for question_id, value in answers.items()},
+            )
+        except sqlite3.IntegrityError:
+            logger.warning(f"Respondent {respondent_id} already submitted to cycle {cycle.id}.")
+            return False
+
+        def complete(stored: FeedbackCycle) -> None:
+            if respondent_id in stored.respondents:
+                stored.respondents[respondent_id].status = "completed"
+
+        # Other respondents of the cycle may be submitting at the same time.
+        await self._redis.update_model(f"cycle:{cycle.id}", FeedbackCycle, complete)
+        await self._progress.mark_completed(cycle.id, respondent_id)
+        return True
+
+    @traced()
     async def send_invitation(
         self,
         bot: Bot,
@@ -83,57 +310,97 @@ class CycleService:
         target_employee: Employee
     ):
         """Generates and sends a survey invitation message with a 'Start Survey' button."""
-        from aiogram.types import InlineKeyboardButton, InlineKeyboardMarkup
-
-        button_callback_data = f"start_survey:{cycle.id}:{respondent.id}"
-        keyboard = InlineKeyboardMarkup(inline_keyboard=[
-            [InlineKeyboardButton(text="Начать опрос", callback_data=button_callback_data)]
-        ])
-
-        message_text = (
-            f"Привет! 👋\n\n"
-            f"Приглашаем тебя принять участие в опросе 360° для коллеги <b>{target_employee.full_name}</b>.\n"
-            f"Твой фидбэк очень важен. Пожалуйста, пройди опрос до {cycle.deadline.strftime('%d.%m.%Y')}."
-        )
+        message = self.invitation_message(cycle, respondent, target_employee)
         await bot.send_message(
+            chat_id=message.chat_id,
+            text=message.text,
+            reply_markup=message.reply_markup
+        )
+
+    def invitation_message(
+        self, cycle: FeedbackCycle, respondent: Employee, target_employee: Employee
+    ) -> OutgoingMessage:
+        """The survey invitation of a respondent, for sending through a sender."""
+        return OutgoingMessage(
             chat_id=respondent.telegram_id,
-            text=message_text,
-            reply_markup=keyboard
+            text=(
+                f"Привет! 👋\n\n"
+                f"Приглашаем тебя принять участие в опросе 360° для коллеги <b>{target_employee.full_name}</b>.\n"
+                f"Твой фидбэк очень важен. Пожалуйста, пройди опрос до {cycle.deadline.strftime('%d.%m.%Y')}."
+            ),
+            reply_markup=get_survey_invitation_keyboard(cycle.respondents[respondent.id].token),
+            employee_id=respondent.id,
+            cycle_id=cycle.id,
         )
 
+    @traced()
     async def notify_respondents(
         self,
         cycle: FeedbackCycle,
         employee_service: EmployeeService,
         bot: Bot,
-    ):
+        sender: RateLimitedSender,
+    ) -> FanOutResult:
+        """
+        Sends the invitations of a new cycle through the sender. Respondents
+        without a Telegram ID and invitations that fail wait as pending
+        notifications; those left unsent on shutdown go to the next process.
+        """
         logger.info(f"Starting notification process for cycle {cycle.id}.")
         target_employee = employee_service.find_by_id(cycle.target_employee_id)
         if not target_employee:
             logger.error(f"Cannot notify respondents for cycle {cycle.id}: Target employee not found.")
-            return
+            return FanOutResult()
+        await employee_service.refresh_telegram_ids()
 
+        messages: List[OutgoingMessage] = []
+        pending: Dict[str, List[str]] = {}
         for resp_id in cycle.respondents:
             respondent = employee_service.find_by_id(resp_id)
             if respondent and respondent.telegram_id:
-                logger.info(f"Found respondent {respondent.id} with telegram_id {respondent.telegram_id}. Attempting to send invitation.")
-                try:
-                    await self.send_invitation(bot, cycle, respondent, target_employee)
-                    logger.info(f"Successfully sent invitation to {respondent.id}.")
-                except TelegramAPIError as e:
-                    logger.error(f"Failed to send invitation to {respondent.id} ({respondent.telegram_id}): {e}. Queuing notification.")
-                    await self.add_pending_notification(respondent.id, cycle.id)
+                messages.append(self.invitation_message(cycle, respondent, target_employee))
             elif respondent:
+                MESSAGES_SENT.inc("invitation", "queued")
                 logger.info(f"Respondent {respondent.id} does not have a telegram_id. Queuing notification.")
-                await self.add_pending_notification(respondent.id, cycle.id)
+                pending[respondent.id] = [cycle.id]
             else:
                 logger.warning(f"Respondent with ID {resp_id} not found. Skipping notification.")
-        logger.info(f"Finished notification process for cycle {cycle.id}.")
+        if pending:
+            await self.add_pending_notifications(pending)
+
+        result = await sender.send_many(bot, messages)
+        queued = await self.queue_undelivered(result.failed)
+        logger.info(
+            f"Finished notification process for cycle {cycle.id}: {result.sent} sent, "
+            f"{queued + len(pending)} queued, {result.handed_over} handed over."
+        )
+        return result
 
     async def add_pending_notification(self, employee_id: str, cycle_id: str):
         """Adds a cycle ID to the set of pending notifications for an employee."""
         await self._redis.add_to_set(f"pending_notifications:{employee_id}", cycle_id)
 
+    async def add_pending_notifications(self, cycle_ids_by_employee: Dict[str, List[str]]) -> None:
+        """Queues notifications for several employees in one round-trip."""
+        pipe = self._redis.pipeline(transaction=False)
+        for employee_id, cycle_ids in cycle_ids_by_employee.items():
+            pipe.sadd(f"pending_notifications:{employee_id}", *cycle_ids)
+        await pipe.execute()
+
+    async def queue_undelivered(self, messages: List[OutgoingMessage]) -> int:
+        """
+        Queues the invitations among undelivered messages as pending
+        notifications, sent when the respondent next starts the bot.
+        :return: The number of invitations queued.
+        """
+        pending: Dict[str, List[str]] = defaultdict(list)
+        for message in messages:
+            if message.employee_id and message.cycle_id:
+                pending[message.employee_id].append(message.cycle_id)
+        if pending:
+            await self.add_pending_notifications(pending)
+        return sum(len(cycle_ids) for cycle_ids in pending.values())
+
     async def get_pending_notifications(self, employee_id: str) -> set[str]:
         """Retrieves the set of pending notification cycle IDs for an employee."""
         return await self._redis.get_set(f"pending_notifications:{employee_id}")
@@ -0,0 +1,105 @@
+import asyncio
+import hashlib
+import logging
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramAPIError, TelegramBadRequest, TelegramRetryAfter
+from aiogram.types import InlineKeyboardMarkup
+
+logger = logging.getLogger(__name__)
+
+MessageKey = Tuple[int, int]
+
+
+def markup_hash(markup: Optional[InlineKeyboardMarkup]) -> str:
+    payload = markup.model_dump_json(exclude_none=True) if markup else ""
+    return hashlib.blake2b(payload.encode("utf-8"), digest_size=8).hexdigest()
+
+
+class EditCoalescer:
+    """
+    Coalesces inline keyboard edits of callback-driven screens.
+
+    Handlers answer the callback right away and hand the new markup over.
+    Edits of one message are held for `delay` seconds after the first
+    change; only the latest markup is sent, and nothing is sent when it
+    equals what the message already shows. A burst of taps therefore costs
+    one edit instead of one per tap.
+    """
+
+    def __init__(self, delay: float = 0.4, max_tracked: int = 10000):
+        self._delay = delay
+        self._max_tracked = max_tracked
+        self._pending: Dict[MessageKey, InlineKeyboardMarkup] = {}
+        self._tasks: Dict[MessageKey, asyncio.Task] = {}
+        self._shown: OrderedDict[MessageKey, str] = OrderedDict()
+        self.requested = 0
+        self.sent = 0
+        self.skipped = 0
+
+    def edit_markup(
+        self, bot: Bot, chat_id: int, message_id: int, markup: InlineKeyboardMarkup
+    ) -> None:
+        """Schedules the message's keyboard to be replaced with `markup`."""
+        key = (chat_id, message_id)
+        self.requested += 1
+        self._pending[key] = markup
+        if key not in self._tasks:
+            self._tasks[key] = asyncio.create_task(self._flush_later(bot, key))
+
+    def discard(self, chat_id: int, message_id: int) -> None:
+        """
+        Drops a pending edit, e.g. before the message is replaced by the
+        next screen, so a late keyboard edit does not overwrite it.
+        """
+        key = (chat_id, message_id)
+        self._pending.pop(key, None)
+        self._shown.pop(key, None)
+        task = self._tasks.pop(key, None)
+        if task:
+            task.cancel()
+
+    async def drain(self) -> None:
+        """Waits for all scheduled edits to be sent."""
+        while self._tasks:
+            await asyncio.gather(*list(self._tasks.values()), return_exceptions=True)
+
+    def _remember(self, key: MessageKey, digest: str) -> None:
+        self._shown[key] = digest
+        self._shown.move_to_end(key)
+        while len(self._shown) > self._max_tracked:
+            self._shown.popitem(last=False)
+
+    async def _flush_later(self, bot: Bot, key: MessageKey) -> None:
+        try:
+            await asyncio.sleep(self._delay)
+            while key in self._pending:
+                markup = self._pending.pop(key)
+                digest = markup_hash(markup)
+                if self._shown.get(key) == digest:
+                    self.skipped += 1
+                    continue
+                try:
+                    await bot.edit_message_reply_markup(
+                        chat_id=key[0], message_id=key[1], reply_markup=markup
+                    )
+                    self.sent += 1
+                except TelegramRetryAfter as e:
+                    logger.warning(f"Edit flood control hit, retrying in {e.retry_after}s.")
+                    # Taps during the wait replace the markup we retry with.
+                    self._pending.setdefault(key, markup)
+                    await asyncio.sleep(e.retry_after)
+                    continue
+                except TelegramBadRequest as e:
+                    if "message is not modified" not in e.message:
+                        logger.error(f"Failed to edit message {key}: {e}")
+                        continue
+                except TelegramAPIError as e:
+                    logger.error(f"Failed to edit message {key}: {e}")
+                    continue
+                self._remember(key, digest)
+        finally:
+            if self._tasks.get(key) is asyncio.current_task():
+                del self._tasks[key]
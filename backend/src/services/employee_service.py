@@ -5,15 +5,22 @@ from pydantic import ValidationError
 
 from ..storage.models import Employee
 from ..storage.redis_storage import RedisStorageService
+from ..tracing import traced
 from .google_sheets import GoogleSheetsService
 
 logger = logging.getLogger(__name__)
 EMPLOYEES_SHEET_NAME = "Employees"
+TELEGRAM_ID_KEY = "employee_tg_id:{employee_id}"
+EMPLOYEE_BY_TELEGRAM_ID_KEY = "employee_by_tg_id:{telegram_id}"
 
 
 class EmployeeService:
     """
     Service for fetching and managing employee data from Google Sheets.
+
+    Telegram IDs are registered by whichever process handles the user's
+    /start, so Redis is the source of truth for them and the in-memory maps
+    are refreshed from it rather than trusted.
     """
 
     def __init__(
@@ -27,6 +34,7 @@ class EmployeeService:
         self._employee_map_by_id: Dict[str, Employee] = {}
         self._employee_map_by_telegram_id: Dict[int, Employee] = {}
 
+    @traced()
     async def load_employees(self) -> None:
         """Loads or reloads the list of employees from the source."""
         logger.info("Loading employees from Google Sheets...")
@@ -44,17 +52,21 @@ class EmployeeService:
             except ValidationError as e:
                 logger.warning(f"Skipping invalid employee record: {rec}. Error: {e}")
 
-        for emp in valid_employees:
-            stored_tg_id = await self._redis.get(f"employee_tg_id:{emp.id}")
-            if stored_tg_id:
-                emp.telegram_id = int(stored_tg_id)
-
         self._employees = valid_employees
         self._employee_map_by_id = {emp.id: emp for emp in self._employees}
+        await self.refresh_telegram_ids()
+        logger.info(f"Successfully loaded {len(self._employees)} employees.")
+
+    async def refresh_telegram_ids(self) -> None:
+        """Picks up Telegram IDs registered by other processes."""
+        stored_tg_ids = await self._redis.get_many(
+            [TELEGRAM_ID_KEY.format(employee_id=emp.id) for emp in self._employees]
+        )
+        for emp, stored_tg_id in zip(self._employees, stored_tg_ids):
+            emp.telegram_id = int(stored_tg_id) if stored_tg_id else None
         self._employee_map_by_telegram_id = {
             emp.telegram_id: emp for emp in self._employees if emp.telegram_id
         }
-        logger.info(f"Successfully loaded {len(self._employees)} employees.")
 
     def find_by_id(self, employee_id: str) -> Optional[Employee]:
         """Finds an employee by their ID from the loaded list."""
@@ -69,9 +81,25 @@ class EmployeeService:
         if employee and employee.telegram_id != telegram_id:
             employee.telegram_id = telegram_id
             self._employee_map_by_telegram_id[telegram_id] = employee
-            await self._redis.set_value(f"employee_tg_id:{username}", str(telegram_id))
+            await self._redis.set_values({
+                TELEGRAM_ID_KEY.format(employee_id=username): str(telegram_id),
+                EMPLOYEE_BY_TELEGRAM_ID_KEY.format(telegram_id=telegram_id): username,
+            })
             logger.info(f"Registered telegram_id {telegram_id} for user @{username}.")
 
-    def find_by_telegram_id(self, telegram_id: int) -> Optional[Employee]:
-        """Finds an employee by their Telegram ID from the loaded list."""
-        return self._employee_map_by_telegram_id.get(telegram_id)
+    async def find_by_telegram_id(self, telegram_id: int) -> Optional[Employee]:
+        """
+        Finds an employee by their Telegram ID, falling back to Redis for
+        IDs registered by another process since the last refresh.
+        """
+        employee = self._employee_map_by_telegram_id.get(telegram_id)
+        if employee:
+            return employee
+        employee_id = await self._redis.get(
+            EMPLOYEE_BY_TELEGRAM_ID_KEY.format(telegram_id=telegram_id)
+        )
+        employee = self.find_by_id(employee_id) if employee_id else None
+        if employee:
+            employee.telegram_id = telegram_id
+            self._employee_map_by_telegram_id[telegram_id] = employee
+        return employee
@@ -1,23 +1,32 @@
 import asyncio
 import logging
-from typing import Any, Dict, List
+from typing import Any, Dict, List, Optional, Set, Tuple
 
 import gspread
 from gspread.exceptions import APIError, WorksheetNotFound
+from gspread.utils import absolute_range_name
 from tenacity import retry, stop_after_attempt, wait_exponential
 
 from ..config import settings
+from ..metrics import SHEETS_ERRORS, SHEETS_LATENCY, SHEETS_RETRIES, instrument
+from ..tracing import traced
 
 logger = logging.getLogger(__name__)
 
+# Worksheets added per batchUpdate request when creating many at once.
+WORKSHEETS_PER_REQUEST = 100
+
 # Define a retry strategy for Google API calls to handle transient errors
 retry_strategy = retry(
     stop=stop_after_attempt(3),
     wait=wait_exponential(multiplier=1, min=2, max=10),
     retry=lambda retry_state: isinstance(retry_state.outcome.exception(), APIError),
-    before_sleep=lambda retry_state: logger.warning(
-        f"Retrying Google Sheets API call due to {retry_state.outcome.exception()} "
-        f"(attempt {retry_state.attempt_number})"
+    before_sleep=lambda retry_state: (
+        SHEETS_RETRIES.inc(),
+        logger.warning(
+            f"Retrying Google Sheets API call due to {retry_state.outcome.exception()} "
+            f"(attempt {retry_state.attempt_number})"
+        ),
     ),
 )
 
@@ -32,6 +41,24 @@ class GoogleSheetsService:
             filename=config.SERVICE_ACCOUNT_KEY_PATH
         )
         self._spreadsheet = self._client.open_by_key(config.SHEET_ID)
+        # Result shards live in further spreadsheets, opened on first use.
+        self._spreadsheets: Dict[str, gspread.Spreadsheet] = {
+            config.SHEET_ID: self._spreadsheet
+        }
+
+    @property
+    def main_spreadsheet_id(self) -> str:
+        return self._spreadsheet.id
+
+    def _open(self, spreadsheet_id: Optional[str]) -> gspread.Spreadsheet:
+        if not spreadsheet_id:
+            return self._spreadsheet
+        spreadsheet = self._spreadsheets.get(spreadsheet_id)
+        if spreadsheet is None:
+            spreadsheet = self._spreadsheets[spreadsheet_id] = self._client.open_by_key(
+                spreadsheet_id
+            )
+        return spreadsheet
 
     @retry_strategy
     def _get_all_records_sync(self, sheet_name: str) -> List[Dict[str, Any]]:
@@ -45,16 +72,70 @@ class GoogleSheetsService:
             logger.error(f"Google API error while fetching from '{sheet_name}': {e}")
             raise
 
+    @traced()
+    @instrument(SHEETS_LATENCY, SHEETS_ERRORS)
     async def get_all_records(self, sheet_name: str) -> List[Dict[str, Any]]:
         """Asynchronously fetches all records from a specified worksheet."""
         return await asyncio.to_thread(self._get_all_records_sync, sheet_name)
 
+    @retry_strategy
+    def _get_all_values_sync(
+        self, sheet_name: str, spreadsheet_id: Optional[str] = None
+    ) -> List[List[str]]:
+        try:
+            worksheet = self._open(spreadsheet_id).worksheet(sheet_name)
+            return worksheet.get_all_values()
+        except WorksheetNotFound:
+            logger.error(f"Worksheet '{sheet_name}' not found.")
+            return []
+
+    @traced()
+    @instrument(SHEETS_LATENCY, SHEETS_ERRORS)
+    async def get_all_values(
+        self, sheet_name: str, spreadsheet_id: Optional[str] = None
+    ) -> List[List[str]]:
+        """Asynchronously fetches all cell values of a worksheet, header row first."""
+        return await asyncio.to_thread(self._get_all_values_sync, sheet_name, spreadsheet_id)
+
+    @retry_strategy
+    def _get_row_count_sync(self, sheet_name: str, spreadsheet_id: Optional[str] = None) -> int:
+        return self._open(spreadsheet_id).worksheet(sheet_name).row_count
+
+    @traced()
+    @instrument(SHEETS_LATENCY, SHEETS_ERRORS)
+    async def get_row_count(self, sheet_name: str, spreadsheet_id: Optional[str] = None) -> int:
+        """Asynchronously reads the number of rows in a worksheet's grid."""
+        return await asyncio.to_thread(self._get_row_count_sync, sheet_name, spreadsheet_id)
+
+    @retry_strategy
+    def _get_rows_sync(
+        self, sheet_name: str, first_row: int, last_row: int, spreadsheet_id: Optional[str] = None
+    ) -> List[List[str]]:
+        response = self._open(spreadsheet_id).values_get(
+            absolute_range_name(sheet_name, f"{first_row}:{last_row}")
+        )
+        return response.get("values", [])
+
+    @traced()
+    @instrument(SHEETS_LATENCY, SHEETS_ERRORS)
+    async def get_rows(
+        self, sheet_name: str, first_row: int, last_row: int, spreadsheet_id: Optional[str] = None
+    ) -> List[List[str]]:
+        """
+        Asynchronously reads the values of a range of rows (1-based,
+        inclusive). Trailing empty cells and rows are omitted.
+        """
+        return await asyncio.to_thread(
+            self._get_rows_sync, sheet_name, first_row, last_row, spreadsheet_id
+        )
+
     @retry_strategy
     def _create_worksheet_sync(
-        self, title: str, headers: List[str]
+        self, title: str, headers: List[str], spreadsheet_id: Optional[str] = None
     ) -> gspread.Worksheet:
+        spreadsheet = self._open(spreadsheet_id)
         try:
-            worksheet = self._spreadsheet.add_worksheet(
+            worksheet = spreadsheet.add_worksheet(
                 title=title, rows=1, cols=len(headers)
             )
             worksheet.append_row(headers, value_input_option="USER_ENTERED")
@@ -62,19 +143,137 @@ class GoogleSheetsService:
         except APIError as e:
             if "already exists" in str(e):
                 logger.warning(f"Worksheet '{title}' already exists. Re-using it.")
-                return self._spreadsheet.worksheet(title)
+                return spreadsheet.worksheet(title)
             logger.error(f"Google API error while creating worksheet '{title}': {e}")
             raise
 
-    async def create_worksheet(self, title: str, headers: List[str]) -> None:
+    @traced()
+    @instrument(SHEETS_LATENCY, SHEETS_ERRORS)
+    async def create_worksheet(
+        self, title: str, headers: List[str], spreadsheet_id: Optional[str] = None
+    ) -> None:
         """Asynchronously creates a new worksheet with a header row."""
-        await asyncio.to_thread(self._create_worksheet_sync, title, headers)
+        await asyncio.to_thread(self._create_worksheet_sync, title, headers, spreadsheet_id)
+
+    @staticmethod
+    def _titles_without_header(spreadsheet: gspread.Spreadsheet, titles: List[str]) -> Set[str]:
+        """The worksheets among `titles` whose first row is empty."""
+        empty = set()
+        for start in range(0, len(titles), WORKSHEETS_PER_REQUEST):
+            chunk = titles[start:start + WORKSHEETS_PER_REQUEST]
+            ranges = spreadsheet.values_batch_get([absolute_range_name(title, "1:1") for title in chunk])
+            for title, value_range in zip(chunk, ranges.get("valueRanges", [])):
+                if not value_range.get("values"):
+                    empty.add(title)
+        return empty
 
     @retry_strategy
-    def _append_row_sync(self, worksheet_title: str, row_data: List[Any]) -> None:
-        worksheet = self._spreadsheet.worksheet(worksheet_title)
+    def _create_worksheets_sync(
+        self, worksheets: Dict[str, List[str]], spreadsheet_id: Optional[str] = None
+    ) -> int:
+        spreadsheet = self._open(spreadsheet_id)
+        # Titles that already exist are re-used. Those without a header row
+        # were added by an attempt that failed before writing it, so they get
+        # one too; this makes retries safe.
+        existing = {worksheet.title for worksheet in spreadsheet.worksheets()}
+        new = [(title, headers) for title, headers in worksheets.items() if title not in existing]
+        for start in range(0, len(new), WORKSHEETS_PER_REQUEST):
+            chunk = new[start:start + WORKSHEETS_PER_REQUEST]
+            spreadsheet.batch_update({
+                "requests": [
+                    {
+                        "addSheet": {
+                            "properties": {
+                                "title": title,
+                                "gridProperties": {"rowCount": 1, "columnCount": len(headers)},
+                            }
+                        }
+                    }
+                    for title, headers in chunk
+                ]
+            })
+
+        without_header = {title for title, _ in new} | self._titles_without_header(
+            spreadsheet, [title for title in worksheets if title in existing]
+        )
+        headers_to_write = [(title, headers) for title, headers in worksheets.items() if title in without_header]
+        for start in range(0, len(headers_to_write), WORKSHEETS_PER_REQUEST):
+            chunk = headers_to_write[start:start + WORKSHEETS_PER_REQUEST]
+            spreadsheet.values_batch_update({
+                "valueInputOption": "USER_ENTERED",
+                "data": [
+                    {"range": absolute_range_name(title, "A1"), "values": [headers]}
+                    for title, headers in chunk
+                ],
+            })
+        return len(new)
+
+    @traced()
+    @instrument(SHEETS_LATENCY, SHEETS_ERRORS)
+    async def create_worksheets(
+        self, worksheets: Dict[str, List[str]], spreadsheet_id: Optional[str] = None
+    ) -> int:
+        """
+        Asynchronously creates worksheets with header rows, two requests per
+        hundred worksheets, plus one to check the header row of every hundred
+        that already exist.
+        :param worksheets: Header row per worksheet title.
+        :return: The number of worksheets created.
+        """
+        return await asyncio.to_thread(self._create_worksheets_sync, worksheets, spreadsheet_id)
+
+    @retry_strategy
+    def _append_row_sync(
+        self, worksheet_title: str, row_data: List[Any], spreadsheet_id: Optional[str] = None
+    ) -> None:
+        worksheet = self._open(spreadsheet_id).worksheet(worksheet_title)
         worksheet.append_row(row_data, value_input_option="USER_ENTERED")
 
-    async def append_row(self, worksheet_title: str, row_data: List[Any]) -> None:
+    @traced()
+    @instrument(SHEETS_LATENCY, SHEETS_ERRORS)
+    async def append_row(
+        self, worksheet_title: str, row_data: List[Any], spreadsheet_id: Optional[str] = None
+    ) -> None:
         """Asynchronously appends a row of data to the specified worksheet."""
-        await asyncio.to_thread(self._append_row_sync, worksheet_title, row_data)
+        await asyncio.to_thread(self._append_row_sync, worksheet_title, row_data, spreadsheet_id)
+
+    @retry_strategy
+    def _append_rows_sync(
+        self, worksheet_title: str, rows: List[List[Any]], spreadsheet_id: Optional[str] = None
+    ) -> None:
+        worksheet = self._open(spreadsheet_id).worksheet(worksheet_title)
+        worksheet.append_rows(rows, value_input_option="USER_ENTERED")
+
+    @traced()
+    @instrument(SHEETS_LATENCY, SHEETS_ERRORS)
+    async def append_rows(
+        self, worksheet_title: str, rows: List[List[Any]], spreadsheet_id: Optional[str] = None
+    ) -> None:
+        """Asynchronously appends several rows to a worksheet in one request."""
+        await asyncio.to_thread(self._append_rows_sync, worksheet_title, rows, spreadsheet_id)
+
+    @retry_strategy
+    def _create_spreadsheet_sync(self, title: str, folder_id: Optional[str] = None) -> str:
+        spreadsheet = self._client.create(title, folder_id=folder_id or None)
+        self._spreadsheets[spreadsheet.id] = spreadsheet
+        return spreadsheet.id
+
+    @traced()
+    @instrument(SHEETS_LATENCY, SHEETS_ERRORS)
+    async def create_spreadsheet(self, title: str, folder_id: Optional[str] = None) -> str:
+        """Asynchronously creates a spreadsheet and returns its ID."""
+        return await asyncio.to_thread(self._create_spreadsheet_sync, title, folder_id)
+
+    @retry_strategy
+    def _get_usage_sync(self, spreadsheet_id: Optional[str] = None) -> Tuple[int, int]:
+        metadata = self._open(spreadsheet_id).fetch_sheet_metadata(
+            params={"fields": "sheets.properties.gridProperties"}
+        )
+        grids = [sheet["properties"]["gridProperties"] for sheet in metadata["sheets"]]
+        return len(grids), sum(g["rowCount"] * g["columnCount"] for g in grids)
+
+    @traced()
+    @instrument(SHEETS_LATENCY, SHEETS_ERRORS)
+    async def get_usage(self, spreadsheet_id: Optional[str] = None) -> Tuple[int, int]:
+        """Asynchronously counts the worksheets and allocated cells of a spreadsheet."""
+        return await asyncio.to_thread(self._get_usage_sync, spreadsheet_id)
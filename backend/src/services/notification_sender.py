@@ -0,0 +1,222 @@
+import asyncio
+import json
+import logging
+import time
+import uuid
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, List, Optional, Sequence
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramAPIError, TelegramRetryAfter
+from aiogram.types import InlineKeyboardMarkup
+
+from ..metrics import MESSAGES_SENT
+from ..storage.redis_storage import RedisStorageService
+
+logger = logging.getLogger(__name__)
+
+# List of messages a stopping process handed over to the next one.
+OUTBOX_KEY = "outbox:messages"
+# A batch of the outbox being sent by a process; removed once it is sent.
+OUTBOX_CLAIM_KEY = "outbox:claim:{claim}"
+# Sorted set of the claims in progress, scored by when they were taken.
+OUTBOX_CLAIMS_KEY = "outbox:claims"
+# Claims older than this belong to a process that died while sending them;
+# their messages are put back into the outbox.
+OUTBOX_CLAIM_TIMEOUT_SECONDS = 600
+
+UndeliveredCallback = Callable[[List["OutgoingMessage"]], Awaitable[None]]
+
+
+@dataclass
+class OutgoingMessage:
+    chat_id: int
+    text: str
+    reply_markup: Optional[InlineKeyboardMarkup] = None
+    # The invited employee and the cycle, for invitations that are queued
+    # as pending notifications when they cannot be delivered.
+    employee_id: Optional[str] = None
+    cycle_id: Optional[str] = None
+
+    def to_json(self) -> str:
+        markup = self.reply_markup.model_dump(mode="json", exclude_none=True) if self.reply_markup else None
+        return json.dumps(
+            {
+                "chat_id": self.chat_id,
+                "text": self.text,
+                "reply_markup": markup,
+                "employee_id": self.employee_id,
+                "cycle_id": self.cycle_id,
+            },
+            ensure_ascii=False,
+        )
+
+    @classmethod
+    def from_json(cls, data: str) -> "OutgoingMessage":
+        fields = json.loads(data)
+        markup = fields["reply_markup"]
+        return cls(
+            fields["chat_id"],
+            fields["text"],
+            InlineKeyboardMarkup.model_validate(markup) if markup else None,
+            fields.get("employee_id"),
+            fields.get("cycle_id"),
+        )
+
+
+@dataclass
+class FanOutResult:
+    sent: int = 0
+    # Messages Telegram refused or that failed to send.
+    failed: List[OutgoingMessage] = field(default_factory=list)
+    # Messages left for the next process because this one is stopping.
+    handed_over: int = 0
+
+
+class RateLimiter:
+    """
+    A token bucket limiting how many operations may start per second.
+    """
+
+    def __init__(self, rate: float, burst: Optional[int] = None):
+        self._rate = rate
+        self._capacity = burst or max(1, int(rate))
+        self._tokens = float(self._capacity)
+        self._updated_at = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self) -> None:
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(
+                    self._capacity, self._tokens + (now - self._updated_at) * self._rate
+                )
+                self._updated_at = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self._rate)
+
+
+class RateLimitedSender:
+    """
+    Sends batches of messages through the Bot API without exceeding
+    Telegram's global broadcast limit (about 30 messages per second).
+
+    Once stopped, the sender finishes the batches in progress and hands the
+    rest of every fan-out over to Redis instead of sending it; `resume`
+    sends those messages from the next process.
+    """
+
+    def __init__(
+        self,
+        rate: float = 25,
+        batch_size: int = 25,
+        redis_service: Optional[RedisStorageService] = None,
+    ):
+        self._limiter = RateLimiter(rate)
+        self._batch_size = batch_size
+        self._redis = redis_service
+        self._stopping = False
+        self.handed_over = 0
+        self.resumed = 0
+
+    def stop(self) -> None:
+        """Makes fan-outs persist their unsent messages rather than send them."""
+        self._stopping = True
+
+    async def _send_one(self, bot: Bot, message: OutgoingMessage) -> bool:
+        for attempt in range(2):
+            await self._limiter.acquire()
+            try:
+                await bot.send_message(
+                    chat_id=message.chat_id,
+                    text=message.text,
+                    reply_markup=message.reply_markup,
+                )
+                MESSAGES_SENT.inc("broadcast", "ok")
+                return True
+            except TelegramRetryAfter as e:
+                MESSAGES_SENT.inc("broadcast", "retry_after")
+                logger.warning(f"Flood control hit, retrying in {e.retry_after}s.")
+                await asyncio.sleep(e.retry_after)
+            except TelegramAPIError as e:
+                logger.error(f"Failed to send message to {message.chat_id}: {e}")
+                break
+        MESSAGES_SENT.inc("broadcast", "failed")
+        return False
+
+    async def send_many(
+        self,
+        bot: Bot,
+        messages: Sequence[OutgoingMessage],
+        on_progress: Optional[Callable[[int, int], Awaitable[None]]] = None,
+    ) -> FanOutResult:
+        """
+        Sends messages in concurrent batches.
+        :param on_progress: Called after every batch with the number of
+            messages handled so far and the total.
+        :return: How many were sent, which failed and how many were handed over.
+        """
+        result = FanOutResult()
+        for start in range(0, len(messages), self._batch_size):
+            if self._stopping and self._redis:
+                rest = messages[start:]
+                await self._redis.append_to_list(OUTBOX_KEY, [m.to_json() for m in rest])
+                self.handed_over += len(rest)
+                result.handed_over = len(rest)
+                logger.info(f"Stopping: handed {len(rest)}/{len(messages)} messages over to the next start.")
+                return result
+            batch = messages[start:start + self._batch_size]
+            results = await asyncio.gather(*(self._send_one(bot, m) for m in batch))
+            result.failed.extend(m for m, ok in zip(batch, results) if not ok)
+            result.sent += sum(results)
+            if on_progress:
+                await on_progress(start + len(batch), len(messages))
+        logger.info(f"Sent {result.sent}/{len(messages)} messages.")
+        return result
+
+    async def _reclaim(self) -> None:
+        """Puts the batches of processes that died while sending back into the outbox."""
+        stale = await self._redis.pop_due_from_sorted_set(
+            OUTBOX_CLAIMS_KEY, time.time() - OUTBOX_CLAIM_TIMEOUT_SECONDS, limit=100
+        )
+        for claim in stale:
+            moved = await self._redis.move_list_items(OUTBOX_CLAIM_KEY.format(claim=claim), OUTBOX_KEY)
+            if moved:
+                logger.warning(f"Put {len(moved)} messages of abandoned outbox batch {claim} back.")
+
+    async def resume(self, bot: Bot, on_undelivered: Optional[UndeliveredCallback] = None) -> int:
+        """
+        Sends the messages handed over by a stopped process. They are taken
+        in batches: each batch is moved to a list of its own first and only
+        deleted once sent, so a crash puts it back into the outbox rather
+        than losing it (its messages may then be sent twice).
+        :param on_undelivered: Receives the messages that failed to send.
+        :return: The number of messages taken over.
+        """
+        if not self._redis:
+            return 0
+        await self._reclaim()
+        taken = 0
+        while not self._stopping:
+            claim = uuid.uuid4().hex
+            claim_key = OUTBOX_CLAIM_KEY.format(claim=claim)
+            await self._redis.add_to_sorted_set(OUTBOX_CLAIMS_KEY, {claim: time.time()})
+            items = await self._redis.move_list_items(OUTBOX_KEY, claim_key, self._batch_size)
+            if items:
+                if not taken:
+                    logger.info("Resuming messages handed over on shutdown.")
+                messages = [OutgoingMessage.from_json(m) for m in items]
+                self.resumed += len(messages)
+                taken += len(messages)
+                # Stopping meanwhile hands the batch back to the outbox.
+                result = await self.send_many(bot, messages)
+                if result.failed and on_undelivered:
+                    await on_undelivered(result.failed)
+                await self._redis.delete_key(claim_key)
+            await self._redis.remove_from_sorted_set(OUTBOX_CLAIMS_KEY, claim)
+            if not items:
+                break
+        return taken
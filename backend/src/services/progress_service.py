@@ -0,0 +1,288 @@
+import logging
+from dataclasses import dataclass, field
+from datetime import date
+from typing import Dict, List, Optional
+
+from aiogram import Bot
+from redis.asyncio.client import Pipeline
+
+from ..storage.models import FeedbackCycle
+from ..storage.redis_storage import RedisStorageService
+from .employee_service import EmployeeService
+from .notification_sender import OutgoingMessage, RateLimitedSender
+
+logger = logging.getLogger(__name__)
+
+# A single hash holds every counter, so a snapshot is one HGETALL.
+# Fields are "<cycle_id>:<name>" for cycles and "*:<name>" for global totals.
+PROGRESS_COUNTERS_KEY = "progress:counters"
+PROGRESS_STATE_KEY = "progress:state:{cycle_id}"
+GLOBAL_SCOPE = "*"
+COUNTER_NAMES = ("invited", "started", "completed", "overdue")
+
+# Moves a respondent to a new state if the current one is allowed and bumps
+# the cycle and global counters of the new state.
+_TRANSITION_SCRIPT = """
+local current = redis.call('HGET', KEYS[2], ARGV[2]) or 'none'
+for allowed in string.gmatch(ARGV[3], '[^,]+') do
+    if allowed == current then
+        redis.call('HSET', KEYS[2], ARGV[2], ARGV[4])
+        redis.call('HINCRBY', KEYS[1], ARGV[1] .. ':' .. ARGV[4], 1)
+        redis.call('HINCRBY', KEYS[1], '*:' .. ARGV[4], 1)
+        return 1
+    end
+end
+return 0
+"""
+
+# Counts respondents that did not complete by the deadline, once per cycle.
+_OVERDUE_SCRIPT = """
+if redis.call('HGET', KEYS[1], ARGV[1] .. ':active') ~= '1' then
+    return 0
+end
+local states = redis.call('HVALS', KEYS[2])
+local overdue = 0
+for _, state in ipairs(states) do
+    if state ~= 'completed' then
+        overdue = overdue + 1
+    end
+end
+redis.call('HINCRBY', KEYS[1], ARGV[1] .. ':overdue', overdue)
+redis.call('HINCRBY', KEYS[1], '*:overdue', overdue)
+redis.call('HSET', KEYS[1], ARGV[1] .. ':active', '0')
+return overdue
+"""
+
+# Drops a cycle's counters and respondent states, taking its counts off the
+# global totals.
+_REMOVE_SCRIPT = """
+local prefix = ARGV[1] .. ':'
+for i = 2, #ARGV do
+    local name = ARGV[i]
+    local value = tonumber(redis.call('HGET', KEYS[1], prefix .. name) or '0')
+    if value ~= 0 then
+        redis.call('HINCRBY', KEYS[1], '*:' .. name, -value)
+    end
+    redis.call('HDEL', KEYS[1], prefix .. name)
+end
+redis.call('HDEL', KEYS[1], prefix .. 'active', prefix .. 'target', prefix .. 'deadline')
+redis.call('DEL', KEYS[2])
+return 1
+"""
+
+# Registers a cycle created before progress was tracked, with the given
+# respondent states, unless it is registered already.
+_BACKFILL_SCRIPT = """
+local prefix = ARGV[1] .. ':'
+if redis.call('HEXISTS', KEYS[1], prefix .. 'active') == 1 then
+    return 0
+end
+local invited, completed = 0, 0
+for i = 4, #ARGV, 2 do
+    redis.call('HSET', KEYS[2], ARGV[i], ARGV[i + 1])
+    invited = invited + 1
+    if ARGV[i + 1] == 'completed' then
+        completed = completed + 1
+    end
+end
+redis.call('HSET', KEYS[1], prefix .. 'active', '1', prefix .. 'target', ARGV[2],
+    prefix .. 'deadline', ARGV[3], prefix .. 'invited', invited, prefix .. 'completed', completed)
+redis.call('HINCRBY', KEYS[1], '*:invited', invited)
+redis.call('HINCRBY', KEYS[1], '*:completed', completed)
+return 1
+"""
+
+
+@dataclass
+class CycleProgress:
+    invited: int = 0
+    started: int = 0
+    completed: int = 0
+    overdue: int = 0
+    active: bool = False
+    target_employee_id: Optional[str] = None
+    deadline: Optional[date] = None
+
+    @property
+    def completion_rate(self) -> float:
+        return self.completed / self.invited if self.invited else 0.0
+
+
+@dataclass
+class ProgressSnapshot:
+    total: CycleProgress = field(default_factory=CycleProgress)
+    cycles: Dict[str, CycleProgress] = field(default_factory=dict)
+
+    @property
+    def active_cycles(self) -> Dict[str, CycleProgress]:
+        return {cycle_id: p for cycle_id, p in self.cycles.items() if p.active}
+
+
+class ProgressService:
+    """
+    Maintains per-cycle and global respondent counters, updated atomically
+    on every state transition, so summaries never have to load cycles.
+    """
+
+    def __init__(self, redis_service: RedisStorageService):
+        self._redis = redis_service
+        self._transition = redis_service.register_script(_TRANSITION_SCRIPT)
+        self._overdue = redis_service.register_script(_OVERDUE_SCRIPT)
+
+    async def register_cycle(self, cycle: FeedbackCycle) -> None:
+        """Records a new cycle with all of its respondents as invited."""
+        pipe = self._redis.pipeline()
+        self.queue_registration(pipe, cycle)
+        await pipe.execute()
+
+    def queue_registration(self, pipe: Pipeline, cycle: FeedbackCycle) -> None:
+        """Adds the commands of `register_cycle` to a caller's pipeline."""
+        invited = len(cycle.respondents)
+        pipe.hset(
+            PROGRESS_COUNTERS_KEY,
+            mapping={
+                f"{cycle.id}:active": "1",
+                f"{cycle.id}:target": cycle.target_employee_id,
+                f"{cycle.id}:deadline": cycle.deadline.isoformat(),
+                f"{cycle.id}:invited": invited,
+            },
+        )
+        pipe.hincrby(PROGRESS_COUNTERS_KEY, f"{GLOBAL_SCOPE}:invited", invited)
+        if invited:
+            pipe.hset(
+                PROGRESS_STATE_KEY.format(cycle_id=cycle.id),
+                mapping={resp_id: "invited" for resp_id in cycle.respondents},
+            )
+
+    def queue_backfill(self, pipe: Pipeline, cycle: FeedbackCycle) -> None:
+        """
+        Adds commands registering a cycle created before progress was tracked
+        to a pipeline; respondents who submitted count as completed.
+        """
+        states = [
+            value
+            for resp_id, info in cycle.respondents.items()
+            for value in (resp_id, "completed" if info.status == "completed" else "invited")
+        ]
+        # Scripts are sent whole: a pipeline queues commands synchronously.
+        pipe.eval(
+            _BACKFILL_SCRIPT, 2, PROGRESS_COUNTERS_KEY, PROGRESS_STATE_KEY.format(cycle_id=cycle.id),
+            cycle.id, cycle.target_employee_id, cycle.deadline.isoformat(), *states,
+        )
+
+    def queue_removal(self, pipe: Pipeline, cycle_id: str) -> None:
+        """
+        Adds commands dropping a cycle's counters and respondent states to a
+        pipeline; its counts are taken off the global totals.
+        """
+        pipe.eval(
+            _REMOVE_SCRIPT, 2, PROGRESS_COUNTERS_KEY, PROGRESS_STATE_KEY.format(cycle_id=cycle_id),
+            cycle_id, *COUNTER_NAMES,
+        )
+
+    def queue_restore(self, pipe: Pipeline, cycle: FeedbackCycle, counters: Dict[str, int]) -> None:
+        """
+        Adds commands bringing back the counters of a closed cycle, and its
+        counts to the global totals, to a pipeline.
+        """
+        pipe.hset(
+            PROGRESS_COUNTERS_KEY,
+            mapping={
+                f"{cycle.id}:active": "0",
+                f"{cycle.id}:target": cycle.target_employee_id,
+                f"{cycle.id}:deadline": cycle.deadline.isoformat(),
+                **{f"{cycle.id}:{name}": value for name, value in counters.items()},
+            },
+        )
+        for name, value in counters.items():
+            if name in COUNTER_NAMES and value:
+                pipe.hincrby(PROGRESS_COUNTERS_KEY, f"{GLOBAL_SCOPE}:{name}", value)
+
+    async def _move(self, cycle_id: str, respondent_id: str, allowed: str, state: str) -> bool:
+        moved = await self._transition(
+            keys=[PROGRESS_COUNTERS_KEY, PROGRESS_STATE_KEY.format(cycle_id=cycle_id)],
+            args=[cycle_id, respondent_id, allowed, state],
+        )
+        return bool(moved)
+
+    async def mark_started(self, cycle_id: str, respondent_id: str) -> bool:
+        """Records that a respondent opened the survey."""
+        return await self._move(cycle_id, respondent_id, "invited", "started")
+
+    async def mark_completed(self, cycle_id: str, respondent_id: str) -> bool:
+        """Records that a respondent submitted the survey."""
+        return await self._move(cycle_id, respondent_id, "invited,started", "completed")
+
+    async def mark_overdue(self, cycle_id: str) -> int:
+        """
+        Counts the respondents who missed the deadline and deactivates the cycle.
+        :return: The number of overdue respondents.
+        """
+        return await self._overdue(
+            keys=[PROGRESS_COUNTERS_KEY, PROGRESS_STATE_KEY.format(cycle_id=cycle_id)],
+            args=[cycle_id],
+        )
+
+    async def mark_closed(self, cycle_id: str) -> None:
+        """Excludes a cycle from the active summaries."""
+        await self._redis.set_hash_fields(PROGRESS_COUNTERS_KEY, {f"{cycle_id}:active": "0"})
+
+    async def get_snapshot(self) -> ProgressSnapshot:
+        """Reads every counter in one round-trip."""
+        snapshot = ProgressSnapshot()
+        for name, value in (await self._redis.get_hash(PROGRESS_COUNTERS_KEY)).items():
+            scope, _, attr = name.rpartition(":")
+            progress = (
+                snapshot.total
+                if scope == GLOBAL_SCOPE
+                else snapshot.cycles.setdefault(scope, CycleProgress())
+            )
+            if attr in COUNTER_NAMES:
+                setattr(progress, attr, int(value))
+            elif attr == "active":
+                progress.active = value == "1"
+            elif attr == "target":
+                progress.target_employee_id = value
+            elif attr == "deadline":
+                progress.deadline = date.fromisoformat(value)
+        return snapshot
+
+    async def send_daily_summary(
+        self,
+        bot: Bot,
+        sender: RateLimitedSender,
+        employee_service: EmployeeService,
+        admin_ids: List[int],
+        today: date,
+    ) -> None:
+        """Sends the HR summary of all active cycles to every admin."""
+        text = format_progress_summary(await self.get_snapshot(), employee_service, today)
+        await sender.send_many(bot, [OutgoingMessage(chat_id=a, text=text) for a in admin_ids])
+
+
+def format_progress_summary(
+    snapshot: ProgressSnapshot, employee_service: EmployeeService, today: date
+) -> str:
+    """Renders the HR summary for all active cycles."""
+    active = snapshot.active_cycles
+    if not active:
+        return "Активных циклов нет."
+
+    lines = []
+    for cycle_id, progress in sorted(active.items(), key=lambda item: item[1].deadline or today):
+        target = employee_service.find_by_id(progress.target_employee_id or "")
+        target_name = target.full_name if target else progress.target_employee_id
+        days_left = (progress.deadline - today).days if progress.deadline else 0
+        lines.append(
+            f"<b>Цикл:</b> {target_name} (<code>{cycle_id}</code>)\n"
+            f"Готово {progress.completed}/{progress.invited} "
+            f"({progress.completion_rate:.0%}), начали {progress.started}, "
+            f"дедлайн через {days_left} дн"
+        )
+
+    total = snapshot.total
+    lines.append(
+        f"<b>Всего:</b> приглашено {total.invited}, начали {total.started}, "
+        f"завершили {total.completed}, просрочено {total.overdue}"
+    )
+    return "\n\n".join(lines)
@@ -5,12 +5,17 @@ from pydantic import ValidationError
 
 from ..storage.models import Question, Questionnaire
 from ..storage.redis_storage import RedisStorageService
+from ..tracing import traced
 from .google_sheets import GoogleSheetsService
 
 logger = logging.getLogger(__name__)
 
 QUESTIONS_SHEET_NAME = "Questions"
-QUESTIONS_CACHE_KEY = "questionnaire"
+QUESTIONS_CACHE_KEY = "questionnaire:v{version}"
+# Incremented by scripts/populate_questions_sheet.py whenever it changes the
+# sheet. The cache key carries the version, so the change is seen at once and
+# the copy of the previous version simply expires.
+QUESTIONNAIRE_VERSION_KEY = "questionnaire:version"
 QUESTIONS_CACHE_TTL_SECONDS = 3600  # 1 hour
 
 
@@ -23,14 +28,15 @@ class QuestionnaireService:
         self._redis = redis_service
         self._g_sheets = google_sheets_service
 
+    @traced()
     async def get_questionnaire(self) -> Optional[List[Question]]:
         """
         Retrieves the questionnaire, from cache if available,
         otherwise from Google Sheets.
         """
-        cached_questionnaire = await self._redis.get_model(
-            QUESTIONS_CACHE_KEY, Questionnaire
-        )
+        version = await self._redis.get(QUESTIONNAIRE_VERSION_KEY) or "0"
+        cache_key = QUESTIONS_CACHE_KEY.format(version=version)
+        cached_questionnaire = await self._redis.get_model(cache_key, Questionnaire)
         if cached_questionnaire:
             logger.info("Questionnaire found in cache.")
             return cached_questionnaire.questions
@@ -46,7 +52,7 @@ class QuestionnaireService:
             questions = [Question.model_validate(rec) for rec in question_records]
             questionnaire = Questionnaire(questions=questions)
             await self._redis.set_model(
-                QUESTIONS_CACHE_KEY, questionnaire, ttl=QUESTIONS_CACHE_TTL_SECONDS
+                cache_key, questionnaire, ttl=QUESTIONS_CACHE_TTL_SECONDS
             )
             logger.info(f"Successfully fetched and cached {len(questions)} questions.")
             return questions
@@ -0,0 +1,192 @@
+import logging
+from collections import defaultdict
+from datetime import date, datetime, time, timedelta, tzinfo
+from typing import Dict, List, Optional
+
+from aiogram import Bot
+from redis.asyncio.client import Pipeline
+
+from ..bot.keyboards.survey_keyboards import get_survey_invitation_keyboard
+from ..storage.models import FeedbackCycle
+from ..storage.redis_storage import RedisStorageService
+from .cycle_service import CycleService
+from .employee_service import EmployeeService
+from .notification_sender import OutgoingMessage, RateLimitedSender
+
+logger = logging.getLogger(__name__)
+
+# Sorted set of due time (unix seconds) -> "remind:<cycle_id>:<respondent_id>"
+# or "deadline:<cycle_id>". A tick only touches the entries that are due.
+REMINDERS_KEY = "reminders:due"
+# How long a tick holds the entries it took; entries it failed to process
+# are due again after this.
+CLAIM_LEASE_SECONDS = 300
+
+
+class ReminderService:
+    """
+    Schedules respondent reminders and cycle deadlines in a Redis sorted set
+    and processes the due entries in batches.
+    """
+
+    def __init__(
+        self,
+        redis_service: RedisStorageService,
+        cycle_service: CycleService,
+        employee_service: EmployeeService,
+        sender: RateLimitedSender,
+        tz: tzinfo,
+        interval_days: int = 3,
+        final_ping_days: int = 2,
+        reminder_hour: int = 10,
+        batch_size: int = 100,
+    ):
+        self._redis = redis_service
+        self._cycles = cycle_service
+        self._employees = employee_service
+        self._sender = sender
+        self._tz = tz
+        self._interval = timedelta(days=interval_days)
+        self._final_ping = timedelta(days=final_ping_days)
+        self._reminder_hour = reminder_hour
+        self._batch_size = batch_size
+
+    def _at_reminder_hour(self, day: date) -> datetime:
+        return datetime.combine(day, time(hour=self._reminder_hour), tzinfo=self._tz)
+
+    def next_reminder_at(self, after: datetime, deadline: date) -> Optional[datetime]:
+        """
+        Returns when the next reminder is due: every `interval_days`, with a
+        final ping `final_ping_days` before the deadline and nothing after it.
+        """
+        final_ping = self._at_reminder_hour(deadline - self._final_ping)
+        if after >= final_ping:
+            return None
+        return min(self._at_reminder_hour((after + self._interval).date()), final_ping)
+
+    def deadline_at(self, deadline: date) -> datetime:
+        """Returns the moment a cycle is overdue: the end of the deadline day."""
+        return datetime.combine(deadline + timedelta(days=1), time.min, tzinfo=self._tz)
+
+    async def schedule_cycle(self, cycle: FeedbackCycle) -> None:
+        """Schedules the first reminder of every respondent and the cycle deadline."""
+        await self.schedule_cycles([cycle])
+
+    async def schedule_cycles(self, cycles: List[FeedbackCycle]) -> None:
+        """Schedules the entries of several cycles with a single ZADD."""
+        now = datetime.now(self._tz)
+        entries = {}
+        for cycle in cycles:
+            entries[f"deadline:{cycle.id}"] = self.deadline_at(cycle.deadline).timestamp()
+            first_reminder = self.next_reminder_at(now, cycle.deadline)
+            if first_reminder:
+                for resp_id in cycle.respondents:
+                    entries[f"remind:{cycle.id}:{resp_id}"] = first_reminder.timestamp()
+        await self._redis.add_to_sorted_set(REMINDERS_KEY, entries)
+        logger.info(f"Scheduled {len(entries)} reminder entries for {len(cycles)} cycles.")
+
+    @staticmethod
+    def queue_unschedule(pipe: Pipeline, cycle: FeedbackCycle) -> None:
+        """Adds commands removing every entry of a cycle to a pipeline."""
+        pipe.zrem(
+            REMINDERS_KEY,
+            f"deadline:{cycle.id}",
+            *(f"remind:{cycle.id}:{resp_id}" for resp_id in cycle.respondents),
+        )
+
+    async def tick(self, bot: Bot) -> int:
+        """
+        Processes all entries that are due. Each batch is leased for
+        `CLAIM_LEASE_SECONDS` and removed only once processed, so a batch
+        that fails (or whose replica dies) is processed again later.
+        :return: The number of processed entries.
+        """
+        now = datetime.now(self._tz)
+        lease_until = now.timestamp() + CLAIM_LEASE_SECONDS
+        processed = 0
+        while True:
+            members = await self._redis.claim_due_from_sorted_set(
+                REMINDERS_KEY, now.timestamp(), self._batch_size, lease_until
+            )
+            if members:
+                await self._process(bot, members, now)
+                # Rescheduled reminders have a new score and are kept.
+                await self._redis.release_claimed(REMINDERS_KEY, members, lease_until)
+                processed += len(members)
+            if len(members) < self._batch_size:
+                break
+        if processed:
+            logger.info(f"Processed {processed} due reminder entries.")
+        return processed
+
+    async def _process(self, bot: Bot, members: List[str], now: datetime) -> None:
+        reminders: Dict[str, List[str]] = defaultdict(list)
+        deadlines = set()
+        for member in members:
+            kind, _, rest = member.partition(":")
+            if kind == "remind":
+                cycle_id, _, resp_id = rest.partition(":")
+                reminders[cycle_id].append(resp_id)
+            elif kind == "deadline":
+                deadlines.add(rest)
+            else:
+                logger.warning(f"Skipping unknown reminder entry: {member}")
+
+        cycle_ids = list(reminders.keys() | deadlines)
+        cycles = await self._redis.get_models(
+            [f"cycle:{cycle_id}" for cycle_id in cycle_ids], FeedbackCycle
+        )
+        cycles_by_id = {c.id: c for c in cycles if c and c.status == "active"}
+
+        if reminders:
+            if not self._employees.get_all_employees():
+                await self._employees.load_employees()
+            else:
+                await self._employees.refresh_telegram_ids()
+
+        messages = []
+        rescheduled = {}
+        for cycle_id, resp_ids in reminders.items():
+            cycle = cycles_by_id.get(cycle_id)
+            if not cycle:
+                continue
+            target = self._employees.find_by_id(cycle.target_employee_id)
+            target_name = target.full_name if target else cycle.target_employee_id
+            next_at = self.next_reminder_at(now, cycle.deadline)
+            for resp_id in resp_ids:
+                respondent_info = cycle.respondents.get(resp_id)
+                if not respondent_info or respondent_info.status != "pending":
+                    continue
+                if next_at:
+                    rescheduled[f"remind:{cycle_id}:{resp_id}"] = next_at.timestamp()
+                respondent = self._employees.find_by_id(resp_id)
+                if not respondent or not respondent.telegram_id:
+                    continue
+                messages.append(
+                    OutgoingMessage(
+                        chat_id=respondent.telegram_id,
+                        text=self._reminder_text(cycle, target_name, now),
+                        reply_markup=get_survey_invitation_keyboard(respondent_info.token),
+                    )
+                )
+
+        for cycle_id in deadlines:
+            cycle = cycles_by_id.get(cycle_id)
+            if cycle:
+                await self._cycles.expire_cycle(cycle)
+
+        await self._redis.add_to_sorted_set(REMINDERS_KEY, rescheduled)
+        if messages:
+            await self._sender.send_many(bot, messages)
+
+    def _reminder_text(self, cycle: FeedbackCycle, target_name: str, now: datetime) -> str:
+        deadline = cycle.deadline.strftime("%d.%m.%Y")
+        if cycle.deadline - now.date() <= self._final_ping:
+            return (
+                f"⏰ Осталось совсем немного времени! Пожалуйста, пройди опрос 360° "
+                f"для коллеги <b>{target_name}</b> до {deadline}."
+            )
+        return (
+            f"Напоминание: ждём твой фидбэк для коллеги <b>{target_name}</b>. "
+            f"Пожалуйста, пройди опрос до {deadline}."
+        )
@@ -0,0 +1,260 @@
+import asyncio
+import logging
+from array import array
+from collections import Counter, OrderedDict
+from dataclasses import dataclass, field
+from itertools import compress
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from redis.asyncio.client import Pipeline
+
+from ..metrics import CACHE_REQUESTS
+from ..storage.models import FeedbackCycle, Question
+from ..storage.redis_storage import RedisStorageService
+from ..storage.results_store import ResultsStore
+from .google_sheets import GoogleSheetsService
+from .question_service import QuestionnaireService
+
+logger = logging.getLogger(__name__)
+
+RESULTS_VERSION_KEY = "results_version:{cycle_id}"
+RESPONDENT_COLUMN = "respondent_id"
+# Scale answers are 0-3 (see the questionnaire spec); anything else is missing.
+SCALE_VALUES = range(0, 4)
+MISSING = -1
+_SCALE_CODES = {str(v): v for v in SCALE_VALUES}
+PERCENTILES = (25, 50, 75, 90)
+
+
+@dataclass
+class ResultColumns:
+    """
+    A column-oriented view of a cycle results sheet.
+    Scale answers are stored as signed byte arrays with MISSING for blanks;
+    categorical answers keep the list of selected options per row.
+    """
+
+    respondent_ids: List[str]
+    self_mask: List[bool]
+    scales: Dict[str, array] = field(default_factory=dict)
+    categories: Dict[str, List[Tuple[str, ...]]] = field(default_factory=dict)
+
+
+@dataclass
+class ScaleStats:
+    histogram: List[int]
+    self_histogram: List[int]
+
+    @property
+    def count(self) -> int:
+        return sum(self.histogram)
+
+    @property
+    def mean(self) -> Optional[float]:
+        return _histogram_mean(self.histogram)
+
+    @property
+    def peer_mean(self) -> Optional[float]:
+        peer = [a - b for a, b in zip(self.histogram, self.self_histogram)]
+        return _histogram_mean(peer)
+
+    @property
+    def self_score(self) -> Optional[float]:
+        return _histogram_mean(self.self_histogram)
+
+    @property
+    def self_peer_gap(self) -> Optional[float]:
+        """Self assessment minus the peer average; positive means overrating."""
+        if self.self_score is None or self.peer_mean is None:
+            return None
+        return self.self_score - self.peer_mean
+
+    @property
+    def distribution(self) -> Dict[int, int]:
+        return dict(zip(SCALE_VALUES, self.histogram))
+
+    @property
+    def percentiles(self) -> Dict[int, Optional[int]]:
+        return {p: _histogram_percentile(self.histogram, p) for p in PERCENTILES}
+
+    def merge(self, other: "ScaleStats") -> "ScaleStats":
+        return ScaleStats(
+            histogram=[a + b for a, b in zip(self.histogram, other.histogram)],
+            self_histogram=[a + b for a, b in zip(self.self_histogram, other.self_histogram)],
+        )
+
+
+@dataclass
+class CycleReport:
+    cycle_ids: List[str]
+    responses: int
+    scales: Dict[str, ScaleStats] = field(default_factory=dict)
+    categories: Dict[str, Counter] = field(default_factory=dict)
+
+    def merge(self, other: "CycleReport") -> "CycleReport":
+        scales = dict(self.scales)
+        for column, stats in other.scales.items():
+            scales[column] = scales[column].merge(stats) if column in scales else stats
+        categories = {column: Counter(c) for column, c in self.categories.items()}
+        for column, counter in other.categories.items():
+            categories.setdefault(column, Counter()).update(counter)
+        return CycleReport(
+            cycle_ids=self.cycle_ids + other.cycle_ids,
+            responses=self.responses + other.responses,
+            scales=scales,
+            categories=categories,
+        )
+
+
+def _histogram_mean(histogram: Sequence[int]) -> Optional[float]:
+    total = sum(histogram)
+    if not total:
+        return None
+    return sum(v * n for v, n in zip(SCALE_VALUES, histogram)) / total
+
+
+def _histogram_percentile(histogram: Sequence[int], percentile: int) -> Optional[int]:
+    """Nearest-rank percentile computed directly from the histogram."""
+    total = sum(histogram)
+    if not total:
+        return None
+    rank = max(1, -(-percentile * total // 100))
+    seen = 0
+    for value, n in zip(SCALE_VALUES, histogram):
+        seen += n
+        if seen >= rank:
+            return value
+    return SCALE_VALUES[-1]
+
+
+def _histogram(column: array) -> List[int]:
+    # array.count runs in C, so one pass per scale value beats a Python loop.
+    return [column.count(v) for v in SCALE_VALUES]
+
+
+def build_columns(
+    rows: Sequence[Sequence[str]],
+    questions: Iterable[Question],
+    target_employee_id: str,
+) -> ResultColumns:
+    """
+    Converts the raw values of a results sheet (header row first) into
+    column arrays. Question columns are matched by sheet column or question ID.
+    """
+    if not rows:
+        return ResultColumns(respondent_ids=[], self_mask=[])
+    header, body = rows[0], rows[1:]
+    width = len(header)
+    columns = list(zip(*(list(r) + [""] * (width - len(r)) for r in body))) or [()] * width
+    by_name = dict(zip(header, columns))
+
+    respondent_ids = list(by_name.get(RESPONDENT_COLUMN, ()))
+    result = ResultColumns(
+        respondent_ids=respondent_ids,
+        self_mask=[r == target_employee_id for r in respondent_ids],
+    )
+    for question in questions:
+        name = question.result_column if question.result_column in by_name else question.id
+        if name not in by_name:
+            continue
+        values = by_name[name]
+        if question.type == "scale":
+            result.scales[name] = array(
+                "b", [_SCALE_CODES.get(v.strip(), MISSING) for v in values]
+            )
+        elif question.type in ("radio", "checkbox"):
+            result.categories[name] = [
+                tuple(o.strip() for o in v.split(",") if o.strip()) for v in values
+            ]
+    return result
+
+
+def compute_report(cycle_id: str, columns: ResultColumns) -> CycleReport:
+    """Computes the per-competency statistics of a cycle from its columns."""
+    report = CycleReport(cycle_ids=[cycle_id], responses=len(columns.respondent_ids))
+    has_self = any(columns.self_mask)
+    for name, column in columns.scales.items():
+        self_histogram = (
+            _histogram(array("b", compress(column, columns.self_mask)))
+            if has_self
+            else [0] * len(SCALE_VALUES)
+        )
+        report.scales[name] = ScaleStats(
+            histogram=_histogram(column), self_histogram=self_histogram
+        )
+    for name, values in columns.categories.items():
+        report.categories[name] = Counter(option for row in values for option in row)
+    return report
+
+
+class ReportAggregationService:
+    """
+    Computes report statistics over cycle results.
+
+    Results are read from the local results store; cycles it does not hold
+    (created before it, or on another host) are loaded from their sheet with
+    a single bulk read. The computed report is cached in memory per (cycle,
+    data version): the store's own version for local cycles, and a Redis
+    counter the Sheets mirror bumps after appending for the others.
+    """
+
+    def __init__(
+        self,
+        redis_service: RedisStorageService,
+        google_sheets_service: GoogleSheetsService,
+        questionnaire_service: QuestionnaireService,
+        results_store: ResultsStore,
+        cache_size: int = 512,
+    ):
+        self._redis = redis_service
+        self._g_sheets = google_sheets_service
+        self._store = results_store
+        self._questionnaire = questionnaire_service
+        self._cache: "OrderedDict[Tuple[str, str], CycleReport]" = OrderedDict()
+        self._cache_size = cache_size
+
+    async def bump_version(self, cycle_id: str) -> None:
+        """Marks the results of a cycle as changed."""
+        await self._redis.increment(RESULTS_VERSION_KEY.format(cycle_id=cycle_id))
+
+    @staticmethod
+    def queue_removal(pipe: Pipeline, cycle_id: str) -> None:
+        """Adds a command dropping a cycle's results version to a pipeline."""
+        pipe.delete(RESULTS_VERSION_KEY.format(cycle_id=cycle_id))
+
+    async def get_cycle_report(self, cycle: FeedbackCycle) -> CycleReport:
+        local = await asyncio.to_thread(self._store.has_cycle, cycle.id)
+        if local:
+            version = f"local:{await asyncio.to_thread(self._store.cycle_version, cycle.id)}"
+        else:
+            version = await self._redis.get(RESULTS_VERSION_KEY.format(cycle_id=cycle.id)) or "0"
+        cache_key = (cycle.id, version)
+        cached = self._cache.get(cache_key)
+        if cached:
+            CACHE_REQUESTS.inc("report", "hit")
+            self._cache.move_to_end(cache_key)
+            return cached
+        CACHE_REQUESTS.inc("report", "miss")
+
+        questions = await self._questionnaire.get_questionnaire() or []
+        if local:
+            rows = await asyncio.to_thread(self._store.get_rows, cycle.id)
+        else:
+            rows = await self._g_sheets.get_all_values(
+                cycle.results_sheet, cycle.results_spreadsheet_id
+            )
+        report = compute_report(cycle.id, build_columns(rows, questions, cycle.target_employee_id))
+
+        self._cache[cache_key] = report
+        if len(self._cache) > self._cache_size:
+            self._cache.popitem(last=False)
+        logger.info(f"Aggregated {report.responses} responses for cycle {cycle.id}.")
+        return report
+
+    async def get_combined_report(self, cycles: Iterable[FeedbackCycle]) -> Optional[CycleReport]:
+        """Aggregates statistics across several cycles by merging their histograms."""
+        combined = None
+        for cycle in cycles:
+            report = await self.get_cycle_report(cycle)
+            combined = report if combined is None else combined.merge(report)
+        return combined
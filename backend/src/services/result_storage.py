@@ -0,0 +1,226 @@
+import asyncio
+import logging
+import uuid
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+from redis.asyncio.client import Pipeline
+
+from ..config import ResultsSettings
+from ..storage.redis_storage import RedisStorageService
+from .google_sheets import GoogleSheetsService
+
+logger = logging.getLogger(__name__)
+
+# cycle_id -> spreadsheet ID holding the cycle's results worksheet.
+ROUTING_KEY = "results:routing"
+# "<spreadsheet_id>:cycles" and "<spreadsheet_id>:cells" per shard.
+SHARDS_KEY = "results:shards"
+# The shard new cycles are placed in.
+CURRENT_SHARD_KEY = "results:current"
+SHARD_LOCK_KEY = "results:shard_lock"
+SHARD_LOCK_TTL_MS = 60_000
+# IDs of the active cycles; a cycle takes its slot when routed.
+ACTIVE_CYCLES_KEY = "cycles:active"
+ACTIVE_LIMIT_REACHED = -1
+
+# Routes a cycle to the current shard if it still fits and takes its slot
+# among the active cycles; idempotent per cycle.
+_RESERVE_SCRIPT = """
+local existing = redis.call('HGET', KEYS[3], ARGV[1])
+if existing then
+    return existing
+end
+if redis.call('SISMEMBER', KEYS[4], ARGV[1]) == 0
+        and redis.call('SCARD', KEYS[4]) >= tonumber(ARGV[5]) then
+    return -1
+end
+local shard = redis.call('GET', KEYS[2])
+if not shard then
+    return false
+end
+local cycles = tonumber(redis.call('HGET', KEYS[1], shard .. ':cycles') or '0')
+local cells = tonumber(redis.call('HGET', KEYS[1], shard .. ':cells') or '0')
+if cycles + 1 > tonumber(ARGV[3]) or cells + tonumber(ARGV[2]) > tonumber(ARGV[4]) then
+    return false
+end
+redis.call('HINCRBY', KEYS[1], shard .. ':cycles', 1)
+redis.call('HINCRBY', KEYS[1], shard .. ':cells', ARGV[2])
+redis.call('HSET', KEYS[3], ARGV[1], shard)
+redis.call('SADD', KEYS[4], ARGV[1])
+return shard
+"""
+
+# Undoes a reservation of _RESERVE_SCRIPT; a no-op for unrouted cycles.
+_RELEASE_SCRIPT = """
+local shard = redis.call('HGET', KEYS[2], ARGV[1])
+if not shard then
+    return 0
+end
+redis.call('HDEL', KEYS[2], ARGV[1])
+redis.call('SREM', KEYS[3], ARGV[1])
+redis.call('HINCRBY', KEYS[1], shard .. ':cycles', -1)
+redis.call('HINCRBY', KEYS[1], shard .. ':cells', -tonumber(ARGV[2]))
+return 1
+"""
+
+
+class ResultStorageFull(Exception):
+    """Raised when no shard can take a cycle and no more shards may be created."""
+
+
+class ActiveCycleLimitReached(ResultStorageFull):
+    """Raised when `MAX_ACTIVE_CYCLES` cycles are active already."""
+
+
+@dataclass
+class ShardUsage:
+    spreadsheet_id: str
+    cycles: int
+    cells: int
+
+
+class ResultStorageRouter:
+    """
+    Places the results worksheet of every cycle in one of several
+    spreadsheets, so the number of cycles is not bound by the tab and cell
+    limits of a single file.
+
+    The main spreadsheet is the first shard. A cycle reserves one worksheet
+    and its expected cells (a row per respondent plus the header) in the
+    current shard; when the reservation does not fit, a new spreadsheet is
+    created under a Redis lock, so replicas never create two at once.
+
+    The same reservation takes the cycle's slot among the active cycles, so
+    concurrent launches cannot exceed `MAX_ACTIVE_CYCLES` together.
+    """
+
+    def __init__(
+        self,
+        redis_service: RedisStorageService,
+        google_sheets_service: GoogleSheetsService,
+        config: ResultsSettings,
+    ):
+        self._redis = redis_service
+        self._g_sheets = google_sheets_service
+        self._config = config
+        self._reserve_script = redis_service.register_script(_RESERVE_SCRIPT)
+        self._release_script = redis_service.register_script(_RELEASE_SCRIPT)
+
+    @staticmethod
+    def estimate_cells(respondents: int, columns: int) -> int:
+        return (respondents + 1) * columns
+
+    async def _reserve(self, cycle_id: str, cells: int) -> Optional[str]:
+        shard = await self._reserve_script(
+            keys=[SHARDS_KEY, CURRENT_SHARD_KEY, ROUTING_KEY, ACTIVE_CYCLES_KEY],
+            args=[
+                cycle_id, cells, self._config.SHARD_MAX_CYCLES, self._config.SHARD_MAX_CELLS,
+                self._config.MAX_ACTIVE_CYCLES,
+            ],
+        )
+        if shard == ACTIVE_LIMIT_REACHED:
+            raise ActiveCycleLimitReached(
+                f"Cannot create cycle {cycle_id}: {self._config.MAX_ACTIVE_CYCLES} cycles are active."
+            )
+        return shard.decode("utf-8") if isinstance(shard, bytes) else shard
+
+    async def _register_shard(self, spreadsheet_id: str) -> None:
+        """Makes a spreadsheet the current shard, starting from its real usage."""
+        tabs, cells = await self._g_sheets.get_usage(spreadsheet_id)
+        pipe = self._redis.pipeline()
+        pipe.hset(
+            SHARDS_KEY,
+            mapping={f"{spreadsheet_id}:cycles": tabs, f"{spreadsheet_id}:cells": cells},
+        )
+        pipe.set(CURRENT_SHARD_KEY, spreadsheet_id)
+        await pipe.execute()
+        logger.info(f"Results shard {spreadsheet_id} is now current ({tabs} tabs, {cells} cells).")
+
+    async def _add_shard(self) -> None:
+        shards = await self.get_shards()
+        if not shards:
+            await self._register_shard(self._g_sheets.main_spreadsheet_id)
+            return
+        if len(shards) >= self._config.MAX_SHARDS:
+            raise ResultStorageFull(
+                f"All {len(shards)} result spreadsheets are full (RESULTS_MAX_SHARDS)."
+            )
+        spreadsheet_id = await self._g_sheets.create_spreadsheet(
+            f"360 Feedback results {len(shards) + 1}", self._config.FOLDER_ID
+        )
+        await self._register_shard(spreadsheet_id)
+
+    async def assign(self, cycle_id: str, respondents: int, columns: int) -> str:
+        """
+        Reserves room for a cycle's results worksheet.
+        :return: The ID of the spreadsheet to create the worksheet in.
+        :raises ResultStorageFull: If the configured number of shards is used up.
+        :raises ActiveCycleLimitReached: If the active-cycle limit is reached.
+        """
+        cells = self.estimate_cells(respondents, columns)
+        if cells > self._config.SHARD_MAX_CELLS:
+            raise ResultStorageFull(f"Cycle {cycle_id} needs {cells} cells, more than a shard holds.")
+
+        owner = uuid.uuid4().hex
+        for _ in range(SHARD_LOCK_TTL_MS // 1000):
+            shard = await self._reserve(cycle_id, cells)
+            if shard:
+                return shard
+            if await self._redis.acquire_lock(SHARD_LOCK_KEY, owner, SHARD_LOCK_TTL_MS):
+                try:
+                    # Another replica may have added a shard while we waited.
+                    shard = await self._reserve(cycle_id, cells)
+                    if shard:
+                        return shard
+                    await self._add_shard()
+                finally:
+                    await self._redis.release_lock(SHARD_LOCK_KEY, owner)
+            else:
+                await asyncio.sleep(1)
+        raise ResultStorageFull(f"Timed out waiting for a results shard for cycle {cycle_id}.")
+
+    async def release(self, cycle_id: str, respondents: int, columns: int) -> None:
+        """
+        Gives back the room reserved by `assign` for a cycle whose worksheet
+        was not created, and forgets its route.
+        """
+        await self._release_script(
+            keys=[SHARDS_KEY, ROUTING_KEY, ACTIVE_CYCLES_KEY],
+            args=[cycle_id, self.estimate_cells(respondents, columns)],
+        )
+
+    async def route(self, cycle_id: str) -> Optional[str]:
+        """The spreadsheet holding a cycle's results, if the cycle was routed."""
+        return await self._redis.get_hash_field(ROUTING_KEY, cycle_id)
+
+    @staticmethod
+    def queue_removal(pipe: Pipeline, cycle_id: str) -> None:
+        """
+        Adds commands forgetting a cycle's route and its active slot to a
+        pipeline. Its worksheet stays, and so does the usage it added to the
+        shard.
+        """
+        pipe.hdel(ROUTING_KEY, cycle_id)
+        pipe.srem(ACTIVE_CYCLES_KEY, cycle_id)
+
+    async def get_shards(self) -> List[ShardUsage]:
+        usage: Dict[str, ShardUsage] = {}
+        for name, value in (await self._redis.get_hash(SHARDS_KEY)).items():
+            spreadsheet_id, _, attr = name.rpartition(":")
+            shard = usage.setdefault(spreadsheet_id, ShardUsage(spreadsheet_id, 0, 0))
+            setattr(shard, attr, int(value))
+        return list(usage.values())
+
+    async def has_capacity(self) -> bool:
+        """Whether another cycle fits in the current shard or in a new one."""
+        shards = await self.get_shards()
+        if len(shards) < self._config.MAX_SHARDS:
+            return True
+        current = await self._redis.get(CURRENT_SHARD_KEY)
+        return any(
+            s.spreadsheet_id == current
+            and s.cycles < self._config.SHARD_MAX_CYCLES
+            and s.cells < self._config.SHARD_MAX_CELLS
+            for s in shards
+        )
@@ -0,0 +1,336 @@
+import asyncio
+import csv
+import logging
+import os
+import re
+import tempfile
+import zipfile
+from dataclasses import dataclass
+from datetime import date
+from typing import AsyncIterator, Callable, Dict, List, Optional, Sequence, Tuple
+from xml.sax.saxutils import escape
+
+from ..storage.models import FeedbackCycle
+from ..storage.redis_storage import RedisStorageService
+from ..storage.results_store import ResultsStore
+from ..tracing import traced
+from .archive_service import CycleArchiveService
+from .employee_service import EmployeeService
+from .google_sheets import GoogleSheetsService
+
+logger = logging.getLogger(__name__)
+
+EXPORT_FORMATS = ("csv", "xlsx")
+# Columns leading every exported row; the answer columns follow.
+LEADING_COLUMNS = ["cycle_id", "target", "respondent_id", "submitted_at"]
+# Cycle models are loaded this many at a time while selecting cycles.
+CYCLES_PER_READ = 200
+
+_QUARTER = re.compile(r"(\d{4})-?[Qq]([1-4])")
+_NUMBER = re.compile(r"-?\d+(\.\d+)?")
+_XML_ILLEGAL = re.compile("[\x00-\x08\x0b\x0c\x0e-\x1f]")
+
+
+def _cell(row: List[str], index: Optional[int]) -> str:
+    # Sheets omits trailing empty cells, so rows may be shorter than the header.
+    return row[index] if index is not None and index < len(row) else ""
+
+
+def parse_period(text: str, today: date) -> Tuple[date, date]:
+    """
+    Parses an export period: a quarter ("2025Q3"), two ISO dates, or
+    nothing for the current quarter.
+    :raises ValueError: If the text is none of these.
+    """
+    parts = text.split()
+    if not parts:
+        parts = [f"{today.year}Q{(today.month - 1) // 3 + 1}"]
+    if len(parts) == 1:
+        match = _QUARTER.fullmatch(parts[0])
+        if not match:
+            raise ValueError(f"Unknown period '{text}'.")
+        year, quarter = int(match.group(1)), int(match.group(2))
+        start = date(year, 3 * quarter - 2, 1)
+        end = date(year + 1, 1, 1) if quarter == 4 else date(year, 3 * quarter + 1, 1)
+        return start, date.fromordinal(end.toordinal() - 1)
+    if len(parts) == 2:
+        start, end = date.fromisoformat(parts[0]), date.fromisoformat(parts[1])
+        if start > end:
+            raise ValueError("The period ends before it starts.")
+        return start, end
+    raise ValueError(f"Unknown period '{text}'.")
+
+
+class CsvExportWriter:
+    """Writes rows to a CSV file that Excel opens as UTF-8."""
+
+    def __init__(self, path: str):
+        self._file = open(path, "w", newline="", encoding="utf-8-sig")
+        self._writer = csv.writer(self._file)
+
+    @staticmethod
+    def _cell(value: str) -> str:
+        # Free-text answers must not be evaluated as spreadsheet formulas.
+        if value[:1] in ("=", "+", "-", "@") and not _NUMBER.fullmatch(value):
+            return "'" + value
+        return value
+
+    def write_row(self, row: Sequence[str]) -> None:
+        self._writer.writerow([self._cell(value) for value in row])
+
+    def close(self) -> None:
+        self._file.close()
+
+
+_XLSX_PARTS = {
+    "[Content_Types].xml": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        '<Override PartName="/xl/worksheets/sheet1.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        "</Types>"
+    ),
+    "_rels/.rels": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+        'Target="xl/workbook.xml"/>'
+        "</Relationships>"
+    ),
+    "xl/workbook.xml": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+        'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+        '<sheets><sheet name="Results" sheetId="1" r:id="rId1"/></sheets>'
+        "</workbook>"
+    ),
+    "xl/_rels/workbook.xml.rels": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+        'Target="worksheets/sheet1.xml"/>'
+        "</Relationships>"
+    ),
+}
+
+
+class XlsxExportWriter:
+    """
+    Writes rows to a single-sheet XLSX workbook. The worksheet XML is
+    streamed into the zip archive as rows arrive, so nothing but the
+    current row is held in memory.
+    """
+
+    def __init__(self, path: str):
+        self._zip = zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED)
+        for name, content in _XLSX_PARTS.items():
+            self._zip.writestr(name, content)
+        self._sheet = self._zip.open("xl/worksheets/sheet1.xml", "w", force_zip64=True)
+        self._sheet.write(
+            b'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+            b'<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+            b"<sheetData>"
+        )
+        self._rows = 0
+
+    @staticmethod
+    def _cell(value: str) -> str:
+        if not value:
+            return "<c/>"
+        if _NUMBER.fullmatch(value):
+            return f"<c><v>{value}</v></c>"
+        text = escape(_XML_ILLEGAL.sub("", value))
+        return f'<c t="inlineStr"><is><t xml:space="preserve">{text}</t></is></c>'
+
+    def write_row(self, row: Sequence[str]) -> None:
+        self._rows += 1
+        cells = "".join(self._cell(value) for value in row)
+        self._sheet.write(f'<row r="{self._rows}">{cells}</row>'.encode("utf-8"))
+
+    def close(self) -> None:
+        self._sheet.write(b"</sheetData></worksheet>")
+        self._sheet.close()
+        self._zip.close()
+
+
+_WRITERS = {"csv": CsvExportWriter, "xlsx": XlsxExportWriter}
+
+
+@dataclass
+class ExportedCycle:
+    """What the export needs of a cycle; the respondents are left behind."""
+
+    id: str
+    target_employee_id: str
+    results_sheet: str
+    results_spreadsheet_id: Optional[str]
+
+
+@dataclass
+class ExportFile:
+    path: str
+    filename: str
+    cycles: int
+    rows: int
+
+
+class ResultsExportService:
+    """
+    Exports the results of the cycles created in a period to one CSV or
+    XLSX file.
+
+    Rows flow through async generators from the source to the file writer:
+    cycles held by the results store are read from it in chunks, others
+    from their worksheet in ranged reads of `chunk_size` rows. Cycles are
+    streamed the same way, so memory use is bound by the chunk size, not
+    by the number of rows or cycles.
+    """
+
+    def __init__(
+        self,
+        redis_service: RedisStorageService,
+        google_sheets_service: GoogleSheetsService,
+        results_store: ResultsStore,
+        employee_service: EmployeeService,
+        archive_service: Optional[CycleArchiveService] = None,
+        chunk_size: int = 500,
+    ):
+        self._redis = redis_service
+        self._g_sheets = google_sheets_service
+        self._store = results_store
+        self._employees = employee_service
+        self._archive = archive_service
+        self._chunk_size = chunk_size
+
+    async def _load_cycles(self, keys: List[str], start: date, end: date) -> List[ExportedCycle]:
+        return [
+            ExportedCycle(c.id, c.target_employee_id, c.results_sheet, c.results_spreadsheet_id)
+            for c in await self._redis.get_models(keys, FeedbackCycle)
+            if c and c.results_sheet and start <= c.created_at.date() <= end
+        ]
+
+    async def iter_cycles(self, start: date, end: date) -> AsyncIterator[ExportedCycle]:
+        """
+        The cycles created within the period, archived ones included. They
+        are read `CYCLES_PER_READ` at a time and come in no particular order.
+        """
+        keys: List[str] = []
+        async for key in self._redis.scan_keys("cycle:*"):
+            keys.append(key)
+            if len(keys) == CYCLES_PER_READ:
+                for cycle in await self._load_cycles(keys, start, end):
+                    yield cycle
+                keys = []
+        for cycle in await self._load_cycles(keys, start, end):
+            yield cycle
+        if self._archive:
+            async for s in self._archive.iter_summaries():
+                if s.results_sheet and start <= s.created_at.date() <= end:
+                    yield ExportedCycle(s.id, s.target_employee_id, s.results_sheet, s.results_spreadsheet_id)
+
+    async def _headers(self, cycle: ExportedCycle) -> List[str]:
+        if await asyncio.to_thread(self._store.has_cycle, cycle.id):
+            headers = await asyncio.to_thread(self._store.get_headers, cycle.id)
+        else:
+            rows = await self._g_sheets.get_rows(
+                cycle.results_sheet, 1, 1, cycle.results_spreadsheet_id
+            )
+            headers = rows[0] if rows else []
+        return headers
+
+    async def _chunks(self, cycle: ExportedCycle) -> AsyncIterator[List[List[str]]]:
+        """The cycle's rows in chunks; the first chunk starts with the header row."""
+        if await asyncio.to_thread(self._store.has_cycle, cycle.id):
+            header = [await asyncio.to_thread(self._store.get_headers, cycle.id)]
+            rows = self._store.iter_rows(cycle.id, self._chunk_size)
+            # Every chunk is read in a worker thread, so the loop runs between chunks.
+            while (chunk := await asyncio.to_thread(next, rows, None)) is not None:
+                yield header + chunk
+                header = []
+            return
+        row_count = await self._g_sheets.get_row_count(
+            cycle.results_sheet, cycle.results_spreadsheet_id
+        )
+        # The first read takes the header row along with the first chunk.
+        first_row = 1
+        while first_row <= row_count:
+            last_row = min(first_row + self._chunk_size - (first_row > 1), row_count)
+            chunk = await self._g_sheets.get_rows(
+                cycle.results_sheet, first_row, last_row, cycle.results_spreadsheet_id
+            )
+            if chunk:
+                yield chunk
+            first_row = last_row + 1
+
+    async def iter_rows(
+        self, cycles: Callable[[], AsyncIterator[ExportedCycle]]
+    ) -> AsyncIterator[List[str]]:
+        """
+        The header row, then the rows of every cycle. Answer columns are the
+        union of the cycles' columns, so cycles created with different
+        questionnaires line up.
+
+        `cycles` is called twice: the first pass collects the columns, the
+        second reads the rows. Neither keeps anything per cycle.
+        """
+        columns: Dict[str, None] = {}
+        async for cycle in cycles():
+            headers = await self._headers(cycle)
+            columns.update(dict.fromkeys(h for h in headers if h not in LEADING_COLUMNS))
+        answer_columns = list(columns)
+        yield LEADING_COLUMNS + answer_columns
+
+        async for cycle in cycles():
+            target = self._employees.find_by_id(cycle.target_employee_id)
+            target_name = target.full_name if target else cycle.target_employee_id
+            position: Optional[Dict[str, int]] = None
+            async for chunk in self._chunks(cycle):
+                if position is None:
+                    position = {h: i for i, h in enumerate(chunk[0])}
+                    order = [position.get(column) for column in answer_columns]
+                    respondent = position.get("respondent_id")
+                    submitted_at = position.get("submitted_at")
+                    chunk = chunk[1:]
+                for row in chunk:
+                    yield [cycle.id, target_name, _cell(row, respondent), _cell(row, submitted_at)] + [
+                        _cell(row, index) for index in order
+                    ]
+
+    @traced()
+    async def export(self, start: date, end: date, fmt: str) -> ExportFile:
+        """
+        Writes the results of the period to a temporary file; the caller
+        removes it after sending.
+        """
+        await self._employees.load_employees()
+        found = 0
+
+        async def cycles() -> AsyncIterator[ExportedCycle]:
+            nonlocal found
+            found = 0
+            async for cycle in self.iter_cycles(start, end):
+                found += 1
+                yield cycle
+
+        fd, path = tempfile.mkstemp(suffix=f".{fmt}", prefix="results_")
+        os.close(fd)
+        writer = _WRITERS[fmt](path)
+        rows = -1
+        try:
+            async for row in self.iter_rows(cycles):
+                writer.write_row(row)
+                rows += 1
+        except BaseException:
+            writer.close()
+            os.remove(path)
+            raise
+        writer.close()
+        logger.info(f"Exported {rows} rows of {found} cycles to {path}.")
+        filename = f"results_{start.isoformat()}_{end.isoformat()}.{fmt}"
+        return ExportFile(path, filename, found, rows)
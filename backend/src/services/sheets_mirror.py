@@ -0,0 +1,111 @@
+import asyncio
+import logging
+from itertools import groupby
+from typing import List, Optional
+
+from ..storage.results_store import MirrorItem, ResultsStore
+from ..tracing import traced
+from .google_sheets import GoogleSheetsService
+from .report_aggregation import ReportAggregationService
+
+logger = logging.getLogger(__name__)
+
+
+class SheetsMirror:
+    """
+    Copies committed submissions from the results store to their results
+    worksheets.
+
+    Pending submissions are read in commit order and appended with one
+    request per run of consecutive rows for the same worksheet; the
+    checkpoint is advanced after every successful request. A failed request
+    stops the pass and everything from it on is retried on the next one, so
+    rows are delivered at least once and Sheets outages only delay the
+    mirror. Appended cycles get their results version bumped, so cached
+    reports read from the sheet are recomputed on every host.
+
+    Processes sharing the store's file take turns through its mirror lock:
+    a pass finding it held does nothing.
+    """
+
+    def __init__(
+        self,
+        store: ResultsStore,
+        google_sheets_service: GoogleSheetsService,
+        batch_size: int = 500,
+        report_service: Optional[ReportAggregationService] = None,
+    ):
+        self._store = store
+        self._g_sheets = google_sheets_service
+        self._reports = report_service
+        self._batch_size = batch_size
+        self.mirrored = 0
+        self.failures = 0
+        self._stopping = asyncio.Event()
+
+    @property
+    def lag(self) -> int:
+        return self._store.mirror_lag()
+
+    async def _append(self, group: List[MirrorItem]) -> None:
+        first = group[0]
+        await self._g_sheets.append_rows(
+            first.sheet, [item.row for item in group], first.spreadsheet_id
+        )
+        await asyncio.to_thread(self._store.set_checkpoint, group[-1].seq)
+        self.mirrored += len(group)
+        if self._reports:
+            for cycle_id in dict.fromkeys(item.cycle_id for item in group):
+                await self._reports.bump_version(cycle_id)
+
+    @traced()
+    async def run_once(self) -> int:
+        """
+        Mirrors pending submissions until none are left or a request fails.
+        :return: The number of rows appended.
+        """
+        with self._store.mirror_lock() as held:
+            if not held:
+                return 0
+            return await self._run_locked()
+
+    async def _run_locked(self) -> int:
+        appended = 0
+        while True:
+            items = await asyncio.to_thread(self._store.pending_mirror, self._batch_size)
+            if not items:
+                return appended
+            for _, group in groupby(items, key=lambda item: (item.spreadsheet_id, item.sheet)):
+                group = list(group)
+                try:
+                    await self._append(group)
+                except Exception as e:
+                    self.failures += 1
+                    logger.error(
+                        f"Failed to mirror {len(group)} rows to '{group[0].sheet}', "
+                        f"will retry: {e}"
+                    )
+                    return appended
+                appended += len(group)
+            if len(items) < self._batch_size:
+                return appended
+
+    async def run(self, interval: float) -> None:
+        """
+        Mirrors in the background, catching up on start, until cancelled or
+        stopped; a stopped mirror makes one last pass before returning.
+        """
+        while True:
+            appended = await self.run_once()
+            if appended:
+                logger.info(f"Mirrored {appended} submissions; {self.lag} pending.")
+            if self._stopping.is_set():
+                return
+            try:
+                await asyncio.wait_for(self._stopping.wait(), interval)
+            except asyncio.TimeoutError:
+                pass
+
+    def stop(self) -> None:
+        """Makes `run` flush what is pending and return."""
+        self._stopping.set()
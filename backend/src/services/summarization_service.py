@@ -0,0 +1,208 @@
+import asyncio
+import hashlib
+import logging
+import re
+import time
+from abc import ABC, abstractmethod
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+from ..metrics import CACHE_REQUESTS
+from ..storage.redis_storage import RedisStorageService
+
+logger = logging.getLogger(__name__)
+
+SUMMARY_CACHE_KEY = "summary:{digest}"
+SUMMARY_CACHE_TTL_SECONDS = 30 * 24 * 3600  # 30 days
+
+# Open questions of the questionnaire and what to extract from them.
+SUMMARY_TOPICS = {
+    "O1_blockers": "Выдели основные зоны роста и блокеры (3-5 пунктов).",
+    "O2_strengths": "Выдели общие сильные стороны (3-5 пунктов).",
+    "O3_suggestions": "Выдели основные предложения и пожелания (3-5 пунктов).",
+}
+
+
+def estimate_tokens(text: str) -> int:
+    """A rough token estimate (about four characters per token)."""
+    return len(text) // 4 + 1
+
+
+class SummarizationBackend(ABC):
+    """A model that condenses a batch of texts according to an instruction."""
+
+    name: str = "backend"
+
+    @abstractmethod
+    async def summarize(self, texts: List[str], instruction: str) -> str:
+        """Returns the summary of `texts` asked for by `instruction`."""
+
+
+class ExtractiveSummarizationBackend(SummarizationBackend):
+    """
+    A deterministic local backend: picks the sentences whose words are the
+    most frequent across all texts. Used in tests; the bot does not
+    summarize reports until a remote model backend is added.
+    """
+
+    name = "extractive"
+
+    def __init__(self, max_points: int = 5):
+        self._max_points = max_points
+
+    async def summarize(self, texts: List[str], instruction: str) -> str:
+        sentences = [
+            s.strip(" -•\n")
+            for text in texts
+            for s in re.split(r"(?<=[.!?])\s+|\n+", text)
+            if len(s.strip(" -•\n")) > 3
+        ]
+        words = Counter(w for s in sentences for w in re.findall(r"\w{4,}", s.lower()))
+
+        def score(sentence: str) -> float:
+            tokens = re.findall(r"\w{4,}", sentence.lower())
+            return sum(words[t] for t in tokens) / (len(tokens) or 1)
+
+        unique = list(dict.fromkeys(sentences))
+        ranked = sorted(enumerate(unique), key=lambda item: (-score(item[1]), item[0]))
+        return "\n".join(f"• {s}" for _, s in ranked[: self._max_points])
+
+
+@dataclass
+class SummaryMetrics:
+    calls: int = 0
+    cache_hits: int = 0
+    errors: int = 0
+    latency_seconds: Dict[str, float] = field(default_factory=dict)
+
+    @property
+    def cache_hit_ratio(self) -> float:
+        total = self.calls + self.cache_hits
+        return self.cache_hits / total if total else 0.0
+
+
+@dataclass
+class ReportSummary:
+    summaries: Dict[str, Optional[str]]
+    metrics: SummaryMetrics
+
+    @property
+    def failed_topics(self) -> List[str]:
+        return [topic for topic, summary in self.summaries.items() if summary is None]
+
+
+class SummarizationService:
+    """
+    Summarizes open answers for reports.
+
+    Inputs are packed into chunks that fit the token budget, chunks are
+    summarized in parallel under a concurrency cap, and every backend call
+    is cached by the hash of its content, so regenerating a report with the
+    same answers makes no backend calls.
+    """
+
+    def __init__(
+        self,
+        redis_service: RedisStorageService,
+        backend: SummarizationBackend,
+        max_concurrency: int = 4,
+        chunk_token_budget: int = 3000,
+    ):
+        self._redis = redis_service
+        self._backend = backend
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._budget = chunk_token_budget
+
+    def chunk(self, texts: List[str]) -> List[List[str]]:
+        """Greedily packs texts into chunks that fit the token budget."""
+        chunks: List[List[str]] = []
+        current: List[str] = []
+        used = 0
+        for text in texts:
+            tokens = estimate_tokens(text)
+            if tokens > self._budget:
+                text = text[: self._budget * 4]
+                tokens = self._budget
+            if current and used + tokens > self._budget:
+                chunks.append(current)
+                current, used = [], 0
+            current.append(text)
+            used += tokens
+        if current:
+            chunks.append(current)
+        return chunks
+
+    async def _call(self, texts: List[str], instruction: str, metrics: SummaryMetrics) -> str:
+        digest = hashlib.sha256(
+            "\x1e".join([self._backend.name, instruction, *texts]).encode("utf-8")
+        ).hexdigest()
+        cache_key = SUMMARY_CACHE_KEY.format(digest=digest)
+        cached = await self._redis.get(cache_key)
+        if cached is not None:
+            metrics.cache_hits += 1
+            CACHE_REQUESTS.inc("summary", "hit")
+            return cached
+        CACHE_REQUESTS.inc("summary", "miss")
+
+        async with self._semaphore:
+            summary = await self._backend.summarize(texts, instruction)
+        metrics.calls += 1
+        await self._redis.set_value(cache_key, summary, ttl=SUMMARY_CACHE_TTL_SECONDS)
+        return summary
+
+    async def summarize(
+        self, texts: List[str], instruction: str, metrics: SummaryMetrics
+    ) -> str:
+        """Summarizes any number of texts with a map-reduce over chunks."""
+        texts = [t.strip() for t in texts if t and t.strip()]
+        if not texts:
+            return ""
+        chunks = self.chunk(texts)
+        while len(chunks) > 1:
+            partial = await asyncio.gather(
+                *(self._call(c, instruction, metrics) for c in chunks)
+            )
+            merged = self.chunk(list(partial))
+            # Summaries that do not shrink are reduced in pairs instead.
+            chunks = merged if len(merged) < len(chunks) else self.pair(partial)
+        return await self._call(chunks[0], instruction, metrics)
+
+    def pair(self, texts: List[str]) -> List[List[str]]:
+        """
+        Groups texts in twos, each cut to half the token budget, so every
+        reduce round halves the number of chunks without exceeding it.
+        """
+        half = max(self._budget // 2 - 1, 1) * 4
+        return [[text[:half] for text in texts[i:i + 2]] for i in range(0, len(texts), 2)]
+
+    async def summarize_report(self, answers: Dict[str, List[str]]) -> ReportSummary:
+        """
+        Summarizes the open answers of a report, one summary per topic.
+        A topic whose backend call fails gets None, so the report can still
+        be sent with a warning.
+        """
+        metrics = SummaryMetrics()
+
+        async def run(topic: str) -> Optional[str]:
+            start = time.perf_counter()
+            try:
+                return await self.summarize(
+                    answers.get(topic, []), SUMMARY_TOPICS[topic], metrics
+                )
+            except Exception as e:
+                metrics.errors += 1
+                logger.error(f"Failed to summarize '{topic}': {e}", exc_info=True)
+                return None
+            finally:
+                metrics.latency_seconds[topic] = time.perf_counter() - start
+
+        topics = [topic for topic in SUMMARY_TOPICS if topic in answers]
+        results = await asyncio.gather(*(run(topic) for topic in topics))
+        logger.info(
+            f"Summarized {len(topics)} topics: {metrics.calls} backend calls, "
+            f"{metrics.cache_hits} cache hits ({metrics.cache_hit_ratio:.0%}), "
+            f"{metrics.errors} errors, latency "
+            + ", ".join(f"{t}={s:.2f}s" for t, s in metrics.latency_seconds.items())
+        )
+        return ReportSummary(summaries=dict(zip(topics, results)), metrics=metrics)
@@ -0,0 +1,203 @@
+import asyncio
+import base64
+import hashlib
+import hmac
+import logging
+from datetime import date, datetime, time, timedelta, timezone
+from typing import Optional, Set
+
+from redis.exceptions import RedisError
+
+from ..bot.keyboards.survey_keyboards import SURVEY_CALLBACK_PREFIX
+from ..storage.models import TokenData
+from ..storage.redis_storage import RedisStorageService
+
+logger = logging.getLogger(__name__)
+
+REVOKED_CYCLES_KEY = "revoked_cycles"
+# Carries the IDs of cycles as they are revoked, to every process.
+REVOKED_CYCLES_CHANNEL = "revoked_cycles"
+# Telegram limits deep-link payloads and callback data to 64 bytes, and the
+# callback data also carries its prefix.
+MAX_TOKEN_LENGTH = 64 - len(SURVEY_CALLBACK_PREFIX)
+TOKEN_SEPARATOR = "-"
+SIGNATURE_BYTES = 8
+# Tokens carry the creation day of the cycle as base36 days since this date,
+# in a fixed number of digits (enough until 2127).
+CYCLE_DAY_EPOCH = date(2000, 1, 1)
+CYCLE_DAY_DIGITS = 3
+RECONNECT_DELAY_SECONDS = 1.0
+MAX_RECONNECT_DELAY_SECONDS = 30.0
+
+
+def _b36encode(value: int) -> str:
+    digits = "0123456789abcdefghijklmnopqrstuvwxyz"
+    result = ""
+    while True:
+        value, rem = divmod(value, 36)
+        result = digits[rem] + result
+        if not value:
+            return result
+
+
+def compact_cycle_id(cycle_id: str) -> str:
+    """
+    Shortens an ID made by `cycle_id_for` (``YYYYMMDD_<target>``) to the
+    creation day in base36 followed by the target.
+    :raises ValueError: If the ID does not have that form.
+    """
+    day, _, target = cycle_id.partition("_")
+    try:
+        created_on = datetime.strptime(day, "%Y%m%d").date()
+    except ValueError:
+        created_on = None
+    if not created_on or not target or TOKEN_SEPARATOR in target:
+        raise ValueError(f"Cycle ID {cycle_id} cannot be carried by a survey token.")
+    return _b36encode((created_on - CYCLE_DAY_EPOCH).days).rjust(CYCLE_DAY_DIGITS, "0") + target
+
+
+def expand_cycle_id(compact: str) -> Optional[str]:
+    """The cycle ID shortened by `compact_cycle_id`, or None if malformed."""
+    if len(compact) <= CYCLE_DAY_DIGITS:
+        return None
+    try:
+        created_on = CYCLE_DAY_EPOCH + timedelta(days=int(compact[:CYCLE_DAY_DIGITS], 36))
+    except (ValueError, OverflowError):
+        return None
+    return f"{created_on.strftime('%Y%m%d')}_{compact[CYCLE_DAY_DIGITS:]}"
+
+
+class SurveyTokenService:
+    """
+    Issues and verifies HMAC-signed survey tokens without Redis reads.
+
+    A token has the form ``<cycle>-<expires>-<signature>``: the cycle ID in
+    a compact form and a signature over the cycle ID, the respondent ID and
+    the expiry. The respondent is not in the token; it is checked against
+    the user presenting it. Tokens stay within Telegram's limits for any
+    Telegram username as the target, and only use characters allowed in
+    deep links, so they fit into a ``t.me/bot?start=`` link as well as
+    into callback data.
+
+    Revoked (cancelled) cycles are kept in a Redis set and published as
+    they are revoked. Once `start`ed, the service holds the set in memory
+    and follows the publications; until it is subscribed (or while it
+    reconnects) verification asks Redis instead, so a revocation is never
+    missed.
+    """
+
+    def __init__(
+        self,
+        redis_service: RedisStorageService,
+        secret: str,
+        grace_days: int = 3,
+    ):
+        self._redis = redis_service
+        self._key = secret.encode("utf-8")
+        self._grace = timedelta(days=grace_days)
+        self._revoked: Set[str] = set()
+        self._following = False
+        self._task: Optional[asyncio.Task] = None
+
+    async def revoke_cycle(self, cycle_id: str) -> None:
+        """Invalidates every token issued for the given cycle, in every process."""
+        pipe = self._redis.pipeline()
+        pipe.sadd(REVOKED_CYCLES_KEY, cycle_id)
+        pipe.publish(REVOKED_CYCLES_CHANNEL, cycle_id)
+        await pipe.execute()
+        self._revoked.add(cycle_id)
+
+    async def _follow(self) -> None:
+        delay = RECONNECT_DELAY_SECONDS
+        while True:
+            pubsub = self._redis.pubsub()
+            try:
+                await pubsub.subscribe(REVOKED_CYCLES_CHANNEL)
+                # Read after subscribing, so nothing revoked in between is missed.
+                self._revoked |= await self._redis.get_set(REVOKED_CYCLES_KEY)
+                self._following = True
+                delay = RECONNECT_DELAY_SECONDS
+                async for message in pubsub.listen():
+                    if message["type"] == "message":
+                        self._revoked.add(message["data"].decode("utf-8"))
+            except (RedisError, OSError) as e:
+                logger.warning(f"Not following revoked cycles, reconnecting in {delay:.0f}s: {e}")
+            finally:
+                self._following = False
+                await pubsub.aclose()
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, MAX_RECONNECT_DELAY_SECONDS)
+
+    def start(self) -> None:
+        """Starts following revocations, so verification needs no Redis reads."""
+        if self._task is None:
+            self._task = asyncio.create_task(self._follow())
+
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def _sign(self, payload: str) -> str:
+        digest = hmac.new(self._key, payload.encode("utf-8"), hashlib.sha256).digest()
+        return base64.urlsafe_b64encode(digest[:SIGNATURE_BYTES]).rstrip(b"=").decode()
+
+    @staticmethod
+    def _payload(cycle_id: str, respondent_id: str, expires: str) -> str:
+        return f"{cycle_id}:{respondent_id}:{expires}"
+
+    def issue(self, cycle_id: str, respondent_id: str, deadline: date) -> str:
+        """
+        Creates a token for a respondent of a cycle.
+        The token expires at the end of the deadline day plus the grace period.
+        :raises ValueError: If the token would not fit into callback data.
+        """
+        expires_at = datetime.combine(deadline, time.max, tzinfo=timezone.utc) + self._grace
+        expires = _b36encode(int(expires_at.timestamp()))
+        signature = self._sign(self._payload(cycle_id, respondent_id, expires))
+        token = TOKEN_SEPARATOR.join([compact_cycle_id(cycle_id), expires, signature])
+        if len(token) > MAX_TOKEN_LENGTH:
+            raise ValueError(
+                f"Survey token for {cycle_id}/{respondent_id} is {len(token)} chars long, "
+                f"over the limit of {MAX_TOKEN_LENGTH}."
+            )
+        return token
+
+    async def verify(self, token: str, respondent_id: str) -> Optional[TokenData]:
+        """
+        Checks that a token was issued to the given respondent, and its
+        expiry and revocation status.
+        :return: The decoded token data, or None if the token is not valid.
+        """
+        parts = token.split(TOKEN_SEPARATOR, 2)
+        if len(parts) != 3:
+            return None
+        compact, expires, signature = parts
+        cycle_id = expand_cycle_id(compact)
+        if not cycle_id:
+            return None
+        if not hmac.compare_digest(signature, self._sign(self._payload(cycle_id, respondent_id, expires))):
+            logger.warning(f"Rejected survey token {token} presented by {respondent_id}.")
+            return None
+        try:
+            expires_at = int(expires, 36)
+        except ValueError:
+            return None
+        if expires_at < datetime.now(timezone.utc).timestamp():
+            logger.info(f"Rejected expired survey token for cycle {cycle_id}.")
+            return None
+        if await self.is_revoked(cycle_id):
+            logger.info(f"Rejected survey token for revoked cycle {cycle_id}.")
+            return None
+        return TokenData(cycle_id=cycle_id, respondent_id=respondent_id)
+
+    async def is_revoked(self, cycle_id: str) -> bool:
+        if cycle_id in self._revoked:
+            return True
+        if self._following:
+            return False
+        return await self._redis.is_set_member(REVOKED_CYCLES_KEY, cycle_id)
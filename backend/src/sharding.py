@@ -0,0 +1,269 @@
+import asyncio
+import logging
+import time
+from collections import defaultdict
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set
+
+from aiogram import BaseMiddleware, Bot, Dispatcher
+from aiogram.types import TelegramObject, Update
+
+from .config import ShardingSettings
+from .metrics import watch_stats
+from .storage.redis_storage import RedisStorageService, StreamEntry
+
+logger = logging.getLogger(__name__)
+
+STREAM_KEY = "updates:{shard}"
+CONSUMER_GROUP = "workers"
+UPDATE_FIELD = "update"
+# Updates that failed MAX_ATTEMPTS times, with the error.
+DEAD_LETTER_KEY = "updates:dead"
+# Sorted set of worker consumer names by last heartbeat (ms).
+WORKERS_KEY = "updates:workers"
+LEASE_KEY = "updates:lease:{shard}"
+
+
+def shard_key(update: Update) -> int:
+    """
+    Returns the ID updates are partitioned by: the user, else the chat.
+    All updates of one user land in the same shard and keep their order.
+    """
+    event = update.event
+    user = getattr(event, "from_user", None)
+    if user:
+        return user.id
+    chat = getattr(event, "chat", None)
+    if chat:
+        return chat.id
+    return update.update_id
+
+
+def shard_for(update: Update, shards: int) -> int:
+    return shard_key(update) % shards
+
+
+class UpdatePublisher:
+    """
+    Appends incoming updates to the stream of their shard.
+
+    The ingestion process handles updates concurrently (webhook workers), so
+    appends are serialized per shard: updates of one user are published in
+    the order they started publishing, which is the order they arrived in.
+    """
+
+    def __init__(self, redis_service: RedisStorageService, shards: int, maxlen: int):
+        self._redis = redis_service
+        self._shards = shards
+        self._maxlen = maxlen
+        self._locks: Dict[int, asyncio.Lock] = defaultdict(asyncio.Lock)
+
+    async def publish(self, update: Update) -> None:
+        shard = shard_for(update, self._shards)
+        async with self._locks[shard]:
+            await self._redis.add_to_stream(
+                STREAM_KEY.format(shard=shard),
+                {UPDATE_FIELD: update.model_dump_json(exclude_none=True, by_alias=True)},
+                maxlen=self._maxlen,
+            )
+
+
+class PublishingMiddleware(BaseMiddleware):
+    """
+    Outer update middleware for the ingestion process: hands every update to
+    the shard streams instead of processing it locally.
+    """
+
+    def __init__(self, publisher: UpdatePublisher):
+        self._publisher = publisher
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: Update,
+        data: Dict[str, Any],
+    ) -> Any:
+        await self._publisher.publish(event)
+
+
+def create_ingest_dispatcher(
+    redis_service: RedisStorageService, config: ShardingSettings
+) -> Dispatcher:
+    """A dispatcher that only forwards updates to the worker processes."""
+    dp = Dispatcher()
+    dp.update.outer_middleware(
+        PublishingMiddleware(UpdatePublisher(redis_service, config.SHARDS, config.STREAM_MAXLEN))
+    )
+    return dp
+
+
+class ShardWorker:
+    """
+    Consumes the shard streams assigned to one worker process.
+
+    Workers announce themselves with a heartbeat in Redis, and every worker
+    derives the same assignment from the live ones: shard `s` goes to the
+    `s % live`-th worker by name. A worker consumes a shard only while it
+    holds the shard's lease, so when workers come or go the shards move
+    without two workers ever reading one. The new owner of a shard first
+    takes over what the previous one received but did not acknowledge.
+
+    Entries of a shard are processed strictly one after another, so FSM
+    transitions of a user never interleave; different shards are processed
+    concurrently. An entry is acknowledged once handled; a failing one is
+    retried before anything after it, and after `MAX_ATTEMPTS` moved to the
+    dead-letter stream.
+    """
+
+    def __init__(
+        self,
+        dp: Dispatcher,
+        bot: Bot,
+        redis_service: RedisStorageService,
+        worker_index: int,
+        config: ShardingSettings,
+    ):
+        self._dp = dp
+        self._bot = bot
+        self._redis = redis_service
+        self._config = config
+        self._consumer = f"worker-{worker_index}"
+        self._tasks: Dict[int, asyncio.Task] = {}
+        self._releasing: Dict[int, asyncio.Event] = {}
+        self._attempts: Dict[str, int] = {}
+        self._stopping = asyncio.Event()
+        self.processed = 0
+        self.failed = 0
+        self.dead_lettered = 0
+
+    @property
+    def shards(self) -> int:
+        return len(self._tasks)
+
+    async def _process(self, stream: str, entry_id: str, fields: Dict[str, str]) -> bool:
+        """Handles one entry; False if it failed and is to be retried."""
+        try:
+            update = Update.model_validate_json(fields[UPDATE_FIELD], context={"bot": self._bot})
+            await self._dp.feed_update(self._bot, update)
+        except Exception as e:
+            self.failed += 1
+            attempts = self._attempts.get(entry_id, 0) + 1
+            if attempts < self._config.MAX_ATTEMPTS:
+                self._attempts[entry_id] = attempts
+                logger.warning(f"Failed to process {stream} entry {entry_id} (attempt {attempts}): {e}")
+                return False
+            logger.error(f"Giving up on {stream} entry {entry_id} after {attempts} attempts: {e}", exc_info=True)
+            await self._redis.add_to_stream(
+                DEAD_LETTER_KEY,
+                {**fields, "stream": stream, "entry_id": entry_id, "error": repr(e)},
+                maxlen=self._config.STREAM_MAXLEN,
+            )
+            self.dead_lettered += 1
+        self._attempts.pop(entry_id, None)
+        await self._redis.ack_stream(stream, CONSUMER_GROUP, entry_id)
+        self.processed += 1
+        return True
+
+    async def _handle(self, stream: str, entries: List[StreamEntry], releasing: asyncio.Event) -> bool:
+        """
+        Processes entries in order, stopping at the first failure or when the
+        shard is being released; what is left stays pending.
+        :return: Whether every entry was handled.
+        """
+        for entry_id, fields in entries:
+            if releasing.is_set() or not await self._process(stream, entry_id, fields):
+                return False
+        return True
+
+    async def _consume(self, shard: int, releasing: asyncio.Event) -> None:
+        stream = STREAM_KEY.format(shard=shard)
+        config = self._config
+        await self._redis.ensure_consumer_group(stream, CONSUMER_GROUP)
+        claimed = await self._redis.claim_pending(stream, CONSUMER_GROUP, self._consumer, config.BATCH_SIZE)
+        if claimed:
+            logger.warning(f"Took over {claimed} unacknowledged entries of {stream}.")
+
+        while not releasing.is_set():
+            # Unacknowledged entries first: replayed after a restart or a
+            # takeover, or retried after a failure.
+            entries = await self._redis.read_group(
+                stream, CONSUMER_GROUP, self._consumer, config.BATCH_SIZE, pending=True
+            )
+            if not entries:
+                entries = await self._redis.read_group(
+                    stream, CONSUMER_GROUP, self._consumer, config.BATCH_SIZE, config.BLOCK_MS
+                )
+            if not await self._handle(stream, entries, releasing):
+                await _wait(releasing, config.RETRY_DELAY_MS / 1000)
+
+    def _start(self, shard: int) -> None:
+        self._releasing[shard] = asyncio.Event()
+        self._tasks[shard] = asyncio.create_task(self._consume(shard, self._releasing[shard]))
+
+    async def _release(self, shard: int) -> None:
+        """Stops consuming a shard after the entry in progress and gives up its lease."""
+        self._releasing.pop(shard).set()
+        task = self._tasks.pop(shard)
+        try:
+            await task
+        except Exception as e:
+            logger.error(f"Shard {shard} stopped with an error: {e}")
+        await self._redis.release_lock(LEASE_KEY.format(shard=shard), self._consumer)
+
+    async def _rebalance(self) -> None:
+        config = self._config
+        now_ms = time.time() * 1000
+        await self._redis.add_to_sorted_set(WORKERS_KEY, {self._consumer: now_ms})
+        live = sorted(await self._redis.get_sorted_set_members(WORKERS_KEY, now_ms - config.LEASE_TTL_MS))
+        assigned: Set[int] = {
+            shard for shard in range(config.SHARDS) if live[shard % len(live)] == self._consumer
+        }
+
+        owned = list(self._tasks)
+        # Renewed at once: awaiting each in turn queues behind every busy
+        # shard and can outlast the lease under load.
+        renewed = await asyncio.gather(*(
+            self._redis.acquire_lock(LEASE_KEY.format(shard=shard), self._consumer, config.LEASE_TTL_MS)
+            for shard in owned
+        ))
+        released = []
+        for shard, held in zip(owned, renewed):
+            if shard not in assigned:
+                released.append(shard)
+            elif not held:
+                logger.error(f"Lost the lease of shard {shard}.")
+                released.append(shard)
+            elif self._tasks[shard].done():
+                error = self._tasks[shard].exception()
+                logger.error(f"Restarting shard {shard} after an error: {error}")
+                self._start(shard)
+        await asyncio.gather(*(self._release(shard) for shard in released))
+        for shard in sorted(assigned - set(self._tasks)):
+            if await self._redis.acquire_lock(LEASE_KEY.format(shard=shard), self._consumer, config.LEASE_TTL_MS):
+                self._start(shard)
+
+    async def run(self) -> None:
+        """Consumes the assigned shards until stopped, then hands them over."""
+        logger.info(f"{self._consumer} joining the shard workers.")
+        watch_stats("shard_worker", self, "processed", "failed", "dead_lettered", "shards")
+        try:
+            while not self._stopping.is_set():
+                try:
+                    await self._rebalance()
+                except Exception as e:
+                    logger.error(f"Failed to rebalance shards: {e}")
+                await _wait(self._stopping, self._config.LEASE_TTL_MS / 3000)
+        finally:
+            await asyncio.gather(*(self._release(shard) for shard in list(self._tasks)))
+            await self._redis.remove_from_sorted_set(WORKERS_KEY, self._consumer)
+
+    def stop(self) -> None:
+        """Lets every shard finish the entry in progress and gives the shards up."""
+        self._stopping.set()
+
+
+async def _wait(event: asyncio.Event, timeout: Optional[float]) -> None:
+    """Sleeps for `timeout` seconds or until the event is set."""
+    try:
+        await asyncio.wait_for(event.wait(), timeout)
+    except asyncio.TimeoutError:
+        pass
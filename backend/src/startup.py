@@ -0,0 +1,79 @@
+import asyncio
+import logging
+import time
+from typing import Awaitable, Dict, List
+
+from aiogram import Dispatcher
+
+logger = logging.getLogger(__name__)
+
+
+class StartupProfiler:
+    """
+    Times the startup phases of a process and logs them in one line once
+    it is ready for updates. `started` is when the application imports
+    began, so the first phase covers the import cost.
+    """
+
+    def __init__(self, started: float):
+        self._started = started
+        self._last = started
+        self.phases: Dict[str, float] = {}
+
+    def mark(self, phase: str) -> None:
+        """Ends a phase that began when the previous one ended."""
+        now = time.perf_counter()
+        self.phases[phase] = now - self._last
+        self._last = now
+
+    async def timed(self, phase: str, awaitable: Awaitable) -> None:
+        """Times a phase that overlaps others, e.g. one warm-up task."""
+        started = time.perf_counter()
+        try:
+            await awaitable
+        finally:
+            self.phases[phase] = time.perf_counter() - started
+
+    def log(self) -> None:
+        total = time.perf_counter() - self._started
+        phases = ", ".join(f"{name} {seconds:.2f} s" for name, seconds in self.phases.items())
+        logger.info(f"Started in {total:.2f} s: {phases}.")
+
+
+async def warm_up(dp: Dispatcher, profiler: StartupProfiler, timeout: float) -> List[str]:
+    """
+    Loads the employee directory with its Telegram IDs and the questionnaire
+    concurrently, so the first update finds them in memory and in Redis,
+    and counts cycles stored before the active-cycle set existed.
+
+    Past the timeout the process starts anyway (degraded): the loads go on
+    in the background, and until then handlers load what they need
+    themselves.
+    :return: The names of the tasks that failed or did not finish in time.
+    """
+    tasks = {
+        "employees": dp["employee_service"].load_employees(),
+        "questionnaire": dp["questionnaire_service"].get_questionnaire(),
+        "active_cycles": dp["cycle_service"].backfill_active_cycles(),
+    }
+    gathered = asyncio.gather(
+        *(profiler.timed(f"warm_up.{name}", task) for name, task in tasks.items()),
+        return_exceptions=True,
+    )
+    try:
+        # Shielded, so the loads that are still running are not cancelled.
+        results = await asyncio.wait_for(asyncio.shield(gathered), timeout)
+    except asyncio.TimeoutError:
+        unfinished = [name for name in tasks if f"warm_up.{name}" not in profiler.phases]
+        logger.warning(
+            f"Warm-up did not finish in {timeout:.0f} s ({', '.join(unfinished)}); "
+            f"starting degraded while it continues."
+        )
+        return unfinished
+
+    failed = []
+    for name, result in zip(tasks, results):
+        if isinstance(result, Exception):
+            logger.error(f"Warm-up of {name} failed; starting degraded: {result}", exc_info=result)
+            failed.append(name)
+    return failed
@@ -0,0 +1,212 @@
+import asyncio
+import logging
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, Optional
+
+from redis.asyncio.client import Redis
+from redis.asyncio.connection import Connection
+from redis.exceptions import RedisError, ResponseError
+
+from ..metrics import CACHE_REQUESTS
+
+logger = logging.getLogger(__name__)
+
+INVALIDATE_CHANNEL = "__redis__:invalidate"
+# Keyspace events needed by the fallback: generic commands (DEL, EXPIRE,
+# RENAME), string commands, expirations and evictions.
+KEYSPACE_EVENTS = "Kg$xe"
+RECONNECT_DELAY_SECONDS = 1.0
+MAX_RECONNECT_DELAY_SECONDS = 30.0
+
+MISSING = object()
+
+
+class ClientSideCache:
+    """
+    A bounded LRU of values read from Redis, kept coherent by invalidations
+    the server pushes.
+
+    One dedicated connection enables CLIENT TRACKING in broadcast mode for
+    the cached key prefixes, redirected to itself, and subscribes to the
+    invalidation channel. Servers without tracking (Redis 5, as in the
+    compose file) are followed through keyspace notifications instead;
+    the server must publish `KEYSPACE_EVENTS`. The cache only turns them
+    on itself (CONFIG SET, which affects every client of the server) with
+    `configure_keyspace_events`; otherwise it stays disabled.
+    While that connection is down the cache is emptied and bypassed, so a
+    missed invalidation never serves stale data.
+
+    A read that races with an invalidation of the same key is returned to
+    its caller but not cached. Missing keys are not cached.
+    """
+
+    def __init__(
+        self,
+        redis_client: Redis,
+        prefixes: Iterable[str],
+        max_entries: int = 10_000,
+        configure_keyspace_events: bool = False,
+    ):
+        self._redis = redis_client
+        self._prefixes = tuple(prefixes)
+        self._max_entries = max_entries
+        self._configure_keyspace_events = configure_keyspace_events
+        self._entries: "OrderedDict[str, Any]" = OrderedDict()
+        # Keys being read from the server -> whether the read may still be cached.
+        self._reading: Dict[str, bool] = {}
+        self._connection: Optional[Connection] = None
+        self._task: Optional[asyncio.Task] = None
+        self._keyspace_prefix = ""
+        self.mode: Optional[str] = None
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    @property
+    def size(self) -> int:
+        return len(self._entries)
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def handles(self, key: str) -> bool:
+        return self.mode is not None and key.startswith(self._prefixes)
+
+    def get(self, key: str) -> Any:
+        """The cached value, or MISSING. A miss marks the key as being read."""
+        value = self._entries.get(key, MISSING)
+        if value is MISSING:
+            self.misses += 1
+            CACHE_REQUESTS.inc("redis_client", "miss")
+            # A concurrent read of the key keeps its (possibly invalidated) state.
+            self._reading.setdefault(key, True)
+        else:
+            self.hits += 1
+            CACHE_REQUESTS.inc("redis_client", "hit")
+            self._entries.move_to_end(key)
+        return value
+
+    def put(self, key: str, value: Any) -> None:
+        """
+        Caches a value read after a miss, unless it was invalidated
+        meanwhile. Must follow every miss; None just ends the read.
+        """
+        if self._reading.pop(key, False) and value is not None and self.mode is not None:
+            self._entries[key] = value
+            if len(self._entries) > self._max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, key: str) -> None:
+        self.invalidations += 1
+        self._entries.pop(key, None)
+        if key in self._reading:
+            self._reading[key] = False
+
+    def clear(self) -> None:
+        self._entries.clear()
+        for key in self._reading:
+            self._reading[key] = False
+
+    async def _subscribe(self) -> bool:
+        """:return: False if the server cannot report invalidations."""
+        connection = self._connection = self._redis.connection_pool.make_connection()
+        await connection.connect()
+        await connection.send_command("CLIENT", "ID")
+        client_id = await connection.read_response()
+        prefixes = [arg for prefix in self._prefixes for arg in ("PREFIX", prefix)]
+        try:
+            await connection.send_command(
+                "CLIENT", "TRACKING", "ON", "REDIRECT", client_id, "BCAST", *prefixes
+            )
+            await connection.read_response()
+        except ResponseError:
+            if not await self._enable_keyspace_events(connection):
+                return False
+            db = self._redis.connection_pool.connection_kwargs.get("db", 0)
+            self._keyspace_prefix = f"__keyspace@{db}__:"
+            await connection.send_command(
+                "PSUBSCRIBE", *(f"{self._keyspace_prefix}{prefix}*" for prefix in self._prefixes)
+            )
+            for _ in self._prefixes:
+                await connection.read_response()
+            self.mode = "keyspace"
+        else:
+            await connection.send_command("SUBSCRIBE", INVALIDATE_CHANNEL)
+            await connection.read_response()
+            self.mode = "tracking"
+        return True
+
+    async def _enable_keyspace_events(self, connection: Connection) -> bool:
+        """:return: Whether the server publishes the keyspace events the fallback needs."""
+        try:
+            await connection.send_command("CONFIG", "GET", "notify-keyspace-events")
+            _, current = await connection.read_response()
+        except ResponseError as e:
+            logger.error(f"Client-side cache disabled: cannot read notify-keyspace-events ({e}).")
+            return False
+        current = current.decode("utf-8") if isinstance(current, bytes) else current
+        # "A" stands for all the event classes.
+        enabled = current.replace("A", "g$lshzxe")
+        missing = "".join(flag for flag in KEYSPACE_EVENTS if flag not in enabled)
+        if not missing:
+            return True
+        if not self._configure_keyspace_events:
+            logger.error(
+                f"Client-side cache disabled: Redis has no CLIENT TRACKING and its "
+                f"notify-keyspace-events '{current}' lacks '{missing}'. Configure the server, "
+                f"or set REDIS_CLIENT_CACHE_KEYSPACE_EVENTS=true to let the bot set it."
+            )
+            return False
+        logger.warning(f"Setting notify-keyspace-events to '{current + missing}' on the Redis server.")
+        await connection.send_command("CONFIG", "SET", "notify-keyspace-events", current + missing)
+        await connection.read_response()
+        return True
+
+    def _handle(self, message: list) -> None:
+        if message[0] == b"message":
+            keys = message[2]
+            if keys is None:
+                # FLUSHDB/FLUSHALL
+                self.clear()
+                return
+            for key in keys:
+                self.invalidate(key.decode("utf-8"))
+        elif message[0] == b"pmessage":
+            self.invalidate(message[2].decode("utf-8")[len(self._keyspace_prefix):])
+
+    async def _listen(self) -> None:
+        delay = RECONNECT_DELAY_SECONDS
+        while True:
+            try:
+                if not await self._subscribe():
+                    return
+                logger.info(f"Client-side cache active ({self.mode}) for {', '.join(self._prefixes)}.")
+                delay = RECONNECT_DELAY_SECONDS
+                while True:
+                    self._handle(await self._connection.read_response())
+            except (RedisError, OSError) as e:
+                logger.warning(f"Client-side cache disabled, reconnecting in {delay:.0f}s: {e}")
+            finally:
+                self.mode = None
+                self.clear()
+                if self._connection:
+                    await self._connection.disconnect()
+                    self._connection = None
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, MAX_RECONNECT_DELAY_SECONDS)
+
+    def start(self) -> None:
+        """Starts following invalidations; the cache is used once subscribed."""
+        if self._task is None:
+            self._task = asyncio.create_task(self._listen())
+
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
@@ -4,11 +4,35 @@ from typing import Dict, List, Literal, Optional
 from pydantic import BaseModel, Field, field_validator
 
 
+SCALE_CHOICES = ["0", "1", "2", "3"]
+
+
 class Question(BaseModel):
     id: str = Field(alias="question_id")
     text: str = Field(alias="question_text")
     type: str = Field(alias="question_type")
     result_column: Optional[str] = Field(alias="sheet_column", default=None)
+    # Comma-separated choices of radio and checkbox questions; for scales,
+    # a description of the levels.
+    options: str = ""
+    required: bool = Field(alias="is_required", default=False)
+
+    @field_validator("required", mode="before")
+    @classmethod
+    def parse_required(cls, v):
+        """Accepts the sheet's «да (≥ 1 чек)» / «нет» as well as booleans."""
+        if isinstance(v, str):
+            return v.strip().lower().startswith(("да", "yes", "true", "1"))
+        return v
+
+    @property
+    def choices(self) -> List[str]:
+        """The answers offered as buttons; empty for free-text questions."""
+        if self.type == "scale":
+            return SCALE_CHOICES
+        if self.type in ("radio", "checkbox"):
+            return [choice.strip() for choice in self.options.split(",") if choice.strip()]
+        return []
 
     @field_validator("type")
     @classmethod
@@ -62,7 +86,27 @@ class FeedbackCycle(BaseModel):
     respondents: Dict[str, RespondentInfo]  # key: respondent_id
     deadline: date
     status: Literal["active", "closed", "reported"] = "active"
+    results_sheet: Optional[str] = None
+    # None for cycles created before results were sharded: the main spreadsheet.
+    results_spreadsheet_id: Optional[str] = None
     created_at: datetime = Field(default_factory=datetime.utcnow)
+    # Set when the cycle is brought back from the archive.
+    restored_at: Optional[datetime] = None
+
+
+class CycleSummary(BaseModel):
+    """What stays readable of an archived cycle; the full cycle is compressed."""
+
+    id: str
+    target_employee_id: str
+    status: Literal["closed", "reported"]
+    deadline: date
+    created_at: datetime
+    results_sheet: Optional[str] = None
+    results_spreadsheet_id: Optional[str] = None
+    # Final progress counters: invited, started, completed, overdue.
+    counters: Dict[str, int] = {}
+    archived_at: datetime = Field(default_factory=datetime.utcnow)
 
 
 class FeedbackDraft(BaseModel):
@@ -1,20 +1,98 @@
-from typing import List, Optional, Set, Type, TypeVar
+from typing import AsyncIterator, Callable, Dict, List, Optional, Set, Tuple, Type, TypeVar
 
 from pydantic import BaseModel
-from redis.asyncio.client import Redis
+from redis.asyncio.client import Pipeline, PubSub, Redis
+from redis.commands.core import AsyncScript
+from redis.exceptions import ResponseError, WatchError
+
+from ..metrics import REDIS_ERRORS, REDIS_LATENCY, instrument_methods
+from ..tracing import traced_methods
+from .client_cache import MISSING, ClientSideCache
 
 T = TypeVar("T", bound=BaseModel)
+StreamEntry = Tuple[str, Dict[str, str]]
+
+# Atomically pops up to ARGV[2] members with a score <= ARGV[1].
+_POP_DUE_SCRIPT = """
+local items = redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', ARGV[1], 'LIMIT', 0, ARGV[2])
+if #items > 0 then
+    redis.call('ZREM', KEYS[1], unpack(items))
+end
+return items
+"""
+
+# Leases up to ARGV[2] members with a score <= ARGV[1] by moving them to
+# the score ARGV[3], when they are due again unless released first.
+_CLAIM_DUE_SCRIPT = """
+local items = redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', ARGV[1], 'LIMIT', 0, ARGV[2])
+for _, item in ipairs(items) do
+    redis.call('ZADD', KEYS[1], ARGV[3], item)
+end
+return items
+"""
+
+# Removes the members ARGV[2..] that still have the score ARGV[1].
+_RELEASE_CLAIMED_SCRIPT = """
+local removed = 0
+for i = 2, #ARGV do
+    local score = redis.call('ZSCORE', KEYS[1], ARGV[i])
+    if score and tonumber(score) == tonumber(ARGV[1]) then
+        removed = removed + redis.call('ZREM', KEYS[1], ARGV[i])
+    end
+end
+return removed
+"""
+
+# Moves up to ARGV[1] items (all with 0) from the head of one list to the
+# tail of another; LMOVE would need Redis 6.2.
+_MOVE_LIST_SCRIPT = """
+local last = tonumber(ARGV[1]) - 1
+local items = redis.call('LRANGE', KEYS[1], 0, last)
+if #items > 0 then
+    redis.call('LTRIM', KEYS[1], #items, -1)
+    redis.call('RPUSH', KEYS[2], unpack(items))
+end
+return items
+"""
 
+# Extends a lock only if it is still held by the caller.
+_EXTEND_LOCK_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('PEXPIRE', KEYS[1], ARGV[2])
+end
+return 0
+"""
 
+# Deletes a lock only if it is still held by the caller.
+_RELEASE_LOCK_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+
+@traced_methods
+@instrument_methods(REDIS_LATENCY, REDIS_ERRORS)
 class RedisStorageService:
     """
     A service for storing and retrieving Pydantic models in Redis.
 
     Handles serialization to JSON and deserialization back to Pydantic models.
+    With a `ClientSideCache`, `get`, `get_model` and `get_models` serve
+    cached keys from memory. The cache holds the stored JSON rather than
+    models, so every caller still gets its own instance to modify.
     """
 
-    def __init__(self, redis_client: Redis):
+    def __init__(self, redis_client: Redis, cache: Optional[ClientSideCache] = None):
         self._redis = redis_client
+        self._cache = cache
+        self._pop_due = redis_client.register_script(_POP_DUE_SCRIPT)
+        self._claim_due = redis_client.register_script(_CLAIM_DUE_SCRIPT)
+        self._release_claimed = redis_client.register_script(_RELEASE_CLAIMED_SCRIPT)
+        self._move_list = redis_client.register_script(_MOVE_LIST_SCRIPT)
+        self._extend_lock = redis_client.register_script(_EXTEND_LOCK_SCRIPT)
+        self._release_lock = redis_client.register_script(_RELEASE_LOCK_SCRIPT)
 
     async def set_model(
         self, key: str, model: BaseModel, ttl: Optional[int] = None
@@ -26,25 +104,135 @@ class RedisStorageService:
         :param model: The Pydantic model instance to store.
         :param ttl: Optional Time-To-Live for the key in seconds.
         """
+        self.invalidate(key)
         await self._redis.set(key, model.model_dump_json(by_alias=True), ex=ttl)
 
+    def invalidate(self, *keys: str) -> None:
+        """
+        Drops keys from the local cache. Writes made here do it themselves;
+        callers writing cached keys through a `pipeline` call it as they
+        queue the commands.
+        """
+        # The server's invalidation arrives asynchronously; this makes our
+        # own writes visible to our next read at once.
+        if self._cache:
+            for key in keys:
+                self._cache.invalidate(key)
+
     async def delete_key(self, key: str) -> int:
         """Deletes a key from Redis."""
+        self.invalidate(key)
         return await self._redis.delete(key)
 
     async def set_value(self, key: str, value: str, ttl: Optional[int] = None):
         """Sets a simple string value in Redis."""
+        self.invalidate(key)
         await self._redis.set(key, value, ex=ttl)
 
+    async def set_values(self, mapping: Dict[str, str]) -> None:
+        """Sets several string values in a single round-trip."""
+        for key in mapping:
+            self.invalidate(key)
+        await self._redis.mset(mapping)
+
+    async def _get_raw(self, key: str) -> Optional[bytes]:
+        cache = self._cache
+        if not cache or not cache.handles(key):
+            return await self._redis.get(key)
+        value = cache.get(key)
+        if value is MISSING:
+            value = None
+            try:
+                value = await self._redis.get(key)
+            finally:
+                cache.put(key, value)
+        return value
+
+    async def _mget_raw(self, keys: List[str]) -> List[Optional[bytes]]:
+        cache = self._cache
+        if not cache:
+            return await self._redis.mget(keys)
+        values = [cache.get(key) if cache.handles(key) else MISSING for key in keys]
+        misses = [index for index, value in enumerate(values) if value is MISSING]
+        if not misses:
+            return values
+        loaded: Dict[int, Optional[bytes]] = {}
+        try:
+            loaded = dict(zip(misses, await self._redis.mget([keys[index] for index in misses])))
+        finally:
+            for index in misses:
+                cache.put(keys[index], loaded.get(index))
+        for index, value in loaded.items():
+            values[index] = value
+        return values
+
     async def get(self, key: str) -> Optional[str]:
         """Gets a simple string value from Redis."""
-        value = await self._redis.get(key)
+        value = await self._get_raw(key)
         return value.decode('utf-8') if value else None
 
+    async def get_many(self, keys: List[str]) -> List[Optional[str]]:
+        """Gets several string values in a single round-trip."""
+        if not keys:
+            return []
+        return [value.decode("utf-8") if value else None for value in await self._mget_raw(keys)]
+
+    async def increment(self, key: str, amount: int = 1) -> int:
+        """Atomically increments an integer value in Redis."""
+        return await self._redis.incrby(key, amount)
+
+    async def set_many_if_absent(self, items: Dict[str, int], value: str = "1") -> List[bool]:
+        """
+        Sets each key (with a TTL in seconds) only if it does not exist yet,
+        in a single round-trip.
+        :return: For every key, whether it was newly set.
+        """
+        pipe = self._redis.pipeline(transaction=False)
+        for key, ttl in items.items():
+            pipe.set(key, value, nx=True, ex=ttl)
+        return [bool(result) for result in await pipe.execute()]
+
+    async def set_many_with_ttl(self, items: Dict[str, int], value: str) -> None:
+        """Sets each key to `value` with its own TTL in seconds, in a single round-trip."""
+        pipe = self._redis.pipeline(transaction=False)
+        for key, ttl in items.items():
+            pipe.set(key, value, ex=ttl)
+        await pipe.execute()
+
+    async def push_to_list(self, key: str, value: str, max_length: int) -> None:
+        """Prepends a value to a list, keeping only the newest `max_length` items."""
+        async with self._redis.pipeline(transaction=True) as pipe:
+            pipe.lpush(key, value)
+            pipe.ltrim(key, 0, max_length - 1)
+            await pipe.execute()
+
+    async def append_to_list(self, key: str, values: List[str]) -> None:
+        """Appends values to the end of a list."""
+        if values:
+            await self._redis.rpush(key, *values)
+
+    async def move_list_items(self, source: str, destination: str, count: int = 0) -> List[str]:
+        """
+        Atomically moves up to `count` items (all with 0) from the head of
+        one list to the tail of another.
+        :return: The moved items.
+        """
+        items = await self._move_list(keys=[source, destination], args=[count])
+        return [item.decode("utf-8") for item in items]
+
+    async def get_list(self, key: str) -> List[str]:
+        return [item.decode("utf-8") for item in await self._redis.lrange(key, 0, -1)]
+
     async def add_to_set(self, key: str, value: str):
         """Adds a value to a Redis set."""
         await self._redis.sadd(key, value)
 
+    async def remove_from_set(self, key: str, *values: str) -> None:
+        await self._redis.srem(key, *values)
+
+    async def count_set(self, key: str) -> int:
+        return await self._redis.scard(key)
+
     async def get_set(self, key: str) -> Set[str]:
         """Gets all members of a Redis set."""
         members = await self._redis.smembers(key)
@@ -57,11 +245,226 @@ class RedisStorageService:
         :param model_class: The Pydantic model class to validate against.
         :return: An instance of the model class, or None if the key does not exist.
         """
-        data = await self._redis.get(key)
+        data = await self._get_raw(key)
         if not data:
             return None
         return model_class.model_validate_json(data)
 
+    async def update_model(
+        self, key: str, model_class: Type[T], update: Callable[[T], None]
+    ) -> T | None:
+        """
+        Applies a change to a stored model without losing concurrent ones:
+        the model is read under WATCH and written in MULTI, and re-read and
+        changed again if another client wrote it meanwhile.
+        :param update: Changes the model in place.
+        :return: The stored model, or None if the key does not exist.
+        """
+        async with self._redis.pipeline(transaction=True) as pipe:
+            while True:
+                try:
+                    await pipe.watch(key)
+                    data = await pipe.get(key)
+                    if not data:
+                        return None
+                    model = model_class.model_validate_json(data)
+                    update(model)
+                    pipe.multi()
+                    pipe.set(key, model.model_dump_json(by_alias=True))
+                    await pipe.execute()
+                except WatchError:
+                    continue
+                self.invalidate(key)
+                return model
+
+    async def get_models(
+        self, keys: List[str], model_class: Type[T]
+    ) -> List[T | None]:
+        """Retrieves several Pydantic models in a single round-trip."""
+        if not keys:
+            return []
+        values = await self._mget_raw(keys)
+        return [model_class.model_validate_json(v) if v else None for v in values]
+
     async def get_keys_by_pattern(self, pattern: str) -> List[str]:
         """Returns a list of keys matching a pattern."""
         return [key.decode("utf-8") for key in await self._redis.keys(pattern)]
+
+    async def scan_keys(self, pattern: str, count: int = 500) -> AsyncIterator[str]:
+        """Iterates over the keys matching a pattern without blocking the server."""
+        async for key in self._redis.scan_iter(match=pattern, count=count):
+            yield key.decode("utf-8")
+
+    async def add_to_sorted_set(self, key: str, mapping: Dict[str, float]) -> None:
+        """Adds members with their scores to a Redis sorted set."""
+        if mapping:
+            await self._redis.zadd(key, mapping)
+
+    async def pop_due_from_sorted_set(
+        self, key: str, max_score: float, limit: int
+    ) -> List[str]:
+        """
+        Atomically removes and returns up to `limit` members of a sorted set
+        whose score is less than or equal to `max_score`.
+        """
+        members = await self._pop_due(keys=[key], args=[max_score, limit])
+        return [member.decode("utf-8") for member in members]
+
+    async def claim_due_from_sorted_set(
+        self, key: str, max_score: float, limit: int, lease_until: float
+    ) -> List[str]:
+        """
+        Atomically takes up to `limit` members of a sorted set whose score is
+        less than or equal to `max_score` by rescoring them to `lease_until`.
+        Members not released with `release_claimed` by then are due again.
+        """
+        members = await self._claim_due(keys=[key], args=[max_score, limit, lease_until])
+        return [member.decode("utf-8") for member in members]
+
+    async def release_claimed(self, key: str, members: List[str], lease_until: float) -> int:
+        """
+        Removes claimed members of a sorted set, except those rescored since
+        the claim.
+        :return: The number of members removed.
+        """
+        if not members:
+            return 0
+        return await self._release_claimed(keys=[key], args=[lease_until, *members])
+
+    async def acquire_lock(self, key: str, owner: str, ttl_ms: int) -> bool:
+        """
+        Acquires or renews a lock identified by `key` for `owner`.
+        :return: True if `owner` holds the lock after the call.
+        """
+        if await self._redis.set(key, owner, nx=True, px=ttl_ms):
+            return True
+        return bool(await self._extend_lock(keys=[key], args=[owner, ttl_ms]))
+
+    async def release_lock(self, key: str, owner: str) -> None:
+        """Releases a lock if it is held by `owner`."""
+        await self._release_lock(keys=[key], args=[owner])
+
+    async def get_hash(self, key: str) -> Dict[str, str]:
+        """Gets all fields and values of a Redis hash."""
+        data = await self._redis.hgetall(key)
+        return {k.decode("utf-8"): v.decode("utf-8") for k, v in data.items()}
+
+    async def scan_hash(self, key: str, count: int = 500) -> AsyncIterator[Tuple[str, str]]:
+        """Iterates over the fields and values of a Redis hash without loading it at once."""
+        async for field, value in self._redis.hscan_iter(key, count=count):
+            yield field.decode("utf-8"), value.decode("utf-8")
+
+    async def get_hash_field(self, key: str, field: str) -> Optional[str]:
+        value = await self._redis.hget(key, field)
+        return value.decode("utf-8") if value else None
+
+    async def get_hash_field_bytes(self, key: str, field: str) -> Optional[bytes]:
+        """Gets a binary hash value, e.g. compressed data."""
+        return await self._redis.hget(key, field)
+
+    async def set_hash_fields(self, key: str, mapping: Dict[str, str]) -> None:
+        """Sets several fields of a Redis hash."""
+        await self._redis.hset(key, mapping=mapping)
+
+    async def used_memory(self) -> int:
+        """Bytes allocated by the Redis server, as reported by INFO."""
+        return (await self._redis.info("memory"))["used_memory"]
+
+    def pipeline(self, transaction: bool = True) -> Pipeline:
+        """Returns a pipeline to send several commands in one round-trip."""
+        return self._redis.pipeline(transaction=transaction)
+
+    def pubsub(self) -> PubSub:
+        """Returns a client to subscribe to channels, on a connection of its own."""
+        return self._redis.pubsub()
+
+    def register_script(self, script: str) -> AsyncScript:
+        """Registers a Lua script to be executed atomically on the server."""
+        return self._redis.register_script(script)
+
+    async def add_to_stream(
+        self, key: str, fields: Dict[str, str], maxlen: Optional[int] = None
+    ) -> str:
+        """Appends an entry to a Redis stream, trimming it to about `maxlen` entries."""
+        entry_id = await self._redis.xadd(key, fields, maxlen=maxlen, approximate=True)
+        return entry_id.decode("utf-8")
+
+    async def ensure_consumer_group(self, key: str, group: str) -> None:
+        """Creates a consumer group (and the stream) if it does not exist yet."""
+        try:
+            await self._redis.xgroup_create(key, group, id="0", mkstream=True)
+        except ResponseError as e:
+            if "BUSYGROUP" not in str(e):
+                raise
+
+    async def read_group(
+        self,
+        key: str,
+        group: str,
+        consumer: str,
+        count: int,
+        block_ms: Optional[int] = None,
+        pending: bool = False,
+    ) -> List[StreamEntry]:
+        """
+        Reads entries for a consumer of a group. With `pending=True` returns
+        the entries already delivered to this consumer but not acknowledged.
+        Pending entries trimmed from the stream meanwhile are acknowledged
+        and skipped.
+        """
+        response = await self._redis.xreadgroup(
+            group, consumer, {key: "0" if pending else ">"}, count=count, block=block_ms
+        )
+        entries = [entry for _, stream_entries in response or [] for entry in stream_entries]
+        trimmed = [entry_id for entry_id, fields in entries if not fields]
+        if trimmed:
+            await self._redis.xack(key, group, *trimmed)
+        return [_decode_stream_entry(entry) for entry in entries if entry[1]]
+
+    async def ack_stream(self, key: str, group: str, *entry_ids: str) -> None:
+        """Acknowledges processed stream entries."""
+        if entry_ids:
+            await self._redis.xack(key, group, *entry_ids)
+
+    async def claim_pending(self, key: str, group: str, consumer: str, count: int) -> int:
+        """
+        Takes over every entry other consumers received but did not
+        acknowledge, e.g. when a shard changes hands; `read_group` with
+        `pending=True` then returns them in order. Works on Redis 5 (no
+        XAUTOCLAIM).
+        :return: The number of entries claimed.
+        """
+        claimed = 0
+        start = "-"
+        while True:
+            pending = await self._redis.xpending_range(key, group, start, "+", count)
+            foreign = [
+                p["message_id"] for p in pending if p["consumer"].decode("utf-8") != consumer
+            ]
+            if foreign:
+                await self._redis.xclaim(key, group, consumer, 0, foreign, justid=True)
+                claimed += len(foreign)
+            if len(pending) < count:
+                return claimed
+            # Redis 5 has no exclusive ranges: continue after the last ID.
+            ms, _, seq = pending[-1]["message_id"].decode("utf-8").partition("-")
+            start = f"{ms}-{int(seq) + 1}"
+
+    async def get_sorted_set_members(self, key: str, min_score: float) -> List[str]:
+        """Members of a sorted set with a score of at least `min_score`."""
+        members = await self._redis.zrangebyscore(key, min_score, "+inf")
+        return [member.decode("utf-8") for member in members]
+
+    async def remove_from_sorted_set(self, key: str, *members: str) -> None:
+        if members:
+            await self._redis.zrem(key, *members)
+
+    async def is_set_member(self, key: str, value: str) -> bool:
+        return bool(await self._redis.sismember(key, value))
+
+
+def _decode_stream_entry(entry) -> StreamEntry:
+    entry_id, fields = entry
+    return entry_id.decode("utf-8"), {
+        k.decode("utf-8"): v.decode("utf-8") for k, v in fields.items()
+    }
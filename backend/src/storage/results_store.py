@@ -0,0 +1,308 @@
+import fcntl
+import json
+import logging
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS cycles (
+    id TEXT PRIMARY KEY,
+    target_employee_id TEXT NOT NULL,
+    results_sheet TEXT NOT NULL,
+    results_spreadsheet_id TEXT,
+    headers TEXT NOT NULL,
+    created_at TEXT NOT NULL,
+    -- 0 for cycles created elsewhere and registered on their first
+    -- submission here: their other results are only in the worksheet.
+    complete INTEGER NOT NULL DEFAULT 1
+);
+CREATE TABLE IF NOT EXISTS submissions (
+    id INTEGER PRIMARY KEY,
+    cycle_id TEXT NOT NULL REFERENCES cycles(id),
+    respondent_id TEXT NOT NULL,
+    submitted_at TEXT NOT NULL,
+    UNIQUE (cycle_id, respondent_id)
+);
+CREATE TABLE IF NOT EXISTS answers (
+    submission_id INTEGER NOT NULL REFERENCES submissions(id),
+    column_name TEXT NOT NULL,
+    value TEXT NOT NULL,
+    PRIMARY KEY (submission_id, column_name)
+) WITHOUT ROWID;
+-- Submissions waiting to be mirrored to Sheets, in commit order.
+CREATE TABLE IF NOT EXISTS outbox (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    submission_id INTEGER NOT NULL REFERENCES submissions(id)
+);
+CREATE TABLE IF NOT EXISTS checkpoints (
+    name TEXT PRIMARY KEY,
+    seq INTEGER NOT NULL
+);
+"""
+
+MIRROR_CHECKPOINT = "sheets"
+
+
+@dataclass
+class MirrorItem:
+    seq: int
+    cycle_id: str
+    spreadsheet_id: Optional[str]
+    sheet: str
+    row: List[Any]
+
+
+class ResultsStore:
+    """
+    The system of record for survey results: an SQLite database in WAL mode.
+
+    A submission and its answers are committed in one transaction together
+    with an outbox entry; `SheetsMirror` copies outbox entries to the
+    results worksheets later.
+
+    The methods block on disk I/O, so async code calls them through
+    `asyncio.to_thread`; a lock serializes them on the one connection.
+
+    Every process on a host that shares the database file (the bot and its
+    shard workers) runs a mirror; a file lock next to the database lets one
+    of them mirror at a time, so rows are not appended twice.
+    """
+
+    def __init__(self, path: str):
+        self._mirror_lock_file = None
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            self._mirror_lock_file = open(f"{path}.mirror.lock", "a")
+        self._lock = threading.RLock()
+        self._db = sqlite3.connect(path, isolation_level=None, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute("PRAGMA foreign_keys=ON")
+        self._db.executescript(SCHEMA)
+        self._migrate()
+
+    def _migrate(self) -> None:
+        columns = {row[1] for row in self._db.execute("PRAGMA table_info(cycles)")}
+        if "complete" not in columns:
+            self._db.execute("ALTER TABLE cycles ADD COLUMN complete INTEGER NOT NULL DEFAULT 1")
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
+        if self._mirror_lock_file:
+            self._mirror_lock_file.close()
+
+    @contextmanager
+    def mirror_lock(self) -> Iterator[bool]:
+        """
+        Takes the mirror lock of the database file without waiting.
+        :return: Whether this process holds it; if not, another one is mirroring.
+        """
+        if not self._mirror_lock_file:
+            yield True
+            return
+        try:
+            fcntl.flock(self._mirror_lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            fcntl.flock(self._mirror_lock_file, fcntl.LOCK_UN)
+
+    def record_cycle(
+        self,
+        cycle_id: str,
+        target_employee_id: str,
+        results_sheet: str,
+        results_spreadsheet_id: Optional[str],
+        headers: List[str],
+        complete: bool = True,
+    ) -> None:
+        """
+        Registers a cycle. With `complete=False` an already registered cycle
+        is left as it is.
+        """
+        with self._lock:
+            self._db.execute(
+                f"INSERT OR {'REPLACE' if complete else 'IGNORE'} INTO cycles "
+                "(id, target_employee_id, results_sheet, results_spreadsheet_id, headers, "
+                "created_at, complete) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (
+                    cycle_id,
+                    target_employee_id,
+                    results_sheet,
+                    results_spreadsheet_id,
+                    json.dumps(headers, ensure_ascii=False),
+                    datetime.utcnow().isoformat(),
+                    int(complete),
+                ),
+            )
+
+    def has_cycle(self, cycle_id: str) -> bool:
+        """Whether the store holds every result of the cycle, i.e. it was created on this host."""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT 1 FROM cycles WHERE id = ? AND complete", (cycle_id,)
+            ).fetchone()
+        return row is not None
+
+    def record_submission(
+        self,
+        cycle_id: str,
+        respondent_id: str,
+        answers: Dict[str, Any],
+        submitted_at: Optional[datetime] = None,
+    ) -> int:
+        """
+        Stores a respondent's answers, keyed by result column, and queues
+        them for mirroring.
+        :return: The submission ID.
+        :raises sqlite3.IntegrityError: If the respondent already submitted.
+        """
+        submitted_at = (submitted_at or datetime.utcnow()).isoformat(timespec="seconds")
+        with self._lock, self._transaction():
+            cursor = self._db.execute(
+                "INSERT INTO submissions (cycle_id, respondent_id, submitted_at) VALUES (?, ?, ?)",
+                (cycle_id, respondent_id, submitted_at),
+            )
+            submission_id = cursor.lastrowid
+            self._db.executemany(
+                "INSERT INTO answers VALUES (?, ?, ?)",
+                [(submission_id, column, str(value)) for column, value in answers.items()],
+            )
+            self._db.execute("INSERT INTO outbox (submission_id) VALUES (?)", (submission_id,))
+        return submission_id
+
+    @contextmanager
+    def _transaction(self) -> Iterator[None]:
+        self._db.execute("BEGIN IMMEDIATE")
+        try:
+            yield
+        except BaseException:
+            self._db.execute("ROLLBACK")
+            raise
+        self._db.execute("COMMIT")
+
+    def cycle_version(self, cycle_id: str) -> str:
+        """Changes whenever a submission is added to the cycle."""
+        with self._lock:
+            count, last = self._db.execute(
+                "SELECT count(*), max(id) FROM submissions WHERE cycle_id = ?", (cycle_id,)
+            ).fetchone()
+        return f"{count}:{last or 0}"
+
+    def get_headers(self, cycle_id: str) -> Optional[List[str]]:
+        """The cycle's header row, or None if the store does not hold the cycle."""
+        with self._lock:
+            row = self._db.execute("SELECT headers FROM cycles WHERE id = ?", (cycle_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def _submission_rows(self, where: str, params: Sequence[Any]) -> Dict[int, Tuple[str, List[str]]]:
+        """Rows of the matching submissions in their cycle's column order, by submission ID."""
+        answers: Dict[int, Dict[str, str]] = {}
+        cycles: Dict[int, str] = {}
+        with self._lock:
+            records = self._db.execute(
+                "SELECT s.id, s.cycle_id, s.respondent_id, s.submitted_at, a.column_name, a.value "
+                "FROM submissions s LEFT JOIN answers a ON a.submission_id = s.id "
+                f"WHERE {where} ORDER BY s.id",
+                params,
+            ).fetchall()
+        for submission_id, cycle_id, respondent_id, submitted_at, column, value in records:
+            fields = answers.setdefault(
+                submission_id,
+                {"cycle_id": cycle_id, "respondent_id": respondent_id, "submitted_at": submitted_at},
+            )
+            cycles[submission_id] = cycle_id
+            if column is not None:
+                fields[column] = value
+
+        headers: Dict[str, List[str]] = {}
+        rows = {}
+        for submission_id, fields in answers.items():
+            cycle_id = cycles[submission_id]
+            if cycle_id not in headers:
+                headers[cycle_id] = self.get_headers(cycle_id) or []
+            rows[submission_id] = (cycle_id, [fields.get(h, "") for h in headers[cycle_id]])
+        return rows
+
+    def get_rows(self, cycle_id: str) -> List[List[str]]:
+        """The cycle's results as worksheet values: the header row, then one row per submission."""
+        headers = self.get_headers(cycle_id)
+        if headers is None:
+            return []
+        rows = self._submission_rows("s.cycle_id = ?", (cycle_id,))
+        return [headers] + [row for _, row in rows.values()]
+
+    def iter_rows(self, cycle_id: str, chunk_size: int = 500) -> Iterator[List[List[str]]]:
+        """The cycle's submission rows in chunks, without the header row."""
+        last_id = 0
+        while True:
+            rows = self._submission_rows(
+                "s.id IN (SELECT id FROM submissions WHERE cycle_id = ? AND id > ? "
+                "ORDER BY id LIMIT ?)",
+                (cycle_id, last_id, chunk_size),
+            )
+            if not rows:
+                return
+            yield [row for _, row in rows.values()]
+            last_id = max(rows)
+            if len(rows) < chunk_size:
+                return
+
+    def get_checkpoint(self, name: str = MIRROR_CHECKPOINT) -> int:
+        with self._lock:
+            row = self._db.execute("SELECT seq FROM checkpoints WHERE name = ?", (name,)).fetchone()
+        return row[0] if row else 0
+
+    def set_checkpoint(self, seq: int, name: str = MIRROR_CHECKPOINT) -> None:
+        """Advances the checkpoint and drops the outbox entries it covers."""
+        with self._lock, self._transaction():
+            self._db.execute(
+                "INSERT INTO checkpoints VALUES (?, ?) "
+                "ON CONFLICT (name) DO UPDATE SET seq = excluded.seq",
+                (name, seq),
+            )
+            self._db.execute("DELETE FROM outbox WHERE seq <= ?", (seq,))
+
+    def pending_mirror(self, limit: int) -> List[MirrorItem]:
+        """Outbox entries after the checkpoint, oldest first."""
+        with self._lock:
+            entries = self._db.execute(
+                "SELECT seq, submission_id FROM outbox WHERE seq > ? ORDER BY seq LIMIT ?",
+                (self.get_checkpoint(), limit),
+            ).fetchall()
+            if not entries:
+                return []
+            ids = [submission_id for _, submission_id in entries]
+            rows = self._submission_rows(f"s.id IN ({','.join('?' * len(ids))})", ids)
+            targets = {
+                cycle_id: (sheet, spreadsheet_id)
+                for cycle_id, sheet, spreadsheet_id in self._db.execute(
+                    "SELECT id, results_sheet, results_spreadsheet_id FROM cycles WHERE id IN "
+                    f"(SELECT cycle_id FROM submissions WHERE id IN ({','.join('?' * len(ids))}))",
+                    ids,
+                )
+            }
+        items = []
+        for seq, submission_id in entries:
+            cycle_id, row = rows[submission_id]
+            sheet, spreadsheet_id = targets[cycle_id]
+            items.append(MirrorItem(seq, cycle_id, spreadsheet_id, sheet, row))
+        return items
+
+    def mirror_lag(self) -> int:
+        """The number of submissions not yet mirrored."""
+        with self._lock:
+            return self._db.execute(
+                "SELECT count(*) FROM outbox WHERE seq > ?", (self.get_checkpoint(),)
+            ).fetchone()[0]
@@ -0,0 +1,203 @@
+import functools
+import inspect
+import json
+import logging
+import random
+import time
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Any, Awaitable, Callable, Dict, List, Optional
+
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject, Update
+
+if TYPE_CHECKING:
+    # The storage service is itself traced, so it is imported for typing only.
+    from .storage.redis_storage import RedisStorageService
+
+logger = logging.getLogger(__name__)
+
+SLOW_TRACES_KEY = "traces:slow"
+
+_current_span: ContextVar[Optional["Span"]] = ContextVar("current_span", default=None)
+
+
+@dataclass
+class Span:
+    name: str
+    start: float = field(default_factory=time.perf_counter)
+    end: Optional[float] = None
+    attrs: Dict[str, Any] = field(default_factory=dict)
+    children: List["Span"] = field(default_factory=list)
+
+    @property
+    def duration_ms(self) -> float:
+        end = self.end if self.end is not None else time.perf_counter()
+        return (end - self.start) * 1000
+
+    def to_dict(self, origin: Optional[float] = None) -> Dict[str, Any]:
+        origin = self.start if origin is None else origin
+        data = {
+            "name": self.name,
+            "offset_ms": round((self.start - origin) * 1000, 1),
+            "duration_ms": round(self.duration_ms, 1),
+        }
+        if self.attrs:
+            data["attrs"] = self.attrs
+        if self.children:
+            data["children"] = [child.to_dict(origin) for child in self.children]
+        return data
+
+
+class span:
+    """
+    Records a child span of the current trace. Outside a trace it does
+    nothing, so instrumented code costs one context variable lookup.
+
+        async with span("render_keyboard", page=page):
+            ...
+    """
+
+    __slots__ = ("_name", "_attrs", "_span", "_token")
+
+    def __init__(self, name: str, **attrs: Any):
+        self._name = name
+        self._attrs = attrs
+        self._span = None
+
+    def __enter__(self) -> Optional[Span]:
+        parent = _current_span.get()
+        if parent is not None:
+            self._span = Span(self._name, attrs=self._attrs)
+            parent.children.append(self._span)
+            self._token = _current_span.set(self._span)
+        return self._span
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if self._span is not None:
+            self._span.end = time.perf_counter()
+            if exc_type is not None:
+                self._span.attrs["error"] = exc_type.__name__
+            _current_span.reset(self._token)
+
+    async def __aenter__(self) -> Optional[Span]:
+        return self.__enter__()
+
+    async def __aexit__(self, exc_type, exc, tb) -> None:
+        self.__exit__(exc_type, exc, tb)
+
+
+def traced(name: Optional[str] = None) -> Callable:
+    """Records every call of an async function as a span."""
+
+    def decorator(func: Callable[..., Awaitable[Any]]) -> Callable[..., Awaitable[Any]]:
+        span_name = name or func.__qualname__
+
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            if _current_span.get() is None:
+                return await func(*args, **kwargs)
+            with span(span_name):
+                return await func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def traced_methods(cls: type) -> type:
+    """Class decorator applying `traced` to every public async method."""
+    for name, member in list(vars(cls).items()):
+        if not name.startswith("_") and inspect.iscoroutinefunction(member):
+            setattr(cls, name, traced()(member))
+    return cls
+
+
+def annotate(**attrs: Any) -> None:
+    """Adds attributes to the current span, if there is one."""
+    current = _current_span.get()
+    if current is not None:
+        current.attrs.update(attrs)
+
+
+class Tracer:
+    """
+    Records a span tree for every update. Trees of updates slower than the
+    threshold are kept in Redis (newest first, bounded); a sampled share of
+    the others is logged.
+    """
+
+    def __init__(
+        self,
+        redis_service: "RedisStorageService",
+        sample_rate: float = 0.01,
+        slow_threshold_ms: float = 2000,
+        keep_slow: int = 50,
+    ):
+        self._redis = redis_service
+        self._sample_rate = sample_rate
+        self._slow_threshold_ms = slow_threshold_ms
+        self._keep_slow = keep_slow
+        self.traced = 0
+        self.slow = 0
+
+    async def finish(self, root: Span) -> None:
+        root.end = time.perf_counter()
+        self.traced += 1
+        if root.duration_ms >= self._slow_threshold_ms:
+            self.slow += 1
+            trace = root.to_dict()
+            trace["at"] = int(time.time())
+            logger.warning(f"Slow update: {root.name} took {root.duration_ms:.0f} ms.")
+            try:
+                await self._redis.push_to_list(
+                    SLOW_TRACES_KEY, json.dumps(trace, ensure_ascii=False), self._keep_slow
+                )
+            except Exception as e:
+                logger.error(f"Failed to persist slow trace: {e}")
+        elif random.random() < self._sample_rate:
+            logger.info(f"Trace: {json.dumps(root.to_dict(), ensure_ascii=False)}")
+
+    async def get_slow_traces(self, limit: int = 5) -> List[Dict[str, Any]]:
+        """The slowest of the recently kept traces, slowest first."""
+        traces = [json.loads(raw) for raw in await self._redis.get_list(SLOW_TRACES_KEY)]
+        traces.sort(key=lambda trace: trace["duration_ms"], reverse=True)
+        return traces[:limit]
+
+
+class TracingMiddleware(BaseMiddleware):
+    """Outer update middleware opening the root span of every update."""
+
+    def __init__(self, tracer: Tracer):
+        self._tracer = tracer
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: Update,
+        data: Dict[str, Any],
+    ) -> Any:
+        user = data.get("event_from_user")
+        root = Span(
+            event.event_type,
+            attrs={"update_id": event.update_id, "user_id": user.id if user else None},
+        )
+        token = _current_span.set(root)
+        try:
+            return await handler(event, data)
+        except Exception as e:
+            root.attrs["error"] = type(e).__name__
+            raise
+        finally:
+            _current_span.reset(token)
+            await self._tracer.finish(root)
+
+
+def format_trace(trace: Dict[str, Any], depth: int = 0) -> List[str]:
+    """Renders a stored trace as indented lines, one per span."""
+    attrs = trace.get("attrs", {})
+    handler = f" [{attrs['handler']}]" if "handler" in attrs else ""
+    lines = [f"{'  ' * depth}{trace['name']}{handler} — {trace['duration_ms']:.0f} ms"]
+    for child in trace.get("children", []):
+        lines.extend(format_trace(child, depth + 1))
+    return lines
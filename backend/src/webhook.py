@@ -0,0 +1,167 @@
+import asyncio
+import hashlib
+import hmac
+import logging
+import time
+from typing import List, Optional
+
+from aiogram import Bot, Dispatcher
+from aiogram.types import Update
+from aiohttp import web
+from pydantic import ValidationError
+
+from .config import WebhookSettings
+from .lifecycle import LifecycleManager
+from .metrics import watch_stats
+
+logger = logging.getLogger(__name__)
+
+SECRET_HEADER = "X-Telegram-Bot-Api-Secret-Token"
+
+
+def derive_secret(bot_token: str) -> str:
+    """A stable webhook secret for when none is configured."""
+    return hashlib.sha256(f"webhook:{bot_token}".encode("utf-8")).hexdigest()
+
+
+class WebhookServer:
+    """
+    Receives updates over HTTP and processes them with a fixed pool of
+    workers reading from a bounded queue.
+
+    When the queue is full the request waits up to `enqueue_timeout` for a
+    free slot and is then rejected with 503, so Telegram redelivers the
+    update later instead of the process buffering without limit.
+    """
+
+    def __init__(
+        self,
+        dp: Dispatcher,
+        bot: Bot,
+        secret_token: str,
+        path: str = "/webhook",
+        queue_size: int = 1000,
+        workers: int = 16,
+        enqueue_timeout: float = 1.0,
+    ):
+        self._dp = dp
+        self._bot = bot
+        self._secret = secret_token
+        self._path = path
+        self._queue: asyncio.Queue[Update] = asyncio.Queue(maxsize=queue_size)
+        self._workers_count = workers
+        self._enqueue_timeout = enqueue_timeout
+        self._workers: List[asyncio.Task] = []
+        self._ready = False
+        self.accepted = 0
+        self.rejected = 0
+
+    def create_app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_post(self._path, self.handle_update)
+        app.router.add_get("/healthz", self.handle_health)
+        app.router.add_get("/readyz", self.handle_ready)
+        return app
+
+    async def handle_update(self, request: web.Request) -> web.Response:
+        if not hmac.compare_digest(request.headers.get(SECRET_HEADER, ""), self._secret):
+            return web.Response(status=401)
+        try:
+            update = Update.model_validate(await request.json(), context={"bot": self._bot})
+        except (ValueError, ValidationError) as e:
+            logger.warning(f"Rejected malformed webhook update: {e}")
+            return web.Response(status=400)
+
+        try:
+            self._queue.put_nowait(update)
+        except asyncio.QueueFull:
+            try:
+                await asyncio.wait_for(self._queue.put(update), self._enqueue_timeout)
+            except asyncio.TimeoutError:
+                self.rejected += 1
+                logger.warning(f"Update queue is full, asking Telegram to retry {update.update_id}.")
+                return web.Response(status=503)
+        self.accepted += 1
+        return web.Response()
+
+    async def handle_health(self, request: web.Request) -> web.Response:
+        return web.json_response({"status": "ok"})
+
+    async def handle_ready(self, request: web.Request) -> web.Response:
+        ready = self._ready and not self._queue.full()
+        return web.json_response(
+            {"ready": ready, "queued": self._queue.qsize()}, status=200 if ready else 503
+        )
+
+    async def _worker(self) -> None:
+        while True:
+            update = await self._queue.get()
+            try:
+                await self._dp.feed_update(self._bot, update)
+            except Exception as e:
+                logger.error(f"Failed to process update {update.update_id}: {e}", exc_info=True)
+            finally:
+                self._queue.task_done()
+
+    async def start(self) -> None:
+        self._workers = [
+            asyncio.create_task(self._worker()) for _ in range(self._workers_count)
+        ]
+        self._ready = True
+        watch_stats("webhook", self, "accepted", "rejected")
+
+    async def stop(self, timeout: Optional[float] = 10) -> None:
+        """Stops accepting updates and processes the queued ones."""
+        self._ready = False
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"Dropping {self._queue.qsize()} unprocessed updates on shutdown.")
+        for task in self._workers:
+            task.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+
+
+async def run_webhook(
+    dp: Dispatcher,
+    bot: Bot,
+    config: WebhookSettings,
+    allowed_updates: Optional[List[str]] = None,
+    lifecycle: Optional[LifecycleManager] = None,
+) -> None:
+    """
+    Registers the webhook with Telegram and serves updates until cancelled.
+    Given a lifecycle, queued updates are drained within its drain deadline.
+    """
+    secret = config.SECRET or derive_secret(bot.token)
+    server = WebhookServer(
+        dp,
+        bot,
+        secret_token=secret,
+        path=config.PATH,
+        queue_size=config.QUEUE_SIZE,
+        workers=config.WORKERS,
+        enqueue_timeout=config.ENQUEUE_TIMEOUT_SECONDS,
+    )
+    runner = web.AppRunner(server.create_app())
+    await runner.setup()
+    await web.TCPSite(runner, config.HOST, config.PORT).start()
+    await server.start()
+    await dp.emit_startup(bot=bot, **dp.workflow_data)
+
+    await bot.set_webhook(
+        url=f"{config.URL.rstrip('/')}{config.PATH}",
+        secret_token=secret,
+        allowed_updates=allowed_updates or dp.resolve_used_update_types(),
+    )
+    logger.info(f"Receiving updates via webhook on {config.HOST}:{config.PORT}{config.PATH}")
+    try:
+        await asyncio.Event().wait()
+    finally:
+        # Stop accepting requests first, then drain what was already queued.
+        await runner.cleanup()
+        if lifecycle:
+            await server.stop(max(lifecycle.start_drain() - time.monotonic(), 0))
+        else:
+            await server.stop()
+        await dp.emit_shutdown(bot=bot, **dp.workflow_data)
@@ -0,0 +1,81 @@
+import argparse
+import asyncio
+import logging
+import signal
+
+from aiogram import Bot
+from aiogram.client.default import DefaultBotProperties
+from redis.asyncio.client import Redis
+
+from . import IMPORT_STARTED
+from .__main__ import create_dispatcher
+from .config import settings
+from .metrics import start_metrics_server
+from .services.google_sheets import GoogleSheetsService
+from .sharding import ShardWorker
+from .startup import StartupProfiler, warm_up
+
+
+async def main(worker_index: int):
+    """
+    Entry point of an update-processing worker when sharding is enabled.
+    """
+    logging.basicConfig(
+        level=logging.INFO,
+        format=f"%(asctime)s - %(levelname)s - worker-{worker_index} - %(name)s - %(message)s",
+    )
+    profiler = StartupProfiler(IMPORT_STARTED)
+    profiler.mark("imports")
+
+    bot = Bot(
+        token=settings.BOT_TOKEN, default=DefaultBotProperties(parse_mode="HTML")
+    )
+    redis_client = Redis.from_url(settings.redis.dsn)
+    dp = create_dispatcher(redis_client, GoogleSheetsService(config=settings.google))
+    profiler.mark("services")
+    if dp["client_cache"]:
+        dp["client_cache"].start()
+    profiler.mark("client_cache")
+    dp["token_service"].start()
+    await warm_up(dp, profiler, settings.WARM_UP_TIMEOUT_SECONDS)
+    profiler.mark("warm_up")
+
+    worker = ShardWorker(dp, bot, dp["app_storage"], worker_index, settings.sharding)
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, worker.stop)
+
+    metrics_runner = None
+    if settings.metrics.ENABLED:
+        metrics_runner = await start_metrics_server(
+            settings.metrics.HOST, settings.metrics.PORT + 1 + worker_index
+        )
+    # Submissions handled here are committed to this host's results store,
+    # which may not be shared with a bot process; the mirrors of processes
+    # sharing it take turns.
+    lifecycle = dp["lifecycle"]
+    lifecycle.start(bot, mirror_interval=settings.results.MIRROR_INTERVAL_SECONDS)
+    profiler.log()
+
+    try:
+        await worker.run()
+    finally:
+        await lifecycle.shutdown()
+        if metrics_runner:
+            await metrics_runner.cleanup()
+        if dp["client_cache"]:
+            await dp["client_cache"].stop()
+        await dp["token_service"].stop()
+        dp["results_store"].close()
+        await bot.session.close()
+        await redis_client.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Process updates of the owned shards.")
+    parser.add_argument(
+        "--index", type=int, required=True,
+        help=f"worker index, 0..SHARDING_WORKERS-1 ({settings.sharding.WORKERS} configured)",
+    )
+    args = parser.parse_args()
+    asyncio.run(main(args.index))
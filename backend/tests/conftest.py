@@ -0,0 +1,22 @@
+import os
+
+# Settings are instantiated at import time, so provide the required values
+# before any application module is imported by the tests.
+os.environ.setdefault("BOT_TOKEN", "12345:test-token")
+os.environ.setdefault("GOOGLE_SHEET_ID", "test-sheet-id")
+
+import fakeredis  # noqa: E402
+import pytest  # noqa: E402
+
+from backend.src.storage.redis_storage import RedisStorageService  # noqa: E402
+
+
+@pytest.fixture
+def redis_client():
+    """An in-memory Redis server of its own, with Lua scripting."""
+    return fakeredis.aioredis.FakeRedis(server=fakeredis.FakeServer())
+
+
+@pytest.fixture
+def redis_service(redis_client):
+    return RedisStorageService(redis_client=redis_client)
@@ -0,0 +1,202 @@
+import asyncio
+import zlib
+from datetime import date, datetime, timezone
+
+import pytest
+
+from backend.src.config import ResultsSettings
+from backend.src.services.archive_service import (
+    ARCHIVE_LOCK_KEY,
+    ARCHIVE_SUMMARIES_KEY,
+    ArchiveReport,
+    CycleArchiveService,
+    format_archive_report,
+    period_of,
+    summarize,
+    unpack_cycle,
+)
+from backend.src.services.cycle_service import CycleService, CycleSpec
+from backend.src.services.progress_service import CycleProgress, ProgressService
+from backend.src.services.reminder_service import ReminderService
+from backend.src.services.report_aggregation import RESULTS_VERSION_KEY, ReportAggregationService
+from backend.src.services.result_storage import ResultStorageRouter
+from backend.src.services.token_service import SurveyTokenService
+from backend.src.storage.models import Employee, FeedbackCycle, Question, RespondentInfo
+from backend.src.storage.results_store import ResultsStore
+
+
+def make_cycle():
+    return FeedbackCycle(
+        id="20250105_ann",
+        target_employee_id="ann",
+        respondents={r: RespondentInfo(id=r, token=f"t-{r}") for r in ("bob", "carl")},
+        deadline=date(2025, 2, 1),
+        status="closed",
+        results_sheet="2025-01-05_Ann",
+        created_at=datetime(2025, 1, 5, 12),
+    )
+
+
+def test_periods_are_quarters():
+    assert [period_of(date(2025, m, 1)) for m in (1, 3, 4, 12)] == [
+        "2025Q1", "2025Q1", "2025Q2", "2025Q4",
+    ]
+
+
+def test_summary_keeps_counters_and_archived_cycle_round_trips():
+    cycle = make_cycle()
+    summary = summarize(cycle, CycleProgress(invited=2, started=2, completed=1, overdue=1))
+    assert summary.counters == {"invited": 2, "started": 2, "completed": 1, "overdue": 1}
+    assert summarize(cycle, None).counters["invited"] == 2
+
+    data = zlib.compress(cycle.model_dump_json(by_alias=True).encode("utf-8"))
+    assert unpack_cycle(data) == cycle
+
+
+def test_report_mentions_periods_and_savings():
+    report = ArchiveReport(cycles=3, json_bytes=30_720, compressed_bytes=10_240,
+                           memory_before=100_000, memory_after=59_040)
+    report.periods.update({"2025Q2": 1, "2025Q1": 2})
+    text = format_archive_report(report)
+    assert "2025Q1: 2, 2025Q2: 1" in text and "40 КБ" in text
+    assert format_archive_report(ArchiveReport()) == "Нет циклов для архивации."
+
+
+class Questionnaire:
+    async def get_questionnaire(self):
+        return [Question(question_id="q1", question_text="Оценка", question_type="radio")]
+
+
+class Sheets:
+    main_spreadsheet_id = "main"
+
+    async def get_usage(self, spreadsheet_id=None):
+        return 0, 0
+
+    async def create_worksheets(self, worksheets, spreadsheet_id=None):
+        return len(worksheets)
+
+
+@pytest.fixture
+def archive(redis_service, monkeypatch):
+    async def used_memory():
+        # fakeredis has no INFO.
+        return 0
+
+    monkeypatch.setattr(redis_service, "used_memory", used_memory)
+    store = ResultsStore(":memory:")
+    progress = ProgressService(redis_service)
+    cycles = CycleService(
+        redis_service,
+        Sheets(),
+        Questionnaire(),
+        SurveyTokenService(redis_service, secret="secret"),
+        progress,
+        ResultStorageRouter(redis_service, Sheets(), ResultsSettings()),
+        store,
+    )
+    reminders = ReminderService(redis_service, cycles, None, None, timezone.utc)
+    reports = ReportAggregationService(redis_service, Sheets(), Questionnaire(), store)
+    service = CycleArchiveService(redis_service, cycles, progress, reminders, cycles._results, reports)
+    yield service, cycles, reminders
+    store.close()
+
+
+async def launch(cycles, reminders, target, deadline, closed=True):
+    employee = Employee(Telegram_Nickname=target, Last_Name=target.title(), First_Name="A")
+    [cycle] = await cycles.create_cycles([CycleSpec(employee, ["bob", "carl"], deadline)])
+    await reminders.schedule_cycles([cycle])
+    await cycles.add_pending_notifications({"carl": [cycle.id]})
+    await cycles._progress.mark_started(cycle.id, "bob")
+    if closed:
+        await cycles.close_cycle(cycle)
+    return cycle
+
+
+def record_pipelines(monkeypatch, redis_service):
+    """The commands of every executed pipeline, and whether it was a transaction."""
+    executed = []
+    make_pipeline = redis_service.pipeline
+
+    def pipeline(transaction=True):
+        pipe = make_pipeline(transaction)
+        execute = pipe.execute
+
+        async def record(*args, **kwargs):
+            executed.append((transaction, [command[0] for command, _ in pipe.command_stack]))
+            return await execute(*args, **kwargs)
+
+        pipe.execute = record
+        return pipe
+
+    monkeypatch.setattr(redis_service, "pipeline", pipeline)
+    return executed
+
+
+def test_run_archives_old_closed_cycles_in_one_transaction(archive, redis_service, redis_client, monkeypatch):
+    async def run():
+        service, cycles, reminders = archive
+        old = await launch(cycles, reminders, "ann", date(2025, 1, 31))
+        recent = await launch(cycles, reminders, "bob", date(2025, 3, 20))
+        active = await launch(cycles, reminders, "dan", date(2025, 1, 31), closed=False)
+        await redis_service.increment(RESULTS_VERSION_KEY.format(cycle_id=old.id))
+        executed = record_pipelines(monkeypatch, redis_service)
+
+        report = await service.run(date(2025, 4, 1))
+
+        assert report.cycles == 1 and report.periods == {period_of(old.created_at.date()): 1}
+        assert len(executed) == 1 and executed[0][0]
+        assert await cycles.get_cycle_by_id(old.id) is None
+        assert await cycles.get_cycle_by_id(recent.id) and await cycles.get_cycle_by_id(active.id)
+        # Nothing else of the archived cycle is left behind.
+        leftovers = [key for key in await redis_client.keys("*") if old.id.encode() in key]
+        leftovers += [m for m in await redis_client.zrange("reminders:due", 0, -1) if old.id.encode() in m]
+        for name in ("progress:counters", "results:routing"):
+            leftovers += [f for f in await redis_client.hkeys(name) if old.id.encode() in f]
+        assert leftovers == []
+        assert await cycles.get_pending_notifications("carl") == {recent.id, active.id}
+        assert (await service.get_summary(old.id)).counters == {
+            "invited": 2, "started": 1, "completed": 0, "overdue": 0,
+        }
+
+    asyncio.run(run())
+
+
+def test_run_is_skipped_while_another_holds_the_lock(archive, redis_service):
+    async def run():
+        service, cycles, reminders = archive
+        cycle = await launch(cycles, reminders, "ann", date(2025, 1, 31))
+        assert await redis_service.acquire_lock(ARCHIVE_LOCK_KEY, "other", 60_000)
+        assert await service.run(date(2025, 4, 1)) is None
+        assert await cycles.get_cycle_by_id(cycle.id)
+
+        await redis_service.release_lock(ARCHIVE_LOCK_KEY, "other")
+        assert (await service.run(date(2025, 4, 1))).cycles == 1
+
+    asyncio.run(run())
+
+
+def test_restored_cycle_round_trips_and_stays_out_of_the_next_runs(archive, redis_service):
+    async def run():
+        service, cycles, reminders = archive
+        cycle = await launch(cycles, reminders, "ann", date(2025, 1, 31))
+        stored = await cycles.get_cycle_by_id(cycle.id)
+        await service.run(date(2025, 4, 1))
+
+        restored = await service.restore(cycle.id)
+        assert restored.restored_at is not None
+        assert restored.model_copy(update={"restored_at": None}) == stored
+        assert await cycles.get_cycle_by_id(cycle.id) == restored
+        assert await service.get_summary(cycle.id) is None
+        assert await redis_service.get_hash(ARCHIVE_SUMMARIES_KEY) == {}
+        snapshot = (await ProgressService(redis_service).get_snapshot()).cycles[cycle.id]
+        assert (snapshot.invited, snapshot.started) == (2, 1)
+        assert await service.restore(cycle.id) is None
+
+        # Restored cycles are only archived again after_days after the restore.
+        assert (await service.run(date(2025, 4, 1))).cycles == 0
+        restored_on = restored.restored_at.date()
+        assert (await service.run(date.fromordinal(restored_on.toordinal() + 30))).cycles == 0
+        assert (await service.run(date.fromordinal(restored_on.toordinal() + 31))).cycles == 1
+
+    asyncio.run(run())
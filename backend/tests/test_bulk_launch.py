@@ -0,0 +1,174 @@
+import asyncio
+from datetime import date
+
+from backend.src.bot.handlers.admin import process_launch_table
+from backend.src.config import ResultsSettings
+from backend.src.services.bulk_launch import BulkLaunchService, parse_launch_table, read_csv
+from backend.src.services.cycle_service import CycleService
+from backend.src.services.employee_service import EmployeeService
+from backend.src.services.notification_sender import FanOutResult
+from backend.src.services.progress_service import ProgressService
+from backend.src.services.result_storage import ResultStorageRouter
+from backend.src.services.token_service import SurveyTokenService
+from backend.src.storage.models import Employee, Question
+from backend.src.storage.results_store import ResultsStore
+
+TODAY = date(2025, 7, 1)
+
+
+class Directory:
+    def __init__(self, *nicknames):
+        self._employees = {
+            n: Employee(Telegram_Nickname=n, Last_Name=n.title(), First_Name="A") for n in nicknames
+        }
+
+    def find_by_id(self, employee_id):
+        return self._employees.get(employee_id)
+
+
+def test_csv_with_semicolons_and_header_is_read():
+    data = "target;respondents;deadline\r\n@ann;bob, carl;2025-07-20\r\n;;\r\n".encode("utf-8-sig")
+    assert read_csv(data) == [
+        ["target", "respondents", "deadline"],
+        ["@ann", "bob, carl", "2025-07-20"],
+    ]
+
+
+def test_every_row_is_validated_and_errors_reference_lines():
+    table = [
+        ["target", "respondents", "deadline"],
+        ["@ann", "bob carl bob", "2025-07-20"],
+        ["ann", "bob", "2025-07-21"],
+        ["zed", "bob", "2025-07-20"],
+        ["bob", "ann ghost", "2025-07-20"],
+        ["carl", "carl ann", "2025-07-20"],
+        ["carl", "ann", "20.07.2025"],
+        ["carl", "ann", "2025-07-01"],
+        ["carl", "", "2025-07-20"],
+        ["bob", "carl"],
+    ]
+    plan = parse_launch_table(table, Directory("ann", "bob", "carl"), TODAY)
+
+    assert [(row.line, row.spec.target_employee.id, row.spec.respondent_ids) for row in plan.rows] == [
+        (2, "ann", ["bob", "carl"]),
+    ]
+    assert [line for line, _ in plan.errors] == [3, 4, 5, 6, 7, 8, 9, 10]
+    assert "строке 2" in plan.errors[0][1]
+    assert "ghost" in plan.errors[2][1]
+
+
+class Sheets:
+    main_spreadsheet_id = "main"
+
+    async def get_all_records(self, sheet_name):
+        return [
+            {"Telegram_Nickname": f"@{n}", "Last_Name": n.title(), "First_Name": "A"}
+            for n in ("ann", "bob", "carl", "dan")
+        ]
+
+    async def get_usage(self, spreadsheet_id=None):
+        return 0, 0
+
+    async def create_worksheets(self, worksheets, spreadsheet_id=None):
+        return len(worksheets)
+
+
+class Questionnaire:
+    async def get_questionnaire(self):
+        return [Question(question_id="q1", question_text="Оценка", question_type="radio")]
+
+
+class Reminders:
+    def __init__(self):
+        self.scheduled = []
+
+    async def schedule_cycles(self, cycles):
+        self.scheduled.extend(cycle.id for cycle in cycles)
+
+
+class Sender:
+    """Fails the messages to the given chats."""
+
+    def __init__(self, *failing_chats):
+        self.sent = []
+        self._failing = set(failing_chats)
+
+    async def send_many(self, bot, messages, on_progress=None):
+        self.sent.extend(m.chat_id for m in messages)
+        if on_progress:
+            await on_progress(len(messages), len(messages))
+        failed = [m for m in messages if m.chat_id in self._failing]
+        return FanOutResult(sent=len(messages) - len(failed), failed=failed)
+
+
+def test_launch_queues_unsent_invitations_as_pending(redis_service, tmp_path):
+    async def run():
+        employees = EmployeeService(redis_service, Sheets())
+        await employees.load_employees()
+        await employees.register_telegram_id("bob", 1)
+        await employees.register_telegram_id("carl", 2)
+        cycles = CycleService(
+            redis_service,
+            Sheets(),
+            Questionnaire(),
+            SurveyTokenService(redis_service, secret="secret"),
+            ProgressService(redis_service),
+            ResultStorageRouter(redis_service, Sheets(), ResultsSettings()),
+            ResultsStore(str(tmp_path / "results.db")),
+        )
+        reminders, sender = Reminders(), Sender(2)
+        service = BulkLaunchService(cycles, employees, reminders, sender)
+        plan = await service.plan(
+            [["ann", "bob carl dan", "2030-01-31"], ["bob", "carl", "2030-01-31"], ["zed", "bob", "2030-01-31"]],
+            date.today(),
+            max_active=10,
+        )
+        progress = []
+
+        async def on_progress(text):
+            progress.append(text)
+
+        result = await service.launch(bot=None, plan=plan, on_progress=on_progress)
+
+        assert [c.target_employee_id for c in result.cycles] == ["ann", "bob"]
+        assert [line for line, _ in result.errors] == [3]
+        assert reminders.scheduled == [c.id for c in result.cycles]
+        assert sorted(sender.sent) == [1, 2, 2]
+        # Carl's invitations failed and Dan has no chat yet: both wait for /start.
+        assert (result.sent, result.queued) == (1, 3)
+        ann, bob = result.cycles
+        assert await cycles.get_pending_notifications("carl") == {ann.id, bob.id}
+        assert await cycles.get_pending_notifications("dan") == {ann.id}
+        assert await cycles.get_pending_notifications("bob") == set()
+        assert progress[-1] == "Создано циклов: 2. Разослано приглашений: 3/3…"
+
+    asyncio.run(run())
+
+
+class Chat:
+    def __init__(self, text):
+        self.text = text
+        self.document = None
+        self.replies = []
+
+    async def answer(self, text, **kwargs):
+        self.replies.append(text)
+
+
+class LaunchSheets:
+    def __init__(self):
+        self.read = []
+
+    async def get_all_values(self, sheet_name):
+        self.read.append(sheet_name)
+        return []
+
+
+def test_commands_are_not_read_as_sheet_names():
+    async def run():
+        message, sheets = Chat("/status"), LaunchSheets()
+        await process_launch_table(message, state=None, bulk_launch_service=None, g_sheets=sheets, bot=None)
+        assert sheets.read == []
+        assert "/cancel_bulk" in message.replies[0]
+
+    asyncio.run(run())
@@ -0,0 +1,115 @@
+import asyncio
+from datetime import date
+
+from backend.src.services.cycle_service import CycleService
+from backend.src.storage.client_cache import KEYSPACE_EVENTS, MISSING, ClientSideCache
+from backend.src.storage.models import FeedbackCycle
+from backend.src.storage.redis_storage import RedisStorageService
+
+
+def make_cache(max_entries=2):
+    cache = ClientSideCache(None, ["cycle:"], max_entries=max_entries)
+    # As if subscribed to invalidations.
+    cache.mode = "tracking"
+    return cache
+
+
+def fill(cache, key, value):
+    assert cache.get(key) is MISSING
+    cache.put(key, value)
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = make_cache()
+    fill(cache, "cycle:1", b"1")
+    fill(cache, "cycle:2", b"2")
+    assert cache.get("cycle:1") == b"1"
+    fill(cache, "cycle:3", b"3")
+
+    assert cache.get("cycle:2") is MISSING
+    assert cache.get("cycle:1") == b"1" and cache.get("cycle:3") == b"3"
+    assert not cache.handles("questionnaire")
+
+
+def test_invalidation_during_read_keeps_the_value_out():
+    cache = make_cache()
+    assert cache.get("cycle:1") is MISSING
+    cache._handle([b"message", b"__redis__:invalidate", [b"cycle:1"]])
+    # A second reader starting after the invalidation must not revive the first read.
+    assert cache.get("cycle:1") is MISSING
+    cache.put("cycle:1", b"old")
+    cache.put("cycle:1", b"new")
+
+    assert cache.get("cycle:1") is MISSING
+    fill(cache, "cycle:1", b"new")
+    assert cache.get("cycle:1") == b"new"
+
+
+def test_flush_and_keyspace_events_invalidate():
+    cache = make_cache()
+    fill(cache, "cycle:1", b"1")
+    fill(cache, "cycle:2", b"2")
+    cache._handle([b"message", b"__redis__:invalidate", None])
+    assert cache.size == 0
+
+    cache.mode = "keyspace"
+    cache._keyspace_prefix = "__keyspace@0__:"
+    fill(cache, "cycle:1", b"1")
+    cache._handle([b"pmessage", b"__keyspace@0__:cycle:*", b"__keyspace@0__:cycle:1", b"set"])
+    assert cache.get("cycle:1") is MISSING
+
+
+class ConfigConnection:
+    """Answers CONFIG GET/SET like a Redis 5 server."""
+
+    def __init__(self, events):
+        self.events = events
+        self._reply = None
+
+    async def send_command(self, *args):
+        if args[:2] == ("CONFIG", "SET"):
+            self.events = args[3]
+            self._reply = b"OK"
+        else:
+            self._reply = [b"notify-keyspace-events", self.events.encode()]
+
+    async def read_response(self):
+        return self._reply
+
+
+def test_keyspace_events_are_only_configured_when_allowed():
+    async def run():
+        connection = ConfigConnection("")
+        assert not await ClientSideCache(None, ["cycle:"])._enable_keyspace_events(connection)
+        assert connection.events == ""
+
+        allowed = ClientSideCache(None, ["cycle:"], configure_keyspace_events=True)
+        assert await allowed._enable_keyspace_events(connection)
+        assert connection.events == KEYSPACE_EVENTS
+
+        connection = ConfigConnection("AKE")
+        assert await ClientSideCache(None, ["cycle:"])._enable_keyspace_events(connection)
+        assert connection.events == "AKE"
+
+    asyncio.run(run())
+
+
+def test_pipelined_cycle_writes_drop_the_cached_copies(redis_client):
+    async def run():
+        cache = make_cache(max_entries=10)
+        redis_service = RedisStorageService(redis_client, cache)
+        cycle_service = CycleService(redis_service, None, None, None, None, None, None)
+        cycle = FeedbackCycle(
+            id="c1", target_employee_id="ann", respondents={}, deadline=date(2030, 1, 31)
+        )
+        await redis_service.set_model("cycle:c1", cycle)
+        assert await cycle_service.get_cycle_by_id("c1")
+        assert cache.size == 1
+
+        # No server invalidation arrives here: the pipeline's writer must drop the key.
+        pipe = redis_service.pipeline()
+        cycle_service.queue_removal(pipe, cycle)
+        await pipe.execute()
+        assert await cycle_service.get_cycle_by_id("c1") is None
+
+    asyncio.run(run())
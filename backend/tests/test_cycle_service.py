@@ -0,0 +1,268 @@
+import asyncio
+from datetime import date
+
+import pytest
+from aiogram.exceptions import TelegramForbiddenError
+from aiogram.methods import SendMessage
+
+from backend.src.config import ResultsSettings
+from backend.src.services.cycle_service import ACTIVE_CYCLES_KEY, CycleService, CycleSpec, cycle_id_for
+from backend.src.services.employee_service import EmployeeService
+from backend.src.services.notification_sender import OUTBOX_KEY, RateLimitedSender
+from backend.src.services.progress_service import ProgressService
+from backend.src.services.result_storage import ResultStorageFull, ResultStorageRouter
+from backend.src.services.token_service import SurveyTokenService
+from backend.src.storage.models import Employee, Question
+from backend.src.storage.results_store import ResultsStore
+
+DEADLINE = date(2030, 1, 31)
+
+
+class Questionnaire:
+    async def get_questionnaire(self):
+        return [
+            Question(question_id="q1", question_text="Оценка", question_type="radio"),
+            Question(question_id="q2", question_text="Комментарий", question_type="text"),
+        ]
+
+
+class Sheets:
+    main_spreadsheet_id = "main"
+
+    def __init__(self, fail_on=None):
+        self.worksheets = {}
+        self.requests = 0
+        self._fail_on = fail_on
+
+    async def get_usage(self, spreadsheet_id=None):
+        return 0, 0
+
+    async def create_spreadsheet(self, title, folder_id=None):
+        return f"extra{title.rsplit(' ', 1)[1]}"
+
+    async def create_worksheets(self, worksheets, spreadsheet_id=None):
+        self.requests += 1
+        if spreadsheet_id == self._fail_on:
+            raise RuntimeError("Sheets API unavailable")
+        for title, headers in worksheets.items():
+            self.worksheets[(spreadsheet_id, title)] = headers
+        return len(worksheets)
+
+
+def employee(nickname):
+    return Employee(Telegram_Nickname=nickname, Last_Name=nickname.title(), First_Name="A")
+
+
+def spec(target, *respondents):
+    return CycleSpec(employee(target), list(respondents), DEADLINE)
+
+
+@pytest.fixture
+def store():
+    store = ResultsStore(":memory:")
+    yield store
+    store.close()
+
+
+def make_service(redis_service, store, sheets, **limits):
+    config = ResultsSettings(**{"SHARD_MAX_CYCLES": 2, "MAX_SHARDS": 2, **limits})
+    router = ResultStorageRouter(redis_service, sheets, config)
+    service = CycleService(
+        redis_service,
+        sheets,
+        Questionnaire(),
+        SurveyTokenService(redis_service, secret="secret"),
+        ProgressService(redis_service),
+        router,
+        store,
+    )
+    return service, router
+
+
+def test_failed_worksheets_release_the_reserved_room(redis_service, store):
+    async def run():
+        sheets = Sheets(fail_on="extra2")
+        service, router = make_service(redis_service, store, sheets)
+        specs = [spec("ann", "bob"), spec("bob", "ann"), spec("carl", "ann", "bob")]
+
+        with pytest.raises(RuntimeError):
+            await service.create_cycles(specs)
+
+        # The main spreadsheet's worksheets exist and keep their room; the
+        # cycle whose worksheet failed gives its reservation back.
+        shards = {s.spreadsheet_id: (s.cycles, s.cells) for s in await router.get_shards()}
+        assert shards == {"main": (2, 20), "extra2": (0, 0)}
+        cycle_ids = [cycle_id_for(e, date.today()) for e in ("ann", "bob", "carl")]
+        assert [await router.route(c) for c in cycle_ids] == [None] * 3
+        assert await service.get_active_cycles_count() == 0
+        assert await service.find_existing(cycle_ids) == set()
+
+    asyncio.run(run())
+
+
+def test_failure_after_the_worksheets_only_drops_the_routes(redis_service, store, monkeypatch):
+    async def run():
+        sheets = Sheets()
+        service, router = make_service(redis_service, store, sheets)
+
+        def fail(*args, **kwargs):
+            raise RuntimeError("store unavailable")
+
+        monkeypatch.setattr(store, "record_cycle", fail)
+        with pytest.raises(RuntimeError):
+            await service.create_cycles([spec("ann", "bob")])
+        assert len(sheets.worksheets) == 1
+        assert [s.cycles for s in await router.get_shards()] == [1]
+        assert await router.route(cycle_id_for("ann", date.today())) is None
+
+    asyncio.run(run())
+
+
+def record_pipelines(monkeypatch, redis_service):
+    """Collects the keys every executed pipeline writes."""
+    executed = []
+    make_pipeline = redis_service.pipeline
+
+    def pipeline(*args, **kwargs):
+        pipe = make_pipeline(*args, **kwargs)
+        execute = pipe.execute
+
+        async def record(*a, **kw):
+            executed.append({str(command[1]) for command, _ in pipe.command_stack})
+            return await execute(*a, **kw)
+
+        pipe.execute = record
+        return pipe
+
+    monkeypatch.setattr(redis_service, "pipeline", pipeline)
+    return executed
+
+
+def test_cycles_are_written_together_and_worksheets_batched(redis_service, store, monkeypatch):
+    async def run():
+        sheets = Sheets()
+        service, router = make_service(redis_service, store, sheets)
+        executed = record_pipelines(monkeypatch, redis_service)
+
+        cycles = await service.create_cycles(
+            [spec("ann", "bob"), spec("bob", "ann"), spec("carl", "ann", "bob")]
+        )
+
+        assert [c.target_employee_id for c in cycles] == ["ann", "bob", "carl"]
+        writes = [keys for keys in executed if any(k.startswith("cycle:") for k in keys)]
+        assert len(writes) == 1
+        assert {f"cycle:{c.id}" for c in cycles} <= writes[0]
+        # One request per spreadsheet: two cycles fill the main one.
+        assert sheets.requests == 2
+        assert sorted(sheets.worksheets) == sorted(
+            (c.results_spreadsheet_id, c.results_sheet) for c in cycles
+        )
+        assert [c.results_spreadsheet_id for c in cycles] == ["main", "main", "extra2"]
+        assert await service.get_active_cycles_count() == 3
+        assert (await service.get_cycle_by_id(cycles[2].id)).respondents.keys() == {"ann", "bob"}
+        assert all(store.has_cycle(c.id) for c in cycles)
+
+    asyncio.run(run())
+
+
+def test_full_storage_creates_the_cycles_that_fit(redis_service, store):
+    async def run():
+        sheets = Sheets()
+        service, router = make_service(redis_service, store, sheets, MAX_SHARDS=1)
+
+        cycles = await service.create_cycles(
+            [spec("ann", "bob"), spec("bob", "ann"), spec("carl", "ann")]
+        )
+
+        assert [c.target_employee_id for c in cycles] == ["ann", "bob"]
+        assert len(sheets.worksheets) == 2
+        assert await service.get_active_cycles_count() == 2
+        assert await router.route(cycle_id_for("carl", date.today())) is None
+        with pytest.raises(ResultStorageFull):
+            await service.create_cycles([spec("carl", "ann")])
+
+    asyncio.run(run())
+
+
+class Bot:
+    """Refuses to send to the given chats."""
+
+    def __init__(self, *blocked_chats):
+        self.sent = []
+        self._blocked = set(blocked_chats)
+
+    async def send_message(self, chat_id, text, reply_markup=None):
+        if chat_id in self._blocked:
+            raise TelegramForbiddenError(SendMessage(chat_id=chat_id, text=text), "bot was blocked")
+        self.sent.append(chat_id)
+
+
+class EmployeeSheets(Sheets):
+    async def get_all_records(self, sheet_name):
+        return [
+            {"Telegram_Nickname": f"@{n}", "Last_Name": n.title(), "First_Name": "A"}
+            for n in ("ann", "bob", "carl", "dan")
+        ]
+
+
+def test_invitations_go_through_the_sender(redis_service, store):
+    async def run():
+        sheets = EmployeeSheets()
+        service, _ = make_service(redis_service, store, sheets)
+        employees = EmployeeService(redis_service, sheets)
+        await employees.load_employees()
+        for telegram_id, nickname in enumerate(("bob", "carl", "dan"), 1):
+            await employees.register_telegram_id(nickname, telegram_id)
+        cycle = (await service.create_cycles([spec("ann", "bob", "carl", "dan")]))[0]
+
+        bot = Bot(2)
+        sender = RateLimitedSender(rate=1000, redis_service=redis_service)
+        result = await service.notify_respondents(cycle, employees, bot, sender)
+        assert (result.sent, bot.sent) == (2, [1, 3])
+        assert await service.get_pending_notifications("carl") == {cycle.id}
+
+        # Invitations a stopping process has not sent yet go to the next one.
+        sender.stop()
+        result = await service.notify_respondents(cycle, employees, Bot(), sender)
+        assert result.handed_over == 3
+        assert len(await redis_service.get_list(OUTBOX_KEY)) == 3
+
+    asyncio.run(run())
+
+
+def test_concurrent_submissions_keep_each_other(redis_service, store):
+    async def run():
+        service, _ = make_service(redis_service, store, Sheets())
+        cycle = (await service.create_cycles([spec("ann", "bob", "carl", "dan")]))[0]
+
+        submitted = await asyncio.gather(
+            *(service.submit_answers(cycle, r, {"q1": "5"}) for r in ("bob", "carl", "dan"))
+        )
+        assert submitted == [True] * 3
+        stored = await service.get_cycle_by_id(cycle.id)
+        assert {r: info.status for r, info in stored.respondents.items()} == dict.fromkeys(
+            ("bob", "carl", "dan"), "completed"
+        )
+
+        await service.close_cycle(cycle)
+        stored = await service.get_cycle_by_id(cycle.id)
+        assert stored.status == "closed" and stored.respondents["bob"].status == "completed"
+
+    asyncio.run(run())
+
+
+def test_cycles_created_before_the_active_set_are_backfilled(redis_service, store):
+    async def run():
+        service, _ = make_service(redis_service, store, Sheets())
+        cycles = await service.create_cycles([spec("ann", "bob"), spec("bob", "ann")])
+        await service.close_cycle(cycles[1])
+        await redis_service.delete_key(ACTIVE_CYCLES_KEY)
+
+        assert await service.backfill_active_cycles() == 1
+        assert await redis_service.get_set(ACTIVE_CYCLES_KEY) == {cycles[0].id}
+        # Cycles already tracking progress keep their counters.
+        assert (await service._progress.get_snapshot()).total.invited == 2
+        # Only once: later cycles are counted when they are created.
+        assert await service.backfill_active_cycles() == 0
+
+    asyncio.run(run())
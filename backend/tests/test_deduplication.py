@@ -0,0 +1,129 @@
+import asyncio
+
+import pytest
+from aiogram.types import Update
+
+from backend.src.bot.middlewares.deduplication import DeduplicationMiddleware
+
+
+def message_update(update_id: int) -> Update:
+    return Update.model_validate(
+        {
+            "update_id": update_id,
+            "message": {
+                "message_id": 1,
+                "date": 0,
+                "chat": {"id": 7, "type": "private"},
+                "from": {"id": 7, "is_bot": False, "first_name": "User"},
+                "text": "/start",
+            },
+        }
+    )
+
+
+def callback_update(update_id: int, data: str) -> Update:
+    user = {"id": 7, "is_bot": False, "first_name": "User"}
+    return Update.model_validate(
+        {
+            "update_id": update_id,
+            "callback_query": {
+                "id": str(update_id),
+                "chat_instance": "1",
+                "from": user,
+                "data": data,
+                "message": {
+                    "message_id": 10,
+                    "date": 0,
+                    "chat": {"id": 7, "type": "private"},
+                    "from": user,
+                    "text": "Пройти опрос?",
+                },
+            },
+        }
+    )
+
+
+class FakeBot:
+    def __init__(self):
+        self.answered = []
+
+    async def answer_callback_query(self, callback_query_id):
+        self.answered.append(callback_query_id)
+
+
+class Handler:
+    def __init__(self, failures: int = 0, delay: float = 0):
+        self.calls = 0
+        self._failures = failures
+        self._delay = delay
+
+    async def __call__(self, event, data):
+        self.calls += 1
+        await asyncio.sleep(self._delay)
+        if self._failures:
+            self._failures -= 1
+            raise RuntimeError("handler failed")
+        return "handled"
+
+
+def test_redelivered_update_is_dropped_even_while_in_progress(redis_service):
+    async def run():
+        dedup = DeduplicationMiddleware(redis_service)
+        handler = Handler(delay=0.05)
+        results = await asyncio.gather(
+            dedup(handler, message_update(1), {}), dedup(handler, message_update(1), {})
+        )
+        assert sorted(results, key=str) == [None, "handled"]
+        assert await dedup(handler, message_update(1), {}) is None
+        assert handler.calls == 1 and dedup.duplicate_updates == 2
+
+    asyncio.run(run())
+
+
+def test_repeated_callback_is_dropped_unless_repeatable(redis_service):
+    async def run():
+        dedup = DeduplicationMiddleware(redis_service)
+        handler = Handler()
+        bot = FakeBot()
+        data = {"bot": bot}
+        assert await dedup(handler, callback_update(1, "survey:abc"), data) == "handled"
+        assert await dedup(handler, callback_update(2, "survey:abc"), data) is None
+        # The dropped press is answered, so its button stops loading.
+        assert bot.answered == ["2"]
+        assert await dedup(handler, callback_update(3, "survey:xyz"), {}) == "handled"
+        # The dropped press itself is done: its redelivery is dropped too.
+        assert await dedup(handler, callback_update(2, "survey:abc"), {}) is None
+
+        assert await dedup(handler, callback_update(4, "toggle_resp:ann:0"), {}) == "handled"
+        assert await dedup(handler, callback_update(5, "toggle_resp:ann:0"), {}) == "handled"
+        assert handler.calls == 4
+        assert (dedup.duplicate_callbacks, dedup.duplicate_updates) == (1, 1)
+
+    asyncio.run(run())
+
+
+def test_failed_update_is_handled_again_when_retried(redis_service):
+    async def run():
+        dedup = DeduplicationMiddleware(redis_service)
+        handler = Handler(failures=1)
+        with pytest.raises(RuntimeError):
+            await dedup(handler, callback_update(1, "survey:abc"), {})
+        assert await dedup(handler, callback_update(1, "survey:abc"), {}) == "handled"
+        assert await dedup(handler, callback_update(1, "survey:abc"), {}) is None
+        assert handler.calls == 2
+
+    asyncio.run(run())
+
+
+def test_claim_is_renewed_while_a_long_handler_runs(redis_service):
+    async def run():
+        dedup = DeduplicationMiddleware(redis_service, processing_ttl=1)
+        handler = Handler(delay=1.6)
+        first = asyncio.create_task(dedup(handler, message_update(1), {}))
+        # Well past the claim's TTL, the update is still being handled.
+        await asyncio.sleep(1.3)
+        assert await dedup(handler, message_update(1), {}) is None
+        assert await first == "handled"
+        assert handler.calls == 1
+
+    asyncio.run(run())
@@ -0,0 +1,54 @@
+import asyncio
+
+from aiogram.types import InlineKeyboardButton, InlineKeyboardMarkup
+
+from backend.src.services.edit_coalescer import EditCoalescer
+
+
+class FakeBot:
+    def __init__(self):
+        self.edits = []
+
+    async def edit_message_reply_markup(self, chat_id, message_id, reply_markup):
+        self.edits.append((chat_id, message_id, reply_markup))
+
+
+def markup(label: str) -> InlineKeyboardMarkup:
+    return InlineKeyboardMarkup(
+        inline_keyboard=[[InlineKeyboardButton(text=label, callback_data=label)]]
+    )
+
+
+def test_burst_is_sent_as_one_edit_with_latest_markup():
+    async def scenario():
+        bot = FakeBot()
+        coalescer = EditCoalescer(delay=0.01)
+        for label in ("a", "b", "c"):
+            coalescer.edit_markup(bot, 1, 10, markup(label))
+        coalescer.edit_markup(bot, 2, 20, markup("x"))
+        await coalescer.drain()
+        return bot, coalescer
+
+    bot, coalescer = asyncio.run(scenario())
+
+    assert [(c, m, k.inline_keyboard[0][0].text) for c, m, k in bot.edits] == [
+        (1, 10, "c"),
+        (2, 20, "x"),
+    ]
+    assert coalescer.requested == 4 and coalescer.sent == 2
+
+
+def test_unchanged_markup_is_not_resent():
+    async def scenario():
+        bot = FakeBot()
+        coalescer = EditCoalescer(delay=0.01)
+        coalescer.edit_markup(bot, 1, 10, markup("a"))
+        await coalescer.drain()
+        coalescer.edit_markup(bot, 1, 10, markup("a"))
+        await coalescer.drain()
+        return bot, coalescer
+
+    bot, coalescer = asyncio.run(scenario())
+
+    assert len(bot.edits) == 1
+    assert coalescer.skipped == 1
@@ -0,0 +1,60 @@
+import pytest
+from gspread.utils import absolute_range_name
+
+from backend.src.services.google_sheets import GoogleSheetsService
+
+
+class Worksheet:
+    def __init__(self, title):
+        self.title = title
+
+
+class Spreadsheet:
+    """Keeps worksheets and their first rows; can fail the header write once."""
+
+    def __init__(self, fail_header_write=False):
+        self.first_rows = {}
+        self._fail_header_write = fail_header_write
+
+    def worksheets(self):
+        return [Worksheet(title) for title in self.first_rows]
+
+    def batch_update(self, body):
+        for request in body["requests"]:
+            self.first_rows[request["addSheet"]["properties"]["title"]] = None
+
+    def values_batch_get(self, ranges):
+        titles = {absolute_range_name(title, "1:1"): title for title in self.first_rows}
+        return {"valueRanges": [
+            {"range": r, **({"values": [self.first_rows[titles[r]]]} if self.first_rows[titles[r]] else {})}
+            for r in ranges
+        ]}
+
+    def values_batch_update(self, body):
+        if self._fail_header_write:
+            self._fail_header_write = False
+            raise ConnectionError("timed out")
+        titles = {absolute_range_name(title, "A1"): title for title in self.first_rows}
+        for data in body["data"]:
+            self.first_rows[titles[data["range"]]] = data["values"][0]
+
+
+def make_service(spreadsheet):
+    service = GoogleSheetsService.__new__(GoogleSheetsService)
+    service._spreadsheet = spreadsheet
+    service._spreadsheets = {}
+    return service
+
+
+def test_retry_writes_the_headers_a_failed_attempt_left_out():
+    spreadsheet = Spreadsheet(fail_header_write=True)
+    spreadsheet.first_rows["done"] = ["cycle_id"]
+    service = make_service(spreadsheet)
+    worksheets = {"done": ["cycle_id"], "a": ["cycle_id", "q1"], "b": ["cycle_id", "q2"]}
+
+    with pytest.raises(ConnectionError):
+        service._create_worksheets_sync.__wrapped__(service, worksheets)
+    assert spreadsheet.first_rows == {"done": ["cycle_id"], "a": None, "b": None}
+
+    assert service._create_worksheets_sync.__wrapped__(service, worksheets) == 0
+    assert spreadsheet.first_rows == {"done": ["cycle_id"], "a": ["cycle_id", "q1"], "b": ["cycle_id", "q2"]}
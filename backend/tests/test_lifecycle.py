@@ -0,0 +1,123 @@
+import asyncio
+import time
+
+from aiogram.exceptions import TelegramForbiddenError
+from aiogram.methods import SendMessage
+
+from backend.src.bot.keyboards.survey_keyboards import get_survey_invitation_keyboard
+from backend.src.bot.middlewares.in_flight import InFlightMiddleware
+from backend.src.lifecycle import LifecycleManager
+from backend.src.services.notification_sender import (
+    OUTBOX_CLAIM_KEY,
+    OUTBOX_CLAIM_TIMEOUT_SECONDS,
+    OUTBOX_CLAIMS_KEY,
+    OUTBOX_KEY,
+    OutgoingMessage,
+    RateLimitedSender,
+)
+
+
+class FakeBot:
+    """Refuses to send to the given chats, as for a user who blocked the bot."""
+
+    def __init__(self, *blocked_chats):
+        self.sent = []
+        self._blocked = set(blocked_chats)
+
+    async def send_message(self, chat_id, text, reply_markup=None):
+        if chat_id in self._blocked:
+            raise TelegramForbiddenError(SendMessage(chat_id=chat_id, text=text), "bot was blocked")
+        self.sent.append((chat_id, text, reply_markup))
+
+
+def test_stopped_sender_hands_messages_over_to_the_next_process(redis_service):
+    async def run():
+        messages = [
+            OutgoingMessage(1, "plain"),
+            OutgoingMessage(2, "invite", get_survey_invitation_keyboard("t"), "bob", "cycle"),
+        ]
+        stopped = RateLimitedSender(rate=1000, redis_service=redis_service)
+        stopped.stop()
+        result = await stopped.send_many(FakeBot(), messages)
+        assert (result.sent, result.failed, result.handed_over) == (0, [], 2)
+        assert stopped.handed_over == 2
+
+        bot = FakeBot()
+        assert await RateLimitedSender(rate=1000, redis_service=redis_service).resume(bot) == 2
+        assert bot.sent == [(m.chat_id, m.text, m.reply_markup) for m in messages]
+        assert not await redis_service.get_list(OUTBOX_KEY)
+        assert not await redis_service.get_sorted_set_members(OUTBOX_CLAIMS_KEY, 0)
+
+    asyncio.run(run())
+
+
+def test_resumed_invitations_that_fail_are_passed_on(redis_service):
+    async def run():
+        messages = [
+            OutgoingMessage(1, "invite", employee_id="ann", cycle_id="c1"),
+            OutgoingMessage(2, "invite", employee_id="bob", cycle_id="c1"),
+        ]
+        await redis_service.append_to_list(OUTBOX_KEY, [m.to_json() for m in messages])
+        undelivered = []
+
+        async def on_undelivered(failed):
+            undelivered.extend(failed)
+
+        sender = RateLimitedSender(rate=1000, batch_size=1, redis_service=redis_service)
+        assert await sender.resume(FakeBot(2), on_undelivered) == 2
+        assert undelivered == [messages[1]]
+
+    asyncio.run(run())
+
+
+def test_batch_of_a_process_that_died_is_put_back(redis_service):
+    async def run():
+        messages = [OutgoingMessage(chat_id, "text") for chat_id in (1, 2, 3)]
+        await redis_service.append_to_list(OUTBOX_KEY, [m.to_json() for m in messages])
+        # A process took the first two and died before sending them.
+        await redis_service.add_to_sorted_set(
+            OUTBOX_CLAIMS_KEY, {"dead": time.time() - OUTBOX_CLAIM_TIMEOUT_SECONDS - 1}
+        )
+        await redis_service.move_list_items(OUTBOX_KEY, OUTBOX_CLAIM_KEY.format(claim="dead"), 2)
+
+        bot = FakeBot()
+        assert await RateLimitedSender(rate=1000, redis_service=redis_service).resume(bot) == 3
+        assert sorted(chat_id for chat_id, _, _ in bot.sent) == [1, 2, 3]
+        assert not await redis_service.get_list(OUTBOX_CLAIM_KEY.format(claim="dead"))
+
+    asyncio.run(run())
+
+
+def test_shutdown_waits_for_updates_in_flight():
+    async def run():
+        in_flight = InFlightMiddleware()
+        finished = []
+
+        async def handler(event, data):
+            await asyncio.sleep(0.05)
+            finished.append(event)
+
+        lifecycle = LifecycleManager(in_flight, RateLimitedSender(), drain_timeout=1)
+        lifecycle.start(FakeBot())
+        update = asyncio.create_task(in_flight(handler, "update", {}))
+        await asyncio.sleep(0)
+        await lifecycle.shutdown()
+        assert finished == ["update"] and in_flight.in_flight == 0
+        await update
+        assert await InFlightMiddleware().wait_idle(0)
+
+    asyncio.run(run())
+
+
+def test_webhook_drain_and_shutdown_share_one_deadline():
+    async def run():
+        sender = RateLimitedSender()
+        lifecycle = LifecycleManager(InFlightMiddleware(), sender, drain_timeout=5)
+        deadline = lifecycle.start_drain()
+        assert 4 < deadline - time.monotonic() <= 5
+        await asyncio.sleep(0.01)
+        assert lifecycle.start_drain() == deadline
+        await lifecycle.shutdown()
+        assert lifecycle.start_drain() == deadline
+
+    asyncio.run(run())
@@ -0,0 +1,37 @@
+import pytest
+
+from backend.src.config import MetricsSettings
+from backend.src.metrics import Metric, Registry
+
+
+def test_prometheus_text_rendering():
+    registry = Registry()
+    requests = registry.counter("requests_total", "Requests.", ("handler",))
+    latency = registry.histogram("latency_seconds", "Latency.", ("handler",), buckets=(0.1, 1.0))
+    hits = registry.gauge("cache_hits", "Hits.")
+    requests.inc("start")
+    requests.inc("start")
+    latency.observe(0.05, "start")
+    latency.observe(0.5, "start")
+    latency.observe(5, "start")
+    hits.set_function(lambda: 7)
+
+    lines = registry.render().splitlines()
+
+    assert "# TYPE requests_total counter" in lines
+    assert 'requests_total{handler="start"} 2' in lines
+    assert 'latency_seconds_bucket{handler="start",le="0.1"} 1' in lines
+    assert 'latency_seconds_bucket{handler="start",le="1"} 2' in lines
+    assert 'latency_seconds_bucket{handler="start",le="+Inf"} 3' in lines
+    assert 'latency_seconds_sum{handler="start"} 5.55' in lines
+    assert 'latency_seconds_count{handler="start"} 3' in lines
+    assert "cache_hits 7" in lines
+
+
+def test_metrics_are_private_by_default(monkeypatch):
+    for name in ("METRICS_ENABLED", "METRICS_HOST"):
+        monkeypatch.delenv(name, raising=False)
+    settings = MetricsSettings(_env_file=None)
+    assert not settings.ENABLED and settings.HOST == "127.0.0.1"
+    with pytest.raises(TypeError):
+        Metric("custom", "A metric without samples.")
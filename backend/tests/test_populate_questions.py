@@ -0,0 +1,58 @@
+import asyncio
+
+from backend.src.services.question_service import QUESTIONNAIRE_VERSION_KEY, QuestionnaireService
+from scripts.populate_questions_sheet import describe_diff, diff_rows
+
+HEADER = ["id", "ui_type", "text"]
+ROWS = [HEADER, ["G-1", "radio", "Комфортно?"], ["G-2", "textarea", "Комментарий"]]
+
+
+def test_identical_sheet_needs_no_changes():
+    assert diff_rows(ROWS, ROWS) == []
+    assert describe_diff(ROWS, ROWS) == []
+    # Sheets omits trailing empty cells; they are not a difference.
+    assert diff_rows([HEADER, ["G-1", "radio", "Комфортно?"], ["G-2", "textarea", "Комментарий", ""]], ROWS) == []
+
+
+def test_edited_row_is_the_only_change():
+    current = [HEADER, ["G-1", "radio", "Комфортно ли?"], ROWS[2]]
+    assert diff_rows(current, ROWS) == [(2, ["G-1", "radio", "Комфортно?"])]
+    assert describe_diff(current, ROWS) == ["~ G-1.text: 'Комфортно ли?' -> 'Комфортно?'"]
+
+
+def test_rows_past_the_end_are_blanked():
+    current = ROWS + [["G-3", "radio", "Удалённый"], ["", "", "", "заметка"]]
+    assert diff_rows(current, ROWS) == [(4, ["", "", "", ""]), (5, ["", "", "", ""])]
+    assert describe_diff(current, ROWS) == ["- G-3"]
+
+
+def test_header_change_rewrites_the_header_row():
+    desired = [HEADER + ["options"], ROWS[1] + [""], ROWS[2] + [""]]
+    assert diff_rows(ROWS, desired) == [(1, HEADER + ["options"])]
+    assert describe_diff(ROWS, desired)[0] == f"~ header: {HEADER} -> {HEADER + ['options']}"
+    assert describe_diff([], desired)[:2] == [f"~ header: [] -> {desired[0]}", "+ G-1: Комфортно?"]
+
+
+class QuestionsSheet:
+    def __init__(self, text):
+        self.text = text
+        self.reads = 0
+
+    async def get_all_records(self, sheet_name):
+        self.reads += 1
+        return [{"question_id": "G-1", "question_text": self.text, "question_type": "radio"}]
+
+
+def test_version_bump_is_seen_without_waiting_for_the_cache(redis_service):
+    async def run():
+        sheet = QuestionsSheet("Старый текст")
+        service = QuestionnaireService(redis_service, sheet)
+        assert (await service.get_questionnaire())[0].text == "Старый текст"
+        sheet.text = "Новый текст"
+        assert (await service.get_questionnaire())[0].text == "Старый текст"
+
+        await redis_service.increment(QUESTIONNAIRE_VERSION_KEY)
+        assert (await service.get_questionnaire())[0].text == "Новый текст"
+        assert sheet.reads == 2
+
+    asyncio.run(run())
@@ -0,0 +1,137 @@
+import asyncio
+from datetime import date
+
+from backend.src.services.progress_service import ProgressService, format_progress_summary
+from backend.src.storage.models import Employee, FeedbackCycle, RespondentInfo
+
+
+class Employees:
+    def find_by_id(self, employee_id):
+        if employee_id == "ann":
+            return Employee(Telegram_Nickname="@ann", Last_Name="Петрова", First_Name="Анна")
+        return None
+
+
+def make_cycle(cycle_id, target, respondents, deadline=date(2025, 7, 20)):
+    return FeedbackCycle(
+        id=cycle_id,
+        target_employee_id=target,
+        respondents={r: RespondentInfo(id=r, token=f"t-{r}") for r in respondents},
+        deadline=deadline,
+        results_sheet=cycle_id,
+    )
+
+
+def test_transitions_move_forward_once(redis_service):
+    async def run():
+        progress = ProgressService(redis_service)
+        await progress.register_cycle(make_cycle("c1", "ann", ["bob", "carl", "dan"]))
+
+        assert await progress.mark_started("c1", "bob")
+        assert not await progress.mark_started("c1", "bob")
+        assert await progress.mark_completed("c1", "bob")
+        assert not await progress.mark_completed("c1", "bob")
+        assert not await progress.mark_started("c1", "bob")
+        # Submitting without opening the survey first is allowed.
+        assert await progress.mark_completed("c1", "carl")
+        # Unknown respondents have no state to move from.
+        assert not await progress.mark_started("c1", "eve")
+
+        cycle = (await progress.get_snapshot()).cycles["c1"]
+        assert (cycle.invited, cycle.started, cycle.completed, cycle.overdue) == (3, 1, 2, 0)
+        assert cycle.active and cycle.target_employee_id == "ann"
+
+    asyncio.run(run())
+
+
+def test_overdue_is_counted_once_and_closes_the_cycle(redis_service):
+    async def run():
+        progress = ProgressService(redis_service)
+        await progress.register_cycle(make_cycle("c1", "ann", ["bob", "carl", "dan"]))
+        await progress.register_cycle(make_cycle("c2", "zoe", ["bob"]))
+        await progress.mark_completed("c1", "bob")
+        await progress.mark_started("c1", "carl")
+
+        assert await progress.mark_overdue("c1") == 2
+        assert await progress.mark_overdue("c1") == 0
+
+        snapshot = await progress.get_snapshot()
+        assert snapshot.cycles["c1"].overdue == 2 and not snapshot.cycles["c1"].active
+        assert list(snapshot.active_cycles) == ["c2"]
+        total = snapshot.total
+        assert (total.invited, total.started, total.completed, total.overdue) == (4, 1, 1, 2)
+
+    asyncio.run(run())
+
+
+
+def test_removal_and_restore_keep_the_totals_in_step(redis_service):
+    async def run():
+        progress = ProgressService(redis_service)
+        removed = make_cycle("c1", "ann", ["bob", "carl"])
+        await progress.register_cycle(removed)
+        await progress.register_cycle(make_cycle("c2", "zoe", ["bob"]))
+        await progress.mark_completed("c1", "bob")
+        await progress.mark_overdue("c1")
+        counters = (await progress.get_snapshot()).cycles["c1"]
+
+        pipe = redis_service.pipeline()
+        progress.queue_removal(pipe, "c1")
+        await pipe.execute()
+        snapshot = await progress.get_snapshot()
+        assert list(snapshot.cycles) == ["c2"]
+        total = snapshot.total
+        assert (total.invited, total.started, total.completed, total.overdue) == (1, 0, 0, 0)
+
+        pipe = redis_service.pipeline()
+        progress.queue_restore(
+            pipe, removed, {"invited": counters.invited, "completed": counters.completed,
+                            "overdue": counters.overdue},
+        )
+        await pipe.execute()
+        total = (await progress.get_snapshot()).total
+        assert (total.invited, total.completed, total.overdue) == (3, 1, 1)
+
+    asyncio.run(run())
+
+
+def test_cycles_from_before_progress_tracking_are_backfilled_once(redis_service):
+    async def run():
+        progress = ProgressService(redis_service)
+        cycle = make_cycle("c1", "ann", ["bob", "carl"])
+        cycle.respondents["bob"].status = "completed"
+        for _ in range(2):
+            pipe = redis_service.pipeline()
+            progress.queue_backfill(pipe, cycle)
+            await pipe.execute()
+
+        assert await progress.mark_started("c1", "carl")
+        assert not await progress.mark_completed("c1", "bob")
+        snapshot = await progress.get_snapshot()
+        progress_c1 = snapshot.cycles["c1"]
+        assert (progress_c1.invited, progress_c1.started, progress_c1.completed) == (2, 1, 1)
+        assert progress_c1.active and progress_c1.deadline == cycle.deadline
+        assert (snapshot.total.invited, snapshot.total.completed) == (2, 1)
+
+    asyncio.run(run())
+
+def test_summary_lists_active_cycles_and_totals(redis_service):
+    async def run():
+        progress = ProgressService(redis_service)
+        await progress.register_cycle(make_cycle("c1", "ann", ["bob", "carl"]))
+        await progress.register_cycle(make_cycle("c2", "zoe", ["bob"], deadline=date(2025, 7, 15)))
+        await progress.mark_completed("c1", "bob")
+        snapshot = await progress.get_snapshot()
+
+        text = format_progress_summary(snapshot, Employees(), date(2025, 7, 10))
+        assert text.index("c2") < text.index("c1")
+        assert "Анна Петрова (<code>c1</code>)\nГотово 1/2 (50%)" in text
+        assert "дедлайн через 10 дн" in text and "zoe" in text
+        assert text.endswith("приглашено 3, начали 0, завершили 1, просрочено 0")
+
+        await progress.mark_closed("c1")
+        await progress.mark_closed("c2")
+        text = format_progress_summary(await progress.get_snapshot(), Employees(), date(2025, 7, 10))
+        assert text == "Активных циклов нет."
+
+    asyncio.run(run())
@@ -0,0 +1,188 @@
+import asyncio
+import time
+from datetime import date, datetime, timedelta, timezone
+
+import pytest
+
+from backend.src.scheduler import LeaderElection
+from backend.src.services.reminder_service import CLAIM_LEASE_SECONDS, REMINDERS_KEY, ReminderService
+from backend.src.storage.models import Employee, FeedbackCycle, RespondentInfo
+
+MSK = timezone(timedelta(hours=3))
+
+
+def make_service():
+    return ReminderService(
+        redis_service=None,
+        cycle_service=None,
+        employee_service=None,
+        sender=None,
+        tz=MSK,
+        interval_days=3,
+        final_ping_days=2,
+        reminder_hour=10,
+    )
+
+
+def test_reminders_every_interval_until_final_ping():
+    service = make_service()
+    deadline = date(2025, 7, 20)
+    now = datetime(2025, 7, 1, 15, 0, tzinfo=MSK)
+
+    schedule = []
+    at = service.next_reminder_at(now, deadline)
+    while at:
+        schedule.append(at)
+        at = service.next_reminder_at(at, deadline)
+
+    assert schedule[0] == datetime(2025, 7, 4, 10, 0, tzinfo=MSK)
+    assert all(b - a <= timedelta(days=3) for a, b in zip(schedule, schedule[1:]))
+    assert schedule[-1] == datetime(2025, 7, 18, 10, 0, tzinfo=MSK)
+
+
+def test_no_reminders_after_final_ping():
+    service = make_service()
+    now = datetime(2025, 7, 19, 9, 0, tzinfo=MSK)
+
+    assert service.next_reminder_at(now, date(2025, 7, 20)) is None
+    assert service.deadline_at(date(2025, 7, 20)) == datetime(2025, 7, 21, tzinfo=MSK)
+
+
+class Cycles:
+    def __init__(self, fail=False):
+        self.expired = []
+        self._fail = fail
+
+    async def expire_cycle(self, cycle):
+        if self._fail:
+            raise RuntimeError("Redis unavailable")
+        self.expired.append(cycle.id)
+
+
+class Employees:
+    def __init__(self, *registered):
+        self._registered = set(registered)
+
+    def get_all_employees(self):
+        return [self.find_by_id(n) for n in ("ann", "bob", "carl")]
+
+    async def refresh_telegram_ids(self):
+        pass
+
+    def find_by_id(self, employee_id):
+        telegram_id = ord(employee_id[0]) if employee_id in self._registered else None
+        return Employee(Telegram_Nickname=employee_id, Last_Name=employee_id.title(),
+                        First_Name="A", telegram_id=telegram_id)
+
+
+class Sender:
+    def __init__(self):
+        self.sent = []
+
+    async def send_many(self, bot, messages, on_progress=None):
+        self.sent.extend(m.chat_id for m in messages)
+
+
+def make_cycle(cycle_id, *respondents, deadline=date(2030, 1, 31)):
+    return FeedbackCycle(
+        id=cycle_id,
+        target_employee_id="ann",
+        respondents={r: RespondentInfo(id=r, token=f"t-{r}") for r in respondents},
+        deadline=deadline,
+    )
+
+
+def make_ticking_service(redis_service, cycles, batch_size=100):
+    sender = Sender()
+    service = ReminderService(
+        redis_service=redis_service,
+        cycle_service=cycles,
+        employee_service=Employees("bob", "carl"),
+        sender=sender,
+        tz=MSK,
+        batch_size=batch_size,
+    )
+    return service, sender
+
+
+def test_tick_processes_only_due_entries(redis_service):
+    async def run():
+        cycles = Cycles()
+        service, sender = make_ticking_service(redis_service, cycles, batch_size=2)
+        await redis_service.set_model("cycle:c1", make_cycle("c1", "bob", "carl"))
+        await redis_service.set_model("cycle:c2", make_cycle("c2", "bob", deadline=date(2020, 1, 1)))
+        past, future = time.time() - 60, time.time() + 3600
+        await redis_service.add_to_sorted_set(REMINDERS_KEY, {
+            "remind:c1:bob": past, "remind:c1:carl": past, "deadline:c2": past,
+            "remind:c2:bob": future,
+        })
+
+        # Two batches of two take the three due entries.
+        assert await service.tick(bot=None) == 3
+        assert sorted(sender.sent) == [ord("b"), ord("c")]
+        assert cycles.expired == ["c2"]
+        left = await redis_service.get_sorted_set_members(REMINDERS_KEY, 0)
+        # The reminders of c1 are rescheduled; c2's future one is untouched.
+        assert sorted(left) == ["remind:c1:bob", "remind:c1:carl", "remind:c2:bob"]
+        assert await service.tick(bot=None) == 0
+
+    asyncio.run(run())
+
+
+def test_failed_batch_is_due_again_after_the_lease(redis_service):
+    async def run():
+        cycles = Cycles(fail=True)
+        service, _ = make_ticking_service(redis_service, cycles)
+        await redis_service.set_model("cycle:c1", make_cycle("c1", "bob", deadline=date(2020, 1, 1)))
+        await redis_service.add_to_sorted_set(REMINDERS_KEY, {"deadline:c1": time.time() - 60})
+
+        with pytest.raises(RuntimeError):
+            await service.tick(bot=None)
+        # Leased rather than lost: not due now, but due once the lease ends.
+        assert await service.tick(bot=None) == 0
+        assert await redis_service.get_sorted_set_members(
+            REMINDERS_KEY, time.time() + CLAIM_LEASE_SECONDS - 60
+        ) == ["deadline:c1"]
+
+        cycles._fail = False
+        await redis_service.add_to_sorted_set(REMINDERS_KEY, {"deadline:c1": time.time() - 1})
+        assert await service.tick(bot=None) == 1
+        assert cycles.expired == ["c1"]
+        assert not await redis_service.get_sorted_set_members(REMINDERS_KEY, 0)
+
+    asyncio.run(run())
+
+
+def test_due_members_are_popped_and_claimed_atomically(redis_service):
+    async def run():
+        await redis_service.add_to_sorted_set("due", {"a": 1, "b": 2, "c": 3, "d": 10})
+        assert await redis_service.pop_due_from_sorted_set("due", 3, limit=2) == ["a", "b"]
+        assert await redis_service.pop_due_from_sorted_set("due", 3, limit=2) == ["c"]
+        assert await redis_service.pop_due_from_sorted_set("due", 3, limit=2) == []
+
+        await redis_service.add_to_sorted_set("due", {"a": 1, "b": 2})
+        assert await redis_service.claim_due_from_sorted_set("due", 3, 10, lease_until=100.5) == ["a", "b"]
+        assert await redis_service.claim_due_from_sorted_set("due", 3, 10, lease_until=100.5) == []
+        # "b" was rescheduled while claimed, so releasing keeps it.
+        await redis_service.add_to_sorted_set("due", {"b": 50})
+        assert await redis_service.release_claimed("due", ["a", "b"], lease_until=100.5) == 1
+        assert await redis_service.get_sorted_set_members("due", 0) == ["d", "b"]
+
+    asyncio.run(run())
+
+
+def test_only_one_replica_leads(redis_service):
+    async def run():
+        first, second = LeaderElection(redis_service, 30), LeaderElection(redis_service, 30)
+        assert await first.check()
+        assert not await second.check()
+        # Checking again renews the lock of the leader.
+        assert await first.check()
+        await second.resign()
+        assert not await second.check()
+
+        await first.resign()
+        assert await second.check()
+        assert not await first.check()
+
+    asyncio.run(run())
@@ -0,0 +1,109 @@
+import asyncio
+from datetime import date
+
+from backend.src.services.report_aggregation import (
+    ReportAggregationService,
+    build_columns,
+    compute_report,
+)
+from backend.src.services.sheets_mirror import SheetsMirror
+from backend.src.storage.models import FeedbackCycle, Question
+from backend.src.storage.results_store import ResultsStore
+
+
+def make_question(qid, qtype, column):
+    return Question.model_validate(
+        {"question_id": qid, "question_text": qid, "question_type": qtype, "sheet_column": column}
+    )
+
+
+QUESTIONS = [
+    make_question("G-1", "checkbox", "G1_comfort"),
+    make_question("G-2", "radio", "G2_role_fit"),
+    make_question("C-1", "scale 0-3", "C1_score"),
+    make_question("O-2", "textarea", "O2_strengths"),
+]
+
+ROWS = [
+    ["cycle_id", "respondent_id", "submitted_at", "G1_comfort", "G2_role_fit", "C1_score", "O2_strengths"],
+    ["c1", "ivan", "2025-07-01", "communication,teamwork", "yes", "3", "text"],
+    ["c1", "petr", "2025-07-01", "teamwork", "yes", "1", "text"],
+    ["c1", "maria", "2025-07-02", "openness", "unknown", "2", "text"],
+    ["c1", "anna", "2025-07-02", "", "no", ""],
+]
+
+
+def test_scale_statistics_with_self_peer_gap():
+    report = compute_report("c1", build_columns(ROWS, QUESTIONS, target_employee_id="ivan"))
+    stats = report.scales["C1_score"]
+
+    assert report.responses == 4
+    assert stats.count == 3
+    assert stats.distribution == {0: 0, 1: 1, 2: 1, 3: 1}
+    assert stats.mean == 2.0
+    assert stats.self_score == 3.0
+    assert stats.peer_mean == 1.5
+    assert stats.self_peer_gap == 1.5
+    assert stats.percentiles == {25: 1, 50: 2, 75: 3, 90: 3}
+
+
+def test_categorical_distributions_and_merge():
+    first = compute_report("c1", build_columns(ROWS, QUESTIONS, target_employee_id="ivan"))
+    second = compute_report("c2", build_columns(ROWS[:2], QUESTIONS, target_employee_id="x"))
+    combined = first.merge(second)
+
+    assert first.categories["G1_comfort"]["teamwork"] == 2
+    assert first.categories["G2_role_fit"] == {"yes": 2, "unknown": 1, "no": 1}
+    assert "O2_strengths" not in first.scales
+    assert combined.cycle_ids == ["c1", "c2"]
+    assert combined.responses == 5
+    assert combined.scales["C1_score"].distribution[3] == 2
+    assert combined.categories["G1_comfort"]["teamwork"] == 3
+
+
+class Sheets:
+    def __init__(self):
+        self.sheets = {}
+
+    async def append_rows(self, worksheet_title, rows, spreadsheet_id=None):
+        self.sheets.setdefault((spreadsheet_id, worksheet_title), [ROWS[0]]).extend(rows)
+
+    async def get_all_values(self, sheet_name, spreadsheet_id=None):
+        return list(self.sheets.get((spreadsheet_id, sheet_name), [ROWS[0]]))
+
+
+class Questionnaire:
+    async def get_questionnaire(self):
+        return QUESTIONS
+
+
+def test_reports_change_after_new_submissions(redis_service):
+    cycle = FeedbackCycle(
+        id="c1", target_employee_id="ivan", respondents={}, deadline=date(2025, 7, 20),
+        results_sheet="Sheet 1", results_spreadsheet_id="main",
+    )
+
+    async def run():
+        sheets = Sheets()
+        # The cycle was created and answered on another host: this host
+        # reads it from the sheet.
+        elsewhere = ResultsStore(":memory:")
+        elsewhere.record_cycle("c1", "ivan", "Sheet 1", "main", ROWS[0])
+        remote = ReportAggregationService(redis_service, sheets, Questionnaire(), ResultsStore(":memory:"))
+        mirror = SheetsMirror(elsewhere, sheets, report_service=remote)
+
+        elsewhere.record_submission("c1", "petr", {"C1_score": "1"})
+        await mirror.run_once()
+        assert (await remote.get_cycle_report(cycle)).responses == 1
+        elsewhere.record_submission("c1", "maria", {"C1_score": "3"})
+        await mirror.run_once()
+        report = await remote.get_cycle_report(cycle)
+        assert report.responses == 2 and report.scales["C1_score"].mean == 2.0
+
+        # Local cycles are versioned by the store itself.
+        local = ReportAggregationService(redis_service, sheets, Questionnaire(), elsewhere)
+        assert (await local.get_cycle_report(cycle)).responses == 2
+        elsewhere.record_submission("c1", "anna", {"C1_score": "2"})
+        assert (await local.get_cycle_report(cycle)).responses == 3
+
+    asyncio.run(run())
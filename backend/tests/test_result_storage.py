@@ -0,0 +1,121 @@
+import asyncio
+
+import pytest
+
+from backend.src.config import ResultsSettings
+from backend.src.services.result_storage import (
+    ACTIVE_CYCLES_KEY,
+    CURRENT_SHARD_KEY,
+    ActiveCycleLimitReached,
+    ResultStorageFull,
+    ResultStorageRouter,
+)
+
+
+class Spreadsheets:
+    main_spreadsheet_id = "main"
+
+    def __init__(self, usage=None):
+        self.usage = dict(usage or {})
+        self.created = []
+
+    async def get_usage(self, spreadsheet_id=None):
+        return self.usage.get(spreadsheet_id, (0, 0))
+
+    async def create_spreadsheet(self, title, folder_id=None):
+        spreadsheet_id = f"extra{len(self.created) + 1}"
+        self.created.append((spreadsheet_id, title, folder_id))
+        return spreadsheet_id
+
+
+def make_router(redis_service, sheets=None, **limits):
+    config = ResultsSettings(
+        **{"SHARD_MAX_CYCLES": 2, "SHARD_MAX_CELLS": 100, "MAX_SHARDS": 2, **limits}
+    )
+    return ResultStorageRouter(redis_service, sheets or Spreadsheets(), config)
+
+
+def usage(shards):
+    return {s.spreadsheet_id: (s.cycles, s.cells) for s in shards}
+
+
+def test_reservation_is_atomic_and_idempotent_per_cycle(redis_service):
+    async def run():
+        router = make_router(redis_service, Spreadsheets({"main": (1, 10)}))
+        shards = await asyncio.gather(*(router.assign("c1", 2, 4) for _ in range(5)))
+        assert set(shards) == {"main"}
+        # The main spreadsheet starts from its real usage; c1 adds 3 rows of 4.
+        assert usage(await router.get_shards()) == {"main": (2, 22)}
+        assert await router.route("c1") == "main"
+
+    asyncio.run(run())
+
+
+def test_full_shard_rolls_over_to_a_new_spreadsheet(redis_service):
+    async def run():
+        sheets = Spreadsheets()
+        router = make_router(redis_service, sheets, FOLDER_ID="folder")
+        assert await router.assign("c1", 1, 10) == "main"
+        assert await router.assign("c2", 1, 10) == "main"
+        assert await router.assign("c3", 1, 10) == "extra1"
+        assert sheets.created == [("extra1", "360 Feedback results 2", "folder")]
+        assert await redis_service.get(CURRENT_SHARD_KEY) == "extra1"
+        assert usage(await router.get_shards()) == {"main": (2, 40), "extra1": (1, 20)}
+
+    asyncio.run(run())
+
+
+def test_storage_full_once_every_shard_is_used_up(redis_service):
+    async def run():
+        router = make_router(redis_service, MAX_SHARDS=1)
+        assert await router.has_capacity()
+        await router.assign("c1", 1, 10)
+        assert await router.has_capacity()
+        await router.assign("c2", 1, 10)
+        assert not await router.has_capacity()
+        with pytest.raises(ResultStorageFull):
+            await router.assign("c3", 1, 10)
+        with pytest.raises(ResultStorageFull):
+            await make_router(redis_service).assign("huge", 100, 10)
+
+    asyncio.run(run())
+
+
+def test_release_gives_the_room_back(redis_service):
+    async def run():
+        router = make_router(redis_service, MAX_SHARDS=1)
+        await router.assign("c1", 1, 10)
+        await router.assign("c2", 1, 10)
+        await router.release("c2", 1, 10)
+        await router.release("never-assigned", 1, 10)
+
+        assert await router.route("c2") is None
+        assert usage(await router.get_shards()) == {"main": (1, 20)}
+        assert await router.has_capacity()
+        assert await router.assign("c3", 1, 10) == "main"
+
+    asyncio.run(run())
+
+
+def test_concurrent_launches_share_the_active_cycle_limit(redis_service):
+    async def run():
+        router = make_router(redis_service, SHARD_MAX_CYCLES=10, MAX_ACTIVE_CYCLES=3)
+
+        async def launch(cycle_id):
+            try:
+                return await router.assign(cycle_id, 1, 10)
+            except ActiveCycleLimitReached:
+                return None
+
+        # The first registers the shard; the others race for the slots left.
+        shards = [await launch("c0")]
+        shards += await asyncio.gather(*(launch(f"c{i}") for i in range(1, 6)))
+        assert shards.count("main") == 3
+        assert len(await redis_service.get_set(ACTIVE_CYCLES_KEY)) == 3
+        # A routed cycle keeps its slot; releasing one frees it.
+        routed = [f"c{i}" for i, shard in enumerate(shards) if shard]
+        assert await router.assign(routed[0], 1, 10) == "main"
+        await router.release(routed[0], 1, 10)
+        assert await router.assign("c9", 1, 10) == "main"
+
+    asyncio.run(run())
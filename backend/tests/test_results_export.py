@@ -0,0 +1,162 @@
+import asyncio
+import csv
+import os
+import zipfile
+from datetime import date, datetime
+from types import SimpleNamespace
+from xml.etree import ElementTree
+
+from backend.src.bot.handlers.admin import cmd_export
+from backend.src.services.archive_service import ARCHIVE_SUMMARIES_KEY, CycleArchiveService
+from backend.src.services.results_export import (
+    CsvExportWriter,
+    ExportedCycle,
+    ResultsExportService,
+    XlsxExportWriter,
+    parse_period,
+)
+from backend.src.storage.models import CycleSummary, FeedbackCycle
+from backend.src.storage.results_store import ResultsStore
+
+
+class RangedSheets:
+    def __init__(self, sheets):
+        self.sheets = sheets
+        self.reads = []
+
+    async def get_row_count(self, sheet_name, spreadsheet_id=None):
+        return len(self.sheets[sheet_name])
+
+    async def get_rows(self, sheet_name, first_row, last_row, spreadsheet_id=None):
+        self.reads.append((sheet_name, first_row, last_row))
+        return self.sheets[sheet_name][first_row - 1:last_row]
+
+
+class NoEmployees:
+    async def load_employees(self):
+        pass
+
+    def find_by_id(self, employee_id):
+        return None
+
+
+def test_period_parsing():
+    assert parse_period("2025Q4", date(2025, 1, 1)) == (date(2025, 10, 1), date(2025, 12, 31))
+    assert parse_period("", date(2025, 5, 9)) == (date(2025, 4, 1), date(2025, 6, 30))
+    assert parse_period("2025-07-01 2025-07-31", date(2025, 1, 1)) == (
+        date(2025, 7, 1),
+        date(2025, 7, 31),
+    )
+
+
+def test_rows_stream_from_store_and_sheets_with_union_columns(tmp_path):
+    store = ResultsStore(str(tmp_path / "results.db"))
+    store.record_cycle("c1", "e1", "S1", None, ["cycle_id", "respondent_id", "submitted_at", "q1"])
+    for n in range(3):
+        store.record_submission("c1", f"r{n}", {"q1": n})
+    sheets = RangedSheets({
+        "S2": [["cycle_id", "respondent_id", "submitted_at", "q2", "q1"]]
+        + [["c2", f"p{n}", "t", "x", "1"] for n in range(5)]
+        + [["c2", "p5"]],
+    })
+    service = ResultsExportService(None, sheets, store, NoEmployees(), chunk_size=2)
+    passes = []
+
+    async def cycles():
+        passes.append(1)
+        yield ExportedCycle("c1", "e1", "S1", None)
+        yield ExportedCycle("c2", "e2", "S2", None)
+
+    async def collect():
+        return [row async for row in service.iter_rows(cycles)]
+
+    rows = asyncio.run(collect())
+
+    assert rows[0] == ["cycle_id", "target", "respondent_id", "submitted_at", "q1", "q2"]
+    assert [row[2] for row in rows[1:]] == ["r0", "r1", "r2", "p0", "p1", "p2", "p3", "p4", "p5"]
+    assert rows[4][4:] == ["1", "x"] and rows[-1][4:] == ["", ""]
+    # The header is read to collect the columns, then again with the first chunk.
+    assert sheets.reads == [("S2", 1, 1), ("S2", 1, 3), ("S2", 4, 5), ("S2", 6, 7)]
+    assert len(passes) == 2
+    store.close()
+
+
+def test_writers_produce_readable_files(tmp_path):
+    rows = [["name", "score"], ["=cmd()", "3"], ["a & <b>", ""]]
+    for writer_class in (CsvExportWriter, XlsxExportWriter):
+        writer = writer_class(str(tmp_path / writer_class.__name__))
+        for row in rows:
+            writer.write_row(row)
+        writer.close()
+
+    with open(tmp_path / "CsvExportWriter", encoding="utf-8-sig", newline="") as f:
+        assert list(csv.reader(f))[1] == ["'=cmd()", "3"]
+
+    with zipfile.ZipFile(tmp_path / "XlsxExportWriter") as workbook:
+        sheet = ElementTree.fromstring(workbook.read("xl/worksheets/sheet1.xml"))
+    ns = {"m": "http://schemas.openxmlformats.org/spreadsheetml/2006/main"}
+    cells = [
+        [c.findtext("m:v", namespaces=ns) or c.findtext("m:is/m:t", namespaces=ns) for c in row]
+        for row in sheet.iterfind("m:sheetData/m:row", ns)
+    ]
+    assert cells == [["name", "score"], ["=cmd()", "3"], ["a & <b>", None]]
+
+
+def test_export_streams_active_and_archived_cycles_of_the_period(redis_service, tmp_path, monkeypatch):
+    monkeypatch.setattr("backend.src.services.results_export.CYCLES_PER_READ", 2)
+    store = ResultsStore(str(tmp_path / "results.db"))
+    headers = ["cycle_id", "respondent_id", "submitted_at", "q1"]
+    sheets = RangedSheets({"Archived": [headers, ["a1", "r1", "t", "5"]]})
+
+    async def run():
+        created = [datetime(2025, 7, 1), datetime(2025, 8, 1), datetime(2025, 9, 1), datetime(2025, 1, 1)]
+        for n, created_at in enumerate(created):
+            cycle = FeedbackCycle(
+                id=f"c{n}", target_employee_id="e", respondents={}, deadline=date(2025, 12, 1),
+                results_sheet=f"S{n}", created_at=created_at,
+            )
+            await redis_service.set_model(f"cycle:{cycle.id}", cycle)
+            store.record_cycle(cycle.id, "e", cycle.results_sheet, None, headers)
+            store.record_submission(cycle.id, "r1", {"q1": n})
+        summary = CycleSummary(
+            id="a1", target_employee_id="e", status="reported", deadline=date(2025, 9, 1),
+            created_at=datetime(2025, 8, 15), results_sheet="Archived",
+        )
+        await redis_service.set_hash_fields(ARCHIVE_SUMMARIES_KEY, {"a1": summary.model_dump_json()})
+        # Export only reads the summaries.
+        archive = CycleArchiveService(redis_service, None, None, None, None, None)
+        service = ResultsExportService(redis_service, sheets, store, NoEmployees(), archive)
+        return await service.export(date(2025, 7, 1), date(2025, 9, 30), "csv")
+
+    export = asyncio.run(run())
+    with open(export.path, encoding="utf-8-sig", newline="") as f:
+        rows = list(csv.reader(f))
+    os.remove(export.path)
+    store.close()
+
+    assert (export.cycles, export.rows) == (4, 4)
+    assert sorted((row[0], row[4]) for row in rows[1:]) == [("a1", "5"), ("c0", "0"), ("c1", "1"), ("c2", "2")]
+
+
+class FailingExport:
+    async def export(self, start, end, fmt):
+        raise RuntimeError("Sheets API unavailable")
+
+
+class Status:
+    def __init__(self):
+        self.text = None
+
+    async def edit_text(self, text, **kwargs):
+        self.text = text
+
+
+def test_failed_export_replaces_the_progress_message():
+    status = Status()
+
+    async def answer(text, **kwargs):
+        return status
+
+    message = SimpleNamespace(answer=answer)
+    asyncio.run(cmd_export(message, SimpleNamespace(args="2025Q3"), FailingExport()))
+    assert status.text == "Не удалось подготовить выгрузку. Попробуйте позже."
@@ -0,0 +1,105 @@
+import asyncio
+import sqlite3
+
+import pytest
+
+from backend.src.services.sheets_mirror import SheetsMirror
+from backend.src.storage.results_store import ResultsStore
+
+HEADERS = ["cycle_id", "respondent_id", "submitted_at", "q1", "q2"]
+
+
+class FlakySheets:
+    def __init__(self, fail_times: int = 0):
+        self.fail_times = fail_times
+        self.sheets = {}
+        self.requests = 0
+
+    async def append_rows(self, worksheet_title, rows, spreadsheet_id=None):
+        self.requests += 1
+        if self.fail_times:
+            self.fail_times -= 1
+            raise RuntimeError("quota exceeded")
+        self.sheets.setdefault((spreadsheet_id, worksheet_title), []).extend(rows)
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = ResultsStore(str(tmp_path / "results.db"))
+    store.record_cycle("c1", "e1", "Sheet 1", "main", HEADERS)
+    store.record_cycle("c2", "e2", "Sheet 2", "shard1", HEADERS)
+    yield store
+    store.close()
+
+
+def test_rows_follow_headers_and_survive_reopen(tmp_path, store):
+    store.record_submission("c1", "r1", {"q2": "b", "q1": 3})
+    store.record_submission("c1", "r2", {"q1": 1})
+    store.close()
+
+    reopened = ResultsStore(str(tmp_path / "results.db"))
+    rows = reopened.get_rows("c1")
+    assert rows[0] == HEADERS
+    assert [row[:2] + row[3:] for row in rows[1:]] == [
+        ["c1", "r1", "3", "b"],
+        ["c1", "r2", "1", ""],
+    ]
+    reopened.close()
+
+
+def test_mirror_batches_per_sheet_and_resumes_after_failure(store):
+    for respondent in ("r1", "r2"):
+        store.record_submission("c1", respondent, {"q1": 1})
+    store.record_submission("c2", "r3", {"q1": 2})
+    store.record_submission("c1", "r4", {"q1": 0})
+
+    sheets = FlakySheets(fail_times=1)
+    mirror = SheetsMirror(store, sheets, batch_size=10)
+    assert asyncio.run(mirror.run_once()) == 0
+    assert mirror.lag == 4 and mirror.failures == 1
+
+    assert asyncio.run(mirror.run_once()) == 4
+    assert [row[1] for row in sheets.sheets[("main", "Sheet 1")]] == ["r1", "r2", "r4"]
+    assert [row[1] for row in sheets.sheets[("shard1", "Sheet 2")]] == ["r3"]
+    # One request per run of rows bound for the same sheet, plus the failed one.
+    assert sheets.requests == 4
+    assert mirror.lag == 0
+    assert asyncio.run(mirror.run_once()) == 0
+
+
+def test_store_from_before_partial_cycles_is_migrated(tmp_path):
+    path = str(tmp_path / "old.db")
+    db = sqlite3.connect(path)
+    db.execute(
+        "CREATE TABLE cycles (id TEXT PRIMARY KEY, target_employee_id TEXT NOT NULL, "
+        "results_sheet TEXT NOT NULL, results_spreadsheet_id TEXT, headers TEXT NOT NULL, "
+        "created_at TEXT NOT NULL)"
+    )
+    db.execute("INSERT INTO cycles VALUES ('c1', 'e1', 'Sheet 1', 'main', '[]', '')")
+    db.commit()
+    db.close()
+
+    store = ResultsStore(path)
+    assert store.has_cycle("c1")
+    store.record_cycle("c2", "e2", "Sheet 2", "main", HEADERS, complete=False)
+    store.record_cycle("c1", "e1", "Sheet 1", "main", HEADERS, complete=False)
+    assert not store.has_cycle("c2")
+    assert store.has_cycle("c1")
+    store.close()
+
+
+def test_processes_sharing_the_store_take_turns_mirroring(tmp_path, store):
+    store.record_submission("c1", "r1", {"q1": 1})
+    other = ResultsStore(str(tmp_path / "results.db"))
+    sheets = FlakySheets()
+
+    async def run():
+        with store.mirror_lock() as held:
+            assert held
+            assert await SheetsMirror(other, sheets).run_once() == 0
+        assert await SheetsMirror(other, sheets).run_once() == 1
+        assert await SheetsMirror(store, sheets).run_once() == 0
+
+    asyncio.run(run())
+    assert sheets.requests == 1 and store.mirror_lag() == 0
+    other.close()
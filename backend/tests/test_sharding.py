@@ -0,0 +1,140 @@
+import asyncio
+import time
+
+from aiogram import Bot, Dispatcher, Router
+from aiogram.types import Message, Update
+
+from backend.src.config import ShardingSettings
+from backend.src.sharding import (
+    CONSUMER_GROUP,
+    DEAD_LETTER_KEY,
+    LEASE_KEY,
+    STREAM_KEY,
+    UPDATE_FIELD,
+    WORKERS_KEY,
+    ShardWorker,
+    UpdatePublisher,
+)
+
+CONFIG = ShardingSettings(SHARDS=2, BLOCK_MS=10, LEASE_TTL_MS=300, MAX_ATTEMPTS=3, RETRY_DELAY_MS=1)
+
+
+def make_update(update_id: int, user_id: int = 42) -> Update:
+    user = {"id": user_id, "is_bot": False, "first_name": "User"}
+    return Update.model_validate(
+        {
+            "update_id": update_id,
+            "message": {
+                "message_id": update_id,
+                "date": 0,
+                "chat": {"id": user_id, "type": "private"},
+                "from": user,
+                "text": str(update_id),
+            },
+        }
+    )
+
+
+def make_dispatcher(seen, failures=None):
+    """Records message texts; `failures` maps a text to how often it fails first."""
+    failures = dict(failures or {})
+    router = Router()
+
+    @router.message()
+    async def on_message(message: Message):
+        if failures.get(message.text, 0) > 0:
+            failures[message.text] -= 1
+            raise RuntimeError(f"boom {message.text}")
+        seen.append(message.text)
+
+    dp = Dispatcher()
+    dp.include_router(router)
+    return dp
+
+
+def make_worker(redis_service, dp, index=0):
+    return ShardWorker(dp, Bot(token="12345:test-token"), redis_service, index, CONFIG)
+
+
+async def wait_until(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "condition not met in time"
+        await asyncio.sleep(0.01)
+
+
+async def run_until(worker, condition):
+    task = asyncio.create_task(worker.run())
+    try:
+        await wait_until(condition)
+    finally:
+        worker.stop()
+        await task
+
+
+def test_concurrent_publishes_keep_per_user_order(redis_client, redis_service):
+    async def run():
+        publisher = UpdatePublisher(redis_service, shards=1, maxlen=100)
+        await asyncio.gather(*(publisher.publish(make_update(i)) for i in range(1, 21)))
+
+        entries = await redis_client.xrange(STREAM_KEY.format(shard=0))
+        ids = [Update.model_validate_json(fields[UPDATE_FIELD.encode()]).update_id for _, fields in entries]
+        assert ids == list(range(1, 21))
+
+    asyncio.run(run())
+
+
+def test_failed_update_is_retried_in_order_then_dead_lettered(redis_client, redis_service):
+    async def run():
+        publisher = UpdatePublisher(redis_service, CONFIG.SHARDS, maxlen=100)
+        for i in (1, 2, 3):
+            await publisher.publish(make_update(i))
+        seen = []
+        worker = make_worker(redis_service, make_dispatcher(seen, {"1": 1, "2": 10}))
+
+        await run_until(worker, lambda: seen == ["1", "3"])
+        assert (worker.failed, worker.dead_lettered, worker.processed) == (1 + 3, 1, 3)
+        dead = await redis_client.xrange(DEAD_LETTER_KEY)
+        assert len(dead) == 1 and b"boom 2" in dead[0][1][b"error"]
+        stream = STREAM_KEY.format(shard=42 % CONFIG.SHARDS)
+        assert await redis_service.read_group(stream, CONSUMER_GROUP, "worker-0", 10, pending=True) == []
+
+    asyncio.run(run())
+
+
+def test_live_worker_takes_over_the_shards_of_a_dead_one(redis_service):
+    async def run():
+        publisher = UpdatePublisher(redis_service, CONFIG.SHARDS, maxlen=100)
+        await publisher.publish(make_update(1))
+        stream = STREAM_KEY.format(shard=42 % CONFIG.SHARDS)
+        # worker-0 received the update, then died before acknowledging it;
+        # its heartbeat and lease run out.
+        await redis_service.ensure_consumer_group(stream, CONSUMER_GROUP)
+        await redis_service.read_group(stream, CONSUMER_GROUP, "worker-0", 10)
+        await redis_service.add_to_sorted_set(WORKERS_KEY, {"worker-0": time.time() * 1000 - 10_000})
+        await redis_service.acquire_lock(LEASE_KEY.format(shard=0), "worker-0", 1)
+        await publisher.publish(make_update(2))
+
+        seen = []
+        worker = make_worker(redis_service, make_dispatcher(seen), index=1)
+        await run_until(worker, lambda: seen == ["1", "2"] and worker.shards == CONFIG.SHARDS)
+        assert await redis_service.read_group(stream, CONSUMER_GROUP, "worker-1", 10, pending=True) == []
+
+    asyncio.run(run())
+
+
+def test_shards_are_split_between_live_workers(redis_service):
+    async def run():
+        first = make_worker(redis_service, make_dispatcher([]), index=0)
+        second = make_worker(redis_service, make_dispatcher([]), index=1)
+        tasks = [asyncio.create_task(w.run()) for w in (first, second)]
+        await wait_until(lambda: first.shards == second.shards == 1)
+
+        # When one stops, the other takes its shard once the lease is free.
+        second.stop()
+        await tasks[1]
+        await wait_until(lambda: first.shards == 2)
+        first.stop()
+        await tasks[0]
+
+    asyncio.run(run())
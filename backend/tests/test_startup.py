@@ -0,0 +1,42 @@
+import asyncio
+
+from backend.src.startup import StartupProfiler, warm_up
+
+
+class Employees:
+    def __init__(self, delay):
+        self.delay = delay
+        self.loaded = False
+
+    async def load_employees(self):
+        await asyncio.sleep(self.delay)
+        self.loaded = True
+
+
+class Questionnaire:
+    async def get_questionnaire(self):
+        raise ConnectionError("Sheets unavailable")
+
+
+class Cycles:
+    async def backfill_active_cycles(self):
+        return 0
+
+
+def test_warm_up_reports_failures_and_keeps_slow_loads_running():
+    async def run():
+        employees = Employees(delay=0.2)
+        dp = {
+            "employee_service": employees,
+            "questionnaire_service": Questionnaire(),
+            "cycle_service": Cycles(),
+        }
+        profiler = StartupProfiler(0.0)
+        degraded = await warm_up(dp, profiler, timeout=0.05)
+        assert degraded == ["employees"] and not employees.loaded
+        await asyncio.sleep(0.3)
+        assert employees.loaded and "warm_up.employees" in profiler.phases
+
+        assert await warm_up(dp, StartupProfiler(0.0), timeout=1) == ["questionnaire"]
+
+    asyncio.run(run())
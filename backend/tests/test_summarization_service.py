@@ -0,0 +1,100 @@
+import asyncio
+
+from backend.src.services.summarization_service import (
+    ExtractiveSummarizationBackend,
+    SummarizationBackend,
+    SummarizationService,
+    SummaryMetrics,
+    estimate_tokens,
+)
+
+
+class FakeRedisService:
+    def __init__(self):
+        self.values = {}
+
+    async def get(self, key):
+        return self.values.get(key)
+
+    async def set_value(self, key, value, ttl=None):
+        self.values[key] = value
+
+
+class CountingBackend(ExtractiveSummarizationBackend):
+    def __init__(self):
+        super().__init__()
+        self.calls = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def summarize(self, texts, instruction):
+        self.calls += 1
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        await asyncio.sleep(0.01)
+        self.in_flight -= 1
+        return await super().summarize(texts, instruction)
+
+
+ANSWERS = {
+    "O2_strengths": [f"Отлично ведёт переговоры с клиентами, пример {i}." for i in range(40)],
+    "O1_blockers": ["Иногда теряет фокус на приоритетах.", "Мало делегирует задачи команде."],
+}
+
+
+def test_chunking_respects_token_budget():
+    service = SummarizationService(FakeRedisService(), CountingBackend(), chunk_token_budget=50)
+    chunks = service.chunk(ANSWERS["O2_strengths"])
+
+    assert len(chunks) > 1
+    assert sum(len(c) for c in chunks) == len(ANSWERS["O2_strengths"])
+
+
+def test_parallel_calls_are_capped_and_cached():
+    backend = CountingBackend()
+    service = SummarizationService(
+        FakeRedisService(), backend, max_concurrency=2, chunk_token_budget=50
+    )
+
+    first = asyncio.run(service.summarize_report(ANSWERS))
+    calls_after_first = backend.calls
+    second = asyncio.run(service.summarize_report(ANSWERS))
+
+    assert backend.max_in_flight <= 2
+    assert first.summaries == second.summaries
+    assert first.summaries["O2_strengths"].startswith("• ")
+    assert first.metrics.cache_hits == 0
+    assert backend.calls == calls_after_first
+    assert second.metrics.calls == 0
+    assert second.metrics.cache_hit_ratio == 1.0
+
+
+def test_failed_backend_leaves_topic_empty():
+    class FailingBackend(ExtractiveSummarizationBackend):
+        async def summarize(self, texts, instruction):
+            raise RuntimeError("unavailable")
+
+    service = SummarizationService(FakeRedisService(), FailingBackend())
+    result = asyncio.run(service.summarize_report(ANSWERS))
+
+    assert result.failed_topics == ["O1_blockers", "O2_strengths"]
+    assert result.metrics.errors == 2
+
+
+def test_summaries_that_do_not_shrink_stay_within_the_budget():
+    class VerboseBackend(SummarizationBackend):
+        name = "verbose"
+
+        def __init__(self):
+            self.chunk_tokens = []
+
+        async def summarize(self, texts, instruction):
+            self.chunk_tokens.append(sum(estimate_tokens(t) for t in texts))
+            return "Подробный пересказ. " * 10
+
+    backend = VerboseBackend()
+    service = SummarizationService(FakeRedisService(), backend, chunk_token_budget=60)
+    summary = asyncio.run(service.summarize(ANSWERS["O2_strengths"], "инструкция", SummaryMetrics()))
+
+    assert summary.startswith("Подробный пересказ.")
+    assert max(backend.chunk_tokens) <= 60
@@ -0,0 +1,202 @@
+import asyncio
+import itertools
+import time
+from datetime import date
+
+import pytest
+from aiogram import Bot, Dispatcher
+from aiogram.client.session.base import BaseSession
+from aiogram.fsm.storage.memory import MemoryStorage
+from aiogram.methods import AnswerCallbackQuery, SendMessage
+from aiogram.types import Message, Update
+
+from backend.src.bot.handlers import respondent
+from backend.src.config import ResultsSettings
+from backend.src.services.cycle_service import CycleService, CycleSpec
+from backend.src.services.employee_service import EmployeeService
+from backend.src.services.progress_service import ProgressService
+from backend.src.services.result_storage import ResultStorageRouter
+from backend.src.services.token_service import SurveyTokenService
+from backend.src.storage.models import Question
+from backend.src.storage.results_store import ResultsStore
+
+BOB_TELEGRAM_ID = 42
+QUESTIONS = [
+    Question(question_id="G-2", question_text="Подходит ли «{Имя}» роли?", question_type="radio",
+             options="yes,no,unknown", is_required="да", sheet_column="G2_role_fit"),
+    Question(question_id="G-1", question_text="Что ценишь?", question_type="checkbox",
+             options="communication,flexibility,teamwork", is_required="нет", sheet_column="G1_comfort"),
+    Question(question_id="O-2", question_text="Сильные стороны", question_type="textarea",
+             is_required="да", sheet_column="O2_strengths"),
+]
+
+
+class Questionnaire:
+    async def get_questionnaire(self):
+        return QUESTIONS
+
+
+class Sheets:
+    main_spreadsheet_id = "main"
+
+    async def get_all_records(self, sheet_name):
+        return [
+            {"Telegram_Nickname": f"@{n}", "Last_Name": n.title(), "First_Name": "A"}
+            for n in ("ann", "bob")
+        ]
+
+    async def get_usage(self, spreadsheet_id=None):
+        return 0, 0
+
+    async def create_worksheets(self, worksheets, spreadsheet_id=None):
+        return len(worksheets)
+
+
+class RecordingSession(BaseSession):
+    """Answers Bot API calls in-process and keeps the texts the bot sent."""
+
+    def __init__(self):
+        super().__init__()
+        self.texts = []
+        self.alerts = []
+        self._message_ids = itertools.count(1)
+
+    async def make_request(self, bot, method, timeout=None):
+        if isinstance(method, SendMessage):
+            self.texts.append(method.text)
+            return Message.model_validate(
+                {"message_id": next(self._message_ids), "date": int(time.time()),
+                 "chat": {"id": method.chat_id, "type": "private"}, "text": method.text},
+                context={"bot": bot},
+            )
+        if isinstance(method, AnswerCallbackQuery) and method.text:
+            self.alerts.append(method.text)
+        return True
+
+    async def stream_content(self, *args, **kwargs):
+        yield b""
+
+    async def close(self):
+        pass
+
+
+class Respondent:
+    def __init__(self, dp, bot):
+        self._dp = dp
+        self._bot = bot
+        self._ids = itertools.count(1)
+
+    async def _feed(self, payload):
+        update = Update.model_validate({"update_id": next(self._ids), **payload}, context={"bot": self._bot})
+        await self._dp.feed_update(self._bot, update)
+
+    async def press(self, data):
+        user = {"id": BOB_TELEGRAM_ID, "is_bot": False, "first_name": "Bob", "username": "bob"}
+        await self._feed({"callback_query": {
+            "id": str(next(self._ids)), "chat_instance": "1", "from": user, "data": data,
+            "message": {"message_id": 1, "date": 1, "text": "screen",
+                        "chat": {"id": BOB_TELEGRAM_ID, "type": "private"}},
+        }})
+
+    async def send(self, text):
+        user = {"id": BOB_TELEGRAM_ID, "is_bot": False, "first_name": "Bob", "username": "bob"}
+        await self._feed({"message": {
+            "message_id": next(self._ids), "date": 0, "text": text, "from": user,
+            "chat": {"id": BOB_TELEGRAM_ID, "type": "private"},
+        }})
+
+
+@pytest.fixture
+def store():
+    store = ResultsStore(":memory:")
+    yield store
+    store.close()
+
+
+def make_cycle_service(redis_service, store):
+    return CycleService(
+        redis_service,
+        Sheets(),
+        Questionnaire(),
+        SurveyTokenService(redis_service, secret="secret"),
+        ProgressService(redis_service),
+        ResultStorageRouter(redis_service, Sheets(), ResultsSettings()),
+        store,
+    )
+
+
+def test_respondent_answers_and_submits_the_questionnaire(redis_service, store):
+    async def run():
+        cycle_service = make_cycle_service(redis_service, store)
+        employee_service = EmployeeService(redis_service, Sheets())
+        await employee_service.load_employees()
+        await employee_service.register_telegram_id("bob", BOB_TELEGRAM_ID)
+        target = employee_service.find_by_id("ann")
+        cycle = (await cycle_service.create_cycles([CycleSpec(target, ["bob"], date(2030, 1, 1))]))[0]
+
+        dp = Dispatcher(
+            storage=MemoryStorage(),
+            cycle_service=cycle_service,
+            employee_service=employee_service,
+            token_service=SurveyTokenService(redis_service, secret="secret"),
+            questionnaire_service=Questionnaire(),
+            progress_service=ProgressService(redis_service),
+        )
+        dp.include_router(respondent.router)
+        session = RecordingSession()
+        bob = Respondent(dp, Bot("12345:test-token", session=session))
+
+        await bob.press(f"survey:{cycle.respondents['bob'].token}")
+        assert session.texts[-1].startswith("Вопрос 1/3") and "A Ann" in session.texts[-1]
+        await bob.send("yes")
+        assert session.texts[-1] == "Выберите ответ кнопкой под вопросом."
+        await bob.press("sq:a:0:1")
+        assert session.texts[-1].startswith("Вопрос 2/3")
+        await bob.press("sq:t:1:0")
+        await bob.press("sq:t:1:2")
+        await bob.press("sq:t:1:0")
+        await bob.press("sq:t:1:0")
+        await bob.press("sq:n:1")
+        await bob.press("sq:a:0:0")
+        assert session.alerts[-1] == "Этот вопрос уже пройден."
+        await bob.press("sq:s:2")
+        assert session.alerts[-1] == "Это обязательный вопрос."
+        await bob.send("Надёжная")
+        assert session.texts[-1] == "Анкета заполнена. Отправить ответы?"
+        await bob.press("sq_submit")
+
+        rows = store.get_rows(cycle.id)
+        assert rows[0][3:] == ["G2_role_fit", "G1_comfort", "O2_strengths"]
+        assert rows[1][:2] == [cycle.id, "bob"]
+        assert rows[1][3:] == ["no", "communication, teamwork", "Надёжная"]
+        stored = await cycle_service.get_cycle_by_id(cycle.id)
+        assert stored.respondents["bob"].status == "completed"
+        assert (await ProgressService(redis_service).get_snapshot()).cycles[cycle.id].completed == 1
+
+        await bob.press(f"survey:{cycle.respondents['bob'].token}")
+        assert session.texts[-1] == "Вы уже заполнили эту анкету. Спасибо!"
+
+    asyncio.run(run())
+
+
+def test_submission_to_a_cycle_created_on_another_host(redis_service, store, tmp_path):
+    async def run():
+        employees = EmployeeService(redis_service, Sheets())
+        await employees.load_employees()
+        cycle = (await make_cycle_service(redis_service, store).create_cycles(
+            [CycleSpec(employees.find_by_id("ann"), ["bob"], date(2030, 1, 1))]
+        ))[0]
+
+        other_store = ResultsStore(str(tmp_path / "other.db"))
+        other_host = make_cycle_service(redis_service, other_store)
+        assert await other_host.submit_answers(cycle, "bob", {"G-2": "yes", "O-2": "Всё"})
+        assert not await other_host.submit_answers(cycle, "bob", {"G-2": "no"})
+
+        # Reports and exports read the worksheet; the row still gets there.
+        assert not other_store.has_cycle(cycle.id)
+        [item] = other_store.pending_mirror(10)
+        assert (item.spreadsheet_id, item.sheet) == ("main", cycle.results_sheet)
+        assert item.row[3:] == ["yes", "", "Всё"]
+        other_store.close()
+
+    asyncio.run(run())
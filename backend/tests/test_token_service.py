@@ -0,0 +1,107 @@
+import asyncio
+from datetime import date, timedelta
+
+import pytest
+
+from backend.src.bot.keyboards.survey_keyboards import get_survey_invitation_keyboard
+from backend.src.services.token_service import SurveyTokenService, compact_cycle_id, expand_cycle_id
+
+NEXT_WEEK = date.today() + timedelta(days=7)
+
+
+def make_service(redis_service, secret="secret"):
+    return SurveyTokenService(redis_service, secret=secret, grace_days=1)
+
+
+def test_issue_and_verify_roundtrip(redis_service):
+    service = make_service(redis_service)
+    token = service.issue("20250622_ivan", "petr_99", NEXT_WEEK)
+
+    data = asyncio.run(service.verify(token, "petr_99"))
+    assert data.cycle_id == "20250622_ivan"
+    assert data.respondent_id == "petr_99"
+
+
+def test_longest_usernames_fit_into_callback_data(redis_service):
+    service = make_service(redis_service)
+    # Telegram usernames have at most 32 characters.
+    cycle_id = "20251019_" + "a" * 32
+    respondent_id = "konstantin_ivanov_vladimirovich"
+    token = service.issue(cycle_id, respondent_id, NEXT_WEEK)
+
+    callback_data = get_survey_invitation_keyboard(token).inline_keyboard[0][0].callback_data
+    assert len(callback_data.encode("utf-8")) <= 64
+    assert asyncio.run(service.verify(token, respondent_id)).cycle_id == cycle_id
+
+    with pytest.raises(ValueError):
+        service.issue("20251019_" + "a" * 64, respondent_id, NEXT_WEEK)
+
+
+def test_cycle_ids_are_carried_compactly():
+    assert compact_cycle_id("20250622_ivan") == "76givan"
+    assert expand_cycle_id("76givan") == "20250622_ivan"
+    assert expand_cycle_id("76g") is None
+    assert expand_cycle_id("!!!ivan") is None
+    for cycle_id in ("ivan", "2025-06-22_ivan", "20250622_", "20250622_iv-an"):
+        with pytest.raises(ValueError):
+            compact_cycle_id(cycle_id)
+
+
+def test_tampered_or_foreign_token_is_rejected(redis_service):
+    service = make_service(redis_service)
+    token = service.issue("20250622_ivan", "petr", NEXT_WEEK)
+
+    assert asyncio.run(service.verify(token, "maria")) is None
+    assert asyncio.run(service.verify("garbage", "petr")) is None
+    assert asyncio.run(service.verify("76h" + token[3:], "petr")) is None
+    assert asyncio.run(make_service(redis_service, secret="other").verify(token, "petr")) is None
+
+
+def test_expired_token_is_rejected(redis_service):
+    service = make_service(redis_service)
+    token = service.issue("20250622_ivan", "petr", date.today() - timedelta(days=3))
+
+    assert asyncio.run(service.verify(token, "petr")) is None
+
+
+def test_revoked_cycle_is_rejected_and_persisted(redis_service):
+    async def run():
+        service = make_service(redis_service)
+        token = service.issue("20250622_ivan", "petr", NEXT_WEEK)
+
+        await service.revoke_cycle("20250622_ivan")
+        assert await service.verify(token, "petr") is None
+        # A process that does not follow revocations yet asks Redis.
+        assert await make_service(redis_service).verify(token, "petr") is None
+
+    asyncio.run(run())
+
+
+def test_following_revocations_verifies_without_redis_reads(redis_service, monkeypatch):
+    async def run():
+        revoked_before = make_service(redis_service).issue("20250622_ivan", "petr", NEXT_WEEK)
+        await make_service(redis_service).revoke_cycle("20250622_ivan")
+
+        service = make_service(redis_service)
+        service.start()
+        while not service._following:
+            await asyncio.sleep(0.01)
+
+        async def no_reads(*args):
+            raise AssertionError("verification read Redis")
+
+        monkeypatch.setattr(redis_service, "is_set_member", no_reads)
+        token = service.issue("20250623_olga", "petr", NEXT_WEEK)
+        assert (await service.verify(token, "petr")).cycle_id == "20250623_olga"
+        assert await service.verify(revoked_before, "petr") is None
+
+        # Revoked by another process after this one subscribed.
+        await make_service(redis_service).revoke_cycle("20250623_olga")
+        for _ in range(100):
+            if await service.verify(token, "petr") is None:
+                break
+            await asyncio.sleep(0.01)
+        assert await service.verify(token, "petr") is None
+        await service.stop()
+
+    asyncio.run(run())
@@ -0,0 +1,40 @@
+import asyncio
+
+from backend.src.tracing import Span, _current_span, format_trace, span, traced
+
+
+@traced("load")
+async def load():
+    await asyncio.sleep(0)
+
+
+@traced("render")
+async def render():
+    async with span("keyboard", page=1):
+        await load()
+
+
+def test_spans_nest_across_tasks():
+    async def scenario():
+        root = Span("message")
+        token = _current_span.set(root)
+        try:
+            await asyncio.gather(render(), load())
+        finally:
+            _current_span.reset(token)
+        root.end = root.start + 0.5
+        return root.to_dict()
+
+    trace = asyncio.run(scenario())
+
+    assert [child["name"] for child in trace["children"]] == ["render", "load"]
+    keyboard = trace["children"][0]["children"][0]
+    assert keyboard["attrs"] == {"page": 1}
+    assert keyboard["children"][0]["name"] == "load"
+    assert format_trace(trace)[0] == "message — 500 ms"
+
+
+def test_no_spans_outside_a_trace():
+    asyncio.run(render())
+
+    assert _current_span.get() is None
@@ -0,0 +1,82 @@
+import asyncio
+
+import pytest
+from aiogram import Bot
+from aiohttp.test_utils import TestClient, TestServer
+from pydantic import ValidationError
+
+from backend.src.config import Settings, WebhookSettings
+from backend.src.webhook import SECRET_HEADER, WebhookServer
+
+SECRET = {SECRET_HEADER: "s3cret"}
+
+
+class Dispatcher:
+    def __init__(self):
+        self.release = asyncio.Event()
+        self.handled = []
+
+    async def feed_update(self, bot, update):
+        await self.release.wait()
+        self.handled.append(update.update_id)
+
+
+def run_with_client(server, scenario):
+    async def run():
+        async with TestClient(TestServer(server.create_app())) as client:
+            await scenario(client)
+
+    asyncio.run(run())
+
+
+def make_server(dp, **kwargs):
+    return WebhookServer(dp, Bot("12345:test-token"), secret_token="s3cret", **kwargs)
+
+
+def test_updates_need_the_secret_token():
+    dp = Dispatcher()
+    server = make_server(dp)
+
+    async def scenario(client):
+        assert (await client.post("/webhook", json={"update_id": 1})).status == 401
+        wrong = {SECRET_HEADER: "guess"}
+        assert (await client.post("/webhook", json={"update_id": 1}, headers=wrong)).status == 401
+        assert (await client.post("/webhook", data="{", headers=SECRET)).status == 400
+        assert (await client.post("/webhook", json={"update_id": 1}, headers=SECRET)).status == 200
+        assert server.accepted == 1
+
+    run_with_client(server, scenario)
+
+
+def test_full_queue_asks_telegram_to_retry_and_reports_not_ready():
+    dp = Dispatcher()
+    server = make_server(dp, queue_size=1, workers=1, enqueue_timeout=0.01)
+
+    async def scenario(client):
+        assert (await client.get("/readyz")).status == 503
+        await server.start()
+        assert (await client.get("/readyz")).status == 200
+
+        for update_id in (1, 2):
+            assert (await client.post("/webhook", json={"update_id": update_id}, headers=SECRET)).status == 200
+        await asyncio.sleep(0)
+        # The worker holds update 1 and update 2 fills the queue.
+        assert (await client.post("/webhook", json={"update_id": 3}, headers=SECRET)).status == 503
+        ready = await client.get("/readyz")
+        assert ready.status == 503 and (await ready.json()) == {"ready": False, "queued": 1}
+        assert (server.accepted, server.rejected) == (2, 1)
+
+        dp.release.set()
+        await server.stop(timeout=1)
+        assert dp.handled == [1, 2]
+
+    run_with_client(server, scenario)
+
+
+def test_webhook_mode_requires_an_https_url():
+    with pytest.raises(ValidationError):
+        Settings(UPDATES_MODE="webhook", webhook=WebhookSettings(URL=""))
+    with pytest.raises(ValidationError):
+        Settings(UPDATES_MODE="webhook", webhook=WebhookSettings(URL="http://bot.example.com"))
+    assert Settings(UPDATES_MODE="webhook", webhook=WebhookSettings(URL="https://bot.example.com"))
+    assert Settings(UPDATES_MODE="polling").UPDATES_MODE == "polling"
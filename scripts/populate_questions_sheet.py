@@ -1,6 +1,10 @@
+import argparse
 import os
+
 import gspread
+import redis
 from dotenv import load_dotenv
+from gspread.utils import rowcol_to_a1
 
 # --- Configuration ---
 # This list is generated based on the updated docs/spec_360_feedback_bot.md
@@ -33,10 +37,127 @@ QUESTIONS_DATA = [
 ]
 
 QUESTIONS_SHEET_NAME = "Questions"
+# Keep in sync with backend/src/services/question_service.py; the bot's
+# cache key includes this version.
+QUESTIONNAIRE_VERSION_KEY = "questionnaire:version"
+
+
+def desired_rows():
+    header = list(QUESTIONS_DATA[0].keys())
+    return [header] + [[str(q[column]) for column in header] for q in QUESTIONS_DATA]
+
+
+def diff_rows(current, desired):
+    """
+    Compares the sheet row by row with the desired rows.
+    Returns the 1-based numbers and new values of the rows that differ;
+    rows past the end of the desired data are blanked.
+    """
+    width = max([len(row) for row in current + desired] or [0])
+
+    def pad(row):
+        return list(row) + [""] * (width - len(row))
+
+    changes = []
+    for index in range(max(len(current), len(desired))):
+        old = pad(current[index]) if index < len(current) else pad([])
+        new = pad(desired[index]) if index < len(desired) else pad([])
+        if old != new:
+            changes.append((index + 1, new))
+    return changes
+
+
+def describe_diff(current, desired):
+    """Summarises the difference by question ID: added, removed and changed questions."""
+    def by_id(rows):
+        if not rows:
+            return {}
+        header = rows[0]
+        return {row[0]: dict(zip(header, row)) for row in rows[1:] if row and row[0]}
+
+    old, new = by_id(current), by_id(desired)
+    lines = []
+    if current[:1] != desired[:1]:
+        lines.append(f"~ header: {current[0] if current else []} -> {desired[0]}")
+    for question_id, fields in new.items():
+        if question_id not in old:
+            lines.append(f"+ {question_id}: {fields.get('text', '')}")
+        else:
+            for column, value in fields.items():
+                if old[question_id].get(column, "") != value:
+                    lines.append(f"~ {question_id}.{column}: {old[question_id].get(column, '')!r} -> {value!r}")
+    lines.extend(f"- {question_id}" for question_id in old if question_id not in new)
+    if not lines and list(old) != list(new):
+        lines.append("~ question order")
+    return lines
+
+
+def invalidate_cache():
+    """Bumps the questionnaire version, which makes the bot read the sheet again."""
+    try:
+        client = redis.Redis(
+            host=os.getenv("REDIS_HOST", "localhost"),
+            port=int(os.getenv("REDIS_PORT", "6379")),
+            db=int(os.getenv("REDIS_DB", "0")),
+        )
+        version = client.incr(QUESTIONNAIRE_VERSION_KEY)
+        print(f"Questionnaire version bumped to {version}; the bot reads the new questions.")
+    except redis.RedisError as e:
+        print(f"Warning: could not update Redis ({e}). The bot picks up the changes when its cache expires.")
+
+
+def sync(worksheet, dry_run):
+    """Applies only the rows that differ, in a single batch update."""
+    current = worksheet.get_all_values()
+    desired = desired_rows()
+    changes = diff_rows(current, desired)
+    if not changes:
+        print(f"'{QUESTIONS_SHEET_NAME}' is up to date.")
+        return
+
+    for line in describe_diff(current, desired):
+        print(line)
+    print(f"{len(changes)} rows differ.")
+    if dry_run:
+        print("Dry run: nothing was written.")
+        return
+
+    width = max(len(values) for _, values in changes)
+    if len(desired) > worksheet.row_count or width > worksheet.col_count:
+        worksheet.resize(rows=max(len(desired), worksheet.row_count), cols=max(width, worksheet.col_count))
+    worksheet.batch_update(
+        [
+            {"range": f"A{row}:{rowcol_to_a1(row, width)}", "values": [values]}
+            for row, values in changes
+        ],
+        value_input_option="RAW",
+    )
+    print(f"Updated {len(changes)} rows of '{QUESTIONS_SHEET_NAME}'.")
+    invalidate_cache()
+
+
+def rewrite(spreadsheet):
+    """Clears the worksheet and writes all questions again."""
+    try:
+        worksheet = spreadsheet.worksheet(QUESTIONS_SHEET_NAME)
+        print(f"Worksheet '{QUESTIONS_SHEET_NAME}' found. Clearing it before writing new data.")
+        worksheet.clear()
+    except gspread.WorksheetNotFound:
+        print(f"Worksheet '{QUESTIONS_SHEET_NAME}' not found. Creating a new one.")
+        worksheet = spreadsheet.add_worksheet(title=QUESTIONS_SHEET_NAME, rows=len(QUESTIONS_DATA) + 1, cols=len(QUESTIONS_DATA[0]))
+
+    rows = desired_rows()
+    worksheet.append_rows(rows, value_input_option='RAW')
+    print(f"Successfully wrote {len(rows) - 1} questions to '{QUESTIONS_SHEET_NAME}'.")
+    invalidate_cache()
+
 
 def main():
-    """Main function to populate the Google Sheet with questions."""
-    print("Starting script to populate Google Sheet with updated questions...")
+    """Main function to sync the Google Sheet with the questions."""
+    parser = argparse.ArgumentParser(description="Sync the Questions worksheet with QUESTIONS_DATA.")
+    parser.add_argument("--dry-run", action="store_true", help="print the diff without writing")
+    parser.add_argument("--rewrite", action="store_true", help="clear the worksheet and write it from scratch")
+    args = parser.parse_args()
 
     # Load environment variables from .env file in the project root
     project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -63,25 +184,18 @@ def main():
         spreadsheet = gc.open_by_key(sheet_id)
         print(f"Successfully opened spreadsheet: '{spreadsheet.title}'")
 
-        # Get or create the worksheet
+        if args.rewrite and not args.dry_run:
+            rewrite(spreadsheet)
+            return
         try:
             worksheet = spreadsheet.worksheet(QUESTIONS_SHEET_NAME)
-            print(f"Worksheet '{QUESTIONS_SHEET_NAME}' found. Clearing it before writing new data.")
-            worksheet.clear()
         except gspread.WorksheetNotFound:
-            print(f"Worksheet '{QUESTIONS_SHEET_NAME}' not found. Creating a new one.")
-            worksheet = spreadsheet.add_worksheet(title=QUESTIONS_SHEET_NAME, rows=len(QUESTIONS_DATA) + 1, cols=len(QUESTIONS_DATA[0]))
-
-        # Prepare data for upload
-        header = list(QUESTIONS_DATA[0].keys())
-        rows = [list(q.values()) for q in QUESTIONS_DATA]
-
-        # Write to sheet
-        worksheet.append_row(header, value_input_option='RAW')
-        worksheet.append_rows(rows, value_input_option='RAW')
-
-        print(f"Successfully wrote {len(rows)} questions to '{QUESTIONS_SHEET_NAME}'.")
-        print("Script finished.")
+            if args.dry_run:
+                print(f"Worksheet '{QUESTIONS_SHEET_NAME}' not found; it would be created.")
+                return
+            rewrite(spreadsheet)
+            return
+        sync(worksheet, args.dry_run)
 
     except gspread.exceptions.SpreadsheetNotFound:
         print(f"Error: Spreadsheet with ID '{sheet_id}' not found. Check your GOOGLE_SHEET_ID.")
@@ -89,4 +203,4 @@ def main():
         print(f"An unexpected error occurred: {e}")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()